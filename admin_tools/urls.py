@@ -8,6 +8,8 @@ from . import views
 
 urlpatterns = [
     url(r'^$', views.admin_home_view, name='admin_home',),
+    url(r'^api_profiler/$', views.api_profiler_view, name='api_profiler'),
+    url(r'^api_profiler_json/$', views.api_profiler_json_view, name='api_profiler_json'),
     url(r'^data_cleanup/$', views.data_cleanup_view, name='data_cleanup'),
     url(r'^data_cleanup_organization_analysis/$',
         views.data_cleanup_organization_analysis_view, name='data_cleanup_organization_analysis'),
@@ -19,6 +21,8 @@ urlpatterns = [
         views.data_cleanup_voter_hanging_data_process_view, name='data_cleanup_voter_hanging_data_process'),
     url(r'^data_cleanup_voter_list_analysis/$',
         views.data_cleanup_voter_list_analysis_view, name='data_cleanup_voter_list_analysis'),
+    url(r'^database_routing_statistics/$',
+        views.database_routing_statistics_view, name='database_routing_statistics'),
     url(r'^data_voter_statistics/$', views.data_voter_statistics_view, name='data_voter_statistics'),
     url(r'^import_sample_data/$', views.import_sample_data_view, name='import_sample_data'),
     url(r'^statistics/$', views.statistics_summary_view, name='statistics_summary'),
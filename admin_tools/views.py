@@ -3,8 +3,9 @@
 # -*- coding: UTF-8 -*-
 
 from config.base import get_environment_variable, get_python_version, LOGIN_URL
-from ballot.models import BallotReturned, VoterBallotSaved
-from candidate.models import CandidateCampaign, CandidateCampaignManager
+from config.database_router import database_routing_state
+from apis_v1.request_profiler import api_profiler
+from candidate.models import CandidateCampaignManager
 from candidate.controllers import candidates_import_from_sample_file
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
@@ -14,7 +15,8 @@ from django.urls import reverse
 from django.db.models import Count, Q
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
-from election.models import Election
+from election.controllers_statistics import ELECTION_STATISTICS_COUNT_FIELD_LIST
+from election.models import Election, ElectionStatisticsManager
 from election.controllers import elections_import_from_sample_file
 from email_outbound.models import EmailAddress
 from follow.models import FollowOrganizationList
@@ -23,9 +25,9 @@ from import_export_facebook.models import FacebookLinkToVoter, FacebookManager
 from import_export_google_civic.models import GoogleCivicApiCounterManager
 from import_export_vote_smart.models import VoteSmartApiCounterManager
 from import_export_ballotpedia.models import BallotpediaApiCounterManager
-from measure.models import ContestMeasure, ContestMeasureManager
+from measure.models import ContestMeasureManager
+import os
 from office.controllers import offices_import_from_sample_file
-from office.models import ContestOffice
 from organization.controllers import organizations_import_from_sample_file
 from organization.models import Organization, OrganizationManager, INDIVIDUAL
 from polling_location.controllers import import_and_save_all_polling_locations_data
@@ -33,11 +35,12 @@ from position.controllers import find_organizations_referenced_in_positions_for_
     positions_import_from_sample_file
 from position.models import PositionEntered, PositionForFriends, PositionMetricsManager
 from twitter.models import TwitterLinkToOrganization, TwitterLinkToVoter, TwitterUserManager
-from voter.models import Voter, VoterAddress, VoterAddressManager, VoterDeviceLinkManager, \
+from voter.models import Voter, VoterAddressManager, VoterDeviceLinkManager, \
     VoterManager, VoterMetricsManager, \
     voter_has_authority, voter_setup
 from wevote_functions.functions import convert_to_int, delete_voter_api_device_id_cookie, generate_voter_device_id, \
     get_voter_api_device_id, positive_value_exists, set_voter_api_device_id, STATE_CODE_MAP
+from wevote_functions.process_statistics import process_statistics_json_response
 
 BALLOT_ITEMS_SYNC_URL = get_environment_variable("BALLOT_ITEMS_SYNC_URL")  # ballotItemsSyncOut
 BALLOT_RETURNED_SYNC_URL = get_environment_variable("BALLOT_RETURNED_SYNC_URL")  # ballotReturnedSyncOut
@@ -54,6 +57,8 @@ POLLING_LOCATIONS_SYNC_URL = get_environment_variable("POLLING_LOCATIONS_SYNC_UR
 POSITIONS_SYNC_URL = get_environment_variable("POSITIONS_SYNC_URL")  # positionsSyncOut
 VOTER_GUIDES_SYNC_URL = get_environment_variable("VOTER_GUIDES_SYNC_URL")  # voterGuidesSyncOut
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
+# update_suggested_friends_for_voter_list holds every pair of these voters' friends in memory
+SUGGESTED_FRIENDS_VOTERS_PER_UPDATE = 500
 
 
 @login_required
@@ -104,6 +109,52 @@ def admin_home_view(request):
     return response
 
 
+@login_required
+def api_profiler_view(request):
+    """
+    Percentiles for each /apis/v1/ endpoint, and the slowest requests, from the worker process answering this request.
+    Add clear=1 to start over.
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    if positive_value_exists(request.GET.get('clear', False)):
+        api_profiler.clear()
+    statistics = api_profiler.statistics()
+    endpoint_statistics_list = []
+    for endpoint in statistics['endpoint_list']:
+        endpoint_statistics = statistics['statistics_by_endpoint'][endpoint]
+        endpoint_statistics['endpoint'] = endpoint
+        endpoint_statistics['database_list'] = sorted(endpoint_statistics['queries_by_database'].items())
+        endpoint_statistics_list.append(endpoint_statistics)
+    template_values = {
+        'api_profiler_on':          statistics['api_profiler_on'],
+        'endpoint_statistics_list': endpoint_statistics_list,
+        'process_id':               os.getpid(),
+        'slowest_request_list':     statistics['slowest_request_list'],
+    }
+    return render(request, 'admin_tools/api_profiler.html', template_values)
+
+
+@login_required
+def api_profiler_json_view(request):
+    """
+    Everything api_profiler_view shows, as json
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    return process_statistics_json_response(request, api_profiler.statistics)
+
+
 @login_required
 def data_cleanup_view(request):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -1107,18 +1158,15 @@ def data_cleanup_voter_list_analysis_view(request):
 
     suggested_friend_created_count = 0
     if updated_suggested_friends:
-        current_friends_results = CurrentFriend.objects.all()
-
-        for one_current_friend in current_friends_results:
-            # Start with one_current_friend.viewer_voter_we_vote_id, get a list of all of that voter's friends
-            results = friend_manager.update_suggested_friends_starting_with_one_voter(
-                one_current_friend.viewer_voter_we_vote_id)
-            if results['suggested_friend_created_count']:
-                suggested_friend_created_count += results['suggested_friend_created_count']
-
-            # Then do the other side of the friendship - the viewee
-            results = friend_manager.update_suggested_friends_starting_with_one_voter(
-                one_current_friend.viewee_voter_we_vote_id)
+        # Both sides of every friendship
+        voter_we_vote_id_set = set()
+        for viewer_voter_we_vote_id, viewee_voter_we_vote_id in CurrentFriend.objects.values_list(
+                'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id'):
+            voter_we_vote_id_set.update([viewer_voter_we_vote_id, viewee_voter_we_vote_id])
+        voter_we_vote_id_list = sorted(we_vote_id for we_vote_id in voter_we_vote_id_set if we_vote_id)
+        for start in range(0, len(voter_we_vote_id_list), SUGGESTED_FRIENDS_VOTERS_PER_UPDATE):
+            results = friend_manager.update_suggested_friends_for_voter_list(
+                voter_we_vote_id_list[start:start + SUGGESTED_FRIENDS_VOTERS_PER_UPDATE])
             if results['suggested_friend_created_count']:
                 suggested_friend_created_count += results['suggested_friend_created_count']
 
@@ -1333,6 +1381,23 @@ def data_cleanup_voter_list_analysis_view(request):
     return response
 
 
+@login_required
+def database_routing_statistics_view(request):
+    """
+    Per view, how many reads and writes the worker process answering this request sent to each database. The views
+    at the top of endpoints_by_primary_reads are the ones still reading from the primary. Add clear=1 to start over.
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    return process_statistics_json_response(
+        request, database_routing_state.statistics, clear_statistics=database_routing_state.clear)
+
+
 @login_required
 def data_voter_statistics_view(request):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -1362,161 +1427,42 @@ def data_voter_statistics_view(request):
     # ####################################
     # Statistics by Election
     # ####################################
+    # The counts are calculated by the REFRESH_ELECTION_STATISTICS batch process (election/controllers_statistics.py)
     election_statistics = []
     election_query = Election.objects.order_by('-google_civic_election_id')
     number_of_voters_found = 0
+    results = ElectionStatisticsManager().retrieve_election_statistics_dict()
+    election_statistics_dict = results['election_statistics_dict']
+    elections_without_statistics_count = 0
     for one_election in election_query:
         if not positive_value_exists(one_election.google_civic_election_id):
             # Skip this entry if missing google_civic_election_id
             continue
-        election_values_exist = False
-        # ################################
-        # For this election, how many addresses were saved?
-        address_query = VoterAddress.objects.all()
-        address_query = address_query.filter(google_civic_election_id=one_election.google_civic_election_id)
-        one_election.voter_address_count = address_query.count()
-        if positive_value_exists(one_election.voter_address_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many BallotSaved entries were saved for voters?
-        ballot_saved_query = VoterBallotSaved.objects.all()
-        ballot_saved_query = ballot_saved_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        ballot_saved_query = ballot_saved_query.exclude(
-            voter_id=0)
-        one_election.voter_ballot_saved_count = ballot_saved_query.count()
-        if positive_value_exists(one_election.voter_ballot_saved_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many BallotReturned entries were saved for voters?
-        ballot_returned_query = BallotReturned.objects.all()
-        ballot_returned_query = ballot_returned_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        ballot_returned_query = ballot_returned_query.exclude(
-            voter_id=0)
-        ballot_returned_query = ballot_returned_query.exclude(
-            voter_id=None)
-        one_election.voter_ballot_returned_count = ballot_returned_query.count()
-        if positive_value_exists(one_election.voter_ballot_returned_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many individual voters saved at least one Public PositionEntered entry?
-        voter_position_entered_query = PositionEntered.objects.all()
-        voter_position_entered_query = voter_position_entered_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        voter_position_entered_query = voter_position_entered_query.exclude(
-            voter_we_vote_id=None)
-        voter_position_entered_query = voter_position_entered_query.values("voter_we_vote_id").distinct()
-        one_election.voters_with_public_positions_count = voter_position_entered_query.count()
-        if positive_value_exists(one_election.voters_with_public_positions_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many Public PositionEntered entries were saved by voters?
-        voter_position_entered_query = PositionEntered.objects.all()
-        voter_position_entered_query = voter_position_entered_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        voter_position_entered_query = voter_position_entered_query.exclude(
-            voter_we_vote_id=None)
-        one_election.voter_position_entered_count = voter_position_entered_query.count()
-        if positive_value_exists(one_election.voter_position_entered_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many individual voters saved at least one PositionForFriends entry?
-        voter_position_for_friends_query = PositionForFriends.objects.all()
-        # As of Aug 2018 we are no longer using PERCENT_RATING
-        voter_position_for_friends_query = voter_position_for_friends_query.exclude(stance__iexact='PERCENT_RATING')
-        voter_position_for_friends_query = voter_position_for_friends_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        voter_position_for_friends_query = voter_position_for_friends_query.exclude(
-            voter_we_vote_id=None)
-        voter_position_for_friends_query = voter_position_for_friends_query.values("voter_we_vote_id").distinct()
-        one_election.voters_with_positions_for_friends_count = voter_position_for_friends_query.count()
-        if positive_value_exists(one_election.voters_with_positions_for_friends_count):
-            election_values_exist = True
-
-        # ################################
-        # For this election, how many Public PositionForFriends entries were saved by voters?
-        voter_position_for_friends_query = PositionForFriends.objects.all()
-        # As of Aug 2018 we are no longer using PERCENT_RATING
-        voter_position_for_friends_query = voter_position_for_friends_query.exclude(stance__iexact='PERCENT_RATING')
-        voter_position_for_friends_query = voter_position_for_friends_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        one_election.voter_position_for_friends_count = voter_position_for_friends_query.count()
-        if positive_value_exists(one_election.voter_position_for_friends_count):
-            election_values_exist = True
-
-        # NOT VOTER SPECIFIC
-
-        # ################################
-        # For this election, how many BallotReturned entries were saved for polling locations?
-        ballot_returned_query = BallotReturned.objects.all()
-        ballot_returned_query = ballot_returned_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        ballot_returned_query = ballot_returned_query.exclude(
-            polling_location_we_vote_id=None)
-        one_election.polling_location_ballot_returned_count = ballot_returned_query.count()
-        # if positive_value_exists(one_election.polling_location_ballot_returned_count):
-        #     election_values_exist = True
-
-        # ################################
-        # For this election, how many organizations shared at least one Public PositionEntered entry?
-        organization_position_entered_query = PositionEntered.objects.all()
-        organization_position_entered_query = organization_position_entered_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        organization_position_entered_query = organization_position_entered_query.exclude(
-            organization_we_vote_id=None)
-        organization_position_entered_query = \
-            organization_position_entered_query.values("organization_we_vote_id").distinct()
-        one_election.organizations_with_public_positions_count = organization_position_entered_query.count()
-        # if positive_value_exists(one_election.organizations_with_public_positions_count):
-        #     election_values_exist = True
-
-        # ################################
-        # For this election, how many Public PositionEntered entries were for organizations?
-        organization_position_entered_query = PositionEntered.objects.all()
-        organization_position_entered_query = organization_position_entered_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        organization_position_entered_query = organization_position_entered_query.exclude(
-            organization_we_vote_id=None)
-        one_election.organization_position_entered_count = organization_position_entered_query.count()
-        # if positive_value_exists(one_election.organization_position_entered_count):
-        #     election_values_exist = True
-
-        # ################################
-        # For this election, how many ContestOffices
-        contest_office_query = ContestOffice.objects.all()
-        contest_office_query = contest_office_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        one_election.number_of_offices = contest_office_query.count()
-        # if positive_value_exists(one_election.number_of_offices):
-        #     election_values_exist = True
-
-        # ################################
-        # For this election, how many CandidateCampaign
-        candidate_campaign_query = CandidateCampaign.objects.all()
-        candidate_campaign_query = candidate_campaign_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        one_election.number_of_candidates = candidate_campaign_query.count()
-        # if positive_value_exists(one_election.number_of_candidates):
-        #     election_values_exist = True
-
-        # ################################
-        # For this election, how many ContestMeasures
-        contest_measure_query = ContestMeasure.objects.all()
-        contest_measure_query = contest_measure_query.filter(
-            google_civic_election_id=one_election.google_civic_election_id)
-        one_election.number_of_measures = contest_measure_query.count()
-        # if positive_value_exists(one_election.number_of_measures):
-        #     election_values_exist = True
-
+        one_election_statistics = election_statistics_dict.get(convert_to_int(one_election.google_civic_election_id))
+        if one_election_statistics is None:
+            elections_without_statistics_count += 1
+            continue
+        for field_name in ELECTION_STATISTICS_COUNT_FIELD_LIST:
+            setattr(one_election, field_name, getattr(one_election_statistics, field_name))
+        one_election.date_statistics_last_calculated = one_election_statistics.date_last_calculated
+
+        # Only show the elections voters used
+        election_values_exist = \
+            positive_value_exists(one_election.voter_address_count) or \
+            positive_value_exists(one_election.voter_ballot_saved_count) or \
+            positive_value_exists(one_election.voter_ballot_returned_count) or \
+            positive_value_exists(one_election.voters_with_public_positions_count) or \
+            positive_value_exists(one_election.voter_position_entered_count) or \
+            positive_value_exists(one_election.voters_with_positions_for_friends_count) or \
+            positive_value_exists(one_election.voter_position_for_friends_count)
         if election_values_exist:
             election_statistics.append(one_election)
 
+    if positive_value_exists(elections_without_statistics_count):
+        status_print_list += str(elections_without_statistics_count) + " elections don't have statistics yet. " \
+                             "They will be calculated by the REFRESH_ELECTION_STATISTICS batch process, or you can " \
+                             "calculate them all now with Backfill Election Statistics. "
+
     # status_print_list += "create_facebook_link_to_voter_possible: " + \
     #                      str(create_facebook_link_to_voter_possible) + ", "
     # if positive_value_exists(create_facebook_link_to_voter_added):
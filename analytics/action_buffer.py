@@ -0,0 +1,192 @@
+# analytics/action_buffer.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# AnalyticsManager.save_action used to INSERT each AnalyticsAction while the API request waited. Now it hands the
+# action to AnalyticsActionBuffer, and a thread in the same worker process writes the queued actions to the analytics
+# database with bulk_create, up to ANALYTICS_ACTION_BATCH_SIZE at a time, at least every ANALYTICS_ACTION_FLUSH_SECONDS.
+#   - The queue holds at most ANALYTICS_ACTION_BUFFER_SIZE actions. When it is full, the request writes its own
+#     action, like before, so we slow down instead of dropping actions.
+#   - When the worker process exits cleanly, shutdown() (registered with atexit) writes whatever is still queued.
+#   - If a batch fails, its actions are written one at a time, so one bad action doesn't lose the others.
+#   - Actions saved inside transaction.atomic on the analytics database are written right away, as part of it.
+# A worker that is killed (kill -9, out of memory) loses the actions it had not written yet, at most a few seconds.
+# ANALYTICS_ACTION_BUFFER_ON=0 goes back to writing each action in the request.
+
+import atexit
+from config.base import get_environment_variable_default
+from django.db import connections
+import os
+import queue
+import threading
+import time
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+ANALYTICS_ACTION_BUFFER_ON = convert_to_int(get_environment_variable_default('ANALYTICS_ACTION_BUFFER_ON', 1))
+ANALYTICS_ACTION_BUFFER_SIZE = convert_to_int(get_environment_variable_default('ANALYTICS_ACTION_BUFFER_SIZE', 10000))
+ANALYTICS_ACTION_BATCH_SIZE = convert_to_int(get_environment_variable_default('ANALYTICS_ACTION_BATCH_SIZE', 500))
+ANALYTICS_ACTION_FLUSH_SECONDS = \
+    convert_to_int(get_environment_variable_default('ANALYTICS_ACTION_FLUSH_SECONDS', 2))
+# How long shutdown() waits for the writer thread to finish the batch it is writing
+ANALYTICS_ACTION_SHUTDOWN_SECONDS = 10
+ANALYTICS_DATABASE = 'analytics'
+
+
+class AnalyticsActionBuffer(object):
+    """
+    The actions waiting to be written, and the thread that writes them, for the worker process we are in
+    """
+
+    def __init__(self, database=ANALYTICS_DATABASE, buffer_size=ANALYTICS_ACTION_BUFFER_SIZE,
+                 batch_size=ANALYTICS_ACTION_BATCH_SIZE, flush_seconds=ANALYTICS_ACTION_FLUSH_SECONDS):
+        self.buffer_on = bool(ANALYTICS_ACTION_BUFFER_ON)
+        self.database = database
+        self.batch_size = max(batch_size, 1)
+        self.flush_seconds = max(flush_seconds, 0.1)
+        self.action_queue = queue.Queue(maxsize=max(buffer_size, 1))
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.writer_thread = None
+        self.writer_process_id = None
+        self.counts = {}
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.counts = {
+                'queued':                   0,
+                'written':                  0,
+                'written_by_request':       0,
+                'batches':                  0,
+                'batch_failures':           0,
+                'not_written':              0,
+                'largest_queue_size':       0,
+                'write_milliseconds':       0.0,
+            }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def add(self, action):
+        """
+        Queue this action to be written soon, or write it now when the buffer is off or full
+        :param action: an unsaved model instance, ready for bulk_create
+        :return: True if queued, False if written now
+        """
+        # Inside transaction.atomic (including in TestCase), the action belongs to the transaction
+        if self.buffer_on and not self.stopping.is_set() and not connections[self.database].in_atomic_block:
+            self.start_writer_thread()
+            try:
+                self.action_queue.put_nowait(action)
+                queue_size = self.action_queue.qsize()
+                with self.lock:
+                    self.counts['queued'] += 1
+                    if queue_size > self.counts['largest_queue_size']:
+                        self.counts['largest_queue_size'] = queue_size
+                return True
+            except queue.Full:
+                pass
+        # Raise like AnalyticsAction.objects.create did, so the caller can report it
+        action.save(using=self.database)
+        self.count('written_by_request')
+        return False
+
+    def start_writer_thread(self):
+        process_id = os.getpid()
+        if self.writer_process_id == process_id and self.writer_thread is not None:
+            return
+        with self.lock:
+            # A worker forked from a process that had a writer thread doesn't have that thread
+            if self.writer_process_id == process_id and self.writer_thread is not None:
+                return
+            self.writer_thread = threading.Thread(
+                name='analytics_action_writer_thread', target=self.write_queued_actions_until_stopped, daemon=True)
+            self.writer_process_id = process_id
+            self.writer_thread.start()
+
+    def take_batch(self, wait_seconds):
+        """
+        Up to batch_size actions, waiting up to wait_seconds for the first one and for the batch to fill
+        """
+        batch = []
+        deadline = time.monotonic() + wait_seconds
+        while len(batch) < self.batch_size:
+            seconds_left = deadline - time.monotonic()
+            try:
+                if seconds_left > 0:
+                    batch.append(self.action_queue.get(timeout=seconds_left))
+                else:
+                    batch.append(self.action_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def write_queued_actions_until_stopped(self):
+        while not self.stopping.is_set():
+            batch = self.take_batch(self.flush_seconds)
+            if batch:
+                self.write_batch(batch)
+        connections[self.database].close()
+
+    def write_batch(self, batch):
+        start_counter = time.perf_counter()
+        connection = connections[self.database]
+        connection.close_if_unusable_or_obsolete()
+        try:
+            model = type(batch[0])
+            model.objects.using(self.database).bulk_create(batch, batch_size=self.batch_size)
+            written_count = len(batch)
+        except Exception as e:
+            logger.error("ANALYTICS_ACTION_BATCH_NOT_WRITTEN, writing one at a time: " + str(e))
+            self.count('batch_failures')
+            connection.close_if_unusable_or_obsolete()
+            written_count = 0
+            for action in batch:
+                try:
+                    action.pk = None
+                    action.save(using=self.database)
+                    written_count += 1
+                except Exception as e:
+                    logger.error("ANALYTICS_ACTION_NOT_WRITTEN: " + str(e))
+                    self.count('not_written')
+        with self.lock:
+            self.counts['written'] += written_count
+            self.counts['batches'] += 1
+            self.counts['write_milliseconds'] += (time.perf_counter() - start_counter) * 1000
+
+    def flush(self):
+        """
+        Write everything that is queued now, in the calling thread
+        """
+        while True:
+            batch = self.take_batch(0)
+            if not batch:
+                return
+            self.write_batch(batch)
+
+    def shutdown(self):
+        """
+        Let the writer thread finish its batch, then write the rest of the queue
+        """
+        self.stopping.set()
+        writer_thread = self.writer_thread
+        if writer_thread is not None and self.writer_process_id == os.getpid() and writer_thread.is_alive():
+            writer_thread.join(ANALYTICS_ACTION_SHUTDOWN_SECONDS)
+        self.flush()
+
+    def statistics(self):
+        with self.lock:
+            counts = dict(self.counts)
+        counts['buffer_on'] = self.buffer_on
+        counts['queue_size'] = self.action_queue.qsize()
+        counts['write_milliseconds'] = round(counts['write_milliseconds'], 1)
+        return counts
+
+
+# One per process
+analytics_action_buffer = AnalyticsActionBuffer()
+atexit.register(analytics_action_buffer.shutdown)
@@ -0,0 +1,81 @@
+from analytics.action_buffer import analytics_action_buffer, ANALYTICS_DATABASE
+from analytics.models import ACTION_BALLOT_VISIT, ACTION_VOTER_GUIDE_VISIT, AnalyticsAction, AnalyticsManager
+from apis_v1.request_profiler import calculate_percentiles
+from django.core.management.base import BaseCommand
+import time
+
+BENCHMARK_GOOGLE_CIVIC_ELECTION_ID = 999999
+BENCHMARK_VOTER_WE_VOTE_ID_PREFIX = 'wvbenchvoter'
+
+
+def save_actions(action_count):
+    """
+    Save actions the way the API does, and return the milliseconds each save_action call took
+    """
+    analytics_manager = AnalyticsManager()
+    milliseconds_list = []
+    for number in range(action_count):
+        # Alternate between the two kinds of action (create_action_type1 and create_action_type2)
+        action_constant = ACTION_VOTER_GUIDE_VISIT if number % 2 else ACTION_BALLOT_VISIT
+        start_counter = time.perf_counter()
+        analytics_manager.save_action(
+            action_constant=action_constant,
+            voter_we_vote_id=BENCHMARK_VOTER_WE_VOTE_ID_PREFIX + str(number % 1000), voter_id=number % 1000,
+            state_code='ca', organization_we_vote_id='wvbenchorg' + str(number % 50), organization_id=number % 50,
+            google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID, user_agent_string='benchmark',
+            is_desktop=True)
+        milliseconds_list.append((time.perf_counter() - start_counter) * 1000)
+    return milliseconds_list
+
+
+def time_save_actions(action_count, buffer_on):
+    analytics_action_buffer.buffer_on = buffer_on
+    analytics_action_buffer.clear()
+    start_time = time.time()
+    milliseconds_list = save_actions(action_count)
+    request_seconds = time.time() - start_time
+    # Wait until the writer thread has written everything it was given
+    analytics_action_buffer.flush()
+    while True:
+        statistics = analytics_action_buffer.statistics()
+        if statistics['written'] + statistics['not_written'] >= statistics['queued']:
+            break
+        time.sleep(0.01)
+    seconds_elapsed = time.time() - start_time
+    results = calculate_percentiles([round(milliseconds, 3) for milliseconds in milliseconds_list])
+    results['actions_per_second'] = action_count / seconds_elapsed if seconds_elapsed else 0
+    results['request_seconds'] = request_seconds
+    results['seconds_elapsed'] = seconds_elapsed
+    results['batches'] = statistics['batches']
+    results['written_by_request'] = statistics['written_by_request']
+    return results
+
+
+def delete_benchmark_actions():
+    return AnalyticsAction.objects.using(ANALYTICS_DATABASE).filter(
+        google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID,
+        voter_we_vote_id__startswith=BENCHMARK_VOTER_WE_VOTE_ID_PREFIX).delete()[0]
+
+
+class Command(BaseCommand):
+    help = 'Times AnalyticsManager.save_action writing each action in the request, and through ' \
+           'analytics_action_buffer. Reports the time each call adds to a request, and actions per second until ' \
+           'everything is in the analytics database. The actions it writes are deleted afterwards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--action_count', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        report_format = '{label}: {actions_per_second:.0f} actions/sec ({seconds_elapsed:.2f} sec, ' \
+                        '{request_seconds:.2f} sec in save_action), ms per save_action p50 {p50} p99 {p99} ' \
+                        'max {max}, {batches} batches, {written_by_request} written by the request'
+        buffer_on = analytics_action_buffer.buffer_on
+        try:
+            for label, buffer_on_for_run in (('one INSERT per action', False), ('buffered', True)):
+                results = time_save_actions(options['action_count'], buffer_on_for_run)
+                self.stdout.write(report_format.format(label=label, **results))
+                delete_benchmark_actions()
+        finally:
+            analytics_action_buffer.buffer_on = buffer_on
+            analytics_action_buffer.flush()
+            delete_benchmark_actions()
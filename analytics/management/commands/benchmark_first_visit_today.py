@@ -0,0 +1,96 @@
+from analytics.models import ACTION_BALLOT_VISIT, AnalyticsAction, AnalyticsManager
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import random
+import time
+from wevote_functions.functions import positive_value_exists
+
+BENCHMARK_FIRST_DAY_AS_INTEGER = 20991201
+BENCHMARK_DAY_COUNT = 30
+
+
+def create_benchmark_actions(action_count, voter_count, seed):
+    random_generator = random.Random(seed)
+    action_list = []
+    for number in range(action_count):
+        action_list.append(AnalyticsAction(
+            action_constant=ACTION_BALLOT_VISIT,
+            date_as_integer=BENCHMARK_FIRST_DAY_AS_INTEGER + random_generator.randrange(BENCHMARK_DAY_COUNT),
+            voter_we_vote_id='wvbenchvoter{number}'.format(number=random_generator.randrange(voter_count))))
+    AnalyticsAction.objects.using('analytics').bulk_create(action_list, batch_size=5000)
+
+
+def update_first_visit_today_one_voter_at_a_time(date_as_integer, through_date_as_integer):
+    """
+    How AnalyticsManager.update_first_visit_today_for_all_voters_since_date used to work, with a query and a save
+    for each voter on each day. analytics/tests.py checks the set-based version against it.
+    """
+    first_visit_today_count = 0
+    distinct_days_query = AnalyticsAction.objects.using('analytics').filter(
+        date_as_integer__gte=date_as_integer, date_as_integer__lte=through_date_as_integer)
+    simple_distinct_days_list = [
+        day_dict['date_as_integer'] for day_dict in distinct_days_query.values('date_as_integer').distinct()
+        if positive_value_exists(day_dict['date_as_integer'])]
+
+    for one_date_as_integer in simple_distinct_days_list:
+        voter_list_query = AnalyticsAction.objects.using('analytics').filter(date_as_integer=one_date_as_integer)
+        simple_voter_list = []
+        for voter_dict in voter_list_query.values('voter_we_vote_id').distinct():
+            if positive_value_exists(voter_dict['voter_we_vote_id']) and \
+                    voter_dict['voter_we_vote_id'] not in simple_voter_list:
+                simple_voter_list.append(voter_dict['voter_we_vote_id'])
+
+        # Update the first entry for each voter on that day with "first_visit_today=True"
+        for voter_we_vote_id in simple_voter_list:
+            first_visit_query = AnalyticsAction.objects.using('analytics').order_by("id")  # order by oldest first
+            first_visit_query = first_visit_query.filter(date_as_integer=one_date_as_integer)
+            first_visit_query = first_visit_query.filter(voter_we_vote_id__iexact=voter_we_vote_id)
+            analytics_action = first_visit_query.first()
+            if not analytics_action.first_visit_today:
+                analytics_action.first_visit_today = True
+                analytics_action.save()
+                first_visit_today_count += 1
+
+    results = {
+        'success':                  True,
+        'status':                   "",
+        'first_visit_today_count':  first_visit_today_count,
+    }
+    return results
+
+
+def time_update(update_function):
+    AnalyticsAction.objects.using('analytics').filter(
+        date_as_integer__gte=BENCHMARK_FIRST_DAY_AS_INTEGER).update(first_visit_today=False)
+    start_time = time.time()
+    results = update_function(BENCHMARK_FIRST_DAY_AS_INTEGER, BENCHMARK_FIRST_DAY_AS_INTEGER + BENCHMARK_DAY_COUNT)
+    return time.time() - start_time, results['first_visit_today_count']
+
+
+class Command(BaseCommand):
+    help = 'Times update_first_visit_today_for_all_voters_since_date against the old one voter at a time loop, on ' \
+           'synthetic analytics actions spread over {day_count} days. Everything it writes is rolled ' \
+           'back.'.format(day_count=BENCHMARK_DAY_COUNT)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--action_counts', type=str, default='10000,100000,1000000')
+        parser.add_argument('--voters_per_action', type=float, default=0.2)
+        parser.add_argument('--one_at_a_time_limit', type=int, default=100000,
+                            help='One voter at a time is slow, so only time it up to this many actions')
+        parser.add_argument('--seed', type=int, default=2020)
+
+    def handle(self, *args, **options):
+        analytics_manager = AnalyticsManager()
+        report_format = '{action_count} actions, {label}: {seconds:.2f} sec, {marked} marked first_visit_today'
+        for action_count in [int(one_count) for one_count in options['action_counts'].split(',') if one_count]:
+            with transaction.atomic(using='analytics'):
+                create_benchmark_actions(
+                    action_count, max(int(action_count * options['voters_per_action']), 1), options['seed'])
+                seconds, marked = time_update(analytics_manager.update_first_visit_today_for_all_voters_since_date)
+                self.stdout.write(report_format.format(
+                    action_count=action_count, label='set-based', seconds=seconds, marked=marked))
+                if action_count <= options['one_at_a_time_limit']:
+                    seconds, marked = time_update(update_first_visit_today_one_voter_at_a_time)
+                    self.stdout.write(report_format.format(
+                        action_count=action_count, label='one voter at a time', seconds=seconds, marked=marked))
+                transaction.set_rollback(True, using='analytics')
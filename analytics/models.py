@@ -2,8 +2,10 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from .action_buffer import analytics_action_buffer
 from django.db import models
-from django.db.models import Q
+from django.db.models import Min, Q
+from django.db.models.functions import Upper
 from django.utils.timezone import localtime, now
 from datetime import timedelta
 from election.models import Election
@@ -99,6 +101,8 @@ ACTIONS_THAT_REQUIRE_ORGANIZATION_IDS = \
      ACTION_ORGANIZATION_FOLLOW, ACTION_ORGANIZATION_FOLLOW_IGNORE, ACTION_ORGANIZATION_STOP_FOLLOWING,
      ACTION_ORGANIZATION_STOP_IGNORING, ACTION_VOTER_GUIDE_VISIT]
 
+# A month of analytics is a handful of UPDATEs, and each one stays a reasonable size
+FIRST_VISIT_TODAY_DAYS_PER_UPDATE = 7
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -110,7 +114,9 @@ class AnalyticsAction(models.Model):
     action_constant = models.PositiveSmallIntegerField(
         verbose_name="constant representing action", null=True, unique=False, db_index=True)
 
-    exact_time = models.DateTimeField(verbose_name='date and time of action', null=False, auto_now_add=True)
+    # Set when the action is created rather than auto_now_add, so actions written later by analytics_action_buffer
+    #  keep the time they happened
+    exact_time = models.DateTimeField(verbose_name='date and time of action', null=False, default=now)
     # We store YYYYMMDD as an integer for very fast lookup (ex/ "20170901" for September, 1, 2017)
     date_as_integer = models.PositiveIntegerField(
         verbose_name="YYYYMMDD of the action", null=True, unique=False, db_index=True)
@@ -561,7 +567,7 @@ class AnalyticsManager(models.Model):
             return results
 
         try:
-            action = AnalyticsAction.objects.using('analytics').create(
+            action = AnalyticsAction(
                 action_constant=action_constant,
                 voter_we_vote_id=voter_we_vote_id,
                 voter_id=voter_id,
@@ -577,9 +583,15 @@ class AnalyticsManager(models.Model):
                 is_desktop=is_desktop,
                 is_tablet=is_tablet
             )
+            # bulk_create doesn't call save(), which is where date_as_integer is usually generated
+            action.generate_date_as_integer()
+            action_queued = analytics_action_buffer.add(action)
             success = True
             action_saved = True
-            status += 'ACTION_TYPE1_SAVED '
+            if action_queued:
+                status += 'ACTION_TYPE1_QUEUED '
+            else:
+                status += 'ACTION_TYPE1_SAVED '
         except Exception as e:
             success = False
             status += 'COULD_NOT_SAVE_ACTION_TYPE1 ' + str(e) + ' '
@@ -623,7 +635,7 @@ class AnalyticsManager(models.Model):
             return results
 
         try:
-            action = AnalyticsAction.objects.using('analytics').create(
+            action = AnalyticsAction(
                 action_constant=action_constant,
                 voter_we_vote_id=voter_we_vote_id,
                 voter_id=voter_id,
@@ -638,9 +650,15 @@ class AnalyticsManager(models.Model):
                 is_desktop=is_desktop,
                 is_tablet=is_tablet
             )
+            # bulk_create doesn't call save(), which is where date_as_integer is usually generated
+            action.generate_date_as_integer()
+            action_queued = analytics_action_buffer.add(action)
             success = True
             action_saved = True
-            status += 'ACTION_TYPE2_SAVED '
+            if action_queued:
+                status += 'ACTION_TYPE2_QUEUED '
+            else:
+                status += 'ACTION_TYPE2_SAVED '
         except Exception as e:
             success = False
             status += 'COULD_NOT_SAVE_ACTION_TYPE2 ' + str(e) + ' '
@@ -1429,80 +1447,46 @@ class AnalyticsManager(models.Model):
         return positive_value_exists(updated_on_date_query.count())
 
     def update_first_visit_today_for_all_voters_since_date(self, date_as_integer, through_date_as_integer):
+        """
+        Mark the first action (lowest id) of each voter on each day from date_as_integer through
+        through_date_as_integer with first_visit_today=True, with one query for the days and one UPDATE for every
+        FIRST_VISIT_TODAY_DAYS_PER_UPDATE days.
+        :param date_as_integer:
+        :param through_date_as_integer:
+        :return:
+        """
         success = True
         status = ""
-        distinct_days_list = []
         first_visit_today_count = 0
 
-        # Get distinct days
         try:
-            distinct_days_query = AnalyticsAction.objects.using('analytics').all()
-            distinct_days_query = distinct_days_query.filter(date_as_integer__gte=date_as_integer)
-            distinct_days_query = distinct_days_query.filter(date_as_integer__lte=through_date_as_integer)
-            distinct_days_query = distinct_days_query.values('date_as_integer').distinct()
-            # distinct_days_query = distinct_days_query[:5]  # TEMP limit to 5
-            distinct_days_list = list(distinct_days_query)
-            distinct_days_found = True
+            distinct_days_query = AnalyticsAction.objects.using('analytics').filter(
+                date_as_integer__gte=date_as_integer, date_as_integer__lte=through_date_as_integer)
+            simple_distinct_days_list = sorted(
+                one_date_as_integer for one_date_as_integer
+                in distinct_days_query.order_by().values_list('date_as_integer', flat=True).distinct()
+                if positive_value_exists(one_date_as_integer))
         except Exception as e:
             success = False
             status += "UPDATE_FIRST_VISIT_TODAY-DISTINCT_DAY_QUERY_ERROR " + str(e) + ' '
-            distinct_days_found = False
+            simple_distinct_days_list = []
 
-        simple_distinct_days_list = []
-        for day_dict in distinct_days_list:
-            if positive_value_exists(day_dict['date_as_integer']):
-                simple_distinct_days_list.append(day_dict['date_as_integer'])
-
-        # Loop through each day
-        for one_date_as_integer in simple_distinct_days_list:
-            # Get distinct voters on that day
-            if not positive_value_exists(one_date_as_integer):
-                continue
-
-            voter_list = []
+        for start in range(0, len(simple_distinct_days_list), FIRST_VISIT_TODAY_DAYS_PER_UPDATE):
+            day_list = simple_distinct_days_list[start:start + FIRST_VISIT_TODAY_DAYS_PER_UPDATE]
             try:
-                voter_list_query = AnalyticsAction.objects.using('analytics').all()
-                voter_list_query = voter_list_query.filter(date_as_integer=one_date_as_integer)
-                voter_list_query = voter_list_query.values('voter_we_vote_id').distinct()
-                # voter_list_query = voter_list_query[:5]  # TEMP limit to 5
-                voter_list = list(voter_list_query)
-                voter_list_found = True
+                # The lowest id for each voter on each day, comparing voter_we_vote_id without case like __iexact
+                first_visit_id_query = AnalyticsAction.objects.using('analytics').filter(date_as_integer__in=day_list)
+                first_visit_id_query = first_visit_id_query.exclude(voter_we_vote_id__isnull=True)
+                first_visit_id_query = first_visit_id_query.exclude(voter_we_vote_id='')
+                first_visit_id_query = first_visit_id_query.order_by().values(
+                    'date_as_integer', voter_we_vote_id_upper=Upper('voter_we_vote_id')).annotate(
+                    first_visit_id=Min('id')).values('first_visit_id')
+                first_visit_today_count += AnalyticsAction.objects.using('analytics').filter(
+                    id__in=first_visit_id_query, first_visit_today=False).update(first_visit_today=True)
             except Exception as e:
                 success = False
-                status += "UPDATE_FIRST_VISIT_TODAY-DISTINCT_VOTER_QUERY_ERROR " + str(e) + ' '
-                voter_list_found = False
-
-            simple_voter_list = []
-            for voter_dict in voter_list:
-                if positive_value_exists(voter_dict['voter_we_vote_id']) and \
-                        voter_dict['voter_we_vote_id'] not in simple_voter_list:
-                    simple_voter_list.append(voter_dict['voter_we_vote_id'])
-
-            if not voter_list_found:
-                continue
-
-            # Loop through each voter per day, and update the first entry for that day with "first_visit_today=True"
-            for voter_we_vote_id in simple_voter_list:
-                if not positive_value_exists(voter_we_vote_id):
-                    continue
-
-                try:
-                    first_visit_query = AnalyticsAction.objects.using('analytics').all()
-                    first_visit_query = first_visit_query.order_by("id")  # order by oldest first
-                    first_visit_query = first_visit_query.filter(date_as_integer=one_date_as_integer)
-                    first_visit_query = first_visit_query.filter(voter_we_vote_id__iexact=voter_we_vote_id)
-                    analytics_action = first_visit_query.first()
-
-                    if not analytics_action.first_visit_today:
-                        analytics_action.first_visit_today = True
-                        analytics_action.save()
-                        first_visit_saved = True
-                        first_visit_today_count += 1
-                except Exception as e:
-                    success = False
-                    status += "UPDATE_FIRST_VISIT_TODAY-VOTER_ON_DATE_QUERY_ERROR " + str(e) + ' '
-                    print_to_log(logger=logger, exception_message_optional=status)
-                    first_visit_found = False
+                status += "UPDATE_FIRST_VISIT_TODAY-UPDATE_ERROR " + str(e) + ' '
+                print_to_log(logger=logger, exception_message_optional=status)
 
         results = {
             'success':                  success,
@@ -0,0 +1,143 @@
+# analytics/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from analytics.action_buffer import AnalyticsActionBuffer
+from analytics.management.commands.benchmark_first_visit_today import update_first_visit_today_one_voter_at_a_time
+from analytics.models import ACTION_BALLOT_VISIT, AnalyticsAction, AnalyticsManager
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase
+import random
+from unittest import mock
+
+FIRST_DAY_AS_INTEGER = 20201101
+LAST_DAY_AS_INTEGER = 20201103
+
+
+def create_analytics_actions(action_count, seed=2020):
+    """
+    Actions on the days FIRST_DAY_AS_INTEGER to LAST_DAY_AS_INTEGER + 1 (one day outside the range we update), from
+    voters whose we_vote_id is sometimes stored in another case, or missing. Some are already marked
+    first_visit_today, some of them wrongly.
+    """
+    random_generator = random.Random(seed)
+    voter_we_vote_id_list = ['wv01voter{number}'.format(number=number) for number in range(20)] + \
+                            ['WV01VOTER3', 'WV01voter7', None, '']
+    action_list = []
+    for number in range(action_count):
+        action_list.append(AnalyticsAction(
+            action_constant=ACTION_BALLOT_VISIT,
+            date_as_integer=random_generator.randint(FIRST_DAY_AS_INTEGER, LAST_DAY_AS_INTEGER + 1),
+            voter_we_vote_id=random_generator.choice(voter_we_vote_id_list),
+            first_visit_today=random_generator.random() < 0.1))
+    AnalyticsAction.objects.using('analytics').bulk_create(action_list)
+
+
+def retrieve_first_visit_today_by_id():
+    return dict(AnalyticsAction.objects.using('analytics').values_list('id', 'first_visit_today'))
+
+
+class WeVoteAnalyticsTestsFirstVisitToday(TestCase):
+    databases = ["default", "analytics"]
+
+    def test_set_based_update_matches_one_voter_at_a_time(self):
+        create_analytics_actions(2000)
+        first_visit_today_before = retrieve_first_visit_today_by_id()
+        analytics_manager = AnalyticsManager()
+
+        results = update_first_visit_today_one_voter_at_a_time(FIRST_DAY_AS_INTEGER, LAST_DAY_AS_INTEGER)
+        first_visit_today_one_at_a_time = retrieve_first_visit_today_by_id()
+        one_at_a_time_count = results['first_visit_today_count']
+
+        # Back to how the actions started
+        AnalyticsAction.objects.using('analytics').update(first_visit_today=False)
+        AnalyticsAction.objects.using('analytics').filter(
+            id__in=[action_id for action_id, first_visit_today in first_visit_today_before.items()
+                    if first_visit_today]).update(first_visit_today=True)
+        results = analytics_manager.update_first_visit_today_for_all_voters_since_date(
+            FIRST_DAY_AS_INTEGER, LAST_DAY_AS_INTEGER)
+        self.assertTrue(results['success'])
+        self.assertEqual(retrieve_first_visit_today_by_id(), first_visit_today_one_at_a_time)
+        self.assertEqual(results['first_visit_today_count'], one_at_a_time_count)
+        self.assertNotEqual(first_visit_today_one_at_a_time, first_visit_today_before)
+
+        # Running again finds nothing new to mark
+        results = analytics_manager.update_first_visit_today_for_all_voters_since_date(
+            FIRST_DAY_AS_INTEGER, LAST_DAY_AS_INTEGER)
+        self.assertEqual(results['first_visit_today_count'], 0)
+
+
+class WeVoteAnalyticsTestsActionBuffer(TransactionTestCase):
+    # Inside TestCase's transaction, the buffer writes each action right away, so these tests commit
+    databases = ["default", "analytics"]
+
+    def create_action_list(self, action_count):
+        return [AnalyticsAction(action_constant=ACTION_BALLOT_VISIT, date_as_integer=FIRST_DAY_AS_INTEGER,
+                                voter_we_vote_id='wv01voter{number}'.format(number=number))
+                for number in range(action_count)]
+
+    def create_action_buffer(self, **buffer_arguments):
+        action_buffer = AnalyticsActionBuffer(**buffer_arguments)
+        action_buffer.buffer_on = True
+        return action_buffer
+
+    def saved_voter_we_vote_id_list(self):
+        return sorted(AnalyticsAction.objects.using('analytics').values_list('voter_we_vote_id', flat=True))
+
+    def test_request_writes_its_own_action_when_queue_is_full(self):
+        action_buffer = self.create_action_buffer(buffer_size=2, batch_size=10)
+        action_list = self.create_action_list(3)
+        # No writer thread, so the queue stays full
+        with mock.patch.object(action_buffer, 'start_writer_thread'):
+            self.assertEqual([action_buffer.add(action) for action in action_list], [True, True, False])
+        self.assertEqual(self.saved_voter_we_vote_id_list(), ['wv01voter2'])
+        statistics = action_buffer.statistics()
+        self.assertEqual(statistics['queued'], 2)
+        self.assertEqual(statistics['written_by_request'], 1)
+        self.assertEqual(statistics['queue_size'], 2)
+
+        action_buffer.flush()
+        self.assertEqual(self.saved_voter_we_vote_id_list(), ['wv01voter0', 'wv01voter1', 'wv01voter2'])
+        self.assertEqual(action_buffer.statistics()['queue_size'], 0)
+
+    def test_flush_writes_every_queued_action_in_batches(self):
+        action_buffer = self.create_action_buffer(buffer_size=100, batch_size=4)
+        action_list = self.create_action_list(10)
+        with mock.patch.object(action_buffer, 'start_writer_thread'):
+            for action in action_list:
+                self.assertTrue(action_buffer.add(action))
+        self.assertEqual(self.saved_voter_we_vote_id_list(), [])
+        action_buffer.flush()
+        self.assertEqual(self.saved_voter_we_vote_id_list(),
+                         sorted(action.voter_we_vote_id for action in action_list))
+        statistics = action_buffer.statistics()
+        self.assertEqual(statistics['written'], 10)
+        self.assertEqual(statistics['batches'], 3)
+
+    def test_shutdown_writes_what_the_writer_thread_has_not(self):
+        action_buffer = self.create_action_buffer(buffer_size=100, batch_size=4, flush_seconds=0.2)
+        action_list = self.create_action_list(10)
+        for action in action_list:
+            action_buffer.add(action)
+        action_buffer.shutdown()
+        self.assertFalse(action_buffer.writer_thread.is_alive())
+        self.assertEqual(self.saved_voter_we_vote_id_list(),
+                         sorted(action.voter_we_vote_id for action in action_list))
+        self.assertEqual(action_buffer.statistics()['written'], 10)
+        # Once stopping, the request writes its own action
+        self.assertFalse(action_buffer.add(self.create_action_list(1)[0]))
+
+    def test_failed_batch_is_written_one_at_a_time(self):
+        action_buffer = self.create_action_buffer(buffer_size=100, batch_size=10)
+        action_list = self.create_action_list(5)
+        with mock.patch.object(action_buffer, 'start_writer_thread'):
+            for action in action_list:
+                action_buffer.add(action)
+        with mock.patch('django.db.models.query.QuerySet.bulk_create', side_effect=DatabaseError('batch failed')):
+            action_buffer.flush()
+        self.assertEqual(self.saved_voter_we_vote_id_list(),
+                         sorted(action.voter_we_vote_id for action in action_list))
+        statistics = action_buffer.statistics()
+        self.assertEqual(statistics['batch_failures'], 1)
+        self.assertEqual(statistics['written'], 5)
+        self.assertEqual(statistics['not_written'], 0)
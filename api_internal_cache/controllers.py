@@ -2,10 +2,257 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from .models import ApiInternalCacheManager
 from config.base import get_environment_variable
+from django.http import HttpResponse, HttpResponseNotModified
+from exception.models import handle_exception
+import json
+import threading
+import time
 import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists, STATE_CODE_MAP
 
 logger = wevote_functions.admin.get_logger(__name__)
 
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
 
+# The parameters of a cached response come from the client, so we only look up (and schedule refreshes for)
+#  parameters we recognize. Every new set of parameters would otherwise be a new ApiRefreshRequest row, and
+#  recurring batch work, created during a GET.
+GOOGLE_CIVIC_ELECTION_ID_SET_CACHE_SECONDS = 300
+VOTER_GUIDES_TO_FOLLOW_CACHED_MAXIMUM_NUMBER_LIST = [0, 25, 50, 75, 100, 150, 200, 250, 300, 350, 400, 500]
+
+# The google_civic_election_ids of every Election, refreshed in each process every
+#  GOOGLE_CIVIC_ELECTION_ID_SET_CACHE_SECONDS
+google_civic_election_id_set_cache = {
+    'google_civic_election_id_set': set(),
+    'time_cached':                  0,
+}
+google_civic_election_id_set_cache_lock = threading.Lock()
+
+
+def generate_http_response_from_api_internal_cache(request, cache_response_results):
+    """
+    Send the already-serialized json from retrieve_latest_api_internal_cache_response without parsing it again.
+    :param request:
+    :param cache_response_results:
+    :return:
+    """
+    etag = cache_response_results['etag']
+    if etag and etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '') and \
+            cache_response_results['cached_api_response_gzipped']:
+        response = HttpResponse(cache_response_results['cached_api_response_gzipped'],
+                                content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(cache_response_results['cached_api_response_serialized'],
+                                content_type='application/json')
+    response['Vary'] = 'Accept-Encoding'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def fetch_google_civic_election_id_set():
+    from election.models import Election
+    with google_civic_election_id_set_cache_lock:
+        if time.time() - google_civic_election_id_set_cache['time_cached'] < GOOGLE_CIVIC_ELECTION_ID_SET_CACHE_SECONDS:
+            return google_civic_election_id_set_cache['google_civic_election_id_set']
+    try:
+        google_civic_election_id_set = set(
+            convert_to_int(google_civic_election_id) for google_civic_election_id in
+            Election.objects.using('readonly').values_list('google_civic_election_id', flat=True))
+    except Exception as e:
+        handle_exception(e, logger=logger)
+        return set()
+    with google_civic_election_id_set_cache_lock:
+        google_civic_election_id_set_cache['google_civic_election_id_set'] = google_civic_election_id_set
+        google_civic_election_id_set_cache['time_cached'] = time.time()
+    return google_civic_election_id_set
+
+
+def is_google_civic_election_id_known(google_civic_election_id):
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    return positive_value_exists(google_civic_election_id) and \
+        google_civic_election_id in fetch_google_civic_election_id_set()
+
+
+def validate_all_ballot_items_parameters(parameters):  # allBallotItemsRetrieve
+    return is_google_civic_election_id_known(parameters.get('google_civic_election_id')) and \
+        (parameters.get('state_code') == '' or parameters.get('state_code') in STATE_CODE_MAP)
+
+
+def validate_no_parameters(parameters):
+    return parameters == {}
+
+
+def validate_voter_guides_to_follow_parameters(parameters):  # voterGuidesToFollowRetrieve
+    return is_google_civic_election_id_known(parameters.get('google_civic_election_id')) and \
+        parameters.get('maximum_number_to_retrieve') in VOTER_GUIDES_TO_FOLLOW_CACHED_MAXIMUM_NUMBER_LIST
+
+
+def validate_voter_guides_upcoming_parameters(parameters):  # voterGuidesUpcoming
+    # For voterGuidesUpcoming, the parameters are the google_civic_election_id_list. An empty list means all
+    #  upcoming elections.
+    return isinstance(parameters, list) and \
+        all(is_google_civic_election_id_known(google_civic_election_id) for google_civic_election_id in parameters)
+
+
+def generate_all_ballot_items_json_data(parameters):  # allBallotItemsRetrieve
+    from ballot.controllers import all_ballot_items_retrieve_for_api
+    return all_ballot_items_retrieve_for_api(parameters['google_civic_election_id'], parameters['state_code'])
+
+
+def generate_ballot_item_highlights_json_data(parameters):  # ballotItemHighlightsRetrieve
+    from ballot.controllers import ballot_item_highlights_retrieve_for_api
+    return ballot_item_highlights_retrieve_for_api()
+
+
+def generate_issue_descriptions_json_data(parameters):  # issueDescriptionsRetrieve
+    from issue.controllers import issue_descriptions_retrieve_json_data_for_api
+    return issue_descriptions_retrieve_json_data_for_api()
+
+
+def generate_voter_guides_to_follow_json_data(parameters):  # voterGuidesToFollowRetrieve
+    from voter_guide.controllers import voter_guides_to_follow_retrieve_for_api
+    results = voter_guides_to_follow_retrieve_for_api(
+        '',
+        google_civic_election_id=parameters['google_civic_election_id'],
+        maximum_number_to_retrieve=parameters['maximum_number_to_retrieve'],
+        generic_for_all_voters=True)
+    return results['json_data']
+
+
+def generate_voter_guides_upcoming_json_data(parameters):  # voterGuidesUpcoming
+    from voter_guide.controllers import voter_guides_upcoming_retrieve_for_api
+    # For voterGuidesUpcoming, the parameters are the google_civic_election_id_list
+    results = voter_guides_upcoming_retrieve_for_api(google_civic_election_id_list=parameters)
+    return results['json_data']
+
+
+# The *_for_api controllers whose responses we pre-generate in the batch process system (API_REFRESH_REQUEST).
+#  The parameters for one cached response are stored, serialized, in election_id_list_serialized.
+#  validate_parameters_function: True if we should serve and refresh a cached response for these parameters
+#  refresh_interval_minutes: how often the batch process regenerates a response that is being requested
+#  staleness_budget_minutes: if the newest cached response is older than this, schedule a refresh immediately
+API_INTERNAL_CACHE_REGISTRY = {
+    'allBallotItemsRetrieve': {
+        'generate_json_data_function':  generate_all_ballot_items_json_data,
+        'validate_parameters_function': validate_all_ballot_items_parameters,
+        'refresh_interval_minutes':     10,
+        'staleness_budget_minutes':     15,
+    },
+    'ballotItemHighlightsRetrieve': {
+        'generate_json_data_function':  generate_ballot_item_highlights_json_data,
+        'validate_parameters_function': validate_no_parameters,
+        'refresh_interval_minutes':     30,
+        'staleness_budget_minutes':     60,
+    },
+    'issueDescriptionsRetrieve': {
+        'generate_json_data_function':  generate_issue_descriptions_json_data,
+        'validate_parameters_function': validate_no_parameters,
+        'refresh_interval_minutes':     30,
+        'staleness_budget_minutes':     60,
+    },
+    'voterGuidesToFollowRetrieve': {
+        'generate_json_data_function':  generate_voter_guides_to_follow_json_data,
+        'validate_parameters_function': validate_voter_guides_to_follow_parameters,
+        'refresh_interval_minutes':     10,
+        'staleness_budget_minutes':     15,
+    },
+    'voterGuidesUpcoming': {
+        'generate_json_data_function':  generate_voter_guides_upcoming_json_data,
+        'validate_parameters_function': validate_voter_guides_upcoming_parameters,
+        'refresh_interval_minutes':     55,
+        'staleness_budget_minutes':     60,
+    },
+}
+
+
+def serialize_api_internal_cache_parameters(parameters):
+    # sort_keys so the same parameters always produce the same cache key
+    return json.dumps(parameters, sort_keys=True)
+
+
+def generate_json_data_for_api_internal_cache(api_name, election_id_list_serialized):
+    """
+    Called by the batch process system to regenerate one cached response
+    :param api_name:
+    :param election_id_list_serialized: The serialized parameters for this response
+    :return:
+    """
+    status = ""
+    if api_name not in API_INTERNAL_CACHE_REGISTRY:
+        status += "API_NAME_NOT_RECOGNIZED: " + str(api_name) + " "
+        return {
+            'success':      False,
+            'status':       status,
+            'json_data':    {},
+        }
+
+    status += "STARTING_PROCESS_ONE_API_REFRESH_REQUESTED-" + str(api_name) + \
+              "-(" + str(election_id_list_serialized) + ") "
+    try:
+        parameters = json.loads(election_id_list_serialized)
+        json_data = API_INTERNAL_CACHE_REGISTRY[api_name]['generate_json_data_function'](parameters)
+        success = positive_value_exists(json_data.get('success'))
+        status += json_data.get('status', '')
+    except Exception as e:
+        handle_exception(e, logger=logger)
+        json_data = {}
+        success = False
+        status += "GENERATE_JSON_DATA_FOR_API_INTERNAL_CACHE_FAILED " + str(e) + " "
+
+    return {
+        'success':      success,
+        'status':       status,
+        'json_data':    json_data,
+    }
+
+
+def retrieve_api_internal_cache_response(api_name, parameters):
+    """
+    For any api in API_INTERNAL_CACHE_REGISTRY: return the latest cached response (as returned by
+    retrieve_latest_api_internal_cache_response), and make sure the batch process system keeps it fresh.
+    :param api_name:
+    :param parameters:
+    :return: None if we don't cache responses for these parameters
+    """
+    api_settings = API_INTERNAL_CACHE_REGISTRY[api_name]
+    if not api_settings['validate_parameters_function'](parameters):
+        return None
+    election_id_list_serialized = serialize_api_internal_cache_parameters(parameters)
+    api_internal_cache_manager = ApiInternalCacheManager()
+    cache_response_results = api_internal_cache_manager.retrieve_latest_api_internal_cache_response(
+        api_name=api_name,
+        election_id_list_serialized=election_id_list_serialized)
+    api_internal_cache = cache_response_results['api_internal_cache']
+
+    api_internal_cache_manager.schedule_refresh_of_api_internal_cache(
+        api_name=api_name,
+        election_id_list_serialized=election_id_list_serialized,
+        api_internal_cache=api_internal_cache,
+        refresh_interval_minutes=api_settings['refresh_interval_minutes'],
+        staleness_budget_minutes=api_settings['staleness_budget_minutes'],
+    )
+    return cache_response_results
+
+
+def retrieve_api_internal_cache_http_response(request, api_name, parameters):
+    """
+    Send the latest cached response for any api in API_INTERNAL_CACHE_REGISTRY. If nothing has been cached yet, or we
+    don't cache responses for these parameters, returns None and the view should generate the response.
+    :param request:
+    :param api_name:
+    :param parameters:
+    :return: HttpResponse or None
+    """
+    cache_response_results = retrieve_api_internal_cache_response(api_name, parameters)
+    if cache_response_results is not None and cache_response_results['api_internal_cache_found']:
+        return generate_http_response_from_api_internal_cache(request, cache_response_results)
+    return None
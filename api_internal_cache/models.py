@@ -5,10 +5,49 @@
 from django.db import models
 from django.utils.timezone import now
 from django.db.models import Q
+from collections import OrderedDict
 from datetime import timedelta
+import gzip
 import json
+import sys
+import threading
+import time
 from wevote_functions.functions import positive_value_exists
 
+# How long a process keeps serving a cached response from memory before checking the database for a newer one.
+#  (mark_prior_api_internal_cache_entries_as_replaced clears the memory tier immediately in the process it runs in.)
+API_INTERNAL_CACHE_MEMORY_SECONDS = 60
+
+# Keyed by (api_name, election_id_list_serialized)
+api_internal_cache_memory_tier = {}
+api_internal_cache_memory_tier_lock = threading.Lock()
+
+# schedule_refresh_of_api_internal_cache runs on every cached read, but one check per key per process in this
+#  many seconds is plenty, since refresh requests are scheduled tens of minutes apart
+API_REFRESH_SCHEDULE_CHECK_SECONDS = 300
+API_REFRESH_SCHEDULE_MAX_KEYS = 10000
+
+# Keyed by (api_name, election_id_list_serialized), the time.time() of the last scheduling check in this process.
+#  Oldest check first, so entries older than API_REFRESH_SCHEDULE_CHECK_SECONDS can be dropped from the front.
+api_refresh_schedule_last_checked = OrderedDict()
+api_refresh_schedule_lock = threading.Lock()
+api_refresh_schedule_statistics = {
+    'checks_skipped':           0,
+    'checks_run':               0,
+    'refresh_requests_created': 0,
+}
+
+
+def clear_api_internal_cache_memory_tier(api_name='', election_id_list_serialized=None):
+    with api_internal_cache_memory_tier_lock:
+        for memory_tier_key in list(api_internal_cache_memory_tier.keys()):
+            if positive_value_exists(api_name) and memory_tier_key[0].lower() != api_name.lower():
+                continue
+            if election_id_list_serialized is not None and \
+                    memory_tier_key[1].lower() != election_id_list_serialized.lower():
+                continue
+            del api_internal_cache_memory_tier[memory_tier_key]
+
 
 class ApiInternalCacheManager(models.Manager):
     def __unicode__(self):
@@ -112,13 +151,18 @@ class ApiInternalCacheManager(models.Manager):
     def does_api_refresh_request_exist_in_future(
             self,
             api_name='',
-            election_id_list_serialized=''):
+            election_id_list_serialized='',
+            read_only=False):
         api_refresh_request_found = False
         status = ''
         success = True
 
         try:
-            query = ApiRefreshRequest.objects.filter(
+            if positive_value_exists(read_only) and 'test' not in sys.argv:
+                query = ApiRefreshRequest.objects.using('readonly').all()
+            else:
+                query = ApiRefreshRequest.objects.all()
+            query = query.filter(
                 api_name__iexact=api_name,
                 date_refresh_is_needed__gt=now(),
                 election_id_list_serialized__iexact=election_id_list_serialized,
@@ -147,6 +191,8 @@ class ApiInternalCacheManager(models.Manager):
         status = ''
         success = True
         if positive_value_exists(excluded_api_internal_cache_id):
+            clear_api_internal_cache_memory_tier(
+                api_name=api_name, election_id_list_serialized=election_id_list_serialized)
             try:
                 query = ApiInternalCache.objects.filter(
                     api_name__iexact=api_name,
@@ -232,10 +278,21 @@ class ApiInternalCacheManager(models.Manager):
         }
         return results
 
+    def retrieve_api_refresh_schedule_statistics(self):
+        """
+        Counters for this process only
+        """
+        statistics = dict(api_refresh_schedule_statistics)
+        statistics['keys_checked'] = len(api_refresh_schedule_last_checked)
+        statistics['check_seconds'] = API_REFRESH_SCHEDULE_CHECK_SECONDS
+        return statistics
+
     def retrieve_latest_api_internal_cache(
             self,
             api_name='',
-            election_id_list_serialized=''):
+            election_id_list_serialized='',
+            parse_json=True,
+            read_only=False):
         api_internal_cache = None
         api_internal_cache_found = False
         api_internal_cache_list = []
@@ -255,17 +312,23 @@ class ApiInternalCacheManager(models.Manager):
             return results
 
         try:
-            query = ApiInternalCache.objects.filter(
+            if positive_value_exists(read_only) and 'test' not in sys.argv:
+                query = ApiInternalCache.objects.using('readonly').all()
+            else:
+                query = ApiInternalCache.objects.all()
+            query = query.filter(
                 api_name__iexact=api_name,
                 election_id_list_serialized__iexact=election_id_list_serialized,
                 replaced=False)
             query = query.exclude(cached_api_response_serialized='')
             query = query.order_by('-date_cached')
-            api_internal_cache_list = list(query)
-            if len(api_internal_cache_list):
-                api_internal_cache = api_internal_cache_list[0]
+            # We only need the newest entry, so don't pull every cached response from the database
+            api_internal_cache = query.first()
+            if api_internal_cache is not None:
+                api_internal_cache_list = [api_internal_cache]
                 api_internal_cache_found = True
-                if positive_value_exists(api_internal_cache.cached_api_response_serialized):
+                if positive_value_exists(parse_json) and \
+                        positive_value_exists(api_internal_cache.cached_api_response_serialized):
                     cached_api_response_json_data = api_internal_cache.cached_api_response_json_data()
             success = True
         except ApiInternalCache.DoesNotExist:
@@ -285,15 +348,115 @@ class ApiInternalCacheManager(models.Manager):
         }
         return results
 
+    def retrieve_latest_api_internal_cache_response(
+            self,
+            api_name='',
+            election_id_list_serialized=''):
+        """
+        Like retrieve_latest_api_internal_cache, but instead of parsing the cached json, we return the stored
+        serialized text (and a gzipped copy, and an ETag) so it can be sent to the client as-is.
+        The newest entry is kept in memory for API_INTERNAL_CACHE_MEMORY_SECONDS.
+        :param api_name:
+        :param election_id_list_serialized:
+        :return:
+        """
+        status = ''
+        memory_tier_key = (api_name, election_id_list_serialized)
+        memory_tier_entry = api_internal_cache_memory_tier.get(memory_tier_key)
+        if memory_tier_entry is not None and \
+                time.time() - memory_tier_entry['time_cached_in_memory'] < API_INTERNAL_CACHE_MEMORY_SECONDS:
+            status += "RETRIEVE_LATEST_CACHE_RESPONSE-FROM_MEMORY "
+            results = memory_tier_entry.copy()
+            results['status'] = status
+            return results
+
+        results = self.retrieve_latest_api_internal_cache(
+            api_name=api_name,
+            election_id_list_serialized=election_id_list_serialized,
+            parse_json=False,
+            read_only=True)
+        status += results['status']
+        if not results['api_internal_cache_found']:
+            return {
+                'success':                          results['success'],
+                'status':                           status,
+                'api_internal_cache':               None,
+                'api_internal_cache_found':         False,
+                'cached_api_response_serialized':   '',
+                'cached_api_response_gzipped':      b'',
+                'etag':                             '',
+            }
+
+        api_internal_cache = results['api_internal_cache']
+        cached_api_response_serialized = api_internal_cache.cached_api_response_serialized
+        memory_tier_entry = {
+            'success':                          True,
+            'status':                           status,
+            'api_internal_cache':               api_internal_cache,
+            'api_internal_cache_found':         True,
+            'cached_api_response_serialized':   cached_api_response_serialized,
+            'cached_api_response_gzipped':      gzip.compress(cached_api_response_serialized.encode('utf-8')),
+            # Cached responses are never modified after they are created, so the id is enough to identify the content
+            'etag':                             '"api_internal_cache-{id}"'.format(id=api_internal_cache.id),
+            'time_cached_in_memory':            time.time(),
+        }
+        with api_internal_cache_memory_tier_lock:
+            api_internal_cache_memory_tier[memory_tier_key] = memory_tier_entry
+        status += "RETRIEVE_LATEST_CACHE_RESPONSE-FROM_DATABASE "
+        results = memory_tier_entry.copy()
+        results['status'] = status
+        return results
+
     def schedule_refresh_of_api_internal_cache(
             self,
             api_name='',
             election_id_list_serialized='',
-            api_internal_cache=None):
+            api_internal_cache=None,
+            refresh_interval_minutes=55,
+            staleness_budget_minutes=60,
+            debounce=True):
+        """
+        Make sure a refresh of this cached api response is scheduled. Called on the read path, so by default each
+        process only checks each key once every API_REFRESH_SCHEDULE_CHECK_SECONDS, and reads from the replica.
+        :param api_name:
+        :param election_id_list_serialized:
+        :param api_internal_cache:
+        :param refresh_interval_minutes:
+        :param staleness_budget_minutes:
+        :param debounce: Pass in False to check the database no matter when this process last checked
+        :return:
+        """
         api_internal_cache_found = False
         status = ''
         success = True
 
+        if positive_value_exists(debounce):
+            schedule_key = (api_name.lower(), election_id_list_serialized.lower())
+            time_now = time.time()
+            with api_refresh_schedule_lock:
+                last_checked = api_refresh_schedule_last_checked.get(schedule_key, 0)
+                if time_now - last_checked < API_REFRESH_SCHEDULE_CHECK_SECONDS:
+                    api_refresh_schedule_statistics['checks_skipped'] += 1
+                    skip_check = True
+                else:
+                    api_refresh_schedule_last_checked.pop(schedule_key, None)
+                    api_refresh_schedule_last_checked[schedule_key] = time_now
+                    while api_refresh_schedule_last_checked:
+                        oldest_key, oldest_time = next(iter(api_refresh_schedule_last_checked.items()))
+                        if time_now - oldest_time < API_REFRESH_SCHEDULE_CHECK_SECONDS and \
+                                len(api_refresh_schedule_last_checked) <= API_REFRESH_SCHEDULE_MAX_KEYS:
+                            break
+                        del api_refresh_schedule_last_checked[oldest_key]
+                    skip_check = False
+            if skip_check:
+                status += "API_REFRESH_SCHEDULE_CHECKED_RECENTLY "
+                results = {
+                    'success':                          success,
+                    'status':                           status,
+                }
+                return results
+        api_refresh_schedule_statistics['checks_run'] += 1
+
         if api_internal_cache and hasattr(api_internal_cache, 'api_name'):
             # Work with this existing object
             api_internal_cache_found = True
@@ -302,20 +465,22 @@ class ApiInternalCacheManager(models.Manager):
             status += "API_INTERNAL_CACHE_NOT_PASSED_IN "
             results = self.retrieve_latest_api_internal_cache(
                 api_name=api_name,
-                election_id_list_serialized=election_id_list_serialized)
+                election_id_list_serialized=election_id_list_serialized,
+                parse_json=False,
+                read_only=True)
             if results['api_internal_cache_found']:
                 api_internal_cache_found = True
                 api_internal_cache = results['api_internal_cache']
                 status += "API_INTERNAL_CACHE_RETRIEVED "
 
-        # Was there an existing api_internal_cache retrieved in the last 60 minutes?
+        # Was there an existing api_internal_cache retrieved within the staleness budget (60 minutes by default)?
         # If not, schedule refresh immediately.
         create_entry_immediately = False
         if not api_internal_cache_found:
             create_entry_immediately = True
         elif api_internal_cache and hasattr(api_internal_cache, 'date_cached'):
-            sixty_minutes_ago = now() - timedelta(hours=1)
-            if api_internal_cache.date_cached < sixty_minutes_ago:
+            staleness_budget_ago = now() - timedelta(minutes=staleness_budget_minutes)
+            if api_internal_cache.date_cached < staleness_budget_ago:
                 create_entry_immediately = True
         if create_entry_immediately:
             # We don't pass in date_refresh_is_needed, so it assumes value is "immediately"
@@ -323,22 +488,28 @@ class ApiInternalCacheManager(models.Manager):
                 api_name=api_name,
                 election_id_list_serialized=election_id_list_serialized)
             status += results['status']
+            if results['api_refresh_request_saved']:
+                api_refresh_schedule_statistics['refresh_requests_created'] += 1
 
-        # Do we have an ApiRefreshRequest entry scheduled in the future? If not, schedule one 55 minutes from now.
+        # Do we have an ApiRefreshRequest entry scheduled in the future? If not, schedule one
+        #  refresh_interval_minutes (55 minutes by default) from now.
         results = self.does_api_refresh_request_exist_in_future(
             api_name=api_name,
-            election_id_list_serialized=election_id_list_serialized)
+            election_id_list_serialized=election_id_list_serialized,
+            read_only=True)
         if not results['success']:
             status += "NOT_ABLE_TO_SEE-(does_api_refresh_request_exist_in_future): " + str(results['status']) + " "
         elif results['api_refresh_request_found']:
             status += "API_REFRESH_REQUEST_FOUND "
         else:
-            date_refresh_is_needed = now() + timedelta(minutes=55)  # Schedule 55 minutes from now
+            date_refresh_is_needed = now() + timedelta(minutes=refresh_interval_minutes)
             results = self.create_api_refresh_request(
                 api_name=api_name,
                 election_id_list_serialized=election_id_list_serialized,
                 date_refresh_is_needed=date_refresh_is_needed)
             status += results['status']
+            if results['api_refresh_request_saved']:
+                api_refresh_schedule_statistics['refresh_requests_created'] += 1
 
         results = {
             'success':                          success,
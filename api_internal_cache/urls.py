@@ -8,6 +8,8 @@ from . import views_admin
 
 
 urlpatterns = [
+    url(r'^api_refresh_schedule_statistics/$', views_admin.api_refresh_schedule_statistics_view,
+        name='api_refresh_schedule_statistics'),
     # url(r'^$', views_admin.batches_home_view, name='batches_home',),
     # url(r'^batch_action_list/$', views_admin.batch_action_list_view, name='batch_action_list'),
     # url(r'^batch_action_list_process/$', views_admin.batch_action_list_process_view, name='batch_action_list_process'),
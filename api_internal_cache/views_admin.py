@@ -2,7 +2,28 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from .models import ApiInternalCacheManager
+from admin_tools.views import redirect_to_sign_in_page
+from django.contrib.auth.decorators import login_required
+from voter.models import voter_has_authority
 import wevote_functions.admin
+from wevote_functions.process_statistics import process_statistics_json_response
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+
+@login_required
+def api_refresh_schedule_statistics_view(request):
+    """
+    How many refresh scheduling checks the worker process answering this request has run or skipped
+    :param request:
+    :return:
+    """
+    # admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    api_internal_cache_manager = ApiInternalCacheManager()
+    return process_statistics_json_response(
+        request, api_internal_cache_manager.retrieve_api_refresh_schedule_statistics)
@@ -0,0 +1,283 @@
+# apis_v1/request_profiler.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Opt-in profiling of the /apis/v1/ endpoints. Turn it on with API_PROFILER_ON=1. For each request,
+# ApiProfilerMiddleware records:
+#   - the wall time
+#   - the number of queries and the time spent in them, for each database (default, readonly, analytics)
+#   - the size of the response
+# ApiProfiler keeps the last API_PROFILER_SAMPLE_SIZE requests to each view, and reports percentiles over them.
+# It also keeps the API_PROFILER_SLOWEST_REQUEST_COUNT slowest requests with their query fingerprints. A
+# fingerprint is the query's SQL with the values taken out, so the same query with different values is counted
+# once. Requests slower than API_PROFILER_LOG_MILLISECONDS are logged with their fingerprints.
+# The queries come from the execute_wrapper that config/database_router.py's observe_queries() puts on each connection.
+# See /admin/api_profiler/ and /admin/api_profiler_json/
+
+from config.base import get_environment_variable_default
+from config.database_router import add_query_listener, observe_queries, request_endpoint, UNRESOLVED_ENDPOINT
+from collections import deque
+import heapq
+import math
+import re
+import threading
+import time
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+API_PROFILER_ON = convert_to_int(get_environment_variable_default('API_PROFILER_ON', 0))
+API_PROFILER_PATH_PREFIX = '/apis/v1/'
+API_PROFILER_SAMPLE_SIZE = convert_to_int(get_environment_variable_default('API_PROFILER_SAMPLE_SIZE', 1000))
+API_PROFILER_SLOWEST_REQUEST_COUNT = \
+    convert_to_int(get_environment_variable_default('API_PROFILER_SLOWEST_REQUEST_COUNT', 25))
+# 0 turns off logging of slow requests
+API_PROFILER_LOG_MILLISECONDS = convert_to_int(get_environment_variable_default('API_PROFILER_LOG_MILLISECONDS', 0))
+API_PROFILER_PERCENTILE_LIST = (50, 90, 95, 99)
+
+QUOTED_STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_PATTERN = re.compile(r"%s|%\(\w+\)s")
+PLACEHOLDER_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def generate_query_fingerprint(sql):
+    """
+    The query with its values replaced by ?, and any list of values by (...), so that "id IN (1, 2)" and
+    "id IN (3, 4, 5)" have the same fingerprint
+    """
+    fingerprint = QUOTED_STRING_PATTERN.sub('?', sql)
+    fingerprint = NUMBER_PATTERN.sub('?', fingerprint)
+    fingerprint = PLACEHOLDER_PATTERN.sub('?', fingerprint)
+    fingerprint = PLACEHOLDER_LIST_PATTERN.sub('(...)', fingerprint)
+    return WHITESPACE_PATTERN.sub(' ', fingerprint).strip()
+
+
+def calculate_percentile(sorted_value_list, percentile):
+    """
+    Nearest rank percentile
+    :param sorted_value_list: sorted, lowest first
+    :param percentile: 0 - 100
+    :return:
+    """
+    if not sorted_value_list:
+        return 0
+    rank = int(math.ceil(percentile / 100.0 * len(sorted_value_list)))
+    rank = min(max(rank, 1), len(sorted_value_list))
+    return sorted_value_list[rank - 1]
+
+
+def calculate_percentiles(value_list):
+    sorted_value_list = sorted(value_list)
+    percentiles = {'p' + str(percentile): calculate_percentile(sorted_value_list, percentile)
+                   for percentile in API_PROFILER_PERCENTILE_LIST}
+    percentiles['max'] = sorted_value_list[-1] if sorted_value_list else 0
+    return percentiles
+
+
+class RequestProfile(object):
+    """
+    What we learn about one request
+    """
+
+    def __init__(self, endpoint=UNRESOLVED_ENDPOINT):
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self.start_counter = time.perf_counter()
+        self.milliseconds = 0
+        self.response_bytes = 0
+        self.status_code = 0
+        self.queries_by_database = {}
+        self.query_time_by_fingerprint = {}
+
+    def add_query(self, database, sql, milliseconds):
+        database_queries = self.queries_by_database.setdefault(database, {'count': 0, 'milliseconds': 0.0})
+        database_queries['count'] += 1
+        database_queries['milliseconds'] += milliseconds
+        fingerprint = generate_query_fingerprint(sql)
+        fingerprint_queries = self.query_time_by_fingerprint.setdefault(
+            fingerprint, {'database': database, 'count': 0, 'milliseconds': 0.0})
+        fingerprint_queries['count'] += 1
+        fingerprint_queries['milliseconds'] += milliseconds
+
+    def query_count(self):
+        return sum(database_queries['count'] for database_queries in self.queries_by_database.values())
+
+    def query_milliseconds(self):
+        return sum(database_queries['milliseconds'] for database_queries in self.queries_by_database.values())
+
+    def finish(self, response):
+        self.milliseconds = (time.perf_counter() - self.start_counter) * 1000
+        self.status_code = response.status_code
+        if not response.streaming:
+            self.response_bytes = len(response.content)
+
+    def summary(self):
+        # The queries that took the most time first
+        fingerprint_list = sorted(self.query_time_by_fingerprint.items(),
+                                  key=lambda fingerprint_item: -fingerprint_item[1]['milliseconds'])
+        return {
+            'endpoint':             self.endpoint,
+            'started_at':           time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(self.started_at)),
+            'milliseconds':         round(self.milliseconds, 1),
+            'status_code':          self.status_code,
+            'response_bytes':       self.response_bytes,
+            'query_count':          self.query_count(),
+            'query_milliseconds':   round(self.query_milliseconds(), 1),
+            'queries_by_database':  {database: {'count': database_queries['count'],
+                                                'milliseconds': round(database_queries['milliseconds'], 1)}
+                                     for database, database_queries in self.queries_by_database.items()},
+            'query_fingerprints':   [{'fingerprint': fingerprint,
+                                      'database': fingerprint_queries['database'],
+                                      'count': fingerprint_queries['count'],
+                                      'milliseconds': round(fingerprint_queries['milliseconds'], 1)}
+                                     for fingerprint, fingerprint_queries in fingerprint_list],
+        }
+
+
+class ApiProfiler(object):
+    """
+    The recent requests to each endpoint, and the slowest requests, for the worker process we are in
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_scope = threading.local()
+        self.samples_by_endpoint = {}
+        self.request_count_by_endpoint = {}
+        # Heap of (milliseconds, sequence, summary), so the fastest of the slowest requests is on top
+        self.slowest_request_heap = []
+        self.sequence = 0
+
+    def start_request(self, endpoint=UNRESOLVED_ENDPOINT):
+        self.request_scope.profile = RequestProfile(endpoint)
+        return self.request_scope.profile
+
+    def current_profile(self):
+        return getattr(self.request_scope, 'profile', None)
+
+    def add_query(self, database, sql, milliseconds):
+        profile = self.current_profile()
+        if profile is not None:
+            profile.add_query(database, sql, milliseconds)
+
+    def end_request(self, response, endpoint=None):
+        """
+        :param response:
+        :param endpoint: the view name, which we only know once the request has been resolved
+        """
+        profile = self.current_profile()
+        self.request_scope.profile = None
+        if profile is None:
+            return
+        if endpoint is not None:
+            profile.endpoint = endpoint
+        profile.finish(response)
+        sample = {
+            'milliseconds':         profile.milliseconds,
+            'query_count':          profile.query_count(),
+            'query_milliseconds':   profile.query_milliseconds(),
+            'response_bytes':       profile.response_bytes,
+            'queries_by_database':  profile.queries_by_database,
+        }
+        with self.lock:
+            samples = self.samples_by_endpoint.get(profile.endpoint)
+            if samples is None:
+                samples = deque(maxlen=max(API_PROFILER_SAMPLE_SIZE, 1))
+                self.samples_by_endpoint[profile.endpoint] = samples
+            samples.append(sample)
+            self.request_count_by_endpoint[profile.endpoint] = \
+                self.request_count_by_endpoint.get(profile.endpoint, 0) + 1
+
+            slow_enough = len(self.slowest_request_heap) < API_PROFILER_SLOWEST_REQUEST_COUNT or \
+                (self.slowest_request_heap and profile.milliseconds > self.slowest_request_heap[0][0])
+            if API_PROFILER_SLOWEST_REQUEST_COUNT > 0 and slow_enough:
+                self.sequence += 1
+                heap_entry = (profile.milliseconds, self.sequence, profile.summary())
+                if len(self.slowest_request_heap) < API_PROFILER_SLOWEST_REQUEST_COUNT:
+                    heapq.heappush(self.slowest_request_heap, heap_entry)
+                else:
+                    heapq.heapreplace(self.slowest_request_heap, heap_entry)
+
+        if API_PROFILER_LOG_MILLISECONDS and profile.milliseconds >= API_PROFILER_LOG_MILLISECONDS:
+            summary = profile.summary()
+            logger.warning("API_PROFILER_SLOW_REQUEST " + profile.endpoint + " " + str(summary['milliseconds']) +
+                           "ms, " + str(summary['query_count']) + " queries " +
+                           str(summary['query_fingerprints'][:10]))
+
+    def clear(self):
+        with self.lock:
+            self.samples_by_endpoint = {}
+            self.request_count_by_endpoint = {}
+            self.slowest_request_heap = []
+
+    def statistics(self):
+        with self.lock:
+            samples_by_endpoint = {endpoint: list(samples) for endpoint, samples in self.samples_by_endpoint.items()}
+            request_count_by_endpoint = dict(self.request_count_by_endpoint)
+            slowest_request_list = [heap_entry[2] for heap_entry in sorted(self.slowest_request_heap, reverse=True)]
+
+        statistics_by_endpoint = {}
+        for endpoint, sample_list in samples_by_endpoint.items():
+            database_set = set()
+            for sample in sample_list:
+                database_set.update(sample['queries_by_database'].keys())
+            queries_by_database = {}
+            for database in database_set:
+                queries_by_database[database] = {
+                    'count': calculate_percentiles(
+                        [sample['queries_by_database'].get(database, {}).get('count', 0) for sample in sample_list]),
+                    'milliseconds': calculate_percentiles(
+                        [round(sample['queries_by_database'].get(database, {}).get('milliseconds', 0), 1)
+                         for sample in sample_list]),
+                }
+            statistics_by_endpoint[endpoint] = {
+                'requests':             request_count_by_endpoint.get(endpoint, 0),
+                'sample_size':          len(sample_list),
+                'milliseconds':         calculate_percentiles(
+                    [round(sample['milliseconds'], 1) for sample in sample_list]),
+                'query_count':          calculate_percentiles([sample['query_count'] for sample in sample_list]),
+                'query_milliseconds':   calculate_percentiles(
+                    [round(sample['query_milliseconds'], 1) for sample in sample_list]),
+                'response_bytes':       calculate_percentiles([sample['response_bytes'] for sample in sample_list]),
+                'queries_by_database':  queries_by_database,
+            }
+        return {
+            'api_profiler_on':          bool(API_PROFILER_ON),
+            'percentiles':              ['p' + str(percentile) for percentile in API_PROFILER_PERCENTILE_LIST],
+            # The endpoints with the slowest p95 first
+            'endpoint_list':            sorted(statistics_by_endpoint.keys(),
+                                               key=lambda endpoint: -statistics_by_endpoint[endpoint][
+                                                   'milliseconds']['p95']),
+            'statistics_by_endpoint':   statistics_by_endpoint,
+            'slowest_request_list':     slowest_request_list,
+        }
+
+
+# One per process
+api_profiler = ApiProfiler()
+add_query_listener(api_profiler.add_query)
+
+
+class ApiProfilerMiddleware(object):
+    """
+    Profiles the /apis/v1/ requests when API_PROFILER_ON is set
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not API_PROFILER_ON or not request.path.startswith(API_PROFILER_PATH_PREFIX):
+            return self.get_response(request)
+
+        api_profiler.start_request()
+        try:
+            with observe_queries():
+                response = self.get_response(request)
+        except Exception:
+            api_profiler.request_scope.profile = None
+            raise
+        api_profiler.end_request(response, request_endpoint(request))
+        return response
@@ -0,0 +1,87 @@
+# apis_v1/tests/test_request_profiler.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from apis_v1.request_profiler import api_profiler, ApiProfiler, ApiProfilerMiddleware, calculate_percentiles, \
+    generate_query_fingerprint
+from config.database_router import DatabaseRoutingMiddleware
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from types import SimpleNamespace
+from unittest import mock
+
+
+class WeVoteAPIsV1TestsRequestProfiler(SimpleTestCase):
+
+    def test_query_fingerprint_ignores_values(self):
+        fingerprint = generate_query_fingerprint(
+            'SELECT "voter_voter"."id" FROM "voter_voter" WHERE ("voter_voter"."id" IN (%s, %s, %s) '
+            'AND "voter_voter"."we_vote_id" = \'wv01voter7\' AND  "voter_voter"."is_admin" = %s) LIMIT 21')
+        self.assertEqual(fingerprint, generate_query_fingerprint(
+            'SELECT "voter_voter"."id" FROM "voter_voter" WHERE ("voter_voter"."id" IN (%s) '
+            'AND "voter_voter"."we_vote_id" = \'wv02voter9\' AND "voter_voter"."is_admin" = %s) LIMIT 1'))
+        self.assertIn('IN (...)', fingerprint)
+
+    def test_percentiles(self):
+        percentiles = calculate_percentiles(list(range(100, 0, -1)))
+        self.assertEqual(percentiles['p50'], 50)
+        self.assertEqual(percentiles['p95'], 95)
+        self.assertEqual(percentiles['max'], 100)
+        self.assertEqual(calculate_percentiles([])['p99'], 0)
+
+    def test_requests_are_counted_by_endpoint_and_database(self):
+        api_profiler = ApiProfiler()
+        profile = api_profiler.start_request('/apis/v1/voterRetrieve/')
+        profile.add_query('readonly', 'SELECT 1', 2.0)
+        profile.add_query('readonly', 'SELECT 2', 3.0)
+        profile.add_query('default', 'UPDATE "voter_voter" SET "first_name" = %s', 5.0)
+        api_profiler.end_request(HttpResponse('{"success": true}'))
+
+        statistics = api_profiler.statistics()
+        endpoint_statistics = statistics['statistics_by_endpoint']['/apis/v1/voterRetrieve/']
+        self.assertEqual(endpoint_statistics['requests'], 1)
+        self.assertEqual(endpoint_statistics['query_count']['p50'], 3)
+        self.assertEqual(endpoint_statistics['queries_by_database']['readonly']['count']['p50'], 2)
+        self.assertEqual(endpoint_statistics['response_bytes']['p50'], len('{"success": true}'))
+        slow_request = statistics['slowest_request_list'][0]
+        # SELECT 1 and SELECT 2 have the same fingerprint
+        self.assertEqual(len(slow_request['query_fingerprints']), 2)
+
+
+class WeVoteAPIsV1TestsRequestProfilerMiddleware(TestCase):
+
+    def setUp(self):
+        api_profiler.clear()
+        profiler_patcher = mock.patch('apis_v1.request_profiler.API_PROFILER_ON', 1)
+        profiler_patcher.start()
+        self.addCleanup(profiler_patcher.stop)
+
+    def tearDown(self):
+        api_profiler.clear()
+
+    def test_one_query_wrapper_and_profiles_keyed_by_view_name(self):
+        execute_wrapper_counts = []
+
+        def voter_retrieve_view(request):
+            request.resolver_match = SimpleNamespace(view_name='apis_v1:voterRetrieveView')
+            execute_wrapper_counts.append(
+                {database: len(connections[database].execute_wrappers) for database in settings.DATABASES})
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse('{"success": true}')
+
+        # Both middleware need the queries, and they get them from the same wrapper
+        middleware = ApiProfilerMiddleware(DatabaseRoutingMiddleware(voter_retrieve_view))
+        request_factory = RequestFactory()
+        for path in ['/apis/v1/voterRetrieve/', '/apis/v1/voterRetrieve']:
+            middleware(request_factory.get(path))
+
+        for execute_wrapper_count_by_database in execute_wrapper_counts:
+            self.assertEqual(set(execute_wrapper_count_by_database.values()), {1})
+        statistics_by_endpoint = api_profiler.statistics()['statistics_by_endpoint']
+        self.assertEqual(list(statistics_by_endpoint.keys()), ['apis_v1:voterRetrieveView'])
+        endpoint_statistics = statistics_by_endpoint['apis_v1:voterRetrieveView']
+        self.assertEqual(endpoint_statistics['requests'], 2)
+        self.assertEqual(endpoint_statistics['queries_by_database']['default']['count']['p50'], 1)
@@ -2,10 +2,15 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from api_internal_cache.controllers import google_civic_election_id_set_cache
+from api_internal_cache.models import ApiInternalCache, ApiRefreshRequest
 from django.urls import reverse
 from django.test import TestCase
+from election.models import Election
+from follow.models import FOLLOWING, FollowOrganization
 import json
 from organization.models import Organization
+from voter.models import fetch_voter_id_from_voter_device_link
 
 
 class WeVoteAPIsV1TestsVoterGuidesToFollowRetrieve(TestCase):
@@ -16,6 +21,7 @@ class WeVoteAPIsV1TestsVoterGuidesToFollowRetrieve(TestCase):
         self.organization_count_url = reverse("apis_v1:organizationCountView")
         self.voter_create_url = reverse("apis_v1:voterCreateView")
         self.voter_guides_to_follow_retrieve_url = reverse("apis_v1:voterGuidesToFollowRetrieveView")
+        google_civic_election_id_set_cache['time_cached'] = 0
 
     def test_retrieve_with_no_voter_device_id(self):
         #######################################
@@ -151,3 +157,52 @@ class WeVoteAPIsV1TestsVoterGuidesToFollowRetrieve(TestCase):
                              "owner_voter_id expected in voterGuidesToFollowRetrieveView json but not found")
             self.assertEqual('last_updated' in one_voter_guide, True,
                              "last_updated expected in voterGuidesToFollowRetrieveView json but not found")
+
+    def test_retrieve_personalized_from_cached_generic_response(self):
+        response01 = self.client.get(self.generate_voter_device_id_url)
+        voter_device_id = json.loads(response01.content.decode())['voter_device_id']
+        self.client.get(self.voter_create_url, {'voter_device_id': voter_device_id})
+        voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
+
+        Election.objects.create(google_civic_election_id='4184', election_name="General Election")
+        generic_voter_guide_list = []
+        for organization_we_vote_id in ['wv01org1', 'wv01org2']:
+            generic_voter_guide_list.append({
+                'organization_we_vote_id':  organization_we_vote_id,
+                'voter_has_pledged':        False,
+                'we_vote_id':               organization_we_vote_id + 'vg',
+            })
+        ApiInternalCache.objects.create(
+            api_name='voterGuidesToFollowRetrieve',
+            election_id_list_serialized=json.dumps(
+                {'google_civic_election_id': 4184, 'maximum_number_to_retrieve': 350}, sort_keys=True),
+            cached_api_response_serialized=json.dumps({
+                'status':           'VOTER_GUIDES_TO_FOLLOW_GENERIC_FOR_ALL_VOTERS ',
+                'success':          True,
+                'voter_device_id':  '',
+                'voter_guides':     generic_voter_guide_list,
+                'number_retrieved': 2,
+            }))
+        FollowOrganization.objects.create(
+            voter_id=voter_id, organization_we_vote_id='wv01org1', following_status=FOLLOWING)
+
+        response02 = self.client.get(self.voter_guides_to_follow_retrieve_url, {
+            'voter_device_id':              voter_device_id,
+            'google_civic_election_id':     4184,
+            'maximum_number_to_retrieve':   350,
+        })
+        json_data02 = json.loads(response02.content.decode())
+        self.assertIn('VOTER_GUIDES_TO_FOLLOW_PERSONALIZED_FROM_GENERIC', json_data02['status'])
+        self.assertEqual(json_data02['voter_device_id'], voter_device_id)
+        organization_we_vote_id_list = \
+            [one_voter_guide['organization_we_vote_id'] for one_voter_guide in json_data02['voter_guides']]
+        self.assertEqual(organization_we_vote_id_list, ['wv01org2'],
+                         "The voter guide from the organization the voter follows should be removed")
+        self.assertEqual(json_data02['number_retrieved'], 1)
+
+    def test_unknown_election_does_not_schedule_refresh(self):
+        self.client.get(self.voter_guides_to_follow_retrieve_url, {
+            'google_civic_election_id':     987654,
+            'maximum_number_to_retrieve':   350,
+        })
+        self.assertEqual(ApiRefreshRequest.objects.count(), 0)
@@ -1,6 +1,7 @@
 # apis_v1/views/views_ballot.py
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
+from api_internal_cache.controllers import retrieve_api_internal_cache_http_response
 from ballot.controllers import all_ballot_items_retrieve_for_api, ballot_item_highlights_retrieve_for_api, \
     ballot_item_options_retrieve_for_api, ballot_items_search_retrieve_for_api
 from candidate.controllers import candidate_retrieve_for_api
@@ -33,12 +34,25 @@ def all_ballot_items_retrieve_view(request):  # allBallotItemsRetrieve
     if use_test_election:
         google_civic_election_id = 2000  # The Google Civic test election
 
+    if positive_value_exists(google_civic_election_id) and len(state_code) <= 2:
+        http_response = retrieve_api_internal_cache_http_response(
+            request, 'allBallotItemsRetrieve', {
+                'google_civic_election_id': google_civic_election_id,
+                'state_code':               state_code.upper(),
+            })
+        if http_response is not None:
+            return http_response
+
     json_data = all_ballot_items_retrieve_for_api(google_civic_election_id, state_code)
 
     return HttpResponse(json.dumps(json_data), content_type='application/json')
 
 
 def ballot_item_highlights_retrieve_view(request):  # ballotItemHighlightsRetrieve
+    http_response = retrieve_api_internal_cache_http_response(request, 'ballotItemHighlightsRetrieve', {})
+    if http_response is not None:
+        return http_response
+
     json_data = ballot_item_highlights_retrieve_for_api()
     response = HttpResponse(json.dumps(json_data), content_type='application/json')
     return response
@@ -5,7 +5,8 @@
 from ballot.controllers import choose_election_from_existing_data
 from django.http import HttpResponse
 import json
-from api_internal_cache.models import ApiInternalCacheManager
+from api_internal_cache.controllers import retrieve_api_internal_cache_http_response, \
+    retrieve_api_internal_cache_response
 from position.models import FRIENDS_AND_PUBLIC, FRIENDS_ONLY, PUBLIC_ONLY
 from voter.models import VoterAddress, VoterAddressManager, VoterDeviceLinkManager, VoterManager
 from voter_guide.controllers import voter_guide_possibility_highlights_retrieve_for_api, \
@@ -16,7 +17,8 @@ from voter_guide.controllers import voter_guide_possibility_highlights_retrieve_
     voter_guides_followed_retrieve_for_api, voter_guides_ignored_retrieve_for_api, voter_guides_retrieve_for_api, \
     voter_guides_followed_by_organization_retrieve_for_api, \
     voter_guide_followers_retrieve_for_api, \
-    voter_guides_to_follow_retrieve_for_api, voter_guides_upcoming_retrieve_for_api
+    voter_guides_to_follow_personalize_generic_json_data, voter_guides_to_follow_retrieve_for_api, \
+    voter_guides_upcoming_retrieve_for_api
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, get_maximum_number_to_retrieve_from_request, \
     get_voter_device_id, positive_value_exists
@@ -250,6 +252,30 @@ def voter_guides_to_follow_retrieve_view(request):  # voterGuidesToFollowRetriev
     add_voter_guides_not_from_election = request.GET.get('add_voter_guides_not_from_election', False)
     add_voter_guides_not_from_election = positive_value_exists(add_voter_guides_not_from_election)
 
+    if positive_value_exists(google_civic_election_id) \
+            and not positive_value_exists(ballot_item_we_vote_id) and not positive_value_exists(search_string) \
+            and not positive_value_exists(start_retrieve_at_this_number) and not filter_voter_guides_by_issue \
+            and not add_voter_guides_not_from_election and not use_test_election:
+        # Start from the pre-generated version for all voters
+        cached_api_parameters = {
+            'google_civic_election_id':     google_civic_election_id,
+            'maximum_number_to_retrieve':   maximum_number_to_retrieve,
+        }
+        if not positive_value_exists(voter_device_id):
+            # Without a voter, there is nothing to personalize, so we can send it as-is
+            http_response = retrieve_api_internal_cache_http_response(
+                request, 'voterGuidesToFollowRetrieve', cached_api_parameters)
+            if http_response is not None:
+                return http_response
+        else:
+            cache_response_results = retrieve_api_internal_cache_response(
+                'voterGuidesToFollowRetrieve', cached_api_parameters)
+            if cache_response_results is not None and cache_response_results['api_internal_cache_found']:
+                results = voter_guides_to_follow_personalize_generic_json_data(
+                    voter_device_id, json.loads(cache_response_results['cached_api_response_serialized']))
+                if results['success']:
+                    return HttpResponse(json.dumps(results['json_data']), content_type='application/json')
+
     if positive_value_exists(ballot_item_we_vote_id):
         # We don't need both ballot_item and google_civic_election_id
         google_civic_election_id = 0
@@ -336,9 +362,6 @@ def voter_guides_upcoming_retrieve_view(request):  # voterGuidesUpcomingRetrieve
     :return:
     """
     status = ""
-    api_internal_cache = None
-    api_internal_cache_found = False
-    json_data = {}
 
     google_civic_election_id_list = request.GET.getlist('google_civic_election_id_list[]')
 
@@ -348,29 +371,14 @@ def voter_guides_upcoming_retrieve_view(request):  # voterGuidesUpcomingRetrieve
     else:
         google_civic_election_id_list = []
 
-    # Since this API assembles a lot of data, we pre-cache it. Get the data cached most recently.
-    api_internal_cache_manager = ApiInternalCacheManager()
-    election_id_list_serialized = json.dumps(google_civic_election_id_list)
-    results = api_internal_cache_manager.retrieve_latest_api_internal_cache(
-        api_name='voterGuidesUpcoming',
-        election_id_list_serialized=election_id_list_serialized)
-    if results['api_internal_cache_found']:
-        api_internal_cache_found = True
-        api_internal_cache = results['api_internal_cache']
-        json_data = results['cached_api_response_json_data']
-
-    # Schedule the next retrieve. It is possible for the first retrieve
-    # of the day (above) to be using data from a few days ago.
-    results = api_internal_cache_manager.schedule_refresh_of_api_internal_cache(
-        api_name='voterGuidesUpcoming',
-        election_id_list_serialized=election_id_list_serialized,
-        api_internal_cache=api_internal_cache,
-    )
-    # Add a log entry here
-
-    if not api_internal_cache_found:
-        results = voter_guides_upcoming_retrieve_for_api(google_civic_election_id_list=google_civic_election_id_list)
-        status += results['status']
-        json_data = results['json_data']
+    # Since this API assembles a lot of data, we pre-cache it. Get the data cached most recently, and schedule
+    #  the next retrieve. It is possible for the first retrieve of the day to be using data from a few days ago.
+    http_response = retrieve_api_internal_cache_http_response(
+        request, 'voterGuidesUpcoming', google_civic_election_id_list)
+    if http_response is not None:
+        return http_response
 
+    results = voter_guides_upcoming_retrieve_for_api(google_civic_election_id_list=google_civic_election_id_list)
+    status += results['status']
+    json_data = results['json_data']
     return HttpResponse(json.dumps(json_data), content_type='application/json')
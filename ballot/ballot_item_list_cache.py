@@ -0,0 +1,174 @@
+# ballot/ballot_item_list_cache.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Every voter whose ballot was copied from the same map point (polling location) gets the same ballot_item_list from
+# voterBallotItemsRetrieve. BallotItemListCache keeps the rendered list in memory, keyed by
+# (google_civic_election_id, polling_location_we_vote_id), so the offices and candidates are only assembled once.
+# Saving or deleting a BallotItem, ContestOffice, CandidateCampaign, CandidateToOfficeLink or ContestMeasure clears
+# the affected entries in this process (see the receivers at the bottom of ballot/models.py). Other processes rely
+# on BALLOT_ITEM_LIST_CACHE_SECONDS.
+
+from collections import OrderedDict
+from config.base import get_environment_variable_default
+import json
+import threading
+import time
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+# 0 turns the cache off
+BALLOT_ITEM_LIST_CACHE_SECONDS = convert_to_int(get_environment_variable_default('BALLOT_ITEM_LIST_CACHE_SECONDS', 300))
+BALLOT_ITEM_LIST_CACHE_MAX_ENTRIES = 5000
+
+
+def extract_we_vote_id_list_from_ballot_item_list(ballot_item_list):
+    """
+    The offices, candidates and measures a rendered ballot depends on
+    """
+    we_vote_id_list = []
+    for one_ballot_item in ballot_item_list:
+        we_vote_id_list.append(one_ballot_item['we_vote_id'])
+        for one_candidate in one_ballot_item.get('candidate_list', []):
+            we_vote_id_list.append(one_candidate['we_vote_id'])
+    return we_vote_id_list
+
+
+def extract_we_vote_id_list_from_ballot_items(ballot_item_list):
+    """
+    The offices and measures on the BallotItem rows a ballot was assembled from. This includes offices that
+    assemble_ballot_item_list_for_api leaves out because they don't have any candidates yet.
+    """
+    we_vote_id_list = []
+    for ballot_item in ballot_item_list:
+        if positive_value_exists(ballot_item.contest_office_we_vote_id):
+            we_vote_id_list.append(ballot_item.contest_office_we_vote_id)
+        if positive_value_exists(ballot_item.contest_measure_we_vote_id):
+            we_vote_id_list.append(ballot_item.contest_measure_we_vote_id)
+    return we_vote_id_list
+
+
+class BallotItemListCache(object):
+    """
+    Entries are stored as serialized json, so each caller gets its own copy of the ballot_item_list to add
+    per-voter data to.
+    """
+
+    def __init__(self, cache_seconds=BALLOT_ITEM_LIST_CACHE_SECONDS, max_entries=BALLOT_ITEM_LIST_CACHE_MAX_ENTRIES):
+        self.cache_seconds = cache_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entry_dict = OrderedDict()
+        self.cache_key_set_by_we_vote_id = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.database_seconds_saved = 0
+
+    @staticmethod
+    def generate_cache_key(google_civic_election_id, polling_location_we_vote_id):
+        return convert_to_int(google_civic_election_id), polling_location_we_vote_id
+
+    def _remove_entry(self, cache_key):
+        entry = self.entry_dict.pop(cache_key, None)
+        if entry is None:
+            return
+        for we_vote_id in entry['we_vote_id_list']:
+            cache_key_set = self.cache_key_set_by_we_vote_id.get(we_vote_id)
+            if cache_key_set is not None:
+                cache_key_set.discard(cache_key)
+                if not cache_key_set:
+                    del self.cache_key_set_by_we_vote_id[we_vote_id]
+
+    def retrieve(self, google_civic_election_id, polling_location_we_vote_id):
+        """
+        :return: a copy of the cached ballot_item_list, or None
+        """
+        if self.cache_seconds <= 0 or not positive_value_exists(polling_location_we_vote_id):
+            return None
+        cache_key = self.generate_cache_key(google_civic_election_id, polling_location_we_vote_id)
+        with self.lock:
+            entry = self.entry_dict.get(cache_key)
+            if entry is not None and time.time() - entry['time_cached'] >= self.cache_seconds:
+                self._remove_entry(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entry_dict.move_to_end(cache_key)
+            self.hits += 1
+            self.database_seconds_saved += entry['seconds_to_assemble']
+            ballot_item_list_json = entry['ballot_item_list_json']
+        return json.loads(ballot_item_list_json)
+
+    def store(self, google_civic_election_id, polling_location_we_vote_id, ballot_item_list,
+              source_we_vote_id_list, seconds_to_assemble=0):
+        """
+        :param ballot_item_list: the rendered ballot_item_list
+        :param source_we_vote_id_list: the office and measure we_vote_ids of the BallotItem rows the ballot was
+         assembled from, so linking a candidate to an office that isn't rendered yet still clears this entry
+        :param seconds_to_assemble:
+        """
+        if self.cache_seconds <= 0 or not positive_value_exists(polling_location_we_vote_id):
+            return
+        cache_key = self.generate_cache_key(google_civic_election_id, polling_location_we_vote_id)
+        entry = {
+            'ballot_item_list_json':    json.dumps(ballot_item_list),
+            'seconds_to_assemble':      seconds_to_assemble,
+            'time_cached':              time.time(),
+            'we_vote_id_list':          set(source_we_vote_id_list) |
+                                        set(extract_we_vote_id_list_from_ballot_item_list(ballot_item_list)),
+        }
+        with self.lock:
+            self._remove_entry(cache_key)
+            while len(self.entry_dict) >= self.max_entries:
+                self._remove_entry(next(iter(self.entry_dict)))
+            self.entry_dict[cache_key] = entry
+            for we_vote_id in entry['we_vote_id_list']:
+                self.cache_key_set_by_we_vote_id.setdefault(we_vote_id, set()).add(cache_key)
+
+    def invalidate(self, google_civic_election_id=0, polling_location_we_vote_id='', we_vote_id=''):
+        """
+        Forget one map point's ballot, every ballot in an election, or every ballot that includes one office,
+        candidate or measure
+        """
+        google_civic_election_id = convert_to_int(google_civic_election_id)
+        with self.lock:
+            if positive_value_exists(we_vote_id):
+                cache_key_list = list(self.cache_key_set_by_we_vote_id.get(we_vote_id, []))
+            elif positive_value_exists(polling_location_we_vote_id):
+                cache_key_list = [(google_civic_election_id, polling_location_we_vote_id)]
+            elif positive_value_exists(google_civic_election_id):
+                cache_key_list = [cache_key for cache_key in self.entry_dict.keys()
+                                  if cache_key[0] == google_civic_election_id]
+            else:
+                cache_key_list = list(self.entry_dict.keys())
+            for cache_key in cache_key_list:
+                if cache_key in self.entry_dict:
+                    self._remove_entry(cache_key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entry_dict = OrderedDict()
+            self.cache_key_set_by_we_vote_id = {}
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.database_seconds_saved = 0
+
+    def statistics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'cache_seconds':            self.cache_seconds,
+                'entries_cached':           len(self.entry_dict),
+                'hits':                     self.hits,
+                'misses':                   self.misses,
+                'hit_rate':                 self.hits / lookups if lookups else 0,
+                'invalidations':            self.invalidations,
+                'database_seconds_saved':   self.database_seconds_saved,
+            }
+
+
+# One per process
+ballot_item_list_cache = BallotItemListCache()
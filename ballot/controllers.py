@@ -2,27 +2,36 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .models import BallotItemListManager, BallotItemManager, BallotReturnedListManager, BallotReturnedManager, \
-    CANDIDATE, find_best_previously_stored_ballot_returned, OFFICE, MEASURE, \
+from .ballot_item_list_cache import ballot_item_list_cache, extract_we_vote_id_list_from_ballot_items
+from .models import BallotItem, BallotItemListManager, BallotItemManager, BallotReturned, \
+    BallotReturnedManager, CANDIDATE, find_best_previously_stored_ballot_returned, OFFICE, MEASURE, \
     VoterBallotSaved, VoterBallotSavedManager
 from candidate.models import CandidateCampaignListManager
 from config.base import get_environment_variable
 from datetime import datetime, timedelta
 import datetime as the_other_datetime
+from django.db.models import Q
+from django.db.models.functions import Upper
 from election.controllers import retrieve_upcoming_election_id_list
 from election.models import ElectionManager
 from exception.models import handle_exception
+from geoip.models import GeocodeCacheManager
 from import_export_google_civic.controllers import \
     refresh_voter_ballot_items_from_google_civic_from_voter_ballot_saved, \
     voter_ballot_items_retrieve_from_google_civic_for_api
-from measure.models import ContestMeasureListManager, ContestMeasureManager
-from office.models import ContestOfficeManager, ContestOfficeListManager
+from measure.models import ContestMeasure, ContestMeasureListManager, ContestMeasureManager
+from office.models import ContestOffice, ContestOfficeListManager
 from polling_location.models import PollingLocationManager
 import pytz
+import time
 from voter.models import BALLOT_ADDRESS, VoterAddress, VoterAddressManager, VoterDeviceLinkManager, VoterManager
 import wevote_functions.admin
-from wevote_functions.functions import convert_to_int, extract_state_code_from_address_string, positive_value_exists, \
-    process_request_from_master, strip_html_tags
+from wevote_functions.functions import convert_to_int, extract_state_code_from_address_string, IN_LIST_CHUNK_SIZE, \
+    positive_value_exists, process_request_from_master, strip_html_tags
+from wevote_functions.bulk_upsert import BulkUpsert, fetch_id_by_we_vote_id
+from wevote_functions.duplicate_index import DuplicateIndex, generate_lookup_chunk_list, generate_upper_value_list, \
+    normalize_for_iexact
+from wevote_functions.sync_stream import import_from_master_server_in_chunks
 from geopy.geocoders import get_geocoder_for_service
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -35,9 +44,10 @@ BALLOT_ITEMS_SYNC_URL = get_environment_variable("BALLOT_ITEMS_SYNC_URL")  # bal
 BALLOT_RETURNED_SYNC_URL = get_environment_variable("BALLOT_RETURNED_SYNC_URL")  # ballotReturnedSyncOut
 
 
-def ballot_items_import_from_master_server(request, google_civic_election_id, state_code):
+def ballot_items_import_from_master_server(request, google_civic_election_id, state_code, full_sync=False):
     """
-    Get the json data, and either create new entries or update existing
+    Get the json data, and either create new entries or update existing. Only ballot items that changed since our
+    last sync of this election and state are requested, unless full_sync is True.
     :return:
     """
     # Request json file from We Vote servers
@@ -65,31 +75,14 @@ def ballot_items_import_from_master_server(request, google_civic_election_id, st
         }
         return import_results
 
-    import_results, structured_json = \
-        process_request_from_master(request, "Loading Ballot Items from We Vote Master servers",
-                                    BALLOT_ITEMS_SYNC_URL, params)
-
+    import_results = import_from_master_server_in_chunks(
+        'ballot_items', BALLOT_ITEMS_SYNC_URL, params,
+        import_function=ballot_items_import_from_structured_json,
+        filter_function=filter_ballot_items_structured_json_for_local_duplicates,
+        full_sync=full_sync)
     if not import_results['success']:
-        return import_results
-
-    try:
-        if 'success' in structured_json:  # On error, you get: {'success': False, 'status': 'BALLOT_ITEM_LIST_MISSING'}
-            import_results = {
-                'success': False,
-                'status': structured_json['status'] + ": Did you set the correct state for syncing this election?",
-            }
-        else:
-            results = filter_ballot_items_structured_json_for_local_duplicates(structured_json)
-            filtered_structured_json = results['structured_json']
-            duplicates_removed = results['duplicates_removed']
-
-            import_results = ballot_items_import_from_structured_json(filtered_structured_json)
-            import_results['duplicates_removed'] = duplicates_removed
-    except Exception as e:
-        import_results = {
-            'success': False,
-            'status': "FAILED_TO_GET_JSON_FROM_MASTER_SERVER",
-        }
+        # On error, the master server returns: {'success': False, 'status': 'BALLOT_ITEM_LIST_MISSING'}
+        import_results['status'] += ": Did you set the correct state for syncing this election?"
 
     return import_results
 
@@ -130,17 +123,52 @@ def ballot_returned_import_from_master_server(request, google_civic_election_id,
     return import_results
 
 
+def generate_ballot_item_duplicate_index(structured_json):
+    """
+    Count the local ballot items that retrieve_possible_duplicate_ballot_items could find for any of these
+    ballot items, by election, polling location and ballot_item_display_name, with the state_code as the value
+    :param structured_json:
+    :return: DuplicateIndex
+    """
+    duplicate_index = DuplicateIndex()
+    # BallotItem.google_civic_election_id is a CharField, so Django compares it as a string
+    google_civic_election_id_list = list({str(one_ballot_item.get('google_civic_election_id'))
+                                          for one_ballot_item in structured_json
+                                          if positive_value_exists(one_ballot_item.get('google_civic_election_id'))})
+    ballot_item_display_name_list = generate_upper_value_list(
+        one_ballot_item.get('ballot_item_display_name') for one_ballot_item in structured_json)
+    polling_location_we_vote_id_list = generate_upper_value_list(
+        one_ballot_item.get('polling_location_we_vote_id') for one_ballot_item in structured_json)
+    if not google_civic_election_id_list or not ballot_item_display_name_list:
+        return duplicate_index
+
+    ballot_item_queryset = BallotItem.objects.filter(google_civic_election_id__in=google_civic_election_id_list) \
+        .annotate(polling_location_we_vote_id_upper=Upper('polling_location_we_vote_id'),
+                  ballot_item_display_name_upper=Upper('ballot_item_display_name')) \
+        .filter(ballot_item_display_name_upper__in=ballot_item_display_name_list)
+    for polling_location_we_vote_id_chunk in generate_lookup_chunk_list(polling_location_we_vote_id_list):
+        query = ballot_item_queryset.filter(polling_location_we_vote_id_upper__in=polling_location_we_vote_id_chunk)
+        for row in query.values('google_civic_election_id', 'polling_location_we_vote_id_upper',
+                                'ballot_item_display_name_upper', 'state_code'):
+            duplicate_index.add(
+                (row['google_civic_election_id'], row['polling_location_we_vote_id_upper'],
+                 row['ballot_item_display_name_upper']),
+                normalize_for_iexact(row['state_code']))
+    return duplicate_index
+
+
 def filter_ballot_items_structured_json_for_local_duplicates(structured_json):
     """
     With this function, we remove ballot_items that seem to be duplicates, but have different we_vote_id's.
     We do not check to see if we have a matching office or measure in the database this routine --
-    that is done elsewhere.
+    that is done elsewhere. We find the same duplicates retrieve_possible_duplicate_ballot_items would, with a few
+    queries for the whole list.
     :param structured_json:
     :return:
     """
     duplicates_removed = 0
     filtered_structured_json = []
-    ballot_item_list_manager = BallotItemListManager()
+    duplicate_index = generate_ballot_item_duplicate_index(structured_json)
     for one_ballot_item in structured_json:
         ballot_item_display_name = one_ballot_item['ballot_item_display_name'] \
             if 'ballot_item_display_name' in one_ballot_item else ''
@@ -150,32 +178,28 @@ def filter_ballot_items_structured_json_for_local_duplicates(structured_json):
             if 'state_code' in one_ballot_item else ''
         polling_location_we_vote_id = one_ballot_item['polling_location_we_vote_id'] \
             if 'polling_location_we_vote_id' in one_ballot_item else ''
-        contest_office_we_vote_id = None
-        contest_measure_we_vote_id = None
         # Check to see if there is an entry that matches in all critical ways, minus the
         # contest_office_we_vote_id or contest_measure_we_vote_id. That is, an entry for a
         # google_civic_election_id + polling_location_we_vote_id that has the same ballot_item_display_name,
         # but different contest_office_we_vote_id or contest_measure_we_vote_id
-        # contest_office_we_vote_id = one_ballot_item['contest_office_we_vote_id'] \
-        #     if 'contest_office_we_vote_id' in one_ballot_item else ''
-        # contest_measure_we_vote_id = one_ballot_item['contest_measure_we_vote_id'] \
-        #     if 'contest_measure_we_vote_id' in one_ballot_item else ''
-        voter_id = 0
-        results = ballot_item_list_manager.retrieve_possible_duplicate_ballot_items(
-            ballot_item_display_name, google_civic_election_id,
-            polling_location_we_vote_id, voter_id,
-            contest_office_we_vote_id, contest_measure_we_vote_id, state_code)
+        if not positive_value_exists(google_civic_election_id) \
+                or not positive_value_exists(polling_location_we_vote_id) \
+                or not positive_value_exists(ballot_item_display_name):
+            duplicate_found = False
+        else:
+            key = (str(google_civic_election_id), normalize_for_iexact(polling_location_we_vote_id),
+                   normalize_for_iexact(ballot_item_display_name))
+            if positive_value_exists(state_code):
+                duplicate_found = duplicate_index.value_exists(key, normalize_for_iexact(state_code))
+            else:
+                duplicate_found = duplicate_index.key_exists(key)
 
-        if results['ballot_item_list_found']:
+        if duplicate_found:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
             filtered_structured_json.append(one_ballot_item)
 
-        count = duplicates_removed + len(filtered_structured_json)
-        if not count % 10000:
-            print("... ballot items checked for duplicates: " + str(count) + " of " + str(len(structured_json)))
-
     ballot_items_results = {
         'success':              True,
         'status':               "FILTER_BALLOT_ITEMS_FOR_DUPLICATES_PROCESS_COMPLETE",
@@ -185,17 +209,68 @@ def filter_ballot_items_structured_json_for_local_duplicates(structured_json):
     return ballot_items_results
 
 
+def generate_ballot_returned_duplicate_index(structured_json):
+    """
+    Count the local ballot_returned entries that retrieve_possible_duplicate_ballot_returned could find for any of
+    these entries, by election, normalized_line1 and normalized_zip, with the polling_location_we_vote_id as the value
+    :param structured_json:
+    :return: DuplicateIndex
+    """
+    duplicate_index = DuplicateIndex()
+    google_civic_election_id_set = set()
+    normalized_zip_set = set()
+    for one_ballot_returned in structured_json:
+        google_civic_election_id = convert_ballot_returned_election_id(
+            one_ballot_returned.get('google_civic_election_id', ''))
+        if google_civic_election_id is not None:
+            google_civic_election_id_set.add(google_civic_election_id)
+            normalized_zip_set.add(normalize_for_iexact(one_ballot_returned.get('normalized_zip', '')))
+    if not google_civic_election_id_set:
+        return duplicate_index
+
+    ballot_returned_queryset = BallotReturned.objects.filter(
+        google_civic_election_id__in=list(google_civic_election_id_set)) \
+        .annotate(normalized_zip_upper=Upper('normalized_zip'))
+    zip_filter_list = [Q(normalized_zip_upper__in=normalized_zip_chunk) for normalized_zip_chunk in
+                       generate_lookup_chunk_list(normalized_zip for normalized_zip in normalized_zip_set
+                                                  if normalized_zip is not None)]
+    if None in normalized_zip_set:
+        zip_filter_list.append(Q(normalized_zip__isnull=True))
+    for zip_filter in zip_filter_list:
+        for row in ballot_returned_queryset.filter(zip_filter).values(
+                'google_civic_election_id', 'normalized_line1', 'normalized_zip', 'polling_location_we_vote_id'):
+            duplicate_index.add(
+                (row['google_civic_election_id'], normalize_for_iexact(row['normalized_line1']),
+                 normalize_for_iexact(row['normalized_zip'])),
+                normalize_for_iexact(row['polling_location_we_vote_id']))
+    return duplicate_index
+
+
+def convert_ballot_returned_election_id(google_civic_election_id):
+    """
+    BallotReturned.google_civic_election_id is an integer field, and retrieve_possible_duplicate_ballot_returned
+    doesn't find anything for an election id Django can't convert to an integer
+    :return: integer, or None
+    """
+    try:
+        return int(google_civic_election_id)
+    except (TypeError, ValueError):
+        return None
+
+
 def filter_ballot_returned_structured_json_for_local_duplicates(structured_json):
     """
     With this function, we remove ballot_returned entries that seem to be duplicates,
     but have different polling_location_we_vote_id's.
     We do not check to see if we have a local entry for polling_location_we_vote_id -- that is done elsewhere.
+    We find the same duplicates retrieve_possible_duplicate_ballot_returned would, with a few queries for the whole
+    list.
     :param structured_json:
     :return:
     """
     duplicates_removed = 0
     filtered_structured_json = []
-    ballot_returned_list_manager = BallotReturnedListManager()
+    duplicate_index = generate_ballot_returned_duplicate_index(structured_json)
     for one_ballot_returned in structured_json:
         polling_location_we_vote_id = one_ballot_returned['polling_location_we_vote_id'] \
             if 'polling_location_we_vote_id' in one_ballot_returned else ''
@@ -205,22 +280,21 @@ def filter_ballot_returned_structured_json_for_local_duplicates(structured_json)
         normalized_zip = one_ballot_returned['normalized_zip'] if 'normalized_zip' in one_ballot_returned else ''
 
         # Check to see if there is an entry that matches in all critical ways, minus the polling_location_we_vote_id
-        results = ballot_returned_list_manager.retrieve_possible_duplicate_ballot_returned(
-            google_civic_election_id, normalized_line1, normalized_zip, polling_location_we_vote_id)
+        google_civic_election_id = convert_ballot_returned_election_id(google_civic_election_id)
+        if google_civic_election_id is None or \
+                (not positive_value_exists(normalized_line1) and not positive_value_exists(normalized_zip)):
+            duplicate_found = False
+        else:
+            duplicate_found = duplicate_index.key_exists_for_other_value(
+                (google_civic_election_id, normalize_for_iexact(normalized_line1),
+                 normalize_for_iexact(normalized_zip)),
+                normalize_for_iexact(polling_location_we_vote_id))
 
-        if results['ballot_returned_list_found']:
+        if duplicate_found:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
             filtered_structured_json.append(one_ballot_returned)
-        processed = duplicates_removed + len(filtered_structured_json)
-        if processed % 5000 == 0:
-            print("... pre-processed " + str(processed) + " ballot returned imports")
-
-        processed = duplicates_removed + len(filtered_structured_json)
-        if not processed % 10000:
-            print("... ballots returned, checked for duplicates: " + str(processed) + " of " +
-                  str(len(structured_json)))
 
     ballot_returned_results = {
         'success':              True,
@@ -231,87 +305,117 @@ def filter_ballot_returned_structured_json_for_local_duplicates(structured_json)
     return ballot_returned_results
 
 
+# The ballot item fields we write when we import from the Master server
+BALLOT_ITEM_IMPORT_FIELD_LIST = (
+    'ballot_item_display_name', 'contest_measure_id', 'contest_measure_we_vote_id', 'contest_office_id',
+    'contest_office_we_vote_id', 'google_ballot_placement', 'local_ballot_order', 'measure_subtitle', 'measure_text',
+    'measure_url', 'no_vote_description', 'state_code', 'yes_vote_description',
+)
+
+
 def ballot_items_import_from_structured_json(structured_json):
     """
-    This pathway in requires a we_vote_id, and is not used when we import from Google Civic
+    This pathway in requires a we_vote_id, and is not used when we import from Google Civic. The offices, measures and
+    existing ballot items we need are looked up for the whole list at once, and the ballot items are written with
+    bulk_create and bulk_update.
     :param structured_json:
     :return:
     """
-    ballot_item_manager = BallotItemManager()
-    ballot_items_saved = 0
-    ballot_items_updated = 0
     ballot_items_not_processed = 0
+    ballot_item_list = []
     for one_ballot_item in structured_json:
-        polling_location_we_vote_id = one_ballot_item['polling_location_we_vote_id'] \
-            if 'polling_location_we_vote_id' in one_ballot_item else ''
-        google_civic_election_id = \
-            one_ballot_item['google_civic_election_id'] if 'google_civic_election_id' in one_ballot_item else ''
-        state_code = one_ballot_item['state_code'] if 'state_code' in one_ballot_item else ''
-        contest_office_we_vote_id = one_ballot_item['contest_office_we_vote_id'] \
-            if 'contest_office_we_vote_id' in one_ballot_item else ''
-        contest_measure_we_vote_id = one_ballot_item['contest_measure_we_vote_id'] \
-            if 'contest_measure_we_vote_id' in one_ballot_item else ''
-
+        polling_location_we_vote_id = one_ballot_item.get('polling_location_we_vote_id', '')
+        google_civic_election_id = one_ballot_item.get('google_civic_election_id', '')
+        contest_office_we_vote_id = one_ballot_item.get('contest_office_we_vote_id', '')
+        contest_measure_we_vote_id = one_ballot_item.get('contest_measure_we_vote_id', '')
         if positive_value_exists(polling_location_we_vote_id) and positive_value_exists(google_civic_election_id) \
                 and (positive_value_exists(contest_office_we_vote_id) or
                      positive_value_exists(contest_measure_we_vote_id)):
-            # We check to make sure we have a local copy of this polling_location, contest_office or contest_measure
-            #  in ballot_item_manager.update_or_create_ballot_item_for_polling_location
-            proceed_to_update_or_create = True
-        else:
-            proceed_to_update_or_create = False
-
-        defaults = {}
-        if proceed_to_update_or_create:
-            ballot_item_display_name = one_ballot_item['ballot_item_display_name'] \
-                if 'ballot_item_display_name' in one_ballot_item else ''
-            measure_subtitle = one_ballot_item['measure_subtitle'] if 'measure_subtitle' in one_ballot_item else ''
-            measure_text = one_ballot_item['measure_text'] if 'measure_text' in one_ballot_item else ''
-            google_ballot_placement = one_ballot_item['google_ballot_placement'] \
-                if 'google_ballot_placement' in one_ballot_item else 0
-            local_ballot_order = one_ballot_item['local_ballot_order'] \
-                if 'local_ballot_order' in one_ballot_item else ''
-
-            defaults['measure_url'] = one_ballot_item['measure_url'] if 'measure_url' in one_ballot_item else ''
-            defaults['yes_vote_description'] = one_ballot_item['yes_vote_description'] \
-                if 'yes_vote_description' in one_ballot_item else ''
-            defaults['no_vote_description'] = one_ballot_item['no_vote_description'] \
-                if 'no_vote_description' in one_ballot_item else ''
-
-            contest_office_id = 0
-            contest_measure_id = 0
-
-            results = ballot_item_manager.update_or_create_ballot_item_for_polling_location(
-                polling_location_we_vote_id, google_civic_election_id, google_ballot_placement,
-                ballot_item_display_name, measure_subtitle, measure_text, local_ballot_order,
-                contest_office_id, contest_office_we_vote_id,
-                contest_measure_id, contest_measure_we_vote_id, state_code, defaults)
-
+            ballot_item_list.append(one_ballot_item)
         else:
             ballot_items_not_processed += 1
-            results = {
-                'success': False,
-                'status': 'Required value missing, cannot update or create'
-            }
 
-        if results['success']:
-            if results['new_ballot_item_created']:
-                ballot_items_saved += 1
-            else:
-                ballot_items_updated += 1
-        else:
+    # Look up everything we need to know locally with a few queries for the whole list
+    contest_office_id_by_we_vote_id = fetch_id_by_we_vote_id(
+        ContestOffice, [one_ballot_item.get('contest_office_we_vote_id') for one_ballot_item in ballot_item_list])
+    contest_measure_id_by_we_vote_id = fetch_id_by_we_vote_id(
+        ContestMeasure, [one_ballot_item.get('contest_measure_we_vote_id') for one_ballot_item in ballot_item_list])
+    google_civic_election_id_list = list({convert_to_int(one_ballot_item['google_civic_election_id'])
+                                          for one_ballot_item in ballot_item_list})
+    polling_location_we_vote_id_list = list({polling_location_we_vote_id
+                                             for one_ballot_item in ballot_item_list
+                                             for polling_location_we_vote_id in
+                                             (one_ballot_item['polling_location_we_vote_id'],
+                                              one_ballot_item['polling_location_we_vote_id'].lower())})
+    # A ballot item is identified by its election, polling location, office and measure
+    ballot_item_id_by_key = {}
+    for start in range(0, len(polling_location_we_vote_id_list), IN_LIST_CHUNK_SIZE):
+        ballot_item_query = BallotItem.objects.filter(
+            google_civic_election_id__in=google_civic_election_id_list,
+            polling_location_we_vote_id__in=polling_location_we_vote_id_list[
+                start:start + IN_LIST_CHUNK_SIZE])
+        for existing_ballot_item in ballot_item_query.order_by('id').values(
+                'id', 'google_civic_election_id', 'polling_location_we_vote_id', 'contest_office_id',
+                'contest_measure_id'):
+            key = (convert_to_int(existing_ballot_item['google_civic_election_id']),
+                   existing_ballot_item['polling_location_we_vote_id'].lower(),
+                   existing_ballot_item['contest_office_id'] or 0,
+                   existing_ballot_item['contest_measure_id'] or 0)
+            if key not in ballot_item_id_by_key:
+                ballot_item_id_by_key[key] = existing_ballot_item['id']
+
+    bulk_upsert = BulkUpsert(BallotItem, BALLOT_ITEM_IMPORT_FIELD_LIST)
+    changed_ballot_set = set()
+    for one_ballot_item in ballot_item_list:
+        google_civic_election_id = convert_to_int(one_ballot_item['google_civic_election_id'])
+        polling_location_we_vote_id = one_ballot_item['polling_location_we_vote_id']
+        contest_office_we_vote_id = one_ballot_item.get('contest_office_we_vote_id') or ''
+        contest_measure_we_vote_id = one_ballot_item.get('contest_measure_we_vote_id') or ''
+        contest_office_id = contest_office_id_by_we_vote_id.get(contest_office_we_vote_id.lower(), 0) \
+            if positive_value_exists(contest_office_we_vote_id) else 0
+        contest_measure_id = contest_measure_id_by_we_vote_id.get(contest_measure_we_vote_id.lower(), 0) \
+            if positive_value_exists(contest_measure_we_vote_id) else 0
+        # We require both contest_office_id and contest_office_we_vote_id
+        #  OR both contest_measure_id and contest_measure_we_vote_id
+        if not positive_value_exists(contest_office_id) and not positive_value_exists(contest_measure_id):
             ballot_items_not_processed += 1
-
-        count = ballot_items_saved + ballot_items_updated
-        if not count % 10000:
-            print("... processed for update/create: " + str(count) + " of " + str(len(structured_json)))
+            continue
+
+        ballot_item_on_stage = BallotItem(
+            google_civic_election_id=google_civic_election_id,
+            polling_location_we_vote_id=polling_location_we_vote_id,
+            contest_office_id=contest_office_id,
+            contest_office_we_vote_id=contest_office_we_vote_id,
+            contest_measure_id=contest_measure_id,
+            contest_measure_we_vote_id=contest_measure_we_vote_id,
+            google_ballot_placement=one_ballot_item.get('google_ballot_placement', 0),
+            local_ballot_order=one_ballot_item.get('local_ballot_order'),
+            ballot_item_display_name=one_ballot_item.get('ballot_item_display_name', ''),
+            measure_subtitle=one_ballot_item.get('measure_subtitle', ''),
+            measure_text=one_ballot_item.get('measure_text', ''),
+            measure_url=one_ballot_item.get('measure_url', ''),
+            no_vote_description=one_ballot_item.get('no_vote_description', ''),
+            state_code=one_ballot_item.get('state_code', ''),
+            yes_vote_description=one_ballot_item.get('yes_vote_description', ''),
+        )
+        key = (google_civic_election_id, polling_location_we_vote_id.lower(), contest_office_id, contest_measure_id)
+        bulk_upsert.add(key, ballot_item_on_stage, existing_id=ballot_item_id_by_key.get(key, 0))
+        changed_ballot_set.add((google_civic_election_id, polling_location_we_vote_id))
+
+    write_results = bulk_upsert.write()
+
+    # bulk_create and bulk_update don't send post_save, so clear the cached ballots ourselves
+    for google_civic_election_id, polling_location_we_vote_id in changed_ballot_set:
+        ballot_item_list_cache.invalidate(
+            google_civic_election_id=google_civic_election_id,
+            polling_location_we_vote_id=polling_location_we_vote_id)
 
     ballot_items_results = {
         'success': True,
         'status': "BALLOT_ITEMS_IMPORT_PROCESS_COMPLETE",
-        'saved': ballot_items_saved,
-        'updated': ballot_items_updated,
-        'not_processed': ballot_items_not_processed,
+        'saved': write_results['saved'],
+        'updated': write_results['updated'],
+        'not_processed': ballot_items_not_processed + write_results['not_processed'],
     }
     return ballot_items_results
 
@@ -418,7 +522,9 @@ def heal_geo_coordinates(text_for_map_search):
     latitude = None
     try:
         google_client = get_geocoder_for_service('google')(GOOGLE_MAPS_API_KEY)
-        location = google_client.geocode(text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
+        geocode_cache_manager = GeocodeCacheManager()
+        location = geocode_cache_manager.geocode(
+            google_client, text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
         if location is None:
             status = 'Could not find location matching "{}" '.format(text_for_map_search)
             logger.debug(status)
@@ -2352,6 +2458,153 @@ def ballot_items_search_retrieve_for_api(search_string):  # ballotItemsSearchRet
     return results
 
 
+def assemble_ballot_item_list_for_api(ballot_item_list, google_civic_election_id):
+    """
+    Turn BallotItem entries into the ballot_item_list returned by voterBallotItemsRetrieve. The offices, the
+    CandidateToOfficeLink entries and the candidates for the whole ballot are retrieved in three readonly queries,
+    no matter how many offices are on the ballot.
+    :param ballot_item_list:
+    :param google_civic_election_id:
+    :return: ballot_item_list ordered by local_ballot_order
+    """
+    status = ""
+    ballot_items_to_display = []
+
+    office_we_vote_id_list = []
+    for ballot_item in ballot_item_list:
+        if positive_value_exists(ballot_item.contest_office_we_vote_id):
+            office_we_vote_id_list.append(ballot_item.contest_office_we_vote_id)
+
+    contest_office_by_we_vote_id = {}
+    candidate_list_by_office_we_vote_id = {}
+    if len(office_we_vote_id_list):
+        office_results = ContestOfficeListManager().retrieve_offices(
+            retrieve_from_this_office_we_vote_id_list=office_we_vote_id_list,
+            return_list_of_objects=True,
+            read_only=True)
+        if not office_results['success']:
+            status += office_results['status']
+        for contest_office in office_results['office_list_objects']:
+            contest_office_by_we_vote_id[contest_office.we_vote_id] = contest_office
+
+        candidate_results = CandidateCampaignListManager().retrieve_all_candidates_for_office_list(
+            office_we_vote_id_list=office_we_vote_id_list, read_only=True)
+        if not candidate_results['success']:
+            status += candidate_results['status']
+        candidate_list_by_office_we_vote_id = candidate_results['candidate_list_by_office_we_vote_id']
+
+    for ballot_item in ballot_item_list:
+        if ballot_item.contest_office_we_vote_id:
+            office_name = ""
+            kind_of_ballot_item = OFFICE
+            office_id = ballot_item.contest_office_id
+            office_we_vote_id = ballot_item.contest_office_we_vote_id
+            race_office_level = ""
+            if office_we_vote_id in contest_office_by_we_vote_id:
+                contest_office = contest_office_by_we_vote_id[office_we_vote_id]
+                office_id = contest_office.id
+                office_name = contest_office.office_name
+                race_office_level = contest_office.ballotpedia_race_office_level
+
+            candidates_to_display = []
+            for candidate_campaign in candidate_list_by_office_we_vote_id.get(office_we_vote_id, []):
+                withdrawal_date = ''
+                if isinstance(candidate_campaign.withdrawal_date, the_other_datetime.date):
+                    withdrawal_date = candidate_campaign.withdrawal_date.strftime("%Y-%m-%d")
+
+                # This should match values returned in candidates_retrieve_for_api (candidatesRetrieve)
+                one_candidate = {
+                    'id':                           candidate_campaign.id,
+                    'we_vote_id':                   candidate_campaign.we_vote_id,
+                    'ballot_item_display_name':     candidate_campaign.display_candidate_name(),
+                    'ballotpedia_candidate_id':     candidate_campaign.ballotpedia_candidate_id,
+                    'ballotpedia_candidate_summary': candidate_campaign.ballotpedia_candidate_summary,
+                    'ballotpedia_candidate_url':    candidate_campaign.ballotpedia_candidate_url,
+                    'ballotpedia_person_id':        candidate_campaign.ballotpedia_person_id,
+                    'candidate_email':              candidate_campaign.candidate_email,
+                    'candidate_phone':              candidate_campaign.candidate_phone,
+                    'candidate_photo_url_large':
+                        candidate_campaign.we_vote_hosted_profile_image_url_large
+                        if positive_value_exists(candidate_campaign.we_vote_hosted_profile_image_url_large)
+                        else candidate_campaign.candidate_photo_url(),
+                    'candidate_photo_url_medium':
+                        candidate_campaign.we_vote_hosted_profile_image_url_medium,
+                    'candidate_photo_url_tiny': candidate_campaign.we_vote_hosted_profile_image_url_tiny,
+                    'candidate_url':                candidate_campaign.candidate_url,
+                    'candidate_contact_form_url':   candidate_campaign.candidate_contact_form_url,
+                    'contest_office_id':            office_id,
+                    'contest_office_name':          office_name,
+                    'contest_office_we_vote_id':    office_we_vote_id,
+                    'facebook_url':                 candidate_campaign.facebook_url,
+                    'google_civic_election_id':     google_civic_election_id,
+                    'kind_of_ballot_item':          CANDIDATE,
+                    'maplight_id':                  candidate_campaign.maplight_id,
+                    'ocd_division_id':              candidate_campaign.ocd_division_id,
+                    'order_on_ballot':              candidate_campaign.order_on_ballot,
+                    'party':                        candidate_campaign.political_party_display(),
+                    'politician_id':                candidate_campaign.politician_id,
+                    'politician_we_vote_id':        candidate_campaign.politician_we_vote_id,
+                    'state_code':                   candidate_campaign.state_code,
+                    'twitter_url':                  candidate_campaign.twitter_url,
+                    'twitter_handle':               candidate_campaign.fetch_twitter_handle(),
+                    'twitter_description':          candidate_campaign.twitter_description,
+                    'twitter_followers_count':      candidate_campaign.twitter_followers_count,
+                    'youtube_url':                  candidate_campaign.youtube_url,
+                    'withdrawn_from_election':      candidate_campaign.withdrawn_from_election,
+                    'withdrawal_date':              withdrawal_date,
+                }
+                candidates_to_display.append(one_candidate.copy())
+
+            if len(candidates_to_display):
+                one_ballot_item = {
+                    'ballot_item_display_name':     ballot_item.ballot_item_display_name,
+                    'google_civic_election_id':     google_civic_election_id,
+                    'google_ballot_placement':      ballot_item.google_ballot_placement,
+                    'id':                           office_id,
+                    'local_ballot_order':           ballot_item.local_ballot_order,
+                    'kind_of_ballot_item':          kind_of_ballot_item,
+                    'race_office_level':            race_office_level,
+                    'we_vote_id':                   office_we_vote_id,
+                    'candidate_list':               candidates_to_display,
+                }
+                ballot_items_to_display.append(one_ballot_item.copy())
+            else:
+                status += "NO_CANDIDATES_FOR_OFFICE:" + str(office_we_vote_id) + " "
+        elif ballot_item.contest_measure_we_vote_id:
+            kind_of_ballot_item = MEASURE
+            measure_id = ballot_item.contest_measure_id
+            measure_we_vote_id = ballot_item.contest_measure_we_vote_id
+            one_ballot_item = {
+                'ballot_item_display_name':     ballot_item.ballot_item_display_name,
+                'google_civic_election_id':     google_civic_election_id,
+                'google_ballot_placement':      ballot_item.google_ballot_placement,
+                'id':                           measure_id,
+                'kind_of_ballot_item':          kind_of_ballot_item,
+                'local_ballot_order':           ballot_item.local_ballot_order + 100,  # Shift to bottom
+                'measure_subtitle':             ballot_item.measure_subtitle,
+                'measure_text':                 ballot_item.measure_text,
+                'measure_url':                  ballot_item.measure_url,
+                'no_vote_description':          strip_html_tags(ballot_item.no_vote_description),
+                'district_name':                "",  # TODO Add this
+                'election_display_name':        "",  # TODO Add this
+                'regional_display_name':        "",  # TODO Add this
+                'state_display_name':           "",  # TODO Add this
+                'we_vote_id':                   measure_we_vote_id,
+                'yes_vote_description':         strip_html_tags(ballot_item.yes_vote_description),
+            }
+            ballot_items_to_display.append(one_ballot_item.copy())
+
+    from operator import itemgetter
+    ballot_item_list_ordered = sorted(ballot_items_to_display, key=itemgetter('local_ballot_order'), reverse=False)
+
+    results = {
+        'status':           status,
+        'success':          True,
+        'ballot_item_list': ballot_item_list_ordered,
+    }
+    return results
+
+
 def voter_ballot_items_retrieve_for_one_election_for_api(
         voter_device_id, voter_id=0, google_civic_election_id='', ballot_returned_we_vote_id=''):
     """
@@ -2365,8 +2618,6 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
     """
     status = ""
     ballot_item_list_manager = BallotItemListManager()
-    contest_office_manager = ContestOfficeManager()
-    candidate_list_object = CandidateCampaignListManager()
     ballot_returned_manager = BallotReturnedManager()
     polling_location_we_vote_id = ''
 
@@ -2377,8 +2628,22 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
             ballot_returned = ballot_returned_results['ballot_returned']
             polling_location_we_vote_id = ballot_returned.polling_location_we_vote_id
 
+    if positive_value_exists(polling_location_we_vote_id):
+        # Every voter whose ballot came from this map point gets the same ballot_item_list
+        ballot_item_list_ordered = ballot_item_list_cache.retrieve(google_civic_election_id, polling_location_we_vote_id)
+        if ballot_item_list_ordered is not None:
+            status += "BALLOT_ITEM_LIST_FROM_CACHE "
+            results = {
+                'status': status,
+                'success': True,
+                'voter_device_id': voter_device_id,
+                'ballot_item_list': ballot_item_list_ordered,
+                'google_civic_election_id': google_civic_election_id,
+            }
+            return results
+
+    start_time = time.time()
     ballot_item_list = []
-    ballot_items_to_display = []
     results = {}
     try:
         if positive_value_exists(polling_location_we_vote_id):
@@ -2403,123 +2668,14 @@ def voter_ballot_items_retrieve_for_one_election_for_api(
 
     if success:
         status += "BALLOT_ITEM_LIST_FOUND "
-        for ballot_item in ballot_item_list:
-            if ballot_item.contest_office_we_vote_id:
-                office_name = ""
-                kind_of_ballot_item = OFFICE
-                office_id = ballot_item.contest_office_id
-                office_we_vote_id = ballot_item.contest_office_we_vote_id
-                race_office_level = ""
-                if positive_value_exists(office_we_vote_id):
-                    office_results = contest_office_manager.retrieve_contest_office_from_we_vote_id(
-                        office_we_vote_id, read_only=True)
-                    if office_results['contest_office_found']:
-                        contest_office = office_results['contest_office']
-                        office_id = contest_office.id
-                        office_name = contest_office.office_name
-                        race_office_level = contest_office.ballotpedia_race_office_level
-                try:
-                    results = candidate_list_object.retrieve_all_candidates_for_office(
-                        office_we_vote_id=office_we_vote_id, read_only=True)
-
-                    candidates_to_display = []
-                    if results['candidate_list_found']:
-                        candidate_list = results['candidate_list']
-                        for candidate_campaign in candidate_list:
-                            withdrawal_date = ''
-                            if isinstance(candidate_campaign.withdrawal_date, the_other_datetime.date):
-                                withdrawal_date = candidate_campaign.withdrawal_date.strftime("%Y-%m-%d")
-
-                            # This should match values returned in candidates_retrieve_for_api (candidatesRetrieve)
-                            one_candidate = {
-                                'id':                           candidate_campaign.id,
-                                'we_vote_id':                   candidate_campaign.we_vote_id,
-                                'ballot_item_display_name':     candidate_campaign.display_candidate_name(),
-                                'ballotpedia_candidate_id':     candidate_campaign.ballotpedia_candidate_id,
-                                'ballotpedia_candidate_summary': candidate_campaign.ballotpedia_candidate_summary,
-                                'ballotpedia_candidate_url':    candidate_campaign.ballotpedia_candidate_url,
-                                'ballotpedia_person_id':        candidate_campaign.ballotpedia_person_id,
-                                'candidate_email':              candidate_campaign.candidate_email,
-                                'candidate_phone':              candidate_campaign.candidate_phone,
-                                'candidate_photo_url_large':
-                                    candidate_campaign.we_vote_hosted_profile_image_url_large
-                                    if positive_value_exists(candidate_campaign.we_vote_hosted_profile_image_url_large)
-                                    else candidate_campaign.candidate_photo_url(),
-                                'candidate_photo_url_medium':
-                                    candidate_campaign.we_vote_hosted_profile_image_url_medium,
-                                'candidate_photo_url_tiny': candidate_campaign.we_vote_hosted_profile_image_url_tiny,
-                                'candidate_url':                candidate_campaign.candidate_url,
-                                'candidate_contact_form_url':   candidate_campaign.candidate_contact_form_url,
-                                'contest_office_id':            office_id,
-                                'contest_office_name':          office_name,
-                                'contest_office_we_vote_id':    office_we_vote_id,
-                                'facebook_url':                 candidate_campaign.facebook_url,
-                                'google_civic_election_id':     google_civic_election_id,
-                                'kind_of_ballot_item':          CANDIDATE,
-                                'maplight_id':                  candidate_campaign.maplight_id,
-                                'ocd_division_id':              candidate_campaign.ocd_division_id,
-                                'order_on_ballot':              candidate_campaign.order_on_ballot,
-                                'party':                        candidate_campaign.political_party_display(),
-                                'politician_id':                candidate_campaign.politician_id,
-                                'politician_we_vote_id':        candidate_campaign.politician_we_vote_id,
-                                'state_code':                   candidate_campaign.state_code,
-                                'twitter_url':                  candidate_campaign.twitter_url,
-                                'twitter_handle':               candidate_campaign.fetch_twitter_handle(),
-                                'twitter_description':          candidate_campaign.twitter_description,
-                                'twitter_followers_count':      candidate_campaign.twitter_followers_count,
-                                'youtube_url':                  candidate_campaign.youtube_url,
-                                'withdrawn_from_election':      candidate_campaign.withdrawn_from_election,
-                                'withdrawal_date':              withdrawal_date,
-                            }
-                            candidates_to_display.append(one_candidate.copy())
-                except Exception as e:
-                    status = 'FAILED retrieve_all_candidates_for_office. ' + str(e) + " "
-                    candidates_to_display = []
-                    if hasattr(results, 'status'):
-                        status += results['status'] + " "
-
-                if len(candidates_to_display):
-                    one_ballot_item = {
-                        'ballot_item_display_name':     ballot_item.ballot_item_display_name,
-                        'google_civic_election_id':     google_civic_election_id,
-                        'google_ballot_placement':      ballot_item.google_ballot_placement,
-                        'id':                           office_id,
-                        'local_ballot_order':           ballot_item.local_ballot_order,
-                        'kind_of_ballot_item':          kind_of_ballot_item,
-                        'race_office_level':            race_office_level,
-                        'we_vote_id':                   office_we_vote_id,
-                        'candidate_list':               candidates_to_display,
-                    }
-                    ballot_items_to_display.append(one_ballot_item.copy())
-                else:
-                    status += "NO_CANDIDATES_FOR_OFFICE:" + str(office_we_vote_id) + " "
-            elif ballot_item.contest_measure_we_vote_id:
-                kind_of_ballot_item = MEASURE
-                measure_id = ballot_item.contest_measure_id
-                measure_we_vote_id = ballot_item.contest_measure_we_vote_id
-                measure_display_name_number = 100
-                one_ballot_item = {
-                    'ballot_item_display_name':     ballot_item.ballot_item_display_name,
-                    'google_civic_election_id':     google_civic_election_id,
-                    'google_ballot_placement':      ballot_item.google_ballot_placement,
-                    'id':                           measure_id,
-                    'kind_of_ballot_item':          kind_of_ballot_item,
-                    'local_ballot_order':           ballot_item.local_ballot_order + 100,  # Shift to bottom
-                    'measure_subtitle':             ballot_item.measure_subtitle,
-                    'measure_text':                 ballot_item.measure_text,
-                    'measure_url':                  ballot_item.measure_url,
-                    'no_vote_description':          strip_html_tags(ballot_item.no_vote_description),
-                    'district_name':                "",  # TODO Add this
-                    'election_display_name':        "",  # TODO Add this
-                    'regional_display_name':        "",  # TODO Add this
-                    'state_display_name':           "",  # TODO Add this
-                    'we_vote_id':                   measure_we_vote_id,
-                    'yes_vote_description':         strip_html_tags(ballot_item.yes_vote_description),
-                }
-                ballot_items_to_display.append(one_ballot_item.copy())
-
-        from operator import itemgetter
-        ballot_item_list_ordered = sorted(ballot_items_to_display, key=itemgetter('local_ballot_order'), reverse=False)
+        assemble_results = assemble_ballot_item_list_for_api(ballot_item_list, google_civic_election_id)
+        status += assemble_results['status']
+        ballot_item_list_ordered = assemble_results['ballot_item_list']
+        if positive_value_exists(polling_location_we_vote_id) and len(ballot_item_list_ordered):
+            ballot_item_list_cache.store(google_civic_election_id, polling_location_we_vote_id,
+                                         ballot_item_list_ordered,
+                                         extract_we_vote_id_list_from_ballot_items(ballot_item_list),
+                                         seconds_to_assemble=time.time() - start_time)
 
         results = {
             'status': status,
@@ -0,0 +1,101 @@
+from ballot.controllers import voter_ballot_items_retrieve_for_one_election_for_api
+from ballot.models import BallotItem, BallotItemListManager
+from candidate.models import CandidateCampaign, CandidateCampaignListManager, CandidateToOfficeLink
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from office.models import ContestOffice, ContestOfficeManager
+import time
+
+BENCHMARK_GOOGLE_CIVIC_ELECTION_ID = 999999
+BENCHMARK_VOTER_ID = 999999999
+
+
+def retrieve_ballot_one_office_at_a_time():
+    # The queries voterBallotItemsRetrieve used to make: three for each office on the ballot
+    contest_office_manager = ContestOfficeManager()
+    candidate_list_manager = CandidateCampaignListManager()
+    results = BallotItemListManager().retrieve_all_ballot_items_for_voter(
+        BENCHMARK_VOTER_ID, BENCHMARK_GOOGLE_CIVIC_ELECTION_ID, read_only=True)
+    for ballot_item in results['ballot_item_list']:
+        contest_office_manager.retrieve_contest_office_from_we_vote_id(
+            ballot_item.contest_office_we_vote_id, read_only=True)
+        candidate_results = candidate_list_manager.retrieve_all_candidates_for_office(
+            office_we_vote_id=ballot_item.contest_office_we_vote_id, read_only=True)
+        list(candidate_results['candidate_list'])
+
+
+def time_retrieve(retrieve_function, repeat_count):
+    context_list = [CaptureQueriesContext(connections[alias]) for alias in ['default', 'readonly']]
+    for context in context_list:
+        context.__enter__()
+    retrieve_function()
+    for context in context_list:
+        context.__exit__(None, None, None)
+    query_count = sum(len(context.captured_queries) for context in context_list)
+
+    start_time = time.time()
+    for _ in range(repeat_count):
+        retrieve_function()
+    milliseconds_per_ballot = (time.time() - start_time) * 1000 / repeat_count if repeat_count else 0
+    return query_count, milliseconds_per_ballot
+
+
+class Command(BaseCommand):
+    help = 'Compares voterBallotItemsRetrieve latency and query count against retrieving each office and its ' \
+           'candidates one at a time, on a synthetic ballot. Everything it creates is deleted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--office_count', type=int, default=40)
+        parser.add_argument('--candidates_per_office', type=int, default=4)
+        parser.add_argument('--repeat_count', type=int, default=50)
+
+    def handle(self, *args, **options):
+        office_we_vote_id_list = []
+        candidate_we_vote_id_list = []
+        for office_number in range(options['office_count']):
+            office_we_vote_id = 'wvbenchoff{office_number}'.format(office_number=office_number)
+            office_we_vote_id_list.append(office_we_vote_id)
+            ContestOffice.objects.create(
+                we_vote_id=office_we_vote_id,
+                office_name='Benchmark Office {office_number}'.format(office_number=office_number),
+                google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID)
+            BallotItem.objects.create(
+                voter_id=BENCHMARK_VOTER_ID,
+                google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID,
+                contest_office_we_vote_id=office_we_vote_id,
+                ballot_item_display_name='Benchmark Office {office_number}'.format(office_number=office_number),
+                local_ballot_order=office_number)
+            for candidate_number in range(options['candidates_per_office']):
+                candidate_we_vote_id = 'wvbenchcand{office_number}x{candidate_number}'.format(
+                    office_number=office_number, candidate_number=candidate_number)
+                candidate_we_vote_id_list.append(candidate_we_vote_id)
+                CandidateCampaign.objects.create(
+                    we_vote_id=candidate_we_vote_id,
+                    candidate_name='Benchmark Candidate {number}'.format(number=len(candidate_we_vote_id_list)),
+                    google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID)
+                CandidateToOfficeLink.objects.create(
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    contest_office_we_vote_id=office_we_vote_id,
+                    google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID)
+
+        try:
+            one_at_a_time_query_count, one_at_a_time_milliseconds = time_retrieve(
+                retrieve_ballot_one_office_at_a_time, options['repeat_count'])
+            batched_query_count, batched_milliseconds = time_retrieve(
+                lambda: voter_ballot_items_retrieve_for_one_election_for_api(
+                    '', voter_id=BENCHMARK_VOTER_ID, google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID),
+                options['repeat_count'])
+        finally:
+            BallotItem.objects.filter(voter_id=BENCHMARK_VOTER_ID,
+                                      google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID).delete()
+            CandidateToOfficeLink.objects.filter(candidate_we_vote_id__in=candidate_we_vote_id_list).delete()
+            CandidateCampaign.objects.filter(we_vote_id__in=candidate_we_vote_id_list).delete()
+            ContestOffice.objects.filter(we_vote_id__in=office_we_vote_id_list).delete()
+
+        self.stdout.write('offices: {office_count}, candidates per office: {candidates_per_office}'.format(
+            **options))
+        self.stdout.write('one office at a time: {query_count} queries, {milliseconds:.1f} ms per ballot'.format(
+            query_count=one_at_a_time_query_count, milliseconds=one_at_a_time_milliseconds))
+        self.stdout.write('batched assembly: {query_count} queries, {milliseconds:.1f} ms per ballot'.format(
+            query_count=batched_query_count, milliseconds=batched_milliseconds))
@@ -0,0 +1,19 @@
+from ballot.map_point_index import benchmark_map_point_index
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compares the map point index used by find_closest_ballot_returned against a full scan, ' \
+           'on a synthetic table of map points'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--map_point_count', type=int, default=200000)
+        parser.add_argument('--lookup_count', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        results = benchmark_map_point_index(
+            map_point_count=options['map_point_count'], lookup_count=options['lookup_count'])
+        self.stdout.write('map points: {map_point_count}, index build: {build_seconds:.2f} seconds'.format(**results))
+        self.stdout.write('index lookups/sec: {index_lookups_per_second:.0f}, '
+                          'full scan lookups/sec: {scan_lookups_per_second:.2f}, '
+                          'mismatches: {mismatch_count}'.format(**results))
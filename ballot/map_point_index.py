@@ -0,0 +1,238 @@
+# ballot/map_point_index.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# In-process spatial index of map points (BallotReturned entries copied from polling locations), so that
+# find_closest_ballot_returned doesn't have to compute and sort the distance to every map point in a state.
+# Points are stored as 3D unit vectors, so the nearest point by straight-line (chord) distance is also the nearest
+# point by great-circle distance, and the search works correctly across the antimeridian and near the poles.
+
+import heapq
+import math
+import random
+import threading
+import time
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+EARTH_RADIUS_IN_MILES = 3958.8
+# How often we check the database to see if the map points for one election & state have changed
+MAP_POINT_INDEX_REVALIDATE_SECONDS = 60
+
+
+def great_circle_distance_in_miles(latitude1, longitude1, latitude2, longitude2):
+    """
+    Haversine formula
+    """
+    latitude1_radians = math.radians(latitude1)
+    latitude2_radians = math.radians(latitude2)
+    latitude_delta = latitude2_radians - latitude1_radians
+    longitude_delta = math.radians(longitude2 - longitude1)
+    a = math.sin(latitude_delta / 2) ** 2 + \
+        math.cos(latitude1_radians) * math.cos(latitude2_radians) * math.sin(longitude_delta / 2) ** 2
+    return 2 * EARTH_RADIUS_IN_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def convert_latitude_longitude_to_unit_vector(latitude, longitude):
+    latitude_radians = math.radians(latitude)
+    longitude_radians = math.radians(longitude)
+    cos_latitude = math.cos(latitude_radians)
+    return (cos_latitude * math.cos(longitude_radians),
+            cos_latitude * math.sin(longitude_radians),
+            math.sin(latitude_radians))
+
+
+class MapPointKDTree(object):
+    """
+    A static 3D k-d tree. Build is O(n log^2 n), nearest neighbor lookups are O(log n) on average.
+    """
+
+    def __init__(self, map_point_list):
+        """
+        :param map_point_list: list of (latitude, longitude, payload) tuples. payload is usually a database id.
+        """
+        self.latitude_list = []
+        self.longitude_list = []
+        self.payload_list = []
+        self.coordinate_list = []
+        for latitude, longitude, payload in map_point_list:
+            if latitude is None or longitude is None:
+                continue
+            self.latitude_list.append(latitude)
+            self.longitude_list.append(longitude)
+            self.payload_list.append(payload)
+            self.coordinate_list.append(convert_latitude_longitude_to_unit_vector(latitude, longitude))
+
+        # Nodes are stored in parallel lists instead of objects to keep the memory footprint small
+        self.node_point_list = []
+        self.node_axis_list = []
+        self.node_left_list = []
+        self.node_right_list = []
+        self.root_node = self._build(list(range(len(self.coordinate_list))), 0)
+
+    def __len__(self):
+        return len(self.payload_list)
+
+    def _build(self, point_index_list, depth):
+        if not point_index_list:
+            return -1
+        axis = depth % 3
+        coordinate_list = self.coordinate_list
+        point_index_list.sort(key=lambda point_index: coordinate_list[point_index][axis])
+        median = len(point_index_list) // 2
+
+        node_id = len(self.node_point_list)
+        self.node_point_list.append(point_index_list[median])
+        self.node_axis_list.append(axis)
+        self.node_left_list.append(-1)
+        self.node_right_list.append(-1)
+        self.node_left_list[node_id] = self._build(point_index_list[:median], depth + 1)
+        self.node_right_list[node_id] = self._build(point_index_list[median + 1:], depth + 1)
+        return node_id
+
+    def _search(self, node_id, target, number_to_find, heap):
+        if node_id < 0:
+            return
+        point_index = self.node_point_list[node_id]
+        point = self.coordinate_list[point_index]
+        chord_squared = (target[0] - point[0]) ** 2 + (target[1] - point[1]) ** 2 + (target[2] - point[2]) ** 2
+        # heap is a max-heap (by negated distance) of the best candidates found so far
+        if len(heap) < number_to_find:
+            heapq.heappush(heap, (-chord_squared, -point_index))
+        elif chord_squared < -heap[0][0]:
+            heapq.heapreplace(heap, (-chord_squared, -point_index))
+
+        axis = self.node_axis_list[node_id]
+        difference = target[axis] - point[axis]
+        if difference < 0:
+            near_node, far_node = self.node_left_list[node_id], self.node_right_list[node_id]
+        else:
+            near_node, far_node = self.node_right_list[node_id], self.node_left_list[node_id]
+        self._search(near_node, target, number_to_find, heap)
+        if len(heap) < number_to_find or difference * difference < -heap[0][0]:
+            self._search(far_node, target, number_to_find, heap)
+
+    def find_nearest(self, latitude, longitude, number_to_find=1):
+        """
+        :return: list of (distance_in_miles, payload) tuples, closest first
+        """
+        if not self.payload_list or number_to_find < 1:
+            return []
+        heap = []
+        target = convert_latitude_longitude_to_unit_vector(latitude, longitude)
+        self._search(self.root_node, target, number_to_find, heap)
+        nearest_list = []
+        for negative_chord_squared, negative_point_index in heap:
+            point_index = -negative_point_index
+            distance_in_miles = great_circle_distance_in_miles(
+                latitude, longitude, self.latitude_list[point_index], self.longitude_list[point_index])
+            nearest_list.append((distance_in_miles, point_index))
+        nearest_list.sort()
+        return [(distance_in_miles, self.payload_list[point_index])
+                for distance_in_miles, point_index in nearest_list]
+
+
+class MapPointIndexCache(object):
+    """
+    Process-wide registry of MapPointKDTree objects, keyed by (google_civic_election_id, state_code).
+    An index is rebuilt when the version returned by fetch_version_function changes (we check at most once every
+    MAP_POINT_INDEX_REVALIDATE_SECONDS), or when it is invalidated because a BallotReturned was saved in this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entry_dict = {}
+        self.index_hits = 0
+        self.index_builds = 0
+        self.index_revalidations = 0
+
+    def retrieve_index(self, index_key, build_function, fetch_version_function):
+        entry = self.entry_dict.get(index_key)
+        now_time = time.time()
+        if entry is not None and now_time - entry['checked_time'] < MAP_POINT_INDEX_REVALIDATE_SECONDS:
+            self.index_hits += 1
+            return entry['index']
+
+        version = fetch_version_function()
+        if entry is not None and entry['version'] == version:
+            self.index_revalidations += 1
+            entry['checked_time'] = now_time
+            return entry['index']
+
+        with self.lock:
+            # Another thread may have rebuilt this index while we waited for the lock
+            entry = self.entry_dict.get(index_key)
+            if entry is not None and entry['version'] == version:
+                return entry['index']
+            map_point_index = MapPointKDTree(build_function())
+            self.entry_dict[index_key] = {
+                'checked_time': time.time(),
+                'index':        map_point_index,
+                'version':      version,
+            }
+            self.index_builds += 1
+        return map_point_index
+
+    def invalidate(self, google_civic_election_id=0):
+        with self.lock:
+            google_civic_election_id = convert_to_int(google_civic_election_id)
+            if positive_value_exists(google_civic_election_id):
+                for index_key in list(self.entry_dict.keys()):
+                    if index_key[0] == google_civic_election_id:
+                        del self.entry_dict[index_key]
+            else:
+                self.entry_dict = {}
+
+    def statistics(self):
+        return {
+            'indexes_cached':       len(self.entry_dict),
+            'map_points_cached':    sum(len(entry['index']) for entry in self.entry_dict.values()),
+            'index_hits':           self.index_hits,
+            'index_builds':         self.index_builds,
+            'index_revalidations':  self.index_revalidations,
+        }
+
+
+# One per process
+map_point_index_cache = MapPointIndexCache()
+
+
+def benchmark_map_point_index(map_point_count=200000, lookup_count=1000, random_seed=42):
+    """
+    Compare the k-d tree against the "compute the distance to every point, then sort" approach that
+    find_closest_ballot_returned used in the database, on synthetic map points spread across the continental US.
+    :return: dict with timings in seconds
+    """
+    random_generator = random.Random(random_seed)
+    map_point_list = [(random_generator.uniform(24.5, 49.4), random_generator.uniform(-124.8, -66.9), payload)
+                      for payload in range(map_point_count)]
+    lookup_list = [(random_generator.uniform(24.5, 49.4), random_generator.uniform(-124.8, -66.9))
+                   for _ in range(lookup_count)]
+
+    start_time = time.time()
+    map_point_index = MapPointKDTree(map_point_list)
+    build_seconds = time.time() - start_time
+
+    start_time = time.time()
+    index_result_list = [map_point_index.find_nearest(latitude, longitude)[0][1]
+                         for latitude, longitude in lookup_list]
+    index_seconds = time.time() - start_time
+
+    # The full scan is slow, so we only time it on a sample of the lookups
+    scan_lookup_count = min(lookup_count, 20)
+    start_time = time.time()
+    mismatch_count = 0
+    for lookup_number in range(scan_lookup_count):
+        latitude, longitude = lookup_list[lookup_number]
+        scan_result = min(map_point_list, key=lambda one_point: great_circle_distance_in_miles(
+            latitude, longitude, one_point[0], one_point[1]))[2]
+        if scan_result != index_result_list[lookup_number]:
+            mismatch_count += 1
+    scan_seconds = time.time() - start_time
+
+    return {
+        'map_point_count':              map_point_count,
+        'build_seconds':                build_seconds,
+        'index_lookups_per_second':     lookup_count / index_seconds if index_seconds else 0,
+        'scan_lookups_per_second':      scan_lookup_count / scan_seconds if scan_seconds else 0,
+        'mismatch_count':               mismatch_count,
+    }
@@ -2,17 +2,22 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from candidate.models import CandidateCampaign
+from .ballot_item_list_cache import ballot_item_list_cache
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
 from config.base import get_environment_variable
 from datetime import date, datetime
 from django.db import models
-from django.db.models import F, Q, Count
+from django.db.models import F, Q, Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from election.models import ElectionManager
 from exception.models import handle_exception, handle_record_found_more_than_one_exception
 from geopy.geocoders import get_geocoder_for_service
 from geopy.exc import GeocoderQuotaExceeded
-from measure.models import ContestMeasureManager
-from office.models import ContestOfficeManager
+from geoip.models import GeocodeCacheManager
+from .map_point_index import map_point_index_cache
+from measure.models import ContestMeasure, ContestMeasureManager
+from office.models import ContestOffice, ContestOfficeManager
 from polling_location.models import PollingLocationManager
 import sys
 import wevote_functions.admin
@@ -89,6 +94,8 @@ class BallotItem(models.Model):
     measure_url = models.URLField(verbose_name='url of measure', max_length=255, blank=True, null=True)
     yes_vote_description = models.TextField(verbose_name="what a yes vote means", null=True, blank=True, default=None)
     no_vote_description = models.TextField(verbose_name="what a no vote means", null=True, blank=True, default=None)
+    # Used by ballotItemsSyncOut to send only the ballot items that changed since the last sync
+    date_last_updated = models.DateTimeField(null=True, auto_now=True)
 
     def is_contest_office(self):
         if positive_value_exists(self.contest_office_id) or positive_value_exists(self.contest_office_we_vote_id):
@@ -1654,6 +1661,9 @@ class BallotReturned(models.Model):
         if self.we_vote_id == "" or self.we_vote_id is None:  # If there isn't a value...
             self.generate_new_we_vote_id()
         super(BallotReturned, self).save(*args, **kwargs)
+        if positive_value_exists(self.polling_location_we_vote_id):
+            # Make sure the next find_closest_ballot_returned in this process sees this map point
+            map_point_index_cache.invalidate(self.google_civic_election_id)
 
     def generate_new_we_vote_id(self):
         # ...generate a new id
@@ -2228,6 +2238,58 @@ class BallotReturnedManager(models.Model):
         # If we got through the elections without finding any ballot_returned entries, there is no prior election
         return 0
 
+    def find_closest_ballot_returned_from_map_point_index(
+            self, latitude, longitude, google_civic_election_id, state_code='', read_only=True):
+        """
+        Use the in-process map point index (see ballot/map_point_index.py) to find the BallotReturned entry for the
+        closest polling location, instead of computing and sorting the distance to every map point in the database.
+        :param latitude:
+        :param longitude:
+        :param google_civic_election_id:
+        :param state_code:
+        :param read_only:
+        :return: BallotReturned or None
+        """
+        google_civic_election_id = convert_to_int(google_civic_election_id)
+        if not positive_value_exists(google_civic_election_id) or latitude is None or longitude is None:
+            return None
+        state_code = state_code.upper() if positive_value_exists(state_code) else ''
+        if 'test' in sys.argv or not positive_value_exists(read_only):
+            database_alias = 'default'
+        else:
+            database_alias = 'readonly'
+
+        def map_point_query():
+            query = BallotReturned.objects.using(database_alias).all()
+            # Limit this query to entries stored for polling locations
+            query = query.exclude(Q(polling_location_we_vote_id__isnull=True) | Q(polling_location_we_vote_id=""))
+            query = query.filter(google_civic_election_id=google_civic_election_id)
+            if positive_value_exists(state_code):
+                query = query.filter(normalized_state__iexact=state_code)
+            return query
+
+        def build_map_point_list():
+            query = map_point_query().exclude(latitude__isnull=True).exclude(longitude__isnull=True)
+            return list(query.values_list('latitude', 'longitude', 'id'))
+
+        def fetch_map_point_version():
+            return tuple(map_point_query().aggregate(Count('id'), Max('date_last_updated')).values())
+
+        try:
+            map_point_index = map_point_index_cache.retrieve_index(
+                (google_civic_election_id, state_code), build_map_point_list, fetch_map_point_version)
+            nearest_list = map_point_index.find_nearest(latitude, longitude)
+            if not len(nearest_list):
+                return None
+            ballot_returned = BallotReturned.objects.using(database_alias).filter(id=nearest_list[0][1]).first()
+            if ballot_returned is None:
+                # The map point was deleted since the index was built
+                map_point_index_cache.invalidate(google_civic_election_id)
+            return ballot_returned
+        except Exception as e:
+            handle_exception(e, logger=logger)
+            return None
+
     def find_closest_ballot_returned(self, text_for_map_search, google_civic_election_id=0, read_only=True):
         """
         We search for the closest address for this election in the ballot_returned table. We never have to worry
@@ -2257,8 +2319,10 @@ class BallotReturnedManager(models.Model):
         if not hasattr(self, 'google_client') or not self.google_client:
             self.google_client = get_geocoder_for_service('google')(GOOGLE_MAPS_API_KEY)
 
+        geocode_cache_manager = GeocodeCacheManager()
         try:
-            location = self.google_client.geocode(text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
+            location = geocode_cache_manager.geocode(
+                self.google_client, text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
         except GeocoderQuotaExceeded:
             try_without_maps_key = True
             status += "GEOCODER_QUOTA_EXCEEDED "
@@ -2272,7 +2336,8 @@ class BallotReturnedManager(models.Model):
             # If we have exceeded our account, try without a maps key
             try:
                 temp_google_client = get_geocoder_for_service('google')()
-                location = temp_google_client.geocode(text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
+                location = geocode_cache_manager.geocode(
+                    temp_google_client, text_for_map_search, sensor=False, timeout=GEOCODE_TIMEOUT)
             except GeocoderQuotaExceeded:
                 results = {
                     'status':                   status,
@@ -2371,7 +2436,10 @@ class BallotReturnedManager(models.Model):
                 status += "SEARCHING_BY_GOOGLE_CIVIC_ID "
                 ballot_returned_query = ballot_returned_query.filter(google_civic_election_id=google_civic_election_id)
                 try:
-                    ballot = ballot_returned_query.first()
+                    ballot = self.find_closest_ballot_returned_from_map_point_index(
+                        location.latitude, location.longitude, google_civic_election_id, state_code, read_only)
+                    if ballot is None:
+                        ballot = ballot_returned_query.first()
                 except Exception as e:
                     ballot = None
                     status += "BALLOT_RETURNED_QUERY_FIRST_FAILED: " + str(e) + ' '
@@ -2388,7 +2456,11 @@ class BallotReturnedManager(models.Model):
                     ballot_returned_query = ballot_returned_query.filter(
                         google_civic_election_id=upcoming_google_civic_election_id)
                     try:
-                        ballot = ballot_returned_query.first()
+                        ballot = self.find_closest_ballot_returned_from_map_point_index(
+                            location.latitude, location.longitude, upcoming_google_civic_election_id, state_code,
+                            read_only)
+                        if ballot is None:
+                            ballot = ballot_returned_query.first()
                     except Exception as e:
                         ballot = None
                         status += "BALLOT_RETURNED_QUERY_FIRST_FAILED: " + str(e) + ' '
@@ -2413,7 +2485,11 @@ class BallotReturnedManager(models.Model):
                                 ballot_returned_query = ballot_returned_query.filter(
                                     google_civic_election_id=upcoming_google_civic_election_id)
                                 try:
-                                    ballot = ballot_returned_query.first()
+                                    ballot = self.find_closest_ballot_returned_from_map_point_index(
+                                        location.latitude, location.longitude, upcoming_google_civic_election_id,
+                                        state_code, read_only)
+                                    if ballot is None:
+                                        ballot = ballot_returned_query.first()
                                 except Exception as e:
                                     ballot = None
                                     status += "BALLOT_RETURNED_QUERY_FIRST_FAILED: " + str(e) + ' '
@@ -2425,13 +2501,18 @@ class BallotReturnedManager(models.Model):
                             else:
                                 more_elections_exist = False
                 else:
+                    status += "FETCH_LAST_ELECTION_IN_THIS_STATE "
                     past_google_civic_election_id = self.fetch_last_election_in_this_state(state_code)
-                    if positive_value_exists(past_google_civic_election_id):
-                        # Limit the search to the most recent election with ballot items
-                        ballot_returned_query = ballot_returned_query.filter(
-                            google_civic_election_id=past_google_civic_election_id)
                     try:
-                        ballot = ballot_returned_query.first()
+                        if positive_value_exists(past_google_civic_election_id):
+                            # Limit the search to the most recent election with ballot items
+                            ballot_returned_query = ballot_returned_query.filter(
+                                google_civic_election_id=past_google_civic_election_id)
+                            ballot = self.find_closest_ballot_returned_from_map_point_index(
+                                location.latitude, location.longitude, past_google_civic_election_id, state_code,
+                                read_only)
+                        if ballot is None:
+                            ballot = ballot_returned_query.first()
                     except Exception as e:
                         ballot = None
                         status += "BALLOT_RETURNED_QUERY_FIRST_FAILED: " + str(e) + ' '
@@ -2472,7 +2553,10 @@ class BallotReturnedManager(models.Model):
                 ballot_returned_query = ballot_returned_query.filter(
                     google_civic_election_id=google_civic_election_id)
                 try:
-                    ballot_returned = ballot_returned_query.first()
+                    ballot_returned = self.find_closest_ballot_returned_from_map_point_index(
+                        location.latitude, location.longitude, google_civic_election_id, read_only=read_only)
+                    if ballot_returned is None:
+                        ballot_returned = ballot_returned_query.first()
                 except Exception as e:
                     ballot_returned = None
                     status += "BALLOT_RETURNED_QUERY_FIRST_FAILED: " + str(e) + ' '
@@ -4098,3 +4182,30 @@ def retrieve_address_fields_from_geocoder(text_for_map_search):
         'zip_long':     zip_long,
     }
     return results
+
+
+# Keep ballot_item_list_cache from serving a ballot that has changed. We don't listen for post_delete on BallotItem
+#  or CandidateToOfficeLink, since that would stop Django from deleting those rows in bulk. Bulk deletes and
+#  queryset updates are picked up when the cache entry expires (or when a ballot item batch process completes).
+@receiver(post_save, sender=BallotItem)
+def save_ballot_item_signal(sender, instance, **kwargs):
+    if positive_value_exists(instance.polling_location_we_vote_id):
+        ballot_item_list_cache.invalidate(
+            google_civic_election_id=instance.google_civic_election_id,
+            polling_location_we_vote_id=instance.polling_location_we_vote_id)
+
+
+@receiver(post_save, sender=CandidateToOfficeLink)
+def save_candidate_to_office_link_signal(sender, instance, **kwargs):
+    ballot_item_list_cache.invalidate(we_vote_id=instance.contest_office_we_vote_id)
+
+
+@receiver(post_save, sender=CandidateCampaign)
+@receiver(post_delete, sender=CandidateCampaign)
+@receiver(post_save, sender=ContestMeasure)
+@receiver(post_delete, sender=ContestMeasure)
+@receiver(post_save, sender=ContestOffice)
+@receiver(post_delete, sender=ContestOffice)
+def save_or_delete_ballot_item_source_signal(sender, instance, **kwargs):
+    if positive_value_exists(instance.we_vote_id):
+        ballot_item_list_cache.invalidate(we_vote_id=instance.we_vote_id)
@@ -1,9 +1,20 @@
 from unittest import mock
 from collections import namedtuple
 
-from django.test import TestCase
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
-from ballot.models import BallotReturned, BallotReturnedManager
+from ballot.ballot_item_list_cache import ballot_item_list_cache, BallotItemListCache
+from ballot.controllers import filter_ballot_items_structured_json_for_local_duplicates, \
+    filter_ballot_returned_structured_json_for_local_duplicates, voter_ballot_items_retrieve_for_one_election_for_api
+from ballot.map_point_index import great_circle_distance_in_miles, map_point_index_cache, MapPointKDTree
+from ballot.models import BallotItem, BallotItemListManager, BallotReturned, BallotReturnedListManager, \
+    BallotReturnedManager
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from geoip.models import GeocodeCacheManager
+from office.models import ContestOffice
+import random
 
 
 Location = namedtuple('Location', ['address', 'latitude', 'longitude'])
@@ -23,6 +34,8 @@ class BallotTestCase(TestCase):
                                          'polling_location_we_vote_id': 'wv01ploc43132',
                                          })
         self.ballot_manager = BallotReturnedManager()
+        # Make sure every test calls the mocked geocoder, instead of using an address cached by an earlier test
+        GeocodeCacheManager().clear_memory_cache()
 
     def test_do_not_return_ballot_in_different_state(self):
         with mock.patch('ballot.models.get_geocoder_for_service') as mock_geopy:
@@ -100,3 +113,315 @@ class BallotTestCase(TestCase):
             self.assertFalse(result['geocoder_quota_exceeded'])
             self.assertTrue(result['ballot_returned_found'])
             self.assertEqual(result['ballot_returned'], ballot_in_jackson)
+
+    def test_ballot_found_with_map_point_index(self):
+        ballot_in_jackson = BallotReturned.objects.create(**{'google_civic_election_id': 4184,
+                                                             'latitude': 32.3140354,
+                                                             'longitude': -90.2110653,
+                                                             'normalized_city': 'jackson',
+                                                             'normalized_line1': '1355 hattiesburg st',
+                                                             'normalized_state': 'MS',
+                                                             'normalized_zip': '39204',
+                                                             'polling_location_we_vote_id': 'wv01ploc42284',
+                                                             })
+        with mock.patch('ballot.models.get_geocoder_for_service') as mock_geopy:
+            google_client = mock_geopy('google')()
+            google_client.geocode.return_value = Location(address='Jackson, MS, USA',
+                                                          latitude=32.310251, longitude=-90.3289724)
+
+            result = self.ballot_manager.find_closest_ballot_returned('Jackson, MS', google_civic_election_id=4184)
+            self.assertTrue(result['ballot_returned_found'])
+            self.assertEqual(result['ballot_returned'], ballot_in_jackson)
+            self.assertEqual(map_point_index_cache.statistics()['map_points_cached'], 2)
+
+    def test_closest_ballot_in_last_election_with_map_point_index(self):
+        map_point_index_cache.invalidate()
+        ballot_in_jackson = BallotReturned.objects.create(**{'google_civic_election_id': 4184,
+                                                             'latitude': 32.3140354,
+                                                             'longitude': -90.2110653,
+                                                             'normalized_city': 'jackson',
+                                                             'normalized_line1': '1355 hattiesburg st',
+                                                             'normalized_state': 'MS',
+                                                             'normalized_zip': '39204',
+                                                             'polling_location_we_vote_id': 'wv01ploc42284',
+                                                             })
+        with mock.patch('ballot.models.get_geocoder_for_service') as mock_geopy, \
+                mock.patch.object(BallotReturnedManager, 'fetch_next_upcoming_election_in_this_state',
+                                  return_value=0), \
+                mock.patch.object(BallotReturnedManager, 'fetch_last_election_in_this_state', return_value=4184):
+            google_client = mock_geopy('google')()
+            google_client.geocode.return_value = Location(address='Jackson, MS, USA',
+                                                          latitude=32.310251, longitude=-90.3289724)
+
+            result = self.ballot_manager.find_closest_ballot_returned('Jackson, MS')
+            self.assertIn('FETCH_LAST_ELECTION_IN_THIS_STATE', result['status'])
+            self.assertTrue(result['ballot_returned_found'])
+            self.assertEqual(result['ballot_returned'], ballot_in_jackson)
+            # Found with the map point index, not by sorting every map point in the database
+            self.assertEqual(map_point_index_cache.statistics()['map_points_cached'], 2)
+
+
+class MapPointIndexTestCase(TestCase):
+
+    def test_great_circle_distance(self):
+        # San Francisco City Hall to Los Angeles City Hall is about 347 miles
+        distance = great_circle_distance_in_miles(37.7793, -122.4193, 34.0537, -118.2427)
+        self.assertAlmostEqual(distance, 347, delta=2)
+
+    def test_nearest_matches_full_scan(self):
+        random_generator = random.Random(4184)
+        map_point_list = [(random_generator.uniform(-89, 89), random_generator.uniform(-180, 180), payload)
+                          for payload in range(2000)]
+        map_point_index = MapPointKDTree(map_point_list)
+        for _ in range(100):
+            latitude, longitude = random_generator.uniform(-90, 90), random_generator.uniform(-180, 180)
+            expected_list = sorted(map_point_list, key=lambda one_point: great_circle_distance_in_miles(
+                latitude, longitude, one_point[0], one_point[1]))[:3]
+            nearest_list = map_point_index.find_nearest(latitude, longitude, number_to_find=3)
+            self.assertEqual([one_point[2] for one_point in expected_list],
+                             [payload for distance, payload in nearest_list])
+
+    def test_nearest_across_antimeridian(self):
+        map_point_index = MapPointKDTree([(51.88, 179.9, 'east'), (51.88, 170.0, 'west')])
+        self.assertEqual(map_point_index.find_nearest(51.88, -179.9)[0][1], 'east')
+
+
+class BallotItemsRetrieveTestCase(TransactionTestCase):
+    # The ballot is assembled from the readonly database, so the test data needs to be committed
+    databases = ["default", "readonly"]
+
+    def create_ballot(self, office_count, candidates_per_office=3):
+        for office_number in range(office_count):
+            office_we_vote_id = "wv01off{office_number}".format(office_number=office_number)
+            ContestOffice.objects.create(
+                we_vote_id=office_we_vote_id,
+                office_name="Office {office_number}".format(office_number=office_number),
+                google_civic_election_id=4184)
+            BallotItem.objects.create(
+                voter_id=1,
+                google_civic_election_id=4184,
+                contest_office_we_vote_id=office_we_vote_id,
+                ballot_item_display_name="Office {office_number}".format(office_number=office_number),
+                local_ballot_order=office_count - office_number)
+            for candidate_number in range(candidates_per_office):
+                candidate_we_vote_id = "wv01cand{office_number}x{candidate_number}".format(
+                    office_number=office_number, candidate_number=candidate_number)
+                CandidateCampaign.objects.create(
+                    we_vote_id=candidate_we_vote_id,
+                    candidate_name="Candidate {candidate_we_vote_id}".format(candidate_we_vote_id=candidate_we_vote_id),
+                    google_civic_election_id=4184,
+                    twitter_followers_count=candidate_number)
+                CandidateToOfficeLink.objects.create(
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    contest_office_we_vote_id=office_we_vote_id,
+                    google_civic_election_id=4184)
+        BallotItem.objects.create(
+            voter_id=1,
+            google_civic_election_id=4184,
+            contest_measure_we_vote_id="wv01meas1",
+            ballot_item_display_name="Measure A",
+            local_ballot_order=1)
+
+    def retrieve_ballot(self):
+        context_list = [CaptureQueriesContext(connections[alias]) for alias in self.databases]
+        for context in context_list:
+            context.__enter__()
+        results = voter_ballot_items_retrieve_for_one_election_for_api('', voter_id=1, google_civic_election_id=4184)
+        for context in context_list:
+            context.__exit__(None, None, None)
+        return sum(len(context.captured_queries) for context in context_list), results
+
+    def test_query_count_does_not_grow_with_ballot_size(self):
+        self.create_ballot(office_count=2)
+        small_query_count, results = self.retrieve_ballot()
+        self.assertTrue(results['success'], results['status'])
+        ballot_item_list = results['ballot_item_list']
+        self.assertEqual([one_ballot_item['we_vote_id'] for one_ballot_item in ballot_item_list],
+                         ["wv01off1", "wv01off0", "wv01meas1"])
+        office_ballot_item = ballot_item_list[1]
+        self.assertEqual(office_ballot_item['id'], ContestOffice.objects.get(we_vote_id="wv01off0").id)
+        self.assertEqual([one_candidate['we_vote_id'] for one_candidate in office_ballot_item['candidate_list']],
+                         ["wv01cand0x2", "wv01cand0x1", "wv01cand0x0"])
+        self.assertEqual(office_ballot_item['candidate_list'][0]['contest_office_name'], "Office 0")
+
+        BallotItem.objects.all().delete()
+        CandidateCampaign.objects.all().delete()
+        CandidateToOfficeLink.objects.all().delete()
+        ContestOffice.objects.all().delete()
+
+        self.create_ballot(office_count=40)
+        large_query_count, results = self.retrieve_ballot()
+        self.assertEqual(len(results['ballot_item_list']), 41)
+        self.assertEqual(small_query_count, large_query_count,
+                         "Query count grew from {small} to {large} as the ballot grew from 2 to 40 offices".format(
+                             small=small_query_count, large=large_query_count))
+
+    def test_ballot_from_map_point_is_served_from_cache_until_candidate_changes(self):
+        ballot_item_list_cache.clear()
+        ballot_returned = BallotReturned.objects.create(
+            google_civic_election_id=4184, polling_location_we_vote_id='wv01ploc1')
+        ContestOffice.objects.create(we_vote_id="wv01off1", office_name="Mayor", google_civic_election_id=4184)
+        BallotItem.objects.create(
+            polling_location_we_vote_id='wv01ploc1',
+            google_civic_election_id=4184,
+            contest_office_we_vote_id="wv01off1",
+            ballot_item_display_name="Mayor")
+        candidate = CandidateCampaign.objects.create(
+            we_vote_id="wv01cand1", candidate_name="Jane Smith", google_civic_election_id=4184)
+        CandidateToOfficeLink.objects.create(
+            candidate_we_vote_id="wv01cand1", contest_office_we_vote_id="wv01off1", google_civic_election_id=4184)
+
+        def retrieve_ballot_for_map_point():
+            return voter_ballot_items_retrieve_for_one_election_for_api(
+                '', voter_id=1, google_civic_election_id=4184,
+                ballot_returned_we_vote_id=ballot_returned.we_vote_id)
+
+        results = retrieve_ballot_for_map_point()
+        self.assertNotIn("BALLOT_ITEM_LIST_FROM_CACHE", results['status'])
+        context_list = [CaptureQueriesContext(connections[alias]) for alias in self.databases]
+        for context in context_list:
+            context.__enter__()
+        results = retrieve_ballot_for_map_point()
+        for context in context_list:
+            context.__exit__(None, None, None)
+        # Only the BallotReturned lookup
+        self.assertEqual(sum(len(context.captured_queries) for context in context_list), 1)
+        self.assertIn("BALLOT_ITEM_LIST_FROM_CACHE", results['status'])
+        self.assertEqual(results['ballot_item_list'][0]['candidate_list'][0]['ballot_item_display_name'],
+                         "Jane Smith")
+
+        candidate.candidate_name = "Jane Smith-Jones"
+        candidate.save()
+        results = retrieve_ballot_for_map_point()
+        self.assertNotIn("BALLOT_ITEM_LIST_FROM_CACHE", results['status'])
+        self.assertEqual(results['ballot_item_list'][0]['candidate_list'][0]['ballot_item_display_name'],
+                         "Jane Smith-Jones")
+        statistics = ballot_item_list_cache.statistics()
+        self.assertEqual((statistics['hits'], statistics['misses'], statistics['invalidations']), (1, 2, 1))
+
+    def test_linking_first_candidate_to_empty_office_clears_cached_ballot(self):
+        ballot_item_list_cache.clear()
+        ballot_returned = BallotReturned.objects.create(
+            google_civic_election_id=4184, polling_location_we_vote_id='wv01ploc1')
+        ContestOffice.objects.create(we_vote_id="wv01off1", office_name="Mayor", google_civic_election_id=4184)
+        ContestOffice.objects.create(we_vote_id="wv01off2", office_name="Sheriff", google_civic_election_id=4184)
+        for contest_office_we_vote_id, office_name in [("wv01off1", "Mayor"), ("wv01off2", "Sheriff")]:
+            BallotItem.objects.create(
+                polling_location_we_vote_id='wv01ploc1',
+                google_civic_election_id=4184,
+                contest_office_we_vote_id=contest_office_we_vote_id,
+                ballot_item_display_name=office_name)
+        CandidateCampaign.objects.create(
+            we_vote_id="wv01cand1", candidate_name="Jane Smith", google_civic_election_id=4184)
+        CandidateToOfficeLink.objects.create(
+            candidate_we_vote_id="wv01cand1", contest_office_we_vote_id="wv01off1", google_civic_election_id=4184)
+        # Sheriff has no candidates yet, so it isn't in the rendered ballot
+        CandidateCampaign.objects.create(
+            we_vote_id="wv01cand2", candidate_name="John Doe", google_civic_election_id=4184)
+
+        def retrieve_ballot_for_map_point():
+            return voter_ballot_items_retrieve_for_one_election_for_api(
+                '', voter_id=1, google_civic_election_id=4184,
+                ballot_returned_we_vote_id=ballot_returned.we_vote_id)
+
+        results = retrieve_ballot_for_map_point()
+        self.assertEqual([one_ballot_item['we_vote_id'] for one_ballot_item in results['ballot_item_list']],
+                         ["wv01off1"])
+        results = retrieve_ballot_for_map_point()
+        self.assertIn("BALLOT_ITEM_LIST_FROM_CACHE", results['status'])
+
+        CandidateToOfficeLink.objects.create(
+            candidate_we_vote_id="wv01cand2", contest_office_we_vote_id="wv01off2", google_civic_election_id=4184)
+        results = retrieve_ballot_for_map_point()
+        self.assertNotIn("BALLOT_ITEM_LIST_FROM_CACHE", results['status'])
+        self.assertEqual(sorted(one_ballot_item['we_vote_id'] for one_ballot_item in results['ballot_item_list']),
+                         ["wv01off1", "wv01off2"])
+
+
+class BallotItemListCacheTestCase(TestCase):
+
+    def test_invalidate_by_election_and_eviction(self):
+        cache = BallotItemListCache(cache_seconds=60, max_entries=2)
+        ballot_item_list = [{'we_vote_id': 'wv01meas1'}]
+        cache.store(4184, 'wv01ploc1', ballot_item_list, ['wv01meas1'])
+        cache.store(4185, 'wv01ploc1', ballot_item_list, ['wv01meas1'])
+        # Callers get their own copy
+        cache.retrieve(4184, 'wv01ploc1')[0]['we_vote_id'] = 'changed'
+        self.assertEqual(cache.retrieve('4184', 'wv01ploc1'), ballot_item_list)
+
+        cache.store(4185, 'wv01ploc2', ballot_item_list, ['wv01meas1'])
+        self.assertIsNone(cache.retrieve(4185, 'wv01ploc1'), "Least recently used entry should be evicted")
+        cache.invalidate(google_civic_election_id=4185)
+        self.assertIsNone(cache.retrieve(4185, 'wv01ploc2'))
+        self.assertEqual(cache.statistics()['entries_cached'], 1)
+        cache.invalidate(we_vote_id='wv01meas1')
+        self.assertEqual(cache.statistics()['entries_cached'], 0)
+
+
+class FilterBallotDuplicatesTestCase(TestCase):
+    """
+    The filters must find the same duplicates as asking retrieve_possible_duplicate_* about one record at a time
+    """
+
+    def test_ballot_items_match_one_at_a_time(self):
+        for polling_location_we_vote_id, ballot_item_display_name, state_code in [
+                ("wv01ploc1", "Mayor", "CA"), ("wv01ploc1", "Measure A", None), ("WV01PLOC2", "mayor", "ca"),
+                (None, "Mayor", "CA")]:
+            BallotItem.objects.create(
+                google_civic_election_id="4184", polling_location_we_vote_id=polling_location_we_vote_id,
+                ballot_item_display_name=ballot_item_display_name, state_code=state_code,
+                contest_office_we_vote_id="wv01off1")
+        structured_json = []
+        for google_civic_election_id in ["4184", 4184, "4185", ""]:
+            for polling_location_we_vote_id in ["wv01ploc1", "wv01ploc2", ""]:
+                for ballot_item_display_name in ["MAYOR", "Measure A", "Sheriff", ""]:
+                    for state_code in ["ca", "NY", ""]:
+                        structured_json.append({
+                            'google_civic_election_id': google_civic_election_id,
+                            'polling_location_we_vote_id': polling_location_we_vote_id,
+                            'ballot_item_display_name': ballot_item_display_name,
+                            'state_code': state_code,
+                        })
+
+        ballot_item_list_manager = BallotItemListManager()
+        expected_structured_json = [
+            one_ballot_item for one_ballot_item in structured_json
+            if not ballot_item_list_manager.retrieve_possible_duplicate_ballot_items(
+                one_ballot_item['ballot_item_display_name'], one_ballot_item['google_civic_election_id'],
+                one_ballot_item['polling_location_we_vote_id'], 0, None, None,
+                one_ballot_item['state_code'])['ballot_item_list_found']]
+        results = filter_ballot_items_structured_json_for_local_duplicates(structured_json)
+        self.assertEqual(results['structured_json'], expected_structured_json)
+        self.assertEqual(results['duplicates_removed'], len(structured_json) - len(expected_structured_json))
+        self.assertGreater(results['duplicates_removed'], 0)
+
+    def test_ballot_returned_matches_one_at_a_time(self):
+        for polling_location_we_vote_id, normalized_line1, normalized_zip in [
+                ("wv01ploc1", "1 MAIN ST", "94110"), ("wv01ploc2", "2 main st", None), ("wv01ploc3", None, "94110"),
+                (None, "3 Main St", "94111")]:
+            BallotReturned.objects.create(
+                google_civic_election_id=4184, polling_location_we_vote_id=polling_location_we_vote_id,
+                normalized_line1=normalized_line1, normalized_zip=normalized_zip,
+                election_description_text="Test Election", text_for_map_search="")
+        structured_json = []
+        for google_civic_election_id in ["4184", 4185, "", "not a number"]:
+            for polling_location_we_vote_id in ["wv01ploc1", "WV01PLOC2", "wv01ploc9", ""]:
+                for normalized_line1, normalized_zip in [("1 main st", "94110"), ("2 MAIN ST", None),
+                                                         (None, "94110"), ("3 main st", "94111"), ("", "")]:
+                    structured_json.append({
+                        'google_civic_election_id': google_civic_election_id,
+                        'polling_location_we_vote_id': polling_location_we_vote_id,
+                        'normalized_line1': normalized_line1,
+                        'normalized_zip': normalized_zip,
+                    })
+
+        ballot_returned_list_manager = BallotReturnedListManager()
+        expected_structured_json = [
+            one_ballot_returned for one_ballot_returned in structured_json
+            if not ballot_returned_list_manager.retrieve_possible_duplicate_ballot_returned(
+                one_ballot_returned['google_civic_election_id'], one_ballot_returned['normalized_line1'],
+                one_ballot_returned['normalized_zip'],
+                one_ballot_returned['polling_location_we_vote_id'])['ballot_returned_list_found']]
+        results = filter_ballot_returned_structured_json_for_local_duplicates(structured_json)
+        self.assertEqual(results['structured_json'], expected_structured_json)
+        self.assertGreater(results['duplicates_removed'], 0)
@@ -4,6 +4,7 @@
 
 from .controllers import ballot_items_import_from_master_server, ballot_returned_import_from_master_server, \
     repair_ballot_items_for_election
+from .ballot_item_list_cache import ballot_item_list_cache
 from .models import BallotItem, BallotItemListManager, BallotItemManager, BallotReturned, BallotReturnedManager
 from admin_tools.views import redirect_to_sign_in_page
 from candidate.models import CandidateCampaignListManager
@@ -26,6 +27,8 @@ import time
 from voter.models import voter_has_authority
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_functions.process_statistics import process_statistics_json_response
+from wevote_functions.sync_stream import is_sync_out_ndjson_request, sync_out_ndjson_response
 
 BALLOT_ITEMS_SYNC_URL = get_environment_variable("BALLOT_ITEMS_SYNC_URL")  # ballotItemsSyncOut
 BALLOT_RETURNED_SYNC_URL = get_environment_variable("BALLOT_RETURNED_SYNC_URL")  # ballotReturnedSyncOut
@@ -59,13 +62,18 @@ def ballot_items_sync_out_view(request):  # ballotItemsSyncOut
 
         # serializer = BallotItemSerializer(ballot_item_list, many=True)
         # return Response(serializer.data)
-        ballot_item_list_dict = ballot_item_list.values('ballot_item_display_name', 'contest_office_we_vote_id',
-                                                        'contest_measure_we_vote_id', 'google_ballot_placement',
-                                                        'google_civic_election_id', 'state_code', 'local_ballot_order',
-                                                        'measure_subtitle', 'measure_url',
-                                                        'no_vote_description',
-                                                        'polling_location_we_vote_id',
-                                                        'yes_vote_description')
+        ballot_item_field_list = ('ballot_item_display_name', 'contest_office_we_vote_id',
+                                  'contest_measure_we_vote_id', 'google_ballot_placement',
+                                  'google_civic_election_id', 'state_code', 'local_ballot_order',
+                                  'measure_subtitle', 'measure_url',
+                                  'no_vote_description',
+                                  'polling_location_we_vote_id',
+                                  'yes_vote_description')
+        if is_sync_out_ndjson_request(request):
+            return sync_out_ndjson_response(request, ballot_item_list, ballot_item_field_list,
+                                            changed_since_field='date_last_updated')
+
+        ballot_item_list_dict = ballot_item_list.values(*ballot_item_field_list)
         if ballot_item_list_dict:
             ballot_item_list_json = list(ballot_item_list_dict)
             return HttpResponse(json.dumps(ballot_item_list_json), content_type='application/json')
@@ -79,6 +87,22 @@ def ballot_items_sync_out_view(request):  # ballotItemsSyncOut
     return HttpResponse(json.dumps(json_data), content_type='application/json')
 
 
+@login_required
+def ballot_item_list_cache_statistics_view(request):
+    """
+    Hit rate and estimated database time saved by the rendered ballot cache in the worker process answering
+    this request
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    return process_statistics_json_response(request, ballot_item_list_cache.statistics)
+
+
 @login_required
 def ballot_returned_delete_process_view(request, ballot_returned_id):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -219,7 +243,9 @@ def ballot_items_import_from_master_server_view(request):
     google_civic_election_id = convert_to_int(request.GET.get('google_civic_election_id', 0))
     state_code = request.GET.get('state_code', '')
 
-    results = ballot_items_import_from_master_server(request, google_civic_election_id, state_code)
+    full_sync = positive_value_exists(request.GET.get('full_sync', False))
+    results = ballot_items_import_from_master_server(request, google_civic_election_id, state_code,
+                                                     full_sync=full_sync)
 
     if not results['success']:
         messages.add_message(request, messages.ERROR, results['status'])
@@ -31,6 +31,7 @@ from wevote_functions.functions import add_period_to_middle_name_initial, add_pe
     convert_to_political_party_constant, positive_value_exists, process_request_from_master, convert_to_int, \
     extract_twitter_handle_from_text_string, extract_website_from_url, \
     remove_period_from_middle_name_initial, remove_period_from_name_prefix_and_suffix
+from wevote_functions.sync_stream import import_from_master_server_in_chunks
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -140,33 +141,26 @@ def candidates_import_from_sample_file():
     return candidates_import_from_structured_json(structured_json)
 
 
-def candidates_import_from_master_server(request, google_civic_election_id='', state_code=''):
+def candidates_import_from_master_server(request, google_civic_election_id='', state_code='', full_sync=False):
     """
-    Get the json data, and either create new entries or update existing
+    Get the json data, and either create new entries or update existing. Only candidates that changed since our
+    last sync of this election and state are requested, unless full_sync is True.
     :param request:
     :param google_civic_election_id:
     :param state_code:
+    :param full_sync:
     :return:
     """
 
-    import_results, structured_json = process_request_from_master(
-        request, "Loading Candidates from We Vote Master servers",
-        CANDIDATES_SYNC_URL,
+    import_results = import_from_master_server_in_chunks(
+        'candidates', CANDIDATES_SYNC_URL,
         {
             "key": WE_VOTE_API_KEY,  # This comes from an environment variable
             "google_civic_election_id": str(google_civic_election_id),
             "state_code": state_code,
-        }
-    )
-
-    if import_results['success']:
-        # results = filter_candidates_structured_json_for_local_duplicates(structured_json)
-        # filtered_structured_json = results['structured_json']
-        # duplicates_removed = results['duplicates_removed']
-        # import_results = candidates_import_from_structured_json(filtered_structured_json)
-        import_results = candidates_import_from_structured_json(structured_json)
-        # import_results['duplicates_removed'] = duplicates_removed
-        import_results['duplicates_removed'] = 0
+        },
+        import_function=candidates_import_from_structured_json,
+        full_sync=full_sync)
 
     import2_results, structured_json = process_request_from_master(
         request, "Loading Candidate to Office Links from We Vote Master servers",
@@ -174,6 +174,96 @@ class CandidateCampaignListManager(models.Model):
         }
         return results
 
+    def retrieve_all_candidates_for_office_list(self, office_we_vote_id_list=[], read_only=True):
+        """
+        Bulk version of retrieve_all_candidates_for_office. Instead of two queries per office, we retrieve the
+        CandidateToOfficeLink entries for all offices in one query, and all of the candidates in a second query.
+        :param office_we_vote_id_list:
+        :param read_only:
+        :return: candidate_list_by_office_we_vote_id: for each office, candidates ordered by twitter_followers_count
+        """
+        candidate_list_by_office_we_vote_id = {}
+        candidate_we_vote_id_list = []
+        status = ""
+        success = True
+
+        if not positive_value_exists(len(office_we_vote_id_list)):
+            status += 'RETRIEVE_ALL_CANDIDATES_FOR_OFFICE_LIST-OFFICE_WE_VOTE_ID_LIST_MISSING '
+            results = {
+                'success':                              False,
+                'status':                               status,
+                'candidate_list_found':                 False,
+                'candidate_list_by_office_we_vote_id':  candidate_list_by_office_we_vote_id,
+                'candidate_we_vote_id_list':            candidate_we_vote_id_list,
+            }
+            return results
+
+        link_results = self.retrieve_candidate_to_office_link_list(
+            contest_office_we_vote_id_list=office_we_vote_id_list,
+            read_only=read_only)
+        if not positive_value_exists(link_results['success']):
+            status += link_results['status']
+            results = {
+                'success':                              False,
+                'status':                               status,
+                'candidate_list_found':                 False,
+                'candidate_list_by_office_we_vote_id':  candidate_list_by_office_we_vote_id,
+                'candidate_we_vote_id_list':            candidate_we_vote_id_list,
+            }
+            return results
+
+        # A candidate can be linked to more than one office (ex/ across a primary and general election)
+        office_we_vote_id_list_by_candidate_we_vote_id = {}
+        for one_link in link_results['candidate_to_office_link_list']:
+            if not positive_value_exists(one_link.candidate_we_vote_id):
+                continue
+            if one_link.candidate_we_vote_id not in office_we_vote_id_list_by_candidate_we_vote_id:
+                office_we_vote_id_list_by_candidate_we_vote_id[one_link.candidate_we_vote_id] = []
+            office_we_vote_id_list_by_candidate_we_vote_id[one_link.candidate_we_vote_id].append(
+                one_link.contest_office_we_vote_id)
+
+        for office_we_vote_id in office_we_vote_id_list:
+            candidate_list_by_office_we_vote_id[office_we_vote_id] = []
+
+        candidate_list = []
+        if positive_value_exists(len(office_we_vote_id_list_by_candidate_we_vote_id)):
+            try:
+                if read_only:
+                    candidate_query = CandidateCampaign.objects.using('readonly').all()
+                else:
+                    candidate_query = CandidateCampaign.objects.all()
+                candidate_query = candidate_query.filter(
+                    we_vote_id__in=list(office_we_vote_id_list_by_candidate_we_vote_id.keys()))
+                candidate_query = candidate_query.exclude(do_not_display_on_ballot=True)
+                candidate_query = candidate_query.order_by('-twitter_followers_count')
+                candidate_list = list(candidate_query)
+            except Exception as e:
+                handle_exception(e, logger=logger)
+                status += 'FAILED retrieve_all_candidates_for_office_list ' + str(e) + ' '
+                success = False
+
+        # Because candidate_list is already sorted, each office's list keeps the twitter_followers_count order
+        for one_candidate in candidate_list:
+            candidate_we_vote_id_list.append(one_candidate.we_vote_id)
+            for office_we_vote_id in office_we_vote_id_list_by_candidate_we_vote_id[one_candidate.we_vote_id]:
+                if office_we_vote_id in candidate_list_by_office_we_vote_id:
+                    candidate_list_by_office_we_vote_id[office_we_vote_id].append(one_candidate)
+
+        candidate_list_found = positive_value_exists(len(candidate_we_vote_id_list))
+        if candidate_list_found:
+            status += 'RETRIEVE_ALL_CANDIDATES_FOR_OFFICE_LIST-CANDIDATES_RETRIEVED '
+        else:
+            status += 'RETRIEVE_ALL_CANDIDATES_FOR_OFFICE_LIST-NO_CANDIDATES_RETRIEVED '
+
+        results = {
+            'success':                              success,
+            'status':                               status,
+            'candidate_list_found':                 candidate_list_found,
+            'candidate_list_by_office_we_vote_id':  candidate_list_by_office_we_vote_id,
+            'candidate_we_vote_id_list':            candidate_we_vote_id_list,
+        }
+        return results
+
     def retrieve_all_candidates_for_upcoming_election(self, google_civic_election_id_list=[], state_code='',
                                                       return_list_of_objects=False):
         candidate_list_objects = []
@@ -1784,10 +1874,11 @@ class CandidateCampaignManager(models.Model):
         candidate_campaign_manager = CandidateCampaignManager()
         return candidate_campaign_manager.retrieve_candidate_campaign(candidate_campaign_id, read_only=read_only)
 
-    def retrieve_candidate_campaign_from_we_vote_id(self, we_vote_id):
+    def retrieve_candidate_campaign_from_we_vote_id(self, we_vote_id, read_only=False):
         candidate_campaign_id = 0
         candidate_campaign_manager = CandidateCampaignManager()
-        return candidate_campaign_manager.retrieve_candidate_campaign(candidate_campaign_id, we_vote_id)
+        return candidate_campaign_manager.retrieve_candidate_campaign(candidate_campaign_id, we_vote_id,
+                                                                      read_only=read_only)
 
     def fetch_candidate_campaign_id_from_we_vote_id(self, we_vote_id):
         candidate_campaign_id = 0
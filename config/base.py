@@ -153,6 +153,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE = [
+    'apis_v1.request_profiler.ApiProfilerMiddleware',  # First, so its timing includes the other middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'corsheaders.middleware.CorsPostCsrfMiddleware',
@@ -164,8 +165,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'wevote_social.middleware.SocialMiddleware',
+    'voter.identity_cache.VoterIdentityCacheMiddleware',
+    'config.database_router.DatabaseRoutingMiddleware',
 ]
 
+# With DATABASE_ROUTER_USE_REPLICA=1, reads made while answering a GET go to the 'readonly' replica
+# (see config/database_router.py)
+DATABASE_ROUTERS = ['config.database_router.WeVoteDatabaseRouter']
+
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.facebook.FacebookOAuth2',
     'social_core.backends.google.GoogleOAuth2',
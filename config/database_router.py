@@ -0,0 +1,259 @@
+# config/database_router.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# We used to send a read to the replica by adding .using('readonly') to that one query, so every query we forgot went
+# to the primary. With DATABASE_ROUTER_USE_REPLICA=1, WeVoteDatabaseRouter makes the replica the default for reads made
+# while answering a GET request:
+#   - reads of the analytics app go to the 'analytics' database
+#   - every other read goes to 'readonly'
+#   - writes go to 'default', or to the database an instance was loaded from, like an AnalyticsAction read with
+#     .using('analytics'). An instance read from the replica is saved to 'default'.
+# Many of our GET APIs also write, and a row read from a lagging replica and saved again would write its stale columns
+# back to the primary. So replica routing is off until it is turned on, and read-your-writes only lasts for one request.
+# Once a request writes anything, the rest of its reads go to 'default', so it reads its own writes. Reads also go to
+# 'default' in requests other than GET/HEAD/OPTIONS, inside transaction.atomic, outside of a request (management
+# commands, threads we start), and inside `with use_primary_database():`. .using() on a query still wins.
+#
+# DatabaseRoutingMiddleware scopes all of this to one request and counts, for each view, the reads and writes that
+# went to each database. /admin/database_routing_statistics/ shows which views still read from the primary.
+#
+# observe_queries() puts one execute_wrapper on each database connection for the request. It times every query and
+# passes it to the listeners added with add_query_listener, like the API profiler, so they don't stack wrappers of
+# their own on every query.
+
+from config.base import get_environment_variable_default
+from contextlib import contextmanager, ExitStack
+from django.conf import settings
+from django.db import connections
+import threading
+import time
+from wevote_functions.functions import convert_to_int
+
+# 0 sends every read to the primary, like Django does without a router
+DATABASE_ROUTER_USE_REPLICA = convert_to_int(get_environment_variable_default('DATABASE_ROUTER_USE_REPLICA', 0))
+PRIMARY_DATABASE = 'default'
+REPLICA_DATABASE = 'readonly'
+ANALYTICS_DATABASE = 'analytics'
+# Apps whose reads go to a database of their own
+READ_DATABASE_BY_APP = {
+    'analytics':    ANALYTICS_DATABASE,
+}
+# The primary and its replica hold the same rows. 'analytics' is a database of its own (see config/local.py), so a
+# row from it can't be related to a row from these.
+SAME_DATA_DATABASES = (PRIMARY_DATABASE, REPLICA_DATABASE)
+REPLICA_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Requests that don't resolve to a view (404s, made-up URLs) share one entry in the statistics
+UNRESOLVED_ENDPOINT = 'unresolved'
+
+
+class DatabaseRoutingState(object):
+    """
+    Per thread, whether we are answering a request that may read from a replica, and whether it has written anything.
+    Per process, the query counts for each view.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_scope = threading.local()
+        self.statistics_by_endpoint = {}
+
+    def start_request(self, replica_allowed):
+        self.request_scope.replica_allowed = replica_allowed
+        self.request_scope.pinned_to_primary = False
+        self.request_scope.query_count_by_database = {}
+
+    def end_request(self, endpoint):
+        query_count_by_database = getattr(self.request_scope, 'query_count_by_database', {})
+        pinned_to_primary = getattr(self.request_scope, 'pinned_to_primary', False)
+        self.request_scope.replica_allowed = False
+        self.request_scope.pinned_to_primary = False
+        self.request_scope.query_count_by_database = {}
+        with self.lock:
+            endpoint_statistics = self.statistics_by_endpoint.get(endpoint)
+            if endpoint_statistics is None:
+                endpoint_statistics = {
+                    'requests':                 0,
+                    'requests_pinned':          0,
+                    'queries_by_database':      {},
+                }
+                self.statistics_by_endpoint[endpoint] = endpoint_statistics
+            endpoint_statistics['requests'] += 1
+            if pinned_to_primary:
+                endpoint_statistics['requests_pinned'] += 1
+            for database, query_count in query_count_by_database.items():
+                database_statistics = endpoint_statistics['queries_by_database'].setdefault(
+                    database, {'reads': 0, 'writes': 0})
+                database_statistics['reads'] += query_count['reads']
+                database_statistics['writes'] += query_count['writes']
+
+    def count_query(self, database, sql):
+        query_count_by_database = getattr(self.request_scope, 'query_count_by_database', None)
+        if query_count_by_database is None:
+            return
+        query_count = query_count_by_database.setdefault(database, {'reads': 0, 'writes': 0})
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            query_count['reads'] += 1
+        else:
+            query_count['writes'] += 1
+
+    def pin_to_primary(self):
+        self.request_scope.pinned_to_primary = True
+
+    def replica_reads_allowed(self):
+        if not DATABASE_ROUTER_USE_REPLICA or not getattr(self.request_scope, 'replica_allowed', False):
+            return False
+        if getattr(self.request_scope, 'pinned_to_primary', False) or \
+                getattr(self.request_scope, 'primary_forced_depth', 0):
+            return False
+        # Inside a transaction we need to see what the transaction has written
+        return not connections[PRIMARY_DATABASE].in_atomic_block
+
+    def clear(self):
+        with self.lock:
+            self.statistics_by_endpoint = {}
+
+    def statistics(self):
+        with self.lock:
+            statistics_by_endpoint = {}
+            for endpoint, endpoint_statistics in self.statistics_by_endpoint.items():
+                queries_by_database = {database: dict(query_count) for database, query_count
+                                       in endpoint_statistics['queries_by_database'].items()}
+                statistics_by_endpoint[endpoint] = {
+                    'requests':             endpoint_statistics['requests'],
+                    'requests_pinned':      endpoint_statistics['requests_pinned'],
+                    'primary_reads':        queries_by_database.get(PRIMARY_DATABASE, {}).get('reads', 0),
+                    'queries_by_database':  queries_by_database,
+                }
+        return {
+            'replica_routing_on':       bool(DATABASE_ROUTER_USE_REPLICA),
+            # The views that still read the most from the primary come first
+            'endpoints_by_primary_reads': sorted(statistics_by_endpoint.keys(),
+                                                 key=lambda endpoint: -statistics_by_endpoint[endpoint][
+                                                     'primary_reads']),
+            'statistics_by_endpoint':   statistics_by_endpoint,
+        }
+
+
+# One per process
+database_routing_state = DatabaseRoutingState()
+
+
+@contextmanager
+def use_primary_database():
+    """
+    Read from the primary database inside this block, for code that can't tolerate replica lag
+    """
+    request_scope = database_routing_state.request_scope
+    request_scope.primary_forced_depth = getattr(request_scope, 'primary_forced_depth', 0) + 1
+    try:
+        yield
+    finally:
+        request_scope.primary_forced_depth -= 1
+
+
+class WeVoteDatabaseRouter(object):
+    """
+    See DATABASE_ROUTERS in config/base.py
+    """
+
+    def db_for_read(self, model, **hints):
+        if not database_routing_state.replica_reads_allowed():
+            return PRIMARY_DATABASE
+        database = READ_DATABASE_BY_APP.get(model._meta.app_label, REPLICA_DATABASE)
+        if database in settings.DATABASES:
+            return database
+        return PRIMARY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        database = instance._state.db if instance is not None else None
+        if database and database != REPLICA_DATABASE:
+            # Save to the database we loaded the instance from
+            if database == PRIMARY_DATABASE:
+                database_routing_state.pin_to_primary()
+            return database
+        database_routing_state.pin_to_primary()
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db in SAME_DATA_DATABASES and obj2._state.db in SAME_DATA_DATABASES:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DATABASE:
+            # The replica gets its tables from the primary
+            return False
+        return None
+
+
+# Called with (database, sql, milliseconds) after every query made inside observe_queries()
+query_listener_list = []
+
+
+def add_query_listener(query_listener):
+    if query_listener not in query_listener_list:
+        query_listener_list.append(query_listener)
+
+
+class QueryObserver(object):
+    def __init__(self, database):
+        self.database = database
+
+    def __call__(self, execute, sql, params, many, context):
+        database_routing_state.count_query(self.database, sql)
+        start_counter = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            milliseconds = (time.perf_counter() - start_counter) * 1000
+            for query_listener in query_listener_list:
+                query_listener(self.database, sql, milliseconds)
+
+
+@contextmanager
+def observe_queries():
+    """
+    Wrap each database connection with a QueryObserver for the rest of this request. Only the outermost call in a
+    thread installs the wrappers, so middleware can all ask for them and every query is still wrapped once.
+    """
+    request_scope = database_routing_state.request_scope
+    observe_depth = getattr(request_scope, 'observe_depth', 0)
+    request_scope.observe_depth = observe_depth + 1
+    try:
+        if observe_depth:
+            yield
+        else:
+            with ExitStack() as stack:
+                for database in settings.DATABASES:
+                    stack.enter_context(connections[database].execute_wrapper(QueryObserver(database)))
+                yield
+    finally:
+        request_scope.observe_depth = observe_depth
+
+
+def request_endpoint(request):
+    """
+    The name of the view that answered this request, so /apis/v1/voterRetrieve/ and /apis/v1/voterRetrieve share one
+    entry in our per-view statistics
+    """
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else UNRESOLVED_ENDPOINT
+
+
+class DatabaseRoutingMiddleware(object):
+    """
+    Gives each request its own read-your-writes pin, and counts its queries by database
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        database_routing_state.start_request(replica_allowed=request.method in REPLICA_SAFE_METHODS)
+        try:
+            with observe_queries():
+                response = self.get_response(request)
+        finally:
+            database_routing_state.end_request(request_endpoint(request))
+        return response
@@ -17,6 +17,9 @@ DEBUG = get_environment_variable('SERVER_IN_DEBUG_MODE')
 # Multiple Databases
 # See https://docs.djangoproject.com/en/1.10/topics/db/multi-db/#defining-your-databases
 # August 2017: Not setting DATABASE_ROUTERS at this time, instead going with ".using('readonly')" on individual queries
+# Now, with DATABASE_ROUTER_USE_REPLICA=1, DATABASE_ROUTERS (config/base.py) sends reads made while answering a GET to
+# 'readonly', and analytics reads to 'analytics', so a new query doesn't need .using() to avoid the primary.
+# See config/database_router.py
 
 DATABASES = {
     'default': {
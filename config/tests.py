@@ -0,0 +1,86 @@
+# config/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from analytics.models import AnalyticsAction
+from config.database_router import database_routing_state, DatabaseRoutingMiddleware, use_primary_database, \
+    WeVoteDatabaseRouter
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from unittest import mock
+from voter.models import Voter
+
+
+class DatabaseRouterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        database_routing_state.clear()
+        self.router = WeVoteDatabaseRouter()
+        # Replica routing is off unless DATABASE_ROUTER_USE_REPLICA is set
+        replica_patcher = mock.patch('config.database_router.DATABASE_ROUTER_USE_REPLICA', 1)
+        replica_patcher.start()
+        self.addCleanup(replica_patcher.stop)
+
+    def tearDown(self):
+        database_routing_state.end_request('test')
+        database_routing_state.clear()
+
+    def test_get_request_reads_from_replica_until_it_writes(self):
+        database_routing_state.start_request(replica_allowed=True)
+        self.assertEqual(self.router.db_for_read(Voter), 'readonly')
+        self.assertEqual(self.router.db_for_read(AnalyticsAction), 'analytics')
+        with use_primary_database():
+            self.assertEqual(self.router.db_for_read(Voter), 'default')
+        self.assertEqual(self.router.db_for_read(Voter), 'readonly')
+
+        self.assertEqual(self.router.db_for_write(Voter), 'default')
+        # Read your writes for the rest of the request
+        self.assertEqual(self.router.db_for_read(Voter), 'default')
+        database_routing_state.end_request('voterRetrieve')
+
+        endpoint_statistics = database_routing_state.statistics()['statistics_by_endpoint']['voterRetrieve']
+        self.assertEqual(endpoint_statistics['requests_pinned'], 1)
+
+    def test_post_and_outside_of_request_read_from_primary(self):
+        self.assertEqual(self.router.db_for_read(Voter), 'default')
+        database_routing_state.start_request(replica_allowed=False)
+        self.assertEqual(self.router.db_for_read(Voter), 'default')
+
+    def test_replica_routing_is_off_by_default(self):
+        with mock.patch('config.database_router.DATABASE_ROUTER_USE_REPLICA', 0):
+            database_routing_state.start_request(replica_allowed=True)
+            self.assertEqual(self.router.db_for_read(Voter), 'default')
+            self.assertEqual(self.router.db_for_read(AnalyticsAction), 'default')
+
+    def test_save_goes_to_database_the_instance_was_loaded_from(self):
+        database_routing_state.start_request(replica_allowed=True)
+        analytics_action = AnalyticsAction()
+        analytics_action._state.db = 'analytics'
+        self.assertEqual(self.router.db_for_write(AnalyticsAction, instance=analytics_action), 'analytics')
+        # Saving to the analytics database doesn't stop us reading the replica
+        self.assertEqual(self.router.db_for_read(Voter), 'readonly')
+
+        # A row read from the replica is saved to the primary
+        voter = Voter()
+        voter._state.db = 'readonly'
+        self.assertEqual(self.router.db_for_write(Voter, instance=voter), 'default')
+        self.assertEqual(self.router.db_for_read(Voter), 'default')
+        self.assertEqual(self.router.db_for_write(Voter, instance=Voter()), 'default')
+
+    def test_relations_only_allowed_between_primary_and_replica(self):
+        voter = Voter()
+        voter._state.db = 'readonly'
+        analytics_action = AnalyticsAction()
+        analytics_action._state.db = 'default'
+        self.assertTrue(self.router.allow_relation(voter, analytics_action))
+        analytics_action._state.db = 'analytics'
+        self.assertIsNone(self.router.allow_relation(voter, analytics_action))
+
+    def test_unresolved_requests_share_one_statistics_entry(self):
+        middleware = DatabaseRoutingMiddleware(lambda request: HttpResponse(status=404))
+        request_factory = RequestFactory()
+        for path in ['/no/such/page/1', '/no/such/page/2']:
+            middleware(request_factory.get(path))
+        statistics_by_endpoint = database_routing_state.statistics()['statistics_by_endpoint']
+        self.assertEqual(list(statistics_by_endpoint.keys()), ['unresolved'])
+        self.assertEqual(statistics_by_endpoint['unresolved']['requests'], 2)
@@ -31,6 +31,8 @@ urlpatterns = [
     url(r'^apis/v1/', include(('apis_v1.urls', 'apis_v1'), namespace="apis_v1")),
 
     url(r'^a/', include(('analytics.urls','analytics'), namespace="analytics")),
+    url(r'^api_internal_cache/', include(('api_internal_cache.urls', 'api_internal_cache'),
+                                         namespace="api_internal_cache")),
     url(r'^b/', include(('ballot.urls','ballot'), namespace="ballot")),
     url(r'^ballotpedia/', include(('import_export_ballotpedia.urls','ballotpedia'), namespace="ballotpedia")),
     url(r'^bookmark/', include(('bookmark.urls','bookmark'), namespace="bookmark")),
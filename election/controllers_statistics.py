@@ -0,0 +1,387 @@
+# election/controllers_statistics.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# The admin dashboards (data_voter_statistics_view, election_list_view, election_summary_view) used to count
+# addresses, ballots, positions, offices and candidates for each election every time they were shown. Now the
+# REFRESH_ELECTION_STATISTICS batch process saves those counts in ElectionStatistics, and the dashboards read them
+# with one query. This is kept apart from election/controllers.py because position/models.py imports that module
+# (through ballot/controllers.py).
+
+from .models import Election, ElectionStatistics, ElectionStatisticsManager
+from ballot.models import BallotReturned, BallotReturnedListManager, VoterBallotSaved
+from candidate.models import CandidateCampaign, CandidateCampaignListManager, CandidateToOfficeLink
+from datetime import timedelta
+from django.db.models import Count, Q
+from django.db.models.functions import Upper
+from django.utils.timezone import now
+from exception.models import handle_exception
+import json
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+from position.models import PERCENT_RATING, PositionEntered, PositionForFriends
+from voter.models import VoterAddress
+from voter_guide.models import VoterGuide
+import wevote_functions.admin
+from wevote_functions.bulk_upsert import BulkUpsert
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+ELECTION_STATISTICS_COUNT_FIELD_LIST = [
+    'voter_address_count', 'voter_ballot_saved_count', 'voter_ballot_returned_count',
+    'voters_with_public_positions_count', 'voter_position_entered_count',
+    'voters_with_positions_for_friends_count', 'voter_position_for_friends_count',
+    'ballot_returned_count', 'polling_location_ballot_returned_count', 'ballot_location_display_option_on_count',
+    'organizations_with_public_positions_count', 'organization_position_entered_count', 'public_positions_count',
+    'voter_guides_count', 'number_of_offices', 'offices_with_candidates_count', 'number_of_candidates',
+    'candidate_count', 'candidates_without_photo_count', 'number_of_measures',
+]
+ELECTION_STATISTICS_FIELD_LIST = ELECTION_STATISTICS_COUNT_FIELD_LIST + ['ballot_returned_count_by_state_json']
+ELECTION_STATISTICS_CHUNK_SIZE = 100
+# Elections this many days in the past (and upcoming elections) are recalculated on every refresh
+ELECTION_STATISTICS_ACTIVE_DAYS = 60
+ELECTION_STATISTICS_OLDER_ELECTIONS_PER_RUN = 10
+ELECTION_STATISTICS_REFRESH_MINUTES = 15
+
+
+def count_by_election(query, google_civic_election_id_list, count_field='id', distinct=False):
+    """
+    Count the rows in query for many elections at once
+    :param query: like PositionEntered.objects.using('readonly').exclude(voter_we_vote_id=None)
+    :param google_civic_election_id_list: integers
+    :param count_field:
+    :param distinct: count the distinct values of count_field
+    :return: dict of google_civic_election_id (integer) -> count, for the elections with at least one row
+    """
+    if query.model._meta.get_field('google_civic_election_id').get_internal_type() == 'CharField':
+        # Some tables store the election id as text
+        google_civic_election_id_list = [str(google_civic_election_id)
+                                         for google_civic_election_id in google_civic_election_id_list]
+    query = query.filter(google_civic_election_id__in=google_civic_election_id_list)
+    # Without order_by(), the model's default ordering would be added to the GROUP BY
+    query = query.order_by().values('google_civic_election_id').annotate(
+        election_count=Count(count_field, distinct=distinct))
+    count_by_election_id = {}
+    for row in query:
+        google_civic_election_id = convert_to_int(row['google_civic_election_id'])
+        count_by_election_id[google_civic_election_id] = \
+            count_by_election_id.get(google_civic_election_id, 0) + row['election_count']
+    return count_by_election_id
+
+
+def calculate_election_statistics(google_civic_election_id_list):
+    """
+    Calculate the ElectionStatistics counts for many elections with about twenty queries, instead of about twenty
+    queries per election
+    :param google_civic_election_id_list:
+    :return: dict of google_civic_election_id (integer) -> dict of ELECTION_STATISTICS_FIELD_LIST values
+    """
+    google_civic_election_id_list = list({convert_to_int(google_civic_election_id)
+                                          for google_civic_election_id in google_civic_election_id_list
+                                          if positive_value_exists(google_civic_election_id)})
+    count_by_field = {}
+    if not google_civic_election_id_list:
+        return {}
+
+    # Voters
+    count_by_field['voter_address_count'] = count_by_election(
+        VoterAddress.objects.using('readonly').all(), google_civic_election_id_list)
+    count_by_field['voter_ballot_saved_count'] = count_by_election(
+        VoterBallotSaved.objects.using('readonly').exclude(voter_id=0), google_civic_election_id_list)
+    count_by_field['voter_ballot_returned_count'] = count_by_election(
+        BallotReturned.objects.using('readonly').exclude(voter_id=0).exclude(voter_id=None),
+        google_civic_election_id_list)
+    voter_position_entered_query = PositionEntered.objects.using('readonly').exclude(voter_we_vote_id=None)
+    count_by_field['voters_with_public_positions_count'] = count_by_election(
+        voter_position_entered_query, google_civic_election_id_list, count_field='voter_we_vote_id', distinct=True)
+    count_by_field['voter_position_entered_count'] = count_by_election(
+        voter_position_entered_query, google_civic_election_id_list)
+    # As of Aug 2018 we are no longer using PERCENT_RATING
+    position_for_friends_query = PositionForFriends.objects.using('readonly').exclude(stance__iexact=PERCENT_RATING)
+    count_by_field['voters_with_positions_for_friends_count'] = count_by_election(
+        position_for_friends_query.exclude(voter_we_vote_id=None), google_civic_election_id_list,
+        count_field='voter_we_vote_id', distinct=True)
+    count_by_field['voter_position_for_friends_count'] = count_by_election(
+        position_for_friends_query, google_civic_election_id_list)
+
+    # Ballots
+    count_by_field['ballot_returned_count'] = count_by_election(
+        BallotReturned.objects.using('readonly').all(), google_civic_election_id_list)
+    count_by_field['polling_location_ballot_returned_count'] = count_by_election(
+        BallotReturned.objects.using('readonly').exclude(polling_location_we_vote_id=None),
+        google_civic_election_id_list)
+    count_by_field['ballot_location_display_option_on_count'] = count_by_election(
+        BallotReturned.objects.using('readonly').filter(ballot_location_display_option_on=True),
+        google_civic_election_id_list)
+    ballot_returned_count_by_state_by_election = {}
+    ballot_returned_by_state_query = BallotReturned.objects.using('readonly').filter(
+        google_civic_election_id__in=google_civic_election_id_list).exclude(normalized_state=None)
+    ballot_returned_by_state_query = ballot_returned_by_state_query.order_by().values(
+        'google_civic_election_id', state=Upper('normalized_state')).annotate(election_count=Count('id'))
+    for row in ballot_returned_by_state_query:
+        count_by_state = ballot_returned_count_by_state_by_election.setdefault(row['google_civic_election_id'], {})
+        count_by_state[row['state']] = count_by_state.get(row['state'], 0) + row['election_count']
+
+    # Organizations and positions
+    organization_position_entered_query = \
+        PositionEntered.objects.using('readonly').exclude(organization_we_vote_id=None)
+    count_by_field['organizations_with_public_positions_count'] = count_by_election(
+        organization_position_entered_query, google_civic_election_id_list,
+        count_field='organization_we_vote_id', distinct=True)
+    count_by_field['organization_position_entered_count'] = count_by_election(
+        organization_position_entered_query, google_civic_election_id_list)
+    count_by_field['voter_guides_count'] = count_by_election(
+        VoterGuide.objects.using('readonly').exclude(vote_smart_ratings_only=True), google_civic_election_id_list)
+
+    # Offices, candidates and measures
+    count_by_field['number_of_offices'] = count_by_election(
+        ContestOffice.objects.using('readonly').all(), google_civic_election_id_list)
+    candidate_we_vote_id_query = CandidateCampaign.objects.using('readonly').values('we_vote_id')
+    linked_office_we_vote_id_query = CandidateToOfficeLink.objects.using('readonly').filter(
+        candidate_we_vote_id__in=candidate_we_vote_id_query).values('contest_office_we_vote_id')
+    count_by_field['offices_with_candidates_count'] = count_by_election(
+        ContestOffice.objects.using('readonly').filter(we_vote_id__in=linked_office_we_vote_id_query),
+        google_civic_election_id_list)
+    count_by_field['number_of_candidates'] = count_by_election(
+        CandidateCampaign.objects.using('readonly').all(), google_civic_election_id_list)
+    count_by_field['candidate_count'] = count_by_election(
+        CandidateToOfficeLink.objects.using('readonly').filter(candidate_we_vote_id__in=candidate_we_vote_id_query),
+        google_civic_election_id_list, count_field='candidate_we_vote_id', distinct=True)
+    candidate_without_photo_we_vote_id_query = CandidateCampaign.objects.using('readonly').filter(
+        Q(we_vote_hosted_profile_image_url_tiny__isnull=True) | Q(we_vote_hosted_profile_image_url_tiny='')
+    ).values('we_vote_id')
+    count_by_field['candidates_without_photo_count'] = count_by_election(
+        CandidateToOfficeLink.objects.using('readonly').filter(
+            candidate_we_vote_id__in=candidate_without_photo_we_vote_id_query),
+        google_civic_election_id_list, count_field='candidate_we_vote_id', distinct=True)
+    count_by_field['number_of_measures'] = count_by_election(
+        ContestMeasure.objects.using('readonly').all(), google_civic_election_id_list)
+
+    election_statistics_by_election_id = {}
+    for google_civic_election_id in google_civic_election_id_list:
+        election_statistics_values = {
+            field_name: count_by_field.get(field_name, {}).get(google_civic_election_id, 0)
+            for field_name in ELECTION_STATISTICS_COUNT_FIELD_LIST}
+        # A position counts for an election if it has the election's id, or if it is about a candidate linked to
+        # the election, so we can't count it once with a GROUP BY
+        position_query = PositionEntered.objects.using('readonly').filter(
+            Q(google_civic_election_id=str(google_civic_election_id)) |
+            Q(candidate_campaign_we_vote_id__in=CandidateToOfficeLink.objects.using('readonly').filter(
+                google_civic_election_id=google_civic_election_id).values('candidate_we_vote_id')))
+        election_statistics_values['public_positions_count'] = \
+            position_query.exclude(stance__iexact=PERCENT_RATING).count()
+        election_statistics_values['ballot_returned_count_by_state_json'] = json.dumps(
+            ballot_returned_count_by_state_by_election.get(google_civic_election_id, {}), sort_keys=True)
+        election_statistics_by_election_id[google_civic_election_id] = election_statistics_values
+    return election_statistics_by_election_id
+
+
+def calculate_election_statistics_live(google_civic_election_id):
+    """
+    Count the ElectionStatistics values for one election the way the admin pages used to, one query per count, so
+    we can check the numbers calculate_election_statistics comes up with
+    :param google_civic_election_id:
+    :return: dict of ELECTION_STATISTICS_COUNT_FIELD_LIST values
+    """
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    live_values = {}
+    live_values['voter_address_count'] = VoterAddress.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).count()
+    live_values['voter_ballot_saved_count'] = VoterBallotSaved.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(voter_id=0).count()
+    live_values['voter_ballot_returned_count'] = BallotReturned.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(voter_id=0).exclude(voter_id=None).count()
+    voter_position_entered_query = PositionEntered.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(voter_we_vote_id=None)
+    live_values['voters_with_public_positions_count'] = \
+        voter_position_entered_query.values("voter_we_vote_id").distinct().count()
+    live_values['voter_position_entered_count'] = voter_position_entered_query.count()
+    position_for_friends_query = PositionForFriends.objects.using('readonly').exclude(
+        stance__iexact=PERCENT_RATING).filter(google_civic_election_id=google_civic_election_id)
+    live_values['voters_with_positions_for_friends_count'] = \
+        position_for_friends_query.exclude(voter_we_vote_id=None).values("voter_we_vote_id").distinct().count()
+    live_values['voter_position_for_friends_count'] = position_for_friends_query.count()
+
+    ballot_returned_list_manager = BallotReturnedListManager()
+    live_values['ballot_returned_count'] = \
+        ballot_returned_list_manager.fetch_ballot_returned_list_count_for_election(google_civic_election_id)
+    live_values['polling_location_ballot_returned_count'] = BallotReturned.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(polling_location_we_vote_id=None).count()
+    live_values['ballot_location_display_option_on_count'] = \
+        ballot_returned_list_manager.fetch_ballot_location_display_option_on_count_for_election(
+            google_civic_election_id)
+
+    organization_position_entered_query = PositionEntered.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(organization_we_vote_id=None)
+    live_values['organizations_with_public_positions_count'] = \
+        organization_position_entered_query.values("organization_we_vote_id").distinct().count()
+    live_values['organization_position_entered_count'] = organization_position_entered_query.count()
+    live_values['voter_guides_count'] = VoterGuide.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).exclude(vote_smart_ratings_only=True).count()
+
+    candidate_list_manager = CandidateCampaignListManager()
+    office_list = list(ContestOffice.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id))
+    live_values['number_of_offices'] = len(office_list)
+    offices_with_candidates_count = 0
+    for one_office in office_list:
+        results = candidate_list_manager.retrieve_candidate_count_for_office(office_we_vote_id=one_office.we_vote_id)
+        if positive_value_exists(results['candidate_count']):
+            offices_with_candidates_count += 1
+    live_values['offices_with_candidates_count'] = offices_with_candidates_count
+    live_values['number_of_candidates'] = CandidateCampaign.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).count()
+    results = candidate_list_manager.retrieve_candidate_we_vote_id_list_from_election_list(
+        google_civic_election_id_list=[google_civic_election_id])
+    candidate_we_vote_id_list = results['candidate_we_vote_id_list']
+    candidate_list_query = CandidateCampaign.objects.using('readonly').filter(we_vote_id__in=candidate_we_vote_id_list)
+    live_values['candidate_count'] = candidate_list_query.count()
+    live_values['candidates_without_photo_count'] = candidate_list_query.filter(
+        Q(we_vote_hosted_profile_image_url_tiny__isnull=True) | Q(we_vote_hosted_profile_image_url_tiny='')).count()
+    live_values['number_of_measures'] = ContestMeasure.objects.using('readonly').filter(
+        google_civic_election_id=google_civic_election_id).count()
+    position_query = PositionEntered.objects.using('readonly').filter(
+        Q(google_civic_election_id=google_civic_election_id) |
+        Q(candidate_campaign_we_vote_id__in=candidate_we_vote_id_list))
+    live_values['public_positions_count'] = position_query.exclude(stance__iexact=PERCENT_RATING).count()
+    return live_values
+
+
+def refresh_election_statistics(google_civic_election_id_list):
+    """
+    Recalculate the ElectionStatistics rows for these elections, ELECTION_STATISTICS_CHUNK_SIZE elections at a time
+    :param google_civic_election_id_list:
+    :return:
+    """
+    status = ""
+    success = True
+    google_civic_election_id_list = sorted({convert_to_int(google_civic_election_id)
+                                            for google_civic_election_id in google_civic_election_id_list
+                                            if positive_value_exists(google_civic_election_id)})
+    bulk_upsert = BulkUpsert(ElectionStatistics, ELECTION_STATISTICS_FIELD_LIST + ['date_last_calculated'])
+    try:
+        for start in range(0, len(google_civic_election_id_list), ELECTION_STATISTICS_CHUNK_SIZE):
+            chunk_election_id_list = google_civic_election_id_list[start:start + ELECTION_STATISTICS_CHUNK_SIZE]
+            election_statistics_by_election_id = calculate_election_statistics(chunk_election_id_list)
+            existing_id_by_election_id = {
+                row['google_civic_election_id']: row['id'] for row in ElectionStatistics.objects.filter(
+                    google_civic_election_id__in=chunk_election_id_list).values('id', 'google_civic_election_id')}
+            date_last_calculated = now()
+            for google_civic_election_id, election_statistics_values in election_statistics_by_election_id.items():
+                election_statistics = ElectionStatistics(
+                    google_civic_election_id=google_civic_election_id,
+                    date_last_calculated=date_last_calculated,
+                    **election_statistics_values)
+                bulk_upsert.add(google_civic_election_id, election_statistics,
+                                existing_id=existing_id_by_election_id.get(google_civic_election_id, 0))
+            bulk_upsert.write()
+        status += "ELECTION_STATISTICS_REFRESHED "
+    except Exception as e:
+        status += "ELECTION_STATISTICS_REFRESH_FAILED " + str(e) + " "
+        handle_exception(e, logger=logger, exception_message=status)
+        success = False
+    upsert_results = bulk_upsert.results()
+    results = {
+        'success':              success,
+        'status':               status,
+        'elections_refreshed':  upsert_results['saved'] + upsert_results['updated'],
+        'not_processed':        upsert_results['not_processed'],
+    }
+    return results
+
+
+def retrieve_election_id_list_for_statistics_refresh():
+    """
+    The elections whose numbers are still changing (upcoming, or in the last ELECTION_STATISTICS_ACTIVE_DAYS), the
+    elections that don't have statistics yet, and the ELECTION_STATISTICS_OLDER_ELECTIONS_PER_RUN other elections
+    that were calculated the longest time ago, so late changes to old elections are picked up too
+    """
+    earliest_active_day_text = (now() - timedelta(days=ELECTION_STATISTICS_ACTIVE_DAYS)).strftime("%Y-%m-%d")
+    election_day_by_election_id = {}
+    for row in Election.objects.using('readonly').values('google_civic_election_id', 'election_day_text'):
+        google_civic_election_id = convert_to_int(row['google_civic_election_id'])
+        if positive_value_exists(google_civic_election_id):
+            election_day_by_election_id[google_civic_election_id] = row['election_day_text'] or ''
+    date_last_calculated_by_election_id = {
+        row['google_civic_election_id']: row['date_last_calculated']
+        for row in ElectionStatistics.objects.using('readonly').values(
+            'google_civic_election_id', 'date_last_calculated')}
+
+    google_civic_election_id_list = []
+    older_election_list = []
+    for google_civic_election_id, election_day_text in election_day_by_election_id.items():
+        date_last_calculated = date_last_calculated_by_election_id.get(google_civic_election_id)
+        if date_last_calculated is None or election_day_text >= earliest_active_day_text:
+            google_civic_election_id_list.append(google_civic_election_id)
+        else:
+            older_election_list.append((date_last_calculated, google_civic_election_id))
+    older_election_list.sort()
+    google_civic_election_id_list += [google_civic_election_id for date_last_calculated, google_civic_election_id
+                                      in older_election_list[:ELECTION_STATISTICS_OLDER_ELECTIONS_PER_RUN]]
+    return google_civic_election_id_list
+
+
+def election_statistics_refresh_is_due():
+    refreshed_since = now() - timedelta(minutes=ELECTION_STATISTICS_REFRESH_MINUTES)
+    return not ElectionStatistics.objects.filter(date_last_calculated__gte=refreshed_since).exists()
+
+
+def backfill_election_statistics():
+    """
+    Calculate the statistics for every election
+    """
+    google_civic_election_id_list = [
+        google_civic_election_id for google_civic_election_id
+        in Election.objects.using('readonly').values_list('google_civic_election_id', flat=True)]
+    return refresh_election_statistics(google_civic_election_id_list)
+
+
+def verify_election_statistics(google_civic_election_id_list):
+    """
+    Compare, for each election, the live counts with what calculate_election_statistics calculates now (a
+    difference is a bug) and with the saved ElectionStatistics row (a difference means the row is out of date)
+    :param google_civic_election_id_list:
+    :return:
+    """
+    status = ""
+    google_civic_election_id_list = [convert_to_int(google_civic_election_id)
+                                     for google_civic_election_id in google_civic_election_id_list
+                                     if positive_value_exists(google_civic_election_id)]
+    calculated_by_election_id = calculate_election_statistics(google_civic_election_id_list)
+    results = ElectionStatisticsManager().retrieve_election_statistics_dict(google_civic_election_id_list)
+    status += results['status']
+    election_statistics_dict = results['election_statistics_dict']
+
+    difference_list = []
+    missing_election_id_list = []
+    for google_civic_election_id in google_civic_election_id_list:
+        live_values = calculate_election_statistics_live(google_civic_election_id)
+        calculated_values = calculated_by_election_id.get(google_civic_election_id, {})
+        election_statistics = election_statistics_dict.get(google_civic_election_id)
+        if election_statistics is None:
+            missing_election_id_list.append(google_civic_election_id)
+        for field_name in ELECTION_STATISTICS_COUNT_FIELD_LIST:
+            stored_value = getattr(election_statistics, field_name) if election_statistics else None
+            if live_values[field_name] != calculated_values.get(field_name) or \
+                    (election_statistics is not None and live_values[field_name] != stored_value):
+                difference_list.append({
+                    'google_civic_election_id': google_civic_election_id,
+                    'field':                    field_name,
+                    'live':                     live_values[field_name],
+                    'calculated':               calculated_values.get(field_name),
+                    'stored':                   stored_value,
+                    'date_last_calculated':
+                        str(election_statistics.date_last_calculated) if election_statistics else None,
+                })
+    status += "ELECTION_STATISTICS_VERIFIED "
+    results = {
+        'success':                  True,
+        'status':                   status,
+        'elections_verified':       len(google_civic_election_id_list),
+        'calculation_matches_live': not any(difference['live'] != difference['calculated']
+                                            for difference in difference_list),
+        'difference_list':          difference_list,
+        'missing_election_id_list': missing_election_id_list,
+    }
+    return results
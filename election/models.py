@@ -5,6 +5,7 @@
 from datetime import date, datetime, time
 from django.db import models
 from django.db.models import Max, Q
+import json
 import wevote_functions.admin
 from wevote_functions.functions import convert_date_as_integer_to_date, convert_date_to_date_as_integer, \
     convert_date_to_we_vote_date_string, \
@@ -1064,6 +1065,95 @@ class ElectionManager(models.Model):
         return results
 
 
+class ElectionStatistics(models.Model):
+    """
+    Counts for one election, used by the admin dashboards so they don't have to count every table for every election
+    each time they are shown. Refreshed by the REFRESH_ELECTION_STATISTICS batch process (see
+    refresh_election_statistics in election/controllers.py).
+    """
+    google_civic_election_id = models.PositiveIntegerField(unique=True, null=False)
+    date_last_calculated = models.DateTimeField(null=True, db_index=True)
+
+    # Voters
+    voter_address_count = models.PositiveIntegerField(default=0)
+    voter_ballot_saved_count = models.PositiveIntegerField(default=0)
+    voter_ballot_returned_count = models.PositiveIntegerField(default=0)
+    voters_with_public_positions_count = models.PositiveIntegerField(default=0)
+    voter_position_entered_count = models.PositiveIntegerField(default=0)
+    voters_with_positions_for_friends_count = models.PositiveIntegerField(default=0)
+    voter_position_for_friends_count = models.PositiveIntegerField(default=0)
+
+    # Ballots
+    ballot_returned_count = models.PositiveIntegerField(default=0)
+    polling_location_ballot_returned_count = models.PositiveIntegerField(default=0)
+    ballot_location_display_option_on_count = models.PositiveIntegerField(default=0)
+    # json dict of state code (upper case) -> number of BallotReturned entries
+    ballot_returned_count_by_state_json = models.TextField(null=True, blank=True)
+
+    # Organizations, offices, candidates and measures
+    organizations_with_public_positions_count = models.PositiveIntegerField(default=0)
+    organization_position_entered_count = models.PositiveIntegerField(default=0)
+    public_positions_count = models.PositiveIntegerField(default=0)
+    voter_guides_count = models.PositiveIntegerField(default=0)
+    number_of_offices = models.PositiveIntegerField(default=0)
+    offices_with_candidates_count = models.PositiveIntegerField(default=0)
+    # Candidates with CandidateCampaign.google_civic_election_id set to this election
+    number_of_candidates = models.PositiveIntegerField(default=0)
+    # Candidates linked to this election with CandidateToOfficeLink
+    candidate_count = models.PositiveIntegerField(default=0)
+    candidates_without_photo_count = models.PositiveIntegerField(default=0)
+    number_of_measures = models.PositiveIntegerField(default=0)
+
+    def ballot_returned_count_by_state(self):
+        if not positive_value_exists(self.ballot_returned_count_by_state_json):
+            return {}
+        try:
+            return json.loads(self.ballot_returned_count_by_state_json)
+        except ValueError:
+            return {}
+
+    def offices_without_candidates_count(self):
+        return self.number_of_offices - self.offices_with_candidates_count
+
+    def candidates_without_photo_percentage(self):
+        if not positive_value_exists(self.candidate_count):
+            return 0
+        return 100 * (self.candidates_without_photo_count / self.candidate_count)
+
+
+class ElectionStatisticsManager(models.Manager):
+
+    def __unicode__(self):
+        return "ElectionStatisticsManager"
+
+    def retrieve_election_statistics_dict(self, google_civic_election_id_list=None):
+        """
+        :param google_civic_election_id_list: None for every election
+        :return: dict of google_civic_election_id (integer) -> ElectionStatistics
+        """
+        status = ""
+        success = True
+        election_statistics_dict = {}
+        try:
+            query = ElectionStatistics.objects.using('readonly').all()
+            if google_civic_election_id_list is not None:
+                query = query.filter(google_civic_election_id__in=[
+                    convert_to_int(google_civic_election_id)
+                    for google_civic_election_id in google_civic_election_id_list])
+            for election_statistics in query:
+                election_statistics_dict[election_statistics.google_civic_election_id] = election_statistics
+            status += "ELECTION_STATISTICS_RETRIEVED "
+        except Exception as e:
+            status += "ELECTION_STATISTICS_NOT_RETRIEVED " + str(e) + " "
+            success = False
+        results = {
+            'success':                  success,
+            'status':                   status,
+            'election_statistics_dict': election_statistics_dict,
+        }
+        return results
+
+
 def fetch_election_state(google_civic_election_id):
     google_civic_election_id = convert_to_int(google_civic_election_id)
 
@@ -0,0 +1,145 @@
+# election/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from ballot.models import BallotReturned, VoterBallotSaved
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from django.test import TestCase
+from election.controllers_statistics import calculate_election_statistics_live, ELECTION_STATISTICS_COUNT_FIELD_LIST, \
+    refresh_election_statistics, verify_election_statistics
+from election.models import Election, ElectionStatistics
+from measure.models import ContestMeasure
+from office.models import ContestOffice
+from position.models import OPPOSE, PERCENT_RATING, PositionEntered, PositionForFriends, SUPPORT
+from voter.models import VoterAddress
+from voter_guide.models import VoterGuide
+
+ELECTION_WITH_BALLOTS_ID = 4000
+ELECTION_WITHOUT_BALLOTS_ID = 4001
+OTHER_ELECTION_ID = 4002
+
+
+def create_election_statistics_fixture():
+    """
+    One election with some of everything, one with no ballots or anything else, and rows from another election
+    that must not be counted
+    """
+    election_id = ELECTION_WITH_BALLOTS_ID
+    Election.objects.bulk_create([
+        Election(google_civic_election_id=str(one_election_id), election_name='Election ' + str(one_election_id),
+                 election_day_text='2020-11-03')
+        for one_election_id in [ELECTION_WITH_BALLOTS_ID, ELECTION_WITHOUT_BALLOTS_ID, OTHER_ELECTION_ID]])
+
+    VoterAddress.objects.bulk_create([
+        VoterAddress(voter_id=1, google_civic_election_id=election_id, text_for_map_search='Oakland, CA'),
+        VoterAddress(voter_id=2, google_civic_election_id=election_id, text_for_map_search='Fresno, CA'),
+        VoterAddress(voter_id=3, google_civic_election_id=OTHER_ELECTION_ID, text_for_map_search='Reno, NV'),
+    ])
+    VoterBallotSaved.objects.bulk_create([
+        VoterBallotSaved(voter_id=1, google_civic_election_id=election_id),
+        VoterBallotSaved(voter_id=0, google_civic_election_id=election_id),
+        VoterBallotSaved(voter_id=2, google_civic_election_id=OTHER_ELECTION_ID),
+    ])
+    BallotReturned.objects.bulk_create([
+        BallotReturned(voter_id=1, google_civic_election_id=election_id, normalized_state='ca'),
+        BallotReturned(polling_location_we_vote_id='wv01ploc1', google_civic_election_id=election_id,
+                       normalized_state='CA', ballot_location_display_option_on=True),
+        BallotReturned(polling_location_we_vote_id='wv01ploc2', google_civic_election_id=election_id,
+                       normalized_state='OR'),
+        BallotReturned(polling_location_we_vote_id='wv01ploc3', google_civic_election_id=OTHER_ELECTION_ID,
+                       normalized_state='NV', ballot_location_display_option_on=True),
+    ])
+
+    ContestOffice.objects.bulk_create([
+        ContestOffice(we_vote_id='wv01off1', office_name='Mayor', google_civic_election_id=str(election_id)),
+        ContestOffice(we_vote_id='wv01off2', office_name='Sheriff', google_civic_election_id=str(election_id)),
+        ContestOffice(we_vote_id='wv01off3', office_name='Governor', google_civic_election_id=str(OTHER_ELECTION_ID)),
+    ])
+    CandidateCampaign.objects.bulk_create([
+        CandidateCampaign(we_vote_id='wv01cand1', candidate_name='Candidate One', google_civic_election_id=str(
+            election_id), we_vote_hosted_profile_image_url_tiny='https://example.com/wv01cand1/tiny.png'),
+        CandidateCampaign(we_vote_id='wv01cand2', candidate_name='Candidate Two',
+                          google_civic_election_id=str(election_id)),
+        CandidateCampaign(we_vote_id='wv01cand3', candidate_name='Candidate Three',
+                          google_civic_election_id=str(OTHER_ELECTION_ID)),
+    ])
+    CandidateToOfficeLink.objects.bulk_create([
+        CandidateToOfficeLink(candidate_we_vote_id='wv01cand1', contest_office_we_vote_id='wv01off1',
+                              google_civic_election_id=election_id),
+        CandidateToOfficeLink(candidate_we_vote_id='wv01cand2', contest_office_we_vote_id='wv01off1',
+                              google_civic_election_id=election_id),
+        CandidateToOfficeLink(candidate_we_vote_id='wv01cand3', contest_office_we_vote_id='wv01off3',
+                              google_civic_election_id=OTHER_ELECTION_ID),
+    ])
+    ContestMeasure.objects.bulk_create([
+        ContestMeasure(we_vote_id='wv01meas1', measure_title='Measure A', google_civic_election_id=str(election_id)),
+    ])
+
+    PositionEntered.objects.bulk_create([
+        PositionEntered(we_vote_id='wv01pos1', voter_we_vote_id='wv01voter1', stance=SUPPORT,
+                        google_civic_election_id=str(election_id), candidate_campaign_we_vote_id='wv01cand1'),
+        PositionEntered(we_vote_id='wv01pos2', voter_we_vote_id='wv01voter1', stance=OPPOSE,
+                        google_civic_election_id=str(election_id), candidate_campaign_we_vote_id='wv01cand2'),
+        PositionEntered(we_vote_id='wv01pos3', organization_we_vote_id='wv01org1', stance=SUPPORT,
+                        google_civic_election_id=str(election_id), candidate_campaign_we_vote_id='wv01cand1'),
+        PositionEntered(we_vote_id='wv01pos4', organization_we_vote_id='wv01org2', stance=PERCENT_RATING,
+                        google_civic_election_id=str(election_id), candidate_campaign_we_vote_id='wv01cand2'),
+        # Not tagged with the election, but about a candidate in it
+        PositionEntered(we_vote_id='wv01pos5', organization_we_vote_id='wv01org3', stance=SUPPORT,
+                        google_civic_election_id='', candidate_campaign_we_vote_id='wv01cand2'),
+        PositionEntered(we_vote_id='wv01pos6', organization_we_vote_id='wv01org1', stance=SUPPORT,
+                        google_civic_election_id=str(OTHER_ELECTION_ID), candidate_campaign_we_vote_id='wv01cand3'),
+    ])
+    PositionForFriends.objects.bulk_create([
+        PositionForFriends(we_vote_id='wv01pff1', voter_we_vote_id='wv01voter2', stance=SUPPORT,
+                           google_civic_election_id=str(election_id)),
+        PositionForFriends(we_vote_id='wv01pff2', voter_we_vote_id='wv01voter2', stance=OPPOSE,
+                           google_civic_election_id=str(election_id)),
+        PositionForFriends(we_vote_id='wv01pff3', voter_we_vote_id='wv01voter3', stance=PERCENT_RATING,
+                           google_civic_election_id=str(election_id)),
+    ])
+    VoterGuide.objects.bulk_create([
+        VoterGuide(we_vote_id='wv01vg1', organization_we_vote_id='wv01org1', google_civic_election_id=election_id),
+        VoterGuide(we_vote_id='wv01vg2', organization_we_vote_id='wv01org2', google_civic_election_id=election_id,
+                   vote_smart_ratings_only=True),
+    ])
+
+
+class WeVoteElectionTestsStatistics(TestCase):
+
+    def setUp(self):
+        create_election_statistics_fixture()
+
+    def test_precomputed_statistics_match_live_calculation(self):
+        election_id_list = [ELECTION_WITH_BALLOTS_ID, ELECTION_WITHOUT_BALLOTS_ID]
+        results = refresh_election_statistics(election_id_list)
+        self.assertTrue(results['success'])
+        self.assertEqual(results['elections_refreshed'], 2)
+
+        for election_id in election_id_list:
+            election_statistics = ElectionStatistics.objects.get(google_civic_election_id=election_id)
+            live_values = calculate_election_statistics_live(election_id)
+            self.assertEqual({field_name: getattr(election_statistics, field_name)
+                              for field_name in ELECTION_STATISTICS_COUNT_FIELD_LIST}, live_values)
+
+        results = verify_election_statistics(election_id_list)
+        self.assertTrue(results['calculation_matches_live'])
+        self.assertEqual(results['difference_list'], [])
+        self.assertEqual(results['missing_election_id_list'], [])
+
+    def test_statistics_count_the_fixture(self):
+        refresh_election_statistics([ELECTION_WITH_BALLOTS_ID, ELECTION_WITHOUT_BALLOTS_ID])
+        election_statistics = ElectionStatistics.objects.get(google_civic_election_id=ELECTION_WITH_BALLOTS_ID)
+        # So the test above can't pass by counting nothing in both calculations
+        self.assertEqual(election_statistics.ballot_returned_count, 3)
+        self.assertEqual(election_statistics.voter_ballot_saved_count, 1)
+        self.assertEqual(election_statistics.voters_with_public_positions_count, 1)
+        self.assertEqual(election_statistics.offices_with_candidates_count, 1)
+        self.assertEqual(election_statistics.candidates_without_photo_count, 1)
+        self.assertEqual(election_statistics.public_positions_count, 4)
+        self.assertEqual(election_statistics.ballot_returned_count_by_state_json, '{"CA": 2, "OR": 1}')
+
+        election_statistics = ElectionStatistics.objects.get(google_civic_election_id=ELECTION_WITHOUT_BALLOTS_ID)
+        for field_name in ELECTION_STATISTICS_COUNT_FIELD_LIST:
+            self.assertEqual(getattr(election_statistics, field_name), 0, field_name)
+        self.assertEqual(election_statistics.ballot_returned_count_by_state_json, '{}')
@@ -22,6 +22,10 @@ urlpatterns = [
     url(r'^(?P<election_local_id>[0-9]+)/election_one_ballot_retrieve/$',
         views_admin.election_one_ballot_retrieve_view, name='election_one_ballot_retrieve'),
     url(r'^election_migration/$', views_admin.election_migration_view, name='election_migration'),
+    url(r'^election_statistics_backfill/$',
+        views_admin.election_statistics_backfill_view, name='election_statistics_backfill'),
+    url(r'^election_statistics_verify/$',
+        views_admin.election_statistics_verify_view, name='election_statistics_verify'),
     url(r'^election_remote_retrieve/$', views_admin.election_remote_retrieve_view, name='election_remote_retrieve'),
     url(r'^import/$',
         views_admin.elections_import_from_master_server_view, name='elections_import_from_master_server'),
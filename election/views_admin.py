@@ -3,7 +3,8 @@
 # -*- coding: UTF-8 -*-
 
 from .controllers import election_remote_retrieve, elections_import_from_master_server
-from .models import Election
+from .controllers_statistics import backfill_election_statistics, verify_election_statistics
+from .models import Election, ElectionStatistics, ElectionStatisticsManager
 from admin_tools.views import redirect_to_sign_in_page
 from analytics.models import AnalyticsManager
 from ballot.models import BallotItem, BallotItemListManager, \
@@ -13,8 +14,9 @@ from candidate.models import CandidateCampaign, CandidateCampaignListManager, Ca
     CandidateToOfficeLink
 from config.base import get_environment_variable
 import copy
+import json
 from datetime import datetime, timedelta
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from django.utils.timezone import now
 from django.urls import reverse
 from django.contrib import messages
@@ -60,6 +62,8 @@ logger = wevote_functions.admin.get_logger(__name__)
 
 ELECTIONS_SYNC_URL = get_environment_variable("ELECTIONS_SYNC_URL")  # electionsSyncOut
 WE_VOTE_SERVER_ROOT_URL = get_environment_variable("WE_VOTE_SERVER_ROOT_URL")
+# The number of recent elections election_statistics_verify_view checks when not given one
+ELECTION_STATISTICS_VERIFY_COUNT = 10
 
 
 def test_view(request):
@@ -843,10 +847,13 @@ def election_list_view(request):
 
             election_list_query = election_list_query.filter(final_filters)
 
-    election_list = election_list_query[:200]
+    election_list = list(election_list_query[:200])
     election_list_modified = []
     ballot_returned_list_manager = BallotReturnedListManager()
     candidate_list_manager = CandidateCampaignListManager()
+    results = ElectionStatisticsManager().retrieve_election_statistics_dict(
+        [election.google_civic_election_id for election in election_list])
+    election_statistics_dict = results['election_statistics_dict']
     for election in election_list:
         if positive_value_exists(election.election_day_text):
             try:
@@ -861,9 +868,37 @@ def election_list_view(request):
         # How many offices?
         office_list_query = ContestOffice.objects.all()
         office_list_query = office_list_query.filter(google_civic_election_id=election.google_civic_election_id)
-        election.office_count = office_list_query.count()
-
-        if positive_value_exists(show_election_statistics):
+        election_statistics = election_statistics_dict.get(convert_to_int(election.google_civic_election_id))
+        if election_statistics is not None:
+            election.office_count = election_statistics.number_of_offices
+        else:
+            election.office_count = office_list_query.count()
+
+        if positive_value_exists(show_election_statistics) and election_statistics is not None \
+                and not positive_value_exists(state_code):
+            # Calculated by the REFRESH_ELECTION_STATISTICS batch process
+            if positive_value_exists(election.state_code):
+                election.ballot_returned_count = election_statistics.ballot_returned_count_by_state().get(
+                    election.state_code.upper(), 0)
+                election.ballot_location_display_option_on_count = \
+                    ballot_returned_list_manager.fetch_ballot_location_display_option_on_count_for_election(
+                        election.google_civic_election_id, election.state_code)
+            else:
+                election.ballot_returned_count = election_statistics.ballot_returned_count
+                election.ballot_location_display_option_on_count = \
+                    election_statistics.ballot_location_display_option_on_count
+            election.offices_with_candidates_count = election_statistics.offices_with_candidates_count
+            election.offices_without_candidates_count = election_statistics.offices_without_candidates_count()
+            election.candidate_count = election_statistics.candidate_count
+            election.candidates_without_photo_count = election_statistics.candidates_without_photo_count
+            if positive_value_exists(election.candidate_count):
+                election.candidates_without_photo_percentage = \
+                    election_statistics.candidates_without_photo_percentage()
+            election.measure_count = election_statistics.number_of_measures
+            election.voter_guides_count = election_statistics.voter_guides_count
+            election.public_positions_count = election_statistics.public_positions_count
+            election.date_statistics_last_calculated = election_statistics.date_last_calculated
+        elif positive_value_exists(show_election_statistics):
             google_civic_election_id_list = [election.google_civic_election_id]
             results = candidate_list_manager.retrieve_candidate_we_vote_id_list_from_election_list(
                 google_civic_election_id_list=google_civic_election_id_list,
@@ -1339,6 +1374,52 @@ def election_remote_retrieve_view(request):
     return HttpResponseRedirect(reverse('election:election_list', args=()))
 
 
+@login_required
+def election_statistics_backfill_view(request):
+    """
+    Recalculate the ElectionStatistics for every election now, instead of waiting for REFRESH_ELECTION_STATISTICS
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    results = backfill_election_statistics()
+    if results['success']:
+        messages.add_message(request, messages.INFO,
+                             "Election statistics calculated for " + str(results['elections_refreshed']) +
+                             " elections.")
+    else:
+        messages.add_message(request, messages.ERROR, results['status'])
+    return HttpResponseRedirect(reverse('admin_tools:data_voter_statistics', args=()))
+
+
+@login_required
+def election_statistics_verify_view(request):
+    """
+    Count the election statistics the slow way, and show where they differ from the saved ElectionStatistics.
+    Without google_civic_election_id, checks the ELECTION_STATISTICS_VERIFY_COUNT most recent elections.
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    google_civic_election_id = convert_to_int(request.GET.get('google_civic_election_id', 0))
+    if positive_value_exists(google_civic_election_id):
+        google_civic_election_id_list = [google_civic_election_id]
+    else:
+        google_civic_election_id_list = list(ElectionStatistics.objects.using('readonly').order_by(
+            '-google_civic_election_id').values_list('google_civic_election_id', flat=True)[
+            :ELECTION_STATISTICS_VERIFY_COUNT])
+    json_data = verify_election_statistics(google_civic_election_id_list)
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+
 @login_required()
 def election_summary_view(request, election_local_id=0, google_civic_election_id=''):
     # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
@@ -1409,9 +1490,17 @@ def election_summary_view(request, election_local_id=0, google_civic_election_id
         batch_manager = BatchManager()
         state_list = STATE_CODE_MAP
         state_list_modified = {}
+        results = ElectionStatisticsManager().retrieve_election_statistics_dict([election.google_civic_election_id])
+        election_statistics = results['election_statistics_dict'].get(
+            convert_to_int(election.google_civic_election_id))
         for one_state_code, one_state_name in state_list.items():
-            ballot_returned_count = ballot_returned_list_manager.fetch_ballot_returned_list_count_for_election(
-                election.google_civic_election_id, one_state_code)
+            if election_statistics is not None:
+                # Calculated by the REFRESH_ELECTION_STATISTICS batch process, instead of one count per state
+                ballot_returned_count = election_statistics.ballot_returned_count_by_state().get(
+                    one_state_code.upper(), 0)
+            else:
+                ballot_returned_count = ballot_returned_list_manager.fetch_ballot_returned_list_count_for_election(
+                    election.google_civic_election_id, one_state_code)
 
             state_name_modified = one_state_name
             if positive_value_exists(ballot_returned_count):
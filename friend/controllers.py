@@ -1895,6 +1895,8 @@ def friend_list_for_api(voter_device_id,  # friendList
         status += retrieve_current_friends_as_voters_results['status']
         if retrieve_current_friends_as_voters_results['friend_list_found']:
             current_friend_list = retrieve_current_friends_as_voters_results['friend_list']
+            mutual_friends_count_dict = friend_manager.fetch_mutual_friends_count_dict(
+                voter.we_vote_id, [friend_voter.we_vote_id for friend_voter in current_friend_list])
             for friend_voter in current_friend_list:
                 if not positive_value_exists(friend_voter.linked_organization_we_vote_id):
                     # We need to retrieve another voter object that can be saved
@@ -1921,7 +1923,7 @@ def friend_list_for_api(voter_device_id,  # friendList
                             status += "VOTER_COULD_NOT_BE_HEALED " + heal_results['status']
                     else:
                         status += "COULD_NOT_RETRIEVE_VOTER_THAT_CAN_BE_SAVED " + voter_results['status']
-                mutual_friends = friend_manager.fetch_mutual_friends_count(voter.we_vote_id, friend_voter.we_vote_id)
+                mutual_friends = mutual_friends_count_dict.get(friend_voter.we_vote_id, 0)
                 positions_taken = position_metrics_manager.fetch_positions_count_for_this_voter(friend_voter)
                 one_friend = {
                     "voter_we_vote_id":                 friend_voter.we_vote_id,
@@ -1952,6 +1954,9 @@ def friend_list_for_api(voter_device_id,  # friendList
         status += retrieve_invitations_processed_results['status']
         if retrieve_invitations_processed_results['friend_list_found']:
             raw_friend_list = retrieve_invitations_processed_results['friend_list']
+            mutual_friends_count_dict = friend_manager.fetch_mutual_friends_count_dict(
+                voter.we_vote_id, [one_friend_invitation.sender_voter_we_vote_id
+                                   for one_friend_invitation in raw_friend_list])
             for one_friend_invitation in raw_friend_list:
                 # Augment the line with voter information
                 friend_voter_results = voter_manager.retrieve_voter_by_we_vote_id(
@@ -1961,8 +1966,7 @@ def friend_list_for_api(voter_device_id,  # friendList
                     recipient_voter_email = one_friend_invitation.recipient_voter_email \
                         if hasattr(one_friend_invitation, "recipient_voter_email") \
                         else ""
-                    mutual_friends = friend_manager.fetch_mutual_friends_count(
-                        voter.we_vote_id, friend_voter.we_vote_id)
+                    mutual_friends = mutual_friends_count_dict.get(friend_voter.we_vote_id, 0)
                     positions_taken = position_metrics_manager.fetch_positions_count_for_this_voter(friend_voter)
                     one_friend = {
                         "voter_we_vote_id":                 friend_voter.we_vote_id,
@@ -1996,6 +2000,9 @@ def friend_list_for_api(voter_device_id,  # friendList
             heal_results = heal_friend_invitations_sent_to_me(voter.we_vote_id, raw_friend_list)
             verified_friend_list = heal_results['friend_list']
             status += heal_results['status']
+            mutual_friends_count_dict = friend_manager.fetch_mutual_friends_count_dict(
+                voter.we_vote_id, [one_friend_invitation.sender_voter_we_vote_id
+                                   for one_friend_invitation in verified_friend_list])
             for one_friend_invitation in verified_friend_list:
                 # Augment the line with voter information
                 friend_voter_results = voter_manager.retrieve_voter_by_we_vote_id(
@@ -2005,8 +2012,7 @@ def friend_list_for_api(voter_device_id,  # friendList
                     recipient_voter_email = one_friend_invitation.recipient_voter_email \
                         if hasattr(one_friend_invitation, "recipient_voter_email") \
                         else ""
-                    mutual_friends = friend_manager.fetch_mutual_friends_count(
-                        voter.we_vote_id, friend_voter.we_vote_id)
+                    mutual_friends = mutual_friends_count_dict.get(friend_voter.we_vote_id, 0)
                     positions_taken = position_metrics_manager.fetch_positions_count_for_this_voter(friend_voter)
                     one_friend = {
                         "voter_we_vote_id":                 friend_voter.we_vote_id,
@@ -2038,6 +2044,9 @@ def friend_list_for_api(voter_device_id,  # friendList
         status += retrieve_invitations_sent_by_me_results['status']
         if retrieve_invitations_sent_by_me_results['friend_list_found']:
             raw_friend_list = retrieve_invitations_sent_by_me_results['friend_list']
+            mutual_friends_count_dict = friend_manager.fetch_mutual_friends_count_dict(
+                voter.we_vote_id, [getattr(one_friend_invitation, 'recipient_voter_we_vote_id', '')
+                                   for one_friend_invitation in raw_friend_list])
             for one_friend_invitation in raw_friend_list:
                 # Two kinds of invitations come in the raw_friend_list, 1) an invitation connected to voter
                 # 2) an invitation to a previously unrecognized email address
@@ -2055,8 +2064,7 @@ def friend_list_for_api(voter_device_id,  # friendList
                     if friend_voter_results['voter_found']:
                         friend_voter = friend_voter_results['voter']
                         positions_taken = position_metrics_manager.fetch_positions_count_for_this_voter(friend_voter)
-                        mutual_friends = friend_manager.fetch_mutual_friends_count(
-                            voter.we_vote_id, friend_voter.we_vote_id)
+                        mutual_friends = mutual_friends_count_dict.get(friend_voter.we_vote_id, 0)
                         one_friend = {
                             "voter_we_vote_id":                 friend_voter.we_vote_id,
                             "voter_date_last_changed":          friend_voter.date_last_changed.strftime('%Y-%m-%d %H:%M:%S'),
@@ -2139,6 +2147,8 @@ def friend_list_for_api(voter_device_id,  # friendList
         status += retrieve_suggested_friend_list_as_voters_results['status']
         if retrieve_suggested_friend_list_as_voters_results['friend_list_found']:
             suggested_friend_list = retrieve_suggested_friend_list_as_voters_results['friend_list']
+            mutual_friends_count_dict = friend_manager.fetch_mutual_friends_count_dict(
+                voter.we_vote_id, [suggested_friend.we_vote_id for suggested_friend in suggested_friend_list])
             for suggested_friend in suggested_friend_list:
                 if not positive_value_exists(suggested_friend.linked_organization_we_vote_id):
                     # We need to retrieve another voter object that can be saved
@@ -2157,8 +2167,7 @@ def friend_list_for_api(voter_device_id,  # friendList
                             status += "SUGGESTED_FRIEND_VOTER_COULD_NOT_BE_HEALED " + heal_results['status']
                     else:
                         status += "SUGGESTED-COULD_NOT_RETRIEVE_VOTER_THAT_CAN_BE_SAVED " + voter_results['status']
-                mutual_friends = \
-                    friend_manager.fetch_mutual_friends_count(voter.we_vote_id, suggested_friend.we_vote_id)
+                mutual_friends = mutual_friends_count_dict.get(suggested_friend.we_vote_id, 0)
                 positions_taken = position_metrics_manager.fetch_positions_count_for_this_voter(suggested_friend)
                 one_friend = {
                     "voter_we_vote_id":                 suggested_friend.we_vote_id,
@@ -5,6 +5,7 @@
 from django.db import models
 from django.db.models import Q
 from email_outbound.models import EmailManager
+from itertools import combinations
 from wevote_functions.functions import convert_to_int, positive_value_exists
 from voter.models import VoterManager
 
@@ -43,6 +44,8 @@ FRIENDS_IN_COMMON = 'FRIENDS_IN_COMMON'
 IGNORED_FRIEND_INVITATIONS = 'IGNORED_FRIEND_INVITATIONS'
 SUGGESTED_FRIEND_LIST = 'SUGGESTED_FRIEND_LIST'
 
+SUGGESTED_FRIEND_BULK_CREATE_BATCH_SIZE = 1000
+
 
 class CurrentFriend(models.Model):
     """
@@ -767,50 +770,91 @@ class FriendManager(models.Model):
 
     def fetch_mutual_friends_count(self, voter_we_vote_id, friend_we_vote_id):
         """
-        TODO: This could be converted to database only calculation for better speed
         :param voter_we_vote_id:
         :param friend_we_vote_id:
         :return:
         """
-        mutual_friends_count = 0
-
         if not positive_value_exists(voter_we_vote_id) or not positive_value_exists(friend_we_vote_id):
-            return mutual_friends_count
-
-        voter_friends_we_vote_id_list = []
-        friend_friends_we_vote_id_list = []
-
-        try:
-            voter_friends_queryset = CurrentFriend.objects.using('readonly').all()
-            voter_friends_queryset = voter_friends_queryset.filter(
-                Q(viewer_voter_we_vote_id__iexact=voter_we_vote_id) |
-                Q(viewee_voter_we_vote_id__iexact=voter_we_vote_id))
-            voter_friends_list = list(voter_friends_queryset)
-            for one_friend in voter_friends_list:
-                voter_friends_we_vote_id_list.append(one_friend.fetch_other_voter_we_vote_id(voter_we_vote_id))
-        except Exception as e:
-            mutual_friends_count = 0
-            return mutual_friends_count
+            return 0
+        return self.fetch_mutual_friends_count_dict(voter_we_vote_id, [friend_we_vote_id]).get(friend_we_vote_id, 0)
 
+    def fetch_mutual_friends_count_dict(self, voter_we_vote_id, other_voter_we_vote_id_list, read_only=True):
+        """
+        How many friends voter_we_vote_id has in common with each of the other voters, with two queries no matter
+        how many friends or other voters there are
+        :param voter_we_vote_id:
+        :param other_voter_we_vote_id_list:
+        :param read_only:
+        :return: dict of other voter we_vote_id -> mutual friends count, for the voters with at least one
+        """
+        other_voter_we_vote_id_set = {other_voter_we_vote_id for other_voter_we_vote_id in other_voter_we_vote_id_list
+                                      if positive_value_exists(other_voter_we_vote_id)}
+        if not positive_value_exists(voter_we_vote_id) or not other_voter_we_vote_id_set:
+            return {}
         try:
-            friend_friends_queryset = CurrentFriend.objects.using('readonly').all()
-            friend_friends_queryset = friend_friends_queryset.filter(
-                Q(viewer_voter_we_vote_id__iexact=friend_we_vote_id) |
-                Q(viewee_voter_we_vote_id__iexact=friend_we_vote_id))
-            friend_friends_list = list(friend_friends_queryset)
-            for one_friend in friend_friends_list:
-                friend_friends_we_vote_id_list.append(one_friend.fetch_other_voter_we_vote_id(friend_we_vote_id))
+            friends_we_vote_id_set = self.retrieve_friends_we_vote_id_dict(
+                [voter_we_vote_id], read_only=read_only).get(voter_we_vote_id, set())
+            if not friends_we_vote_id_set:
+                return {}
+            # The friendships between one of the other voters and one of the voter's friends, in either direction
+            if positive_value_exists(read_only):
+                current_friend_queryset = CurrentFriend.objects.using('readonly').all()
+            else:
+                current_friend_queryset = CurrentFriend.objects.all()
+            current_friend_queryset = current_friend_queryset.filter(
+                Q(viewer_voter_we_vote_id__in=other_voter_we_vote_id_set,
+                  viewee_voter_we_vote_id__in=friends_we_vote_id_set) |
+                Q(viewee_voter_we_vote_id__in=other_voter_we_vote_id_set,
+                  viewer_voter_we_vote_id__in=friends_we_vote_id_set))
+            mutual_friend_pair_set = set()
+            for viewer_voter_we_vote_id, viewee_voter_we_vote_id in current_friend_queryset.values_list(
+                    'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id'):
+                if viewer_voter_we_vote_id in other_voter_we_vote_id_set and \
+                        viewee_voter_we_vote_id in friends_we_vote_id_set:
+                    mutual_friend_pair_set.add((viewer_voter_we_vote_id, viewee_voter_we_vote_id))
+                if viewee_voter_we_vote_id in other_voter_we_vote_id_set and \
+                        viewer_voter_we_vote_id in friends_we_vote_id_set:
+                    mutual_friend_pair_set.add((viewee_voter_we_vote_id, viewer_voter_we_vote_id))
         except Exception as e:
-            mutual_friends_count = 0
-            return mutual_friends_count
+            return {}
 
-        voter_set = set(voter_friends_we_vote_id_list)
-        friend_set = set(friend_friends_we_vote_id_list)
-        mutual_set = voter_set & friend_set
-        if mutual_set:
-            mutual_friends_count = len(mutual_set)
+        mutual_friends_count_dict = {}
+        for other_voter_we_vote_id, mutual_friend_we_vote_id in mutual_friend_pair_set:
+            if other_voter_we_vote_id != mutual_friend_we_vote_id:
+                mutual_friends_count_dict[other_voter_we_vote_id] = \
+                    mutual_friends_count_dict.get(other_voter_we_vote_id, 0) + 1
+        return mutual_friends_count_dict
 
-        return mutual_friends_count
+    def retrieve_friends_we_vote_id_dict(self, voter_we_vote_id_list, read_only=True):
+        """
+        The friends of each of these voters, with one query. Unlike the lookups that use __iexact, the we_vote_ids
+        have to match exactly, so the database can use its indexes.
+        :param voter_we_vote_id_list:
+        :param read_only:
+        :return: dict of voter we_vote_id -> set of friend we_vote_ids
+        """
+        voter_we_vote_id_set = {voter_we_vote_id for voter_we_vote_id in voter_we_vote_id_list
+                                if positive_value_exists(voter_we_vote_id)}
+        friends_we_vote_id_dict = {}
+        if not voter_we_vote_id_set:
+            return friends_we_vote_id_dict
+        if positive_value_exists(read_only):
+            current_friend_queryset = CurrentFriend.objects.using('readonly').all()
+        else:
+            current_friend_queryset = CurrentFriend.objects.all()
+        current_friend_queryset = current_friend_queryset.filter(
+            Q(viewer_voter_we_vote_id__in=voter_we_vote_id_set) | Q(viewee_voter_we_vote_id__in=voter_we_vote_id_set))
+        for viewer_voter_we_vote_id, viewee_voter_we_vote_id in current_friend_queryset.values_list(
+                'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id'):
+            if not positive_value_exists(viewer_voter_we_vote_id) or \
+                    not positive_value_exists(viewee_voter_we_vote_id) or \
+                    viewer_voter_we_vote_id == viewee_voter_we_vote_id:
+                continue
+            if viewer_voter_we_vote_id in voter_we_vote_id_set:
+                friends_we_vote_id_dict.setdefault(viewer_voter_we_vote_id, set()).add(viewee_voter_we_vote_id)
+            if viewee_voter_we_vote_id in voter_we_vote_id_set:
+                friends_we_vote_id_dict.setdefault(viewee_voter_we_vote_id, set()).add(viewer_voter_we_vote_id)
+        return friends_we_vote_id_dict
 
     def fetch_suggested_friends_count(self, voter_we_vote_id):
         suggested_friends_count = 0
@@ -2019,35 +2063,70 @@ class FriendManager(models.Model):
         :param read_only:
         :return:
         """
-        all_friends_one_person_results = self.retrieve_current_friends(starting_voter_we_vote_id, read_only=read_only)
+        return self.update_suggested_friends_for_voter_list([starting_voter_we_vote_id], read_only=read_only)
+
+    def update_suggested_friends_for_voter_list(self, starting_voter_we_vote_id_list, read_only=False):
+        """
+        For each starting voter, suggest each of their friends to each other (Ex/ You have the friends Jo and Pat.
+        Jo and Pat see each other as suggested friends), unless they are already friends or already suggested.
+        This takes three queries and one bulk INSERT, however many friends the starting voters have.
+        :param starting_voter_we_vote_id_list:
+        :param read_only: See update_suggested_friends_starting_with_one_voter
+        :return:
+        """
+        status = ""
+        success = True
         suggested_friend_created_count = 0
-        if all_friends_one_person_results['current_friend_list_found']:
-            current_friend_list = all_friends_one_person_results['current_friend_list']
-            # For each friend on this list, suggest every other friend as a possible friend
-            # Ex/ You have the friends Jo and Pat. This routine makes sure they both see each other as suggested friends
-            for one_current_friend_to_suggest in current_friend_list:
-                first_voter_we_vote_id = one_current_friend_to_suggest.fetch_other_voter_we_vote_id(
-                    starting_voter_we_vote_id)
-                for second_current_friend_to_suggest in current_friend_list:
-                    second_voter_we_vote_id = second_current_friend_to_suggest.fetch_other_voter_we_vote_id(
-                        starting_voter_we_vote_id)
-                    if positive_value_exists(first_voter_we_vote_id) and \
-                            positive_value_exists(second_voter_we_vote_id) and \
-                            first_voter_we_vote_id != second_voter_we_vote_id:
-                        # Are they already friends?
-                        already_friend_results = self.retrieve_current_friend(first_voter_we_vote_id,
-                                                                              second_voter_we_vote_id)
-                        if not already_friend_results['current_friend_found']:
-                            suggested_friend_results = self.update_or_create_suggested_friend(first_voter_we_vote_id,
-                                                                                              second_voter_we_vote_id)
-                            if suggested_friend_results['suggested_friend_created'] or \
-                                    suggested_friend_results['suggested_friend_found']:
-                                suggested_friend_created_count += 1
+        suggested_friend_new_count = 0
+        try:
+            friends_we_vote_id_dict = self.retrieve_friends_we_vote_id_dict(
+                starting_voter_we_vote_id_list, read_only=read_only)
+            # For each starting voter, each pair of their friends, with the lower we_vote_id first
+            pair_set_by_starting_voter = {
+                starting_voter_we_vote_id: set(combinations(sorted(friends_we_vote_id_set), 2))
+                for starting_voter_we_vote_id, friends_we_vote_id_set in friends_we_vote_id_dict.items()}
+            pair_set = set().union(*pair_set_by_starting_voter.values())
+            friend_of_friend_we_vote_id_set = {we_vote_id for pair in pair_set for we_vote_id in pair}
+
+            if pair_set:
+                # Are they already friends?
+                already_friends_dict = self.retrieve_friends_we_vote_id_dict(
+                    friend_of_friend_we_vote_id_set, read_only=read_only)
+                pair_set = {pair for pair in pair_set if pair[1] not in already_friends_dict.get(pair[0], set())}
+
+            if pair_set:
+                if positive_value_exists(read_only):
+                    suggested_friend_queryset = SuggestedFriend.objects.using('readonly').all()
+                else:
+                    suggested_friend_queryset = SuggestedFriend.objects.all()
+                suggested_friend_queryset = suggested_friend_queryset.filter(
+                    viewer_voter_we_vote_id__in=friend_of_friend_we_vote_id_set,
+                    viewee_voter_we_vote_id__in=friend_of_friend_we_vote_id_set)
+                already_suggested_pair_set = {
+                    tuple(sorted(pair)) for pair in suggested_friend_queryset.values_list(
+                        'viewer_voter_we_vote_id', 'viewee_voter_we_vote_id')}
+                new_pair_list = sorted(pair_set - already_suggested_pair_set)
+                SuggestedFriend.objects.bulk_create([
+                    SuggestedFriend(viewer_voter_we_vote_id=viewer_voter_we_vote_id,
+                                    viewee_voter_we_vote_id=viewee_voter_we_vote_id)
+                    for viewer_voter_we_vote_id, viewee_voter_we_vote_id in new_pair_list],
+                    batch_size=SUGGESTED_FRIEND_BULK_CREATE_BATCH_SIZE)
+                suggested_friend_new_count = len(new_pair_list)
+                # Counted like the one pair at a time loop used to: each friend suggested to each other friend of
+                # each starting voter, whether the suggestion was created or found
+                for starting_voter_pair_set in pair_set_by_starting_voter.values():
+                    suggested_friend_created_count += 2 * len(starting_voter_pair_set & pair_set)
+            status += "UPDATE_SUGGESTED_FRIENDS_COMPLETED "
+        except Exception as e:
+            success = False
+            status += "UPDATE_SUGGESTED_FRIENDS_FAILED " + str(e) + " "
 
         results = {
-            'status':                           "UPDATE_SUGGESTED_FRIENDS_COMPLETED ",
-            'success':                          True,
+            'status':                           status,
+            'success':                          success,
             'suggested_friend_created_count':   suggested_friend_created_count,
+            # The SuggestedFriend rows we added
+            'suggested_friend_new_count':       suggested_friend_new_count,
         }
         return results
 
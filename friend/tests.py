@@ -0,0 +1,45 @@
+# friend/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+from friend.models import CurrentFriend, FriendManager, SuggestedFriend
+
+
+def create_friendships(voter_we_vote_id, friend_we_vote_id_list):
+    CurrentFriend.objects.bulk_create([
+        CurrentFriend(viewer_voter_we_vote_id=voter_we_vote_id, viewee_voter_we_vote_id=friend_we_vote_id)
+        for friend_we_vote_id in friend_we_vote_id_list])
+
+
+class WeVoteFriendTestsFriendGraph(TestCase):
+
+    def setUp(self):
+        self.friend_we_vote_id_list = ['wv01voter{number}'.format(number=number) for number in range(100)]
+        create_friendships('wv01voter1000', self.friend_we_vote_id_list)
+        # wv01voter0 and wv01voter1 are already friends, in the other direction
+        create_friendships('wv01voter1', ['wv01voter0'])
+        # wv01voter2000 shares three friends with wv01voter1000
+        create_friendships('wv01voter2000', self.friend_we_vote_id_list[:3])
+        SuggestedFriend.objects.create(viewer_voter_we_vote_id='wv01voter3', viewee_voter_we_vote_id='wv01voter2')
+        self.friend_manager = FriendManager()
+
+    def test_mutual_friends_count_with_constant_queries(self):
+        with self.assertNumQueries(2):
+            mutual_friends_count_dict = self.friend_manager.fetch_mutual_friends_count_dict(
+                'wv01voter1000', ['wv01voter2000', 'wv01voter0', 'wv01voter50'], read_only=False)
+        self.assertEqual(mutual_friends_count_dict, {'wv01voter2000': 3, 'wv01voter0': 1})
+
+    def test_suggested_friends_with_constant_queries(self):
+        # 3 queries, then the 4948 new suggestions in INSERTs of SUGGESTED_FRIEND_BULK_CREATE_BATCH_SIZE
+        with self.assertNumQueries(3 + 5):
+            results = self.friend_manager.update_suggested_friends_starting_with_one_voter('wv01voter1000')
+        self.assertTrue(results['success'])
+        # Every pair of the 100 friends, except the pair who are already friends and the pair already suggested
+        self.assertEqual(results['suggested_friend_new_count'], 100 * 99 // 2 - 2)
+        # Each friend suggested to each other friend, including the suggestion we found
+        self.assertEqual(results['suggested_friend_created_count'], 2 * (100 * 99 // 2 - 1))
+        self.assertEqual(SuggestedFriend.objects.count(), 100 * 99 // 2 - 1)
+        results = self.friend_manager.update_suggested_friends_starting_with_one_voter('wv01voter1000')
+        self.assertEqual(results['suggested_friend_new_count'], 0)
+        self.assertEqual(results['suggested_friend_created_count'], 2 * (100 * 99 // 2 - 1))
@@ -3,9 +3,8 @@
 # -*- coding: UTF-8 -*-
 
 import sys
-import geoip2.database
+from geoip.geoip_reader import geoip_city_reader
 import wevote_functions.admin
-from config.base import get_environment_variable_default
 from wevote_functions.functions import get_ip_from_headers, positive_value_exists
 
 logger = wevote_functions.admin.get_logger(__name__)
@@ -58,15 +57,10 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
 
         return response_content
 
-    try:
-        database_location = get_environment_variable_default('GEOLITE2_DATABASE_LOCATION',
-                                                             'geoip2/city-db/GeoLite2-City.mmdb')
-        reader = geoip2.database.Reader(database_location)
-        response = reader.city(ip_address)
-
-    except geoip2.errors.AddressNotFoundError as e:
+    location = geoip_city_reader.retrieve_location(ip_address)
+    if location is None:
         if 'test' not in sys.argv:
-            logger.error("voter_location_retrieve_from_ip_for_api ip " + ip_address + " not found: " + str(e))
+            logger.error("voter_location_retrieve_from_ip_for_api ip " + ip_address + " not found")
 
         response_content = {
             'success':              True,
@@ -90,18 +84,18 @@ def voter_location_retrieve_from_ip_for_api(request, ip_address=''):
     success = True
     voter_location_found = False
     try:
-        if response.city.name:
-            city = response.city.name
+        if location['city']:
+            city = location['city']
             voter_location += city
-            if response.subdivisions.most_specific.iso_code or response.postal.code:
+            if location['region'] or location['postal_code']:
                 voter_location += ', '
-        if response.subdivisions.most_specific.iso_code:
-            region = response.subdivisions.most_specific.iso_code
+        if location['region']:
+            region = location['region']
             voter_location += region
-            if response.postal.code:
+            if location['postal_code']:
                 voter_location += ' '
-        if response.postal.code:
-            postal_code = response.postal.code
+        if location['postal_code']:
+            postal_code = location['postal_code']
             voter_location += postal_code
         if positive_value_exists(voter_location):
             status = 'LOCATION_FOUND'
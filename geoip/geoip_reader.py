@@ -0,0 +1,136 @@
+# geoip/geoip_reader.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# voterLocationRetrieveFromIP used to open GeoLite2-City.mmdb on every call. GeoIPCityReader opens it once per process
+# (memory-mapped), reopens it when update_geoip_data or a deploy replaces the file, and remembers the location found
+# for each /24 (IPv4) or /48 (IPv6) network, since the city database almost never distinguishes between addresses
+# that close together.
+
+from collections import OrderedDict
+from config.base import get_environment_variable_default
+import geoip2.database
+import geoip2.errors
+import ipaddress
+import os
+import threading
+import time
+from wevote_functions.functions import convert_to_int
+
+GEOIP_PREFIX_CACHE_MAX_ENTRIES = convert_to_int(get_environment_variable_default('GEOIP_PREFIX_CACHE_MAX_ENTRIES', 50000))
+# How often we check whether the mmdb file has been replaced
+GEOIP_RELOAD_CHECK_SECONDS = convert_to_int(get_environment_variable_default('GEOIP_RELOAD_CHECK_SECONDS', 60))
+
+
+def fetch_geolite2_database_location():
+    return get_environment_variable_default('GEOLITE2_DATABASE_LOCATION', 'geoip2/city-db/GeoLite2-City.mmdb')
+
+
+def generate_ip_prefix_key(ip_address):
+    """
+    The /24 or /48 network an address belongs to. Raises ValueError for anything that isn't an IP address.
+    """
+    ip = ipaddress.ip_address(ip_address)
+    if ip.version == 4:
+        return 4, int(ip) >> 8
+    return 6, int(ip) >> 80
+
+
+def extract_location_from_city_response(response):
+    return {
+        'city':         response.city.name or '',
+        'region':       response.subdivisions.most_specific.iso_code or '',  # could be state_code
+        'postal_code':  response.postal.code or '',
+    }
+
+
+class GeoIPCityReader(object):
+    """
+    Locations are cached as dicts of city, region and postal_code, or None when the address isn't in the database.
+    """
+
+    def __init__(self, database_location=None, max_entries=GEOIP_PREFIX_CACHE_MAX_ENTRIES,
+                 reload_check_seconds=GEOIP_RELOAD_CHECK_SECONDS):
+        self.database_location = database_location
+        self.max_entries = max_entries
+        self.reload_check_seconds = reload_check_seconds
+        self.lock = threading.Lock()
+        self.reader = None
+        self.database_modified_time = None
+        self.time_checked = 0
+        self.location_by_prefix = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _open_reader_if_needed(self):
+        database_location = self.database_location or fetch_geolite2_database_location()
+        if self.reader is not None and time.monotonic() - self.time_checked < self.reload_check_seconds:
+            return self.reader
+        with self.lock:
+            if self.reader is not None and time.monotonic() - self.time_checked < self.reload_check_seconds:
+                return self.reader
+            database_modified_time = os.stat(database_location).st_mtime
+            if self.reader is None or database_modified_time != self.database_modified_time:
+                if self.reader is not None:
+                    self.reloads += 1
+                # MODE_AUTO memory-maps the file, with the C extension when it is installed. We don't close the
+                # reader we are replacing, since another thread may be in the middle of a lookup with it. It closes
+                # when the last reference goes away.
+                self.reader = geoip2.database.Reader(database_location, mode=geoip2.database.MODE_AUTO)
+                self.database_modified_time = database_modified_time
+                self.location_by_prefix = OrderedDict()
+            self.time_checked = time.monotonic()
+            return self.reader
+
+    def retrieve_location(self, ip_address):
+        """
+        :return: dict with city, region and postal_code, or None if the address isn't in the database
+        """
+        reader = self._open_reader_if_needed()
+        prefix_key = generate_ip_prefix_key(ip_address)
+        with self.lock:
+            if prefix_key in self.location_by_prefix:
+                self.location_by_prefix.move_to_end(prefix_key)
+                self.hits += 1
+                return self.location_by_prefix[prefix_key]
+            self.misses += 1
+
+        try:
+            location = extract_location_from_city_response(reader.city(ip_address))
+        except geoip2.errors.AddressNotFoundError:
+            location = None
+
+        with self.lock:
+            if reader is self.reader:
+                self.location_by_prefix[prefix_key] = location
+                while len(self.location_by_prefix) > self.max_entries:
+                    self.location_by_prefix.popitem(last=False)
+        return location
+
+    def clear(self):
+        with self.lock:
+            self.reader = None
+            self.database_modified_time = None
+            self.time_checked = 0
+            self.location_by_prefix = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+            self.reloads = 0
+
+    def statistics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'database_location':    self.database_location or fetch_geolite2_database_location(),
+                'database_open':        self.reader is not None,
+                'prefixes_cached':      len(self.location_by_prefix),
+                'hits':                 self.hits,
+                'misses':               self.misses,
+                'hit_rate':             self.hits / lookups if lookups else 0,
+                'reloads':              self.reloads,
+            }
+
+
+# One per process
+geoip_city_reader = GeoIPCityReader()
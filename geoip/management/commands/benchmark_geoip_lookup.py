@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from geoip.geoip_reader import extract_location_from_city_response, fetch_geolite2_database_location, \
+    GeoIPCityReader
+import geoip2.database
+import geoip2.errors
+import ipaddress
+import random
+import time
+
+
+def generate_synthetic_ip_stream(lookup_count, network_count, seed):
+    """
+    Visitors cluster by network, so draw each address from one of network_count random /24 networks
+    """
+    random_generator = random.Random(seed)
+    network_list = [random_generator.randrange(1 << 24, 224 << 24) >> 8 for _ in range(network_count)]
+    return [str(ipaddress.IPv4Address((random_generator.choice(network_list) << 8) + random_generator.randrange(256)))
+            for _ in range(lookup_count)]
+
+
+def lookup_with_new_reader_each_time(database_location, ip_address):
+    # What voterLocationRetrieveFromIP used to do
+    reader = geoip2.database.Reader(database_location)
+    try:
+        return extract_location_from_city_response(reader.city(ip_address))
+    except geoip2.errors.AddressNotFoundError:
+        return None
+
+
+def time_lookups(lookup_function, ip_address_list):
+    start_time = time.time()
+    for ip_address in ip_address_list:
+        lookup_function(ip_address)
+    seconds_elapsed = time.time() - start_time
+    return len(ip_address_list) / seconds_elapsed if seconds_elapsed else 0
+
+
+class Command(BaseCommand):
+    help = 'Compares GeoIP lookups per second when opening the mmdb file for every lookup, sharing one reader, and ' \
+           'sharing one reader with the /24 prefix cache, on a synthetic stream of IPv4 addresses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database_location', type=str, default='')
+        parser.add_argument('--lookup_count', type=int, default=100000)
+        parser.add_argument('--network_count', type=int, default=5000)
+        parser.add_argument('--new_reader_lookup_count', type=int, default=1000,
+                            help='Opening the file every time is slow, so time it on fewer lookups')
+        parser.add_argument('--seed', type=int, default=2020)
+
+    def handle(self, *args, **options):
+        database_location = options['database_location'] or fetch_geolite2_database_location()
+        ip_address_list = generate_synthetic_ip_stream(
+            options['lookup_count'], options['network_count'], options['seed'])
+
+        new_reader_lookups_per_second = time_lookups(
+            lambda ip_address: lookup_with_new_reader_each_time(database_location, ip_address),
+            ip_address_list[:options['new_reader_lookup_count']])
+
+        shared_reader = geoip2.database.Reader(database_location, mode=geoip2.database.MODE_AUTO)
+
+        def lookup_with_shared_reader(ip_address):
+            try:
+                return extract_location_from_city_response(shared_reader.city(ip_address))
+            except geoip2.errors.AddressNotFoundError:
+                return None
+        shared_reader_lookups_per_second = time_lookups(lookup_with_shared_reader, ip_address_list)
+
+        geoip_city_reader = GeoIPCityReader(database_location=database_location)
+        cached_lookups_per_second = time_lookups(geoip_city_reader.retrieve_location, ip_address_list)
+        statistics = geoip_city_reader.statistics()
+
+        self.stdout.write('database: {database_location}, lookups: {lookup_count}, networks: {network_count}'.format(
+            database_location=database_location, **options))
+        self.stdout.write('new reader for each lookup: {lookups_per_second:.0f} lookups/sec'.format(
+            lookups_per_second=new_reader_lookups_per_second))
+        self.stdout.write('one shared reader: {lookups_per_second:.0f} lookups/sec'.format(
+            lookups_per_second=shared_reader_lookups_per_second))
+        self.stdout.write('shared reader with prefix cache: {lookups_per_second:.0f} lookups/sec, '
+                          'hit rate {hit_rate:.1%}'.format(lookups_per_second=cached_lookups_per_second,
+                                                           hit_rate=statistics['hit_rate']))
@@ -1,3 +1,198 @@
+# geoip/models.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from collections import namedtuple, OrderedDict
+from datetime import timedelta
 from django.db import models
+from django.utils.timezone import now
+import json
+import re
+import sys
+import threading
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# How long we trust a geocoded address before asking Google again
+GEOCODE_CACHE_FOUND_DAYS = 180
+# When Google can't find an address, we don't ask again for this long, in case it was a temporary problem
+GEOCODE_CACHE_NOT_FOUND_HOURS = 24
+# Number of addresses kept in memory in each process
+GEOCODE_CACHE_MEMORY_SIZE = 10000
+
+# Same attributes as geopy.location.Location, so callers don't need to know if the value came from the cache
+CachedGeocodedLocation = namedtuple('CachedGeocodedLocation', ['address', 'latitude', 'longitude', 'raw'])
+
+# Shared by all GeocodeCacheManager objects in this process
+geocode_memory_cache = OrderedDict()
+geocode_memory_cache_lock = threading.Lock()
+geocode_cache_statistics = {
+    'memory_hits':              0,
+    'database_hits':            0,
+    'misses':                   0,
+    'not_found_results_cached': 0,
+}
+
+
+def normalize_address_for_geocode_cache(text_for_map_search):
+    """
+    "1200  Broadway Ave.,Oakland, CA " and "1200 broadway ave, oakland, ca" should share one cache entry
+    :param text_for_map_search:
+    :return:
+    """
+    if not positive_value_exists(text_for_map_search):
+        return ''
+    normalized_address = text_for_map_search.lower()
+    normalized_address = normalized_address.replace('.', ' ')
+    normalized_address = re.sub(r'\s*,\s*', ', ', normalized_address)
+    normalized_address = re.sub(r'\s+', ' ', normalized_address)
+    return normalized_address.strip(' ,')
+
+
+class GeocodeCacheManager(models.Manager):
+    """
+    Wraps google_client.geocode() so that the same address is only sent to Google once. Results are kept in an
+    in-process LRU cache, backed by the GeocodedAddress table so they are shared across processes and restarts.
+    """
+
+    def __unicode__(self):
+        return "GeocodeCacheManager"
+
+    def geocode(self, google_client, text_for_map_search, **kwargs):
+        """
+        Drop-in replacement for google_client.geocode(text_for_map_search, **kwargs). Exceptions raised by the
+        geocoder (including GeocoderQuotaExceeded) are passed through to the caller, and are not cached.
+        :param google_client:
+        :param text_for_map_search:
+        :param kwargs:
+        :return: CachedGeocodedLocation, or None if the address could not be found
+        """
+        normalized_address = normalize_address_for_geocode_cache(text_for_map_search)
+        if not positive_value_exists(normalized_address) or len(normalized_address) > 255:
+            return google_client.geocode(text_for_map_search, **kwargs)
+
+        results = self.retrieve_geocoded_address_from_cache(normalized_address)
+        if results['geocoded_address_found']:
+            return results['location']
+
+        geocode_cache_statistics['misses'] += 1
+        location = google_client.geocode(text_for_map_search, **kwargs)
+        if location is None:
+            geocode_cache_statistics['not_found_results_cached'] += 1
+            cached_location = None
+        else:
+            cached_location = CachedGeocodedLocation(
+                address=location.address,
+                latitude=location.latitude,
+                longitude=location.longitude,
+                raw=getattr(location, 'raw', {}) or {})
+        self.update_or_create_geocoded_address(normalized_address, cached_location)
+        return cached_location
+
+    def retrieve_geocoded_address_from_cache(self, normalized_address):
+        location = None
+        geocoded_address_found = False
+        with geocode_memory_cache_lock:
+            if normalized_address in geocode_memory_cache:
+                location, date_expires = geocode_memory_cache[normalized_address]
+                if date_expires > now():
+                    geocode_memory_cache.move_to_end(normalized_address)
+                    geocoded_address_found = True
+                else:
+                    del geocode_memory_cache[normalized_address]
+        if geocoded_address_found:
+            geocode_cache_statistics['memory_hits'] += 1
+            return {
+                'geocoded_address_found':   True,
+                'location':                 location,
+            }
+
+        try:
+            if 'test' in sys.argv:
+                query = GeocodedAddress.objects.all()
+            else:
+                query = GeocodedAddress.objects.using('readonly').all()
+            geocoded_address = query.filter(normalized_address=normalized_address, date_expires__gt=now()).first()
+            if geocoded_address is not None:
+                location = geocoded_address.location()
+                self.store_in_memory_cache(normalized_address, location, geocoded_address.date_expires)
+                geocode_cache_statistics['database_hits'] += 1
+                geocoded_address_found = True
+        except Exception as e:
+            logger.error("retrieve_geocoded_address_from_cache: " + str(e))
+
+        return {
+            'geocoded_address_found':   geocoded_address_found,
+            'location':                 location,
+        }
+
+    def store_in_memory_cache(self, normalized_address, location, date_expires):
+        with geocode_memory_cache_lock:
+            geocode_memory_cache[normalized_address] = (location, date_expires)
+            geocode_memory_cache.move_to_end(normalized_address)
+            while len(geocode_memory_cache) > GEOCODE_CACHE_MEMORY_SIZE:
+                geocode_memory_cache.popitem(last=False)
+
+    def update_or_create_geocoded_address(self, normalized_address, location):
+        if location is None:
+            date_expires = now() + timedelta(hours=GEOCODE_CACHE_NOT_FOUND_HOURS)
+            defaults = {
+                'address_found':    False,
+                'address':          '',
+                'latitude':         None,
+                'longitude':        None,
+                'raw_serialized':   '',
+                'date_expires':     date_expires,
+            }
+        else:
+            date_expires = now() + timedelta(days=GEOCODE_CACHE_FOUND_DAYS)
+            defaults = {
+                'address_found':    True,
+                'address':          location.address[:255] if location.address else '',
+                'latitude':         location.latitude,
+                'longitude':        location.longitude,
+                'raw_serialized':   json.dumps(location.raw),
+                'date_expires':     date_expires,
+            }
+        self.store_in_memory_cache(normalized_address, location, date_expires)
+        try:
+            GeocodedAddress.objects.update_or_create(normalized_address=normalized_address, defaults=defaults)
+        except Exception as e:
+            logger.error("update_or_create_geocoded_address: " + str(e))
+
+    def clear_memory_cache(self):
+        with geocode_memory_cache_lock:
+            geocode_memory_cache.clear()
+
+    def retrieve_geocode_cache_statistics(self):
+        statistics = dict(geocode_cache_statistics)
+        statistics['memory_cache_size'] = len(geocode_memory_cache)
+        lookups = statistics['memory_hits'] + statistics['database_hits'] + statistics['misses']
+        statistics['hit_rate'] = \
+            (statistics['memory_hits'] + statistics['database_hits']) / lookups if lookups else 0
+        return statistics
+
+
+class GeocodedAddress(models.Model):
+    """
+    One address we have sent to the Google geocoder, and what came back
+    """
+    normalized_address = models.CharField(max_length=255, null=False, unique=True, db_index=True)
+    # False if the geocoder could not find this address
+    address_found = models.BooleanField(default=False)
+    address = models.CharField(max_length=255, null=False, blank=True, default='')
+    latitude = models.FloatField(null=True)
+    longitude = models.FloatField(null=True)
+    # The full geocoder response (we use address_components to repair missing zip codes)
+    raw_serialized = models.TextField(null=False, blank=True, default='')
+    date_geocoded = models.DateTimeField(null=True, auto_now=True)
+    date_expires = models.DateTimeField(null=True, db_index=True)
 
-# Create your models here.
+    def location(self):
+        if not self.address_found:
+            return None
+        raw = json.loads(self.raw_serialized) if positive_value_exists(self.raw_serialized) else {}
+        return CachedGeocodedLocation(
+            address=self.address, latitude=self.latitude, longitude=self.longitude, raw=raw)
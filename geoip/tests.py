@@ -1,3 +1,114 @@
-from django.test import TestCase
+# geoip/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
 
-# Create your tests here.
+from collections import namedtuple
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+import geoip2.errors
+from geopy.exc import GeocoderQuotaExceeded
+
+from geoip.geoip_reader import generate_ip_prefix_key, GeoIPCityReader
+from geoip.models import GeocodeCacheManager, GeocodedAddress, normalize_address_for_geocode_cache
+
+Location = namedtuple('Location', ['address', 'latitude', 'longitude', 'raw'])
+
+
+class GeocodeCacheTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        self.geocode_cache_manager = GeocodeCacheManager()
+        self.geocode_cache_manager.clear_memory_cache()
+        self.google_client = mock.Mock()
+        self.google_client.geocode.return_value = Location(
+            address='1200 Broadway, Oakland, CA 94612, USA', latitude=37.8030442, longitude=-122.2739699,
+            raw={'address_components': [{'types': ['postal_code'], 'long_name': '94612'}]})
+
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address_for_geocode_cache(' 1200  Broadway Ave.,Oakland,  CA '),
+                         '1200 broadway ave, oakland, ca')
+
+    def test_second_lookup_is_cached(self):
+        location = self.geocode_cache_manager.geocode(self.google_client, '1200 Broadway, Oakland, CA')
+        self.assertEqual(location.latitude, 37.8030442)
+        location = self.geocode_cache_manager.geocode(self.google_client, '1200 broadway,  oakland, ca')
+        self.assertEqual(location.raw['address_components'][0]['long_name'], '94612')
+        self.assertEqual(self.google_client.geocode.call_count, 1)
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
+
+        # A new process starts with an empty memory cache, but finds the address in the database
+        self.geocode_cache_manager.clear_memory_cache()
+        statistics_before = self.geocode_cache_manager.retrieve_geocode_cache_statistics()
+        location = self.geocode_cache_manager.geocode(self.google_client, '1200 Broadway, Oakland, CA')
+        self.assertEqual(location.longitude, -122.2739699)
+        self.assertEqual(self.google_client.geocode.call_count, 1)
+        statistics_after = self.geocode_cache_manager.retrieve_geocode_cache_statistics()
+        self.assertEqual(statistics_after['database_hits'], statistics_before['database_hits'] + 1)
+
+    def test_not_found_is_cached(self):
+        self.google_client.geocode.return_value = None
+        self.assertIsNone(self.geocode_cache_manager.geocode(self.google_client, 'blah bal blh, OK'))
+        self.assertIsNone(self.geocode_cache_manager.geocode(self.google_client, 'blah bal blh, OK'))
+        self.assertEqual(self.google_client.geocode.call_count, 1)
+        self.assertFalse(GeocodedAddress.objects.get().address_found)
+
+    def test_quota_exceeded_is_not_cached(self):
+        self.google_client.geocode.side_effect = GeocoderQuotaExceeded()
+        with self.assertRaises(GeocoderQuotaExceeded):
+            self.geocode_cache_manager.geocode(self.google_client, '1200 Broadway, Oakland, CA')
+        self.assertEqual(GeocodedAddress.objects.count(), 0)
+
+
+def make_city_response(city_name):
+    return SimpleNamespace(city=SimpleNamespace(name=city_name),
+                           subdivisions=SimpleNamespace(most_specific=SimpleNamespace(iso_code='CA')),
+                           postal=SimpleNamespace(code='94612'))
+
+
+class GeoIPCityReaderTestCase(SimpleTestCase):
+
+    def setUp(self):
+        database_file = tempfile.NamedTemporaryFile(suffix='.mmdb', delete=False)
+        database_file.close()
+        self.database_location = database_file.name
+        self.addCleanup(os.remove, self.database_location)
+        reader_patcher = mock.patch('geoip2.database.Reader')
+        self.reader_class = reader_patcher.start()
+        self.addCleanup(reader_patcher.stop)
+        self.reader_class.return_value.city.return_value = make_city_response('Oakland')
+
+    def test_prefix_key(self):
+        self.assertEqual(generate_ip_prefix_key('73.158.32.221'), generate_ip_prefix_key('73.158.32.1'))
+        self.assertNotEqual(generate_ip_prefix_key('73.158.32.221'), generate_ip_prefix_key('73.158.33.221'))
+        self.assertEqual(generate_ip_prefix_key('2001:db8:1:2::1'), generate_ip_prefix_key('2001:db8:1:ffff::9'))
+        self.assertNotEqual(generate_ip_prefix_key('2001:db8:1::1'), generate_ip_prefix_key('2001:db8:2::1'))
+        with self.assertRaises(ValueError):
+            generate_ip_prefix_key('not an ip')
+
+    def test_reader_opened_once_and_prefix_cached(self):
+        geoip_city_reader = GeoIPCityReader(database_location=self.database_location)
+        self.assertEqual(geoip_city_reader.retrieve_location('73.158.32.221'),
+                         {'city': 'Oakland', 'region': 'CA', 'postal_code': '94612'})
+        self.assertEqual(geoip_city_reader.retrieve_location('73.158.32.5')['city'], 'Oakland')
+        self.assertEqual(self.reader_class.call_count, 1)
+        self.assertEqual(self.reader_class.return_value.city.call_count, 1)
+
+        self.reader_class.return_value.city.side_effect = geoip2.errors.AddressNotFoundError('not found')
+        self.assertIsNone(geoip_city_reader.retrieve_location('10.0.0.1'))
+        self.assertIsNone(geoip_city_reader.retrieve_location('10.0.0.2'))
+        self.assertEqual(self.reader_class.return_value.city.call_count, 2)
+        self.assertEqual(geoip_city_reader.statistics()['hits'], 2)
+
+    def test_replaced_database_is_reopened(self):
+        geoip_city_reader = GeoIPCityReader(database_location=self.database_location, reload_check_seconds=0)
+        geoip_city_reader.retrieve_location('73.158.32.221')
+        os.utime(self.database_location, (1, 1))
+        self.reader_class.return_value.city.return_value = make_city_response('Berkeley')
+        self.assertEqual(geoip_city_reader.retrieve_location('73.158.32.221')['city'], 'Berkeley')
+        self.assertEqual(self.reader_class.call_count, 2)
+        self.assertEqual(geoip_city_reader.statistics()['reloads'], 1)
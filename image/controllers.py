@@ -2,6 +2,9 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from exception.models import handle_exception
+from io import BytesIO
+from PIL import Image
 import requests
 import wevote_functions.admin
 from .functions import analyze_remote_url, analyze_image_file, analyze_image_in_memory
@@ -52,6 +55,7 @@ FACEBOOK_URL_NOT_FOUND = "facebook url not found"
 TWITTER_USER_DOES_NOT_EXIST = "twitter user does not exist"
 TWITTER_URL_NOT_FOUND = "twitter url not found"
 IMAGE_ALREADY_CACHED = "image already cached"
+RESIZED_IMAGE_NOT_NEEDED = "resized image not needed"
 ALL_KIND_OF_IMAGE = ['kind_of_image_twitter_profile', 'kind_of_image_twitter_background',
                      'kind_of_image_twitter_banner', 'kind_of_image_facebook_profile',
                      'kind_of_image_facebook_background', 'kind_of_image_maplight', 'kind_of_image_vote_smart']
@@ -68,7 +72,6 @@ ISSUES_IMAGE_MEDIUM_WIDTH = convert_to_int(get_environment_variable("ISSUES_IMAG
 ISSUES_IMAGE_MEDIUM_HEIGHT = convert_to_int(get_environment_variable("ISSUES_IMAGE_MEDIUM_HEIGHT"))
 ISSUES_IMAGE_TINY_WIDTH = convert_to_int(get_environment_variable("ISSUES_IMAGE_TINY_WIDTH"))
 ISSUES_IMAGE_TINY_HEIGHT = convert_to_int(get_environment_variable("ISSUES_IMAGE_TINY_HEIGHT"))
-AWS_STORAGE_BUCKET_NAME = get_environment_variable("AWS_STORAGE_BUCKET_NAME")
 
 try:
     SOCIAL_BACKGROUND_IMAGE_WIDTH = convert_to_int(get_environment_variable("SOCIAL_BACKGROUND_IMAGE_WIDTH"))
@@ -279,13 +282,12 @@ def cache_organization_master_images(organization_we_vote_id):
     :param organization_we_vote_id:
     :return:
     """
+    # We only cache Twitter images for organizations
     cache_all_kind_of_images_results = {
         'organization_we_vote_id':          "",
         'cached_twitter_profile_image':     False,
         'cached_twitter_background_image':  False,
         'cached_twitter_banner_image':      False,
-        'cached_facebook_profile_image':    False,
-        'cached_facebook_background_image': False
     }
     google_civic_election_id = 0
     twitter_id = None
@@ -714,8 +716,12 @@ def cache_image_locally(google_civic_election_id, image_url_https, voter_we_vote
         else:
             we_vote_image_file_location = we_vote_image_file_name
 
-        image_stored_locally = we_vote_image_manager.store_image_locally(
-            analyze_source_images_results['image_url_https'], we_vote_image_file_name)
+        # analyze_remote_url already downloaded the image, so we store those bytes
+        image_bytes = analyze_source_images_results['analyze_image_url_results']['image_bytes']
+        if image_bytes is None:
+            image_bytes = we_vote_image_manager.retrieve_image_bytes_from_url(
+                analyze_source_images_results['image_url_https'])
+        image_stored_locally = image_bytes is not None
 
         if not image_stored_locally:
             error_results = {
@@ -731,8 +737,8 @@ def cache_image_locally(google_civic_election_id, image_url_https, voter_we_vote
             return error_results
 
         status += " IMAGE_STORED_LOCALLY "
-        image_stored_to_aws = we_vote_image_manager.store_image_to_aws(
-            we_vote_image_file_name, we_vote_image_file_location,
+        image_stored_to_aws = we_vote_image_manager.store_image_bytes_to_aws(
+            image_bytes, we_vote_image_file_location,
             analyze_source_images_results['analyze_image_url_results']['image_format'])
         if not image_stored_to_aws:
             error_results = {
@@ -746,9 +752,7 @@ def cache_image_locally(google_civic_election_id, image_url_https, voter_we_vote
             }
             delete_we_vote_image_results = we_vote_image_manager.delete_we_vote_image(we_vote_image)
             return error_results
-        we_vote_image_url = "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
-                            "".format(bucket_name=AWS_STORAGE_BUCKET_NAME,
-                                      we_vote_image_file_location=we_vote_image_file_location)
+        we_vote_image_url = we_vote_image_manager.we_vote_image_url_from_location(we_vote_image_file_location)
         save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(we_vote_image, we_vote_image_url,
                                                                           we_vote_image_file_location,
                                                                           we_vote_parent_image_id, is_active_version)
@@ -1472,6 +1476,9 @@ def cache_and_create_resized_images_for_organization(organization_we_vote_id):
             create_resized_images_results = create_resized_image_if_not_created(we_vote_image)
             create_resized_images_results.update(cache_images_for_one_organization_results)
             create_all_resized_images_results.append(create_resized_images_results)
+        if not create_all_resized_images_results:
+            # Nothing to resize, so show how caching the original images went
+            create_all_resized_images_results.append(cache_images_for_one_organization_results)
         return create_all_resized_images_results
 
 
@@ -1499,9 +1506,32 @@ def cache_and_create_resized_images_for_voter(voter_id):
             create_resized_images_results = create_resized_image_if_not_created(we_vote_image)
             create_resized_images_results.update(cache_images_for_a_voter_results)
             create_all_resized_images_results.append(create_resized_images_results)
+        if not create_all_resized_images_results:
+            # Nothing to resize, so show how caching the original images went
+            create_all_resized_images_results.append(cache_images_for_a_voter_results)
         return create_all_resized_images_results
 
 
+def cache_and_create_resized_images_for_candidate(candidate_we_vote_id):
+    """
+    Create resized images for specific candidate. We cache a candidate's master images when we import the
+    candidate's photos, so here we only create the resized versions that are missing.
+    :param candidate_we_vote_id:
+    :return:
+    """
+    create_all_resized_images_results = []
+    we_vote_image_manager = WeVoteImageManager()
+
+    we_vote_image_list_results = we_vote_image_manager.retrieve_we_vote_image_list_from_we_vote_id(
+        None, candidate_we_vote_id)
+    for we_vote_image in we_vote_image_list_results['we_vote_image_list']:
+        if not we_vote_image.kind_of_image_original:
+            continue
+        create_resized_images_results = create_resized_image_if_not_created(we_vote_image)
+        create_all_resized_images_results.append(create_resized_images_results)
+    return create_all_resized_images_results
+
+
 def retrieve_all_images_for_one_issue(issue_we_vote_id):
     """
     Retrieve all cached images for one issue
@@ -1544,6 +1574,26 @@ def retrieve_all_images_for_one_voter(voter_id):
     return we_vote_image_list
 
 
+def retrieve_python_image_from_url(image_url_https):
+    """
+    Download and decode the image, in memory
+    :param image_url_https:
+    :return: the decoded PIL image, or None if we couldn't download or decode it
+    """
+    we_vote_image_manager = WeVoteImageManager()
+    image_bytes = we_vote_image_manager.retrieve_image_bytes_from_url(image_url_https)
+    if image_bytes is None:
+        return None
+    try:
+        python_image_library_image = Image.open(BytesIO(image_bytes))
+        # Decode now, so each resized version doesn't decode it again
+        python_image_library_image.load()
+        return python_image_library_image
+    except Exception as e:
+        handle_exception(e, logger=logger, exception_message="retrieve_python_image_from_url failed to decode image")
+        return None
+
+
 def create_resized_image_if_not_created(we_vote_image):
     """
     Create resized images only if not created for we_vote_image object
@@ -1629,6 +1679,12 @@ def create_resized_image_if_not_created(we_vote_image):
         kind_of_image_wikipedia_profile=kind_of_image_wikipedia_profile,
         kind_of_image_other_source=kind_of_image_other_source
     )
+    # Download and decode the source once, for all of the resized versions we need
+    source_python_image = None
+    if not resized_version_exists_results['large_image_version_exists'] or \
+            not resized_version_exists_results['medium_image_version_exists'] or \
+            not resized_version_exists_results['tiny_image_version_exists']:
+        source_python_image = retrieve_python_image_from_url(image_url_https)
     if not resized_version_exists_results['large_image_version_exists']:
         # Large version does not exist so create resize image and cache it
         cache_resized_image_locally_results = cache_resized_image_locally(
@@ -1646,7 +1702,8 @@ def create_resized_image_if_not_created(we_vote_image):
             kind_of_image_linkedin_profile=kind_of_image_linkedin_profile,
             kind_of_image_wikipedia_profile=kind_of_image_wikipedia_profile,
             kind_of_image_other_source=kind_of_image_other_source, kind_of_image_large=True,
-            image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source)
+            image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source,
+            source_python_image=source_python_image)
         create_resized_image_results['cached_large_image'] = \
             cache_resized_image_locally_results['success']
     else:
@@ -1673,7 +1730,8 @@ def create_resized_image_if_not_created(we_vote_image):
                 kind_of_image_linkedin_profile=kind_of_image_linkedin_profile,
                 kind_of_image_wikipedia_profile=kind_of_image_wikipedia_profile,
                 kind_of_image_other_source=kind_of_image_other_source, kind_of_image_medium=True,
-                image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source)
+                image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source,
+                source_python_image=source_python_image)
             create_resized_image_results['cached_medium_image'] = \
                 cache_resized_image_locally_results['success']
         else:
@@ -1696,11 +1754,16 @@ def create_resized_image_if_not_created(we_vote_image):
                 kind_of_image_linkedin_profile=kind_of_image_linkedin_profile,
                 kind_of_image_wikipedia_profile=kind_of_image_wikipedia_profile,
                 kind_of_image_other_source=kind_of_image_other_source, kind_of_image_tiny=True,
-                image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source)
+                image_offset_x=image_offset_x, image_offset_y=image_offset_y, other_source=other_source,
+                source_python_image=source_python_image)
             create_resized_image_results['cached_tiny_image'] = \
                 cache_resized_image_locally_results['success']
         else:
             create_resized_image_results['cached_tiny_image'] = IMAGE_ALREADY_CACHED
+    else:
+        # Backgrounds and banners only have a large version
+        create_resized_image_results['cached_medium_image'] = RESIZED_IMAGE_NOT_NEEDED
+        create_resized_image_results['cached_tiny_image'] = RESIZED_IMAGE_NOT_NEEDED
     return create_resized_image_results
 
 
@@ -1813,7 +1876,8 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
                                 kind_of_image_linkedin_profile=False, kind_of_image_wikipedia_profile=False,
                                 kind_of_image_other_source=False,
                                 kind_of_image_original=False, kind_of_image_large=False, kind_of_image_medium=False,
-                                kind_of_image_tiny=False, image_offset_x=0, image_offset_y=0):
+                                kind_of_image_tiny=False, image_offset_x=0, image_offset_y=0,
+                                source_python_image=None):
     """
     Resize the image as per image version and cache the same
     :param google_civic_election_id:
@@ -1848,6 +1912,7 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
     :param kind_of_image_tiny:
     :param image_offset_x:                      # For Facebook background
     :param image_offset_y:                      # For Facebook background
+    :param source_python_image:                 # The decoded image at image_url_https, if the caller has it
     :return:
     """
 
@@ -2032,8 +2097,9 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
         elif issue_we_vote_id:
             we_vote_image_file_location = issue_we_vote_id + "/" + we_vote_image_file_name
 
-        image_stored_locally = we_vote_image_manager.store_image_locally(
-                image_url_https, we_vote_image_file_name)
+        if source_python_image is None:
+            source_python_image = retrieve_python_image_from_url(image_url_https)
+        image_stored_locally = source_python_image is not None
         if not image_stored_locally:
             error_results = {
                 'success':                      success,
@@ -2048,8 +2114,10 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
             return error_results
 
         status += " IMAGE_STORED_LOCALLY"
-        resized_image_created = we_vote_image_manager.resize_we_vote_master_image(
-            we_vote_image_file_name, image_width, image_height, image_type, image_offset_x, image_offset_y)
+        resized_image_bytes = we_vote_image_manager.resize_we_vote_image_in_memory(
+            source_python_image, image_width, image_height, image_type, image_offset_x, image_offset_y,
+            image_format)
+        resized_image_created = resized_image_bytes is not None
         if not resized_image_created:
             error_results = {
                 'success':                      success,
@@ -2064,8 +2132,8 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
             return error_results
 
         status += " RESIZED_IMAGE_CREATED"
-        image_stored_to_aws = we_vote_image_manager.store_image_to_aws(we_vote_image_file_name,
-                                                                       we_vote_image_file_location, image_format)
+        image_stored_to_aws = we_vote_image_manager.store_image_bytes_to_aws(resized_image_bytes,
+                                                                             we_vote_image_file_location, image_format)
         if not image_stored_to_aws:
             error_results = {
                 'success':                      success,
@@ -2079,9 +2147,7 @@ def cache_resized_image_locally(google_civic_election_id, image_url_https, we_vo
             delete_we_vote_image_results = we_vote_image_manager.delete_we_vote_image(we_vote_image)
             return error_results
 
-        we_vote_image_url = "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
-                            "".format(bucket_name=AWS_STORAGE_BUCKET_NAME,
-                                      we_vote_image_file_location=we_vote_image_file_location)
+        we_vote_image_url = we_vote_image_manager.we_vote_image_url_from_location(we_vote_image_file_location)
         # if we_vote_image_url is not empty then save we_vote_image_wes_info else delete we_vote_image entry
         if we_vote_image_url is not None and we_vote_image_url != "":
             save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(we_vote_image, we_vote_image_url,
@@ -2781,9 +2847,7 @@ def cache_issue_image_master(google_civic_election_id, issue_image_file, issue_w
         delete_we_vote_image_results = we_vote_image_manager.delete_we_vote_image(we_vote_image)
         return error_results
 
-    we_vote_image_url = "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
-                        "".format(bucket_name=AWS_STORAGE_BUCKET_NAME,
-                                  we_vote_image_file_location=we_vote_image_file_location)
+    we_vote_image_url = we_vote_image_manager.we_vote_image_url_from_location(we_vote_image_file_location)
     save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(we_vote_image, we_vote_image_url,
                                                                       we_vote_image_file_location,
                                                                       we_vote_parent_image_id, is_active_version)
@@ -2959,8 +3023,14 @@ def cache_organization_sharing_image(
 
     we_vote_image_file_location = organization_we_vote_id + "/" + we_vote_image_file_name
 
-    image_stored_locally = we_vote_image_manager.store_python_image_locally(
-        python_image_library_image, we_vote_image_file_name)
+    try:
+        image_bytes = we_vote_image_manager.encode_python_image(
+            python_image_library_image, python_image_library_image.format or image_format)
+        image_stored_locally = True
+    except Exception as e:
+        image_bytes = None
+        image_stored_locally = False
+        handle_exception(e, logger=logger, exception_message="cache_organization_sharing_image failed to encode image")
 
     if not image_stored_locally:
         error_results = {
@@ -2975,8 +3045,8 @@ def cache_organization_sharing_image(
         delete_we_vote_image_results = we_vote_image_manager.delete_we_vote_image(we_vote_image)
         return error_results
 
-    image_stored_to_aws = we_vote_image_manager.store_image_to_aws(
-        we_vote_image_file_name, we_vote_image_file_location, image_format)
+    image_stored_to_aws = we_vote_image_manager.store_image_bytes_to_aws(
+        image_bytes, we_vote_image_file_location, image_format)
     if not image_stored_to_aws:
         error_results = {
             'success':                      success,
@@ -2990,9 +3060,7 @@ def cache_organization_sharing_image(
         delete_we_vote_image_results = we_vote_image_manager.delete_we_vote_image(we_vote_image)
         return error_results
 
-    we_vote_image_url = "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
-                        "".format(bucket_name=AWS_STORAGE_BUCKET_NAME,
-                                  we_vote_image_file_location=we_vote_image_file_location)
+    we_vote_image_url = we_vote_image_manager.we_vote_image_url_from_location(we_vote_image_file_location)
     save_aws_info = we_vote_image_manager.save_we_vote_image_aws_info(we_vote_image, we_vote_image_url,
                                                                       we_vote_image_file_location,
                                                                       we_vote_parent_image_id, is_active_version)
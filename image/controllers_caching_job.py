@@ -0,0 +1,305 @@
+# image/controllers_caching_job.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Bulk image caching jobs. Caching the images for one candidate, organization or voter is mostly waiting, on the
+# download from Twitter, Facebook or wherever the image lives, and on the upload to S3. So a job caches the images for
+# worker_count of them at the same time, in threads, while image_download_limiter keeps the downloads in this process
+# to download_limit at a time.
+#   - The list of candidates, organizations or voters is saved with the job as WeVoteImageCachingJobItem entries when
+#     the job starts. Each item is marked when it is done, so a job that was interrupted (deploy, crash, Ctrl-C) can be
+#     run again with run_image_caching_job, and only caches the items that aren't done.
+#   - The job's counts and date_last_progress are updated as each item finishes, so the image caching job page and
+#     the cache_images_in_parallel management command can show progress while it runs.
+
+from candidate.models import CandidateCampaignManager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config.base import get_environment_variable_default
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.timezone import now
+from .controllers import cache_and_create_resized_images_for_candidate, \
+    cache_and_create_resized_images_for_organization, cache_and_create_resized_images_for_voter
+from .functions import IMAGE_DOWNLOAD_LIMIT, image_download_limiter
+from .models import CACHE_IMAGES_FOR_CANDIDATES, CACHE_IMAGES_FOR_ORGANIZATIONS, CACHE_IMAGES_FOR_VOTERS, \
+    WeVoteImage, WeVoteImageCachingJob, WeVoteImageCachingJobItem
+import threading
+import time
+from twitter.models import TwitterLinkToOrganization
+from voter.models import Voter
+from voter_guide.models import VoterGuide
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+IMAGE_CACHING_WORKER_COUNT = convert_to_int(get_environment_variable_default('IMAGE_CACHING_WORKER_COUNT', 8))
+IMAGE_CACHING_JOB_ITEMS_PER_CREATE = 1000
+
+
+def retrieve_we_vote_id_list_for_image_caching(kind_of_job, google_civic_election_id=0):
+    """
+    The candidates, organizations or voters whose images a job caches
+    :param kind_of_job:
+    :param google_civic_election_id: Candidates running in, or organizations with a voter guide for, this election.
+      Voters aren't tied to an election, so a voters job always covers every voter with Twitter or Facebook.
+    :return:
+    """
+    google_civic_election_id = convert_to_int(google_civic_election_id)
+    if kind_of_job == CACHE_IMAGES_FOR_CANDIDATES:
+        if positive_value_exists(google_civic_election_id):
+            candidate_campaign_manager = CandidateCampaignManager()
+            results = candidate_campaign_manager.retrieve_candidate_we_vote_id_list_from_election_list(
+                google_civic_election_id_list=[google_civic_election_id])
+            we_vote_id_list = results['candidate_we_vote_id_list']
+        else:
+            we_vote_id_list = WeVoteImage.objects.filter(kind_of_image_original=True) \
+                .exclude(Q(candidate_we_vote_id__isnull=True) | Q(candidate_we_vote_id='')) \
+                .values_list('candidate_we_vote_id', flat=True)
+    elif kind_of_job == CACHE_IMAGES_FOR_ORGANIZATIONS:
+        if positive_value_exists(google_civic_election_id):
+            we_vote_id_list = VoterGuide.objects.filter(google_civic_election_id=google_civic_election_id) \
+                .exclude(Q(organization_we_vote_id__isnull=True) | Q(organization_we_vote_id='')) \
+                .values_list('organization_we_vote_id', flat=True)
+        else:
+            we_vote_id_list = TwitterLinkToOrganization.objects.values_list('organization_we_vote_id', flat=True)
+    elif kind_of_job == CACHE_IMAGES_FOR_VOTERS:
+        we_vote_id_list = Voter.objects.filter(Q(twitter_id__isnull=False) | Q(facebook_id__isnull=False)) \
+            .exclude(Q(we_vote_id__isnull=True) | Q(we_vote_id='')) \
+            .order_by('id').values_list('we_vote_id', flat=True)
+    else:
+        we_vote_id_list = []
+    # Without repeats, in the order we found them
+    return list(dict.fromkeys(we_vote_id_list))
+
+
+def start_image_caching_job(kind_of_job, google_civic_election_id=0, worker_count=IMAGE_CACHING_WORKER_COUNT,
+                            download_limit=IMAGE_DOWNLOAD_LIMIT):
+    """
+    Create the job and its list of items. Run it with run_image_caching_job.
+    :param kind_of_job:
+    :param google_civic_election_id:
+    :param worker_count:
+    :param download_limit:
+    :return:
+    """
+    status = ""
+    success = True
+    caching_job = None
+    try:
+        we_vote_id_list = retrieve_we_vote_id_list_for_image_caching(kind_of_job, google_civic_election_id)
+        caching_job = WeVoteImageCachingJob.objects.create(
+            kind_of_job=kind_of_job,
+            google_civic_election_id=convert_to_int(google_civic_election_id),
+            worker_count=max(convert_to_int(worker_count), 1),
+            download_limit=max(convert_to_int(download_limit), 1),
+            item_count=len(we_vote_id_list))
+        WeVoteImageCachingJobItem.objects.bulk_create(
+            [WeVoteImageCachingJobItem(caching_job_id=caching_job.id, we_vote_id=we_vote_id)
+             for we_vote_id in we_vote_id_list],
+            batch_size=IMAGE_CACHING_JOB_ITEMS_PER_CREATE)
+        status += "IMAGE_CACHING_JOB_CREATED "
+    except Exception as e:
+        status += "IMAGE_CACHING_JOB_NOT_CREATED: " + str(e) + " "
+        success = False
+
+    results = {
+        'success':      success,
+        'status':       status,
+        'caching_job':  caching_job,
+    }
+    return results
+
+
+def retrieve_images_not_cached_list(create_all_resized_images_results):
+    """
+    The cache_and_create_resized_images_for_* functions catch download and upload errors, and report them as a cached_*
+    entry that is False
+    :param create_all_resized_images_results:
+    :return: the cached_* entries that are False, without repeats
+    """
+    images_not_cached_list = []
+    for create_resized_images_results in create_all_resized_images_results:
+        for key, value in create_resized_images_results.items():
+            if key.startswith('cached_') and value is False and key not in images_not_cached_list:
+                images_not_cached_list.append(key)
+    return images_not_cached_list
+
+
+def cache_images_for_one_item(kind_of_job, we_vote_id):
+    """
+    :param kind_of_job:
+    :param we_vote_id:
+    :return: the images we couldn't cache, empty if every image was cached
+    """
+    if kind_of_job == CACHE_IMAGES_FOR_CANDIDATES:
+        create_all_resized_images_results = cache_and_create_resized_images_for_candidate(we_vote_id)
+    elif kind_of_job == CACHE_IMAGES_FOR_ORGANIZATIONS:
+        create_all_resized_images_results = cache_and_create_resized_images_for_organization(we_vote_id)
+        if create_all_resized_images_results is None:
+            raise ValueError("ORGANIZATION_NOT_FOUND")
+    elif kind_of_job == CACHE_IMAGES_FOR_VOTERS:
+        voter_id = Voter.objects.filter(we_vote_id=we_vote_id).values_list('id', flat=True).first()
+        if not positive_value_exists(voter_id):
+            raise ValueError("VOTER_NOT_FOUND")
+        create_all_resized_images_results = cache_and_create_resized_images_for_voter(voter_id)
+        if create_all_resized_images_results is None:
+            raise ValueError("VOTER_NOT_FOUND")
+    else:
+        raise ValueError("KIND_OF_IMAGE_CACHING_JOB_INVALID")
+    return retrieve_images_not_cached_list(create_all_resized_images_results)
+
+
+def cache_images_for_job_item(caching_job, caching_job_item_id, we_vote_id, stop_event):
+    """
+    Runs in a worker thread
+    :return: True if cached, False if not, None if the job was stopped before we started
+    """
+    if stop_event.is_set():
+        return None
+    try:
+        try:
+            images_not_cached_list = cache_images_for_one_item(caching_job.kind_of_job, we_vote_id)
+            succeeded = not images_not_cached_list
+            if succeeded:
+                status = "IMAGES_CACHED "
+            else:
+                status = "IMAGES_NOT_CACHED: " + ", ".join(images_not_cached_list) + " "
+        except Exception as e:
+            logger.error("IMAGE_CACHING_JOB_ITEM_FAILED " + str(we_vote_id) + ": " + str(e))
+            succeeded = False
+            status = "IMAGES_NOT_CACHED: " + str(e) + " "
+        WeVoteImageCachingJobItem.objects.filter(id=caching_job_item_id).update(
+            date_completed=now(), succeeded=succeeded, status=status)
+        count_field_name = 'item_cached_count' if succeeded else 'item_failed_count'
+        WeVoteImageCachingJob.objects.filter(id=caching_job.id).update(
+            date_last_progress=now(), **{count_field_name: F(count_field_name) + 1})
+        return succeeded
+    finally:
+        # Each worker thread has its own database connections
+        connections.close_all()
+
+
+def retrieve_image_caching_job_progress(caching_job, refresh=True):
+    """
+    :param caching_job:
+    :param refresh: Read the counts the worker threads have updated since we retrieved caching_job
+    :return:
+    """
+    if refresh:
+        caching_job.refresh_from_db()
+    item_done_count = caching_job.item_done_count()
+    seconds_running = 0
+    items_per_minute = 0
+    seconds_left = None
+    if caching_job.date_started is not None:
+        date_until = caching_job.date_completed or caching_job.date_last_progress or now()
+        seconds_running = max((date_until - caching_job.date_started).total_seconds(), 0)
+    if seconds_running > 0 and item_done_count > 0:
+        items_per_minute = item_done_count * 60 / seconds_running
+        seconds_left = (caching_job.item_count - item_done_count) * 60 / items_per_minute
+    return {
+        'caching_job_id':       caching_job.id,
+        'kind_of_job':          caching_job.kind_of_job,
+        'item_count':           caching_job.item_count,
+        'item_cached_count':    caching_job.item_cached_count,
+        'item_failed_count':    caching_job.item_failed_count,
+        'item_left_count':      caching_job.item_count - item_done_count,
+        'percent_done':         caching_job.percent_done(),
+        'seconds_running':      round(seconds_running, 1),
+        'items_per_minute':     round(items_per_minute, 1),
+        'seconds_left':         round(seconds_left) if seconds_left is not None else None,
+        'completed':            caching_job.date_completed is not None,
+    }
+
+
+def run_image_caching_job(caching_job_id, worker_count=None, download_limit=None, retry_failed=False,
+                          progress_function=None, stop_event=None):
+    """
+    Cache the images for every item of the job that isn't done yet. Safe to run again after an interruption.
+    :param caching_job_id:
+    :param worker_count: None for the job's worker_count
+    :param download_limit: None for the job's download_limit
+    :param retry_failed: Cache the items that failed last time again
+    :param progress_function: Called with retrieve_image_caching_job_progress results after each item
+    :param stop_event: A threading.Event we stop at (after the items already started) when it is set
+    :return:
+    """
+    status = ""
+    try:
+        caching_job = WeVoteImageCachingJob.objects.get(id=caching_job_id)
+    except WeVoteImageCachingJob.DoesNotExist:
+        results = {
+            'success':              False,
+            'status':               "IMAGE_CACHING_JOB_NOT_FOUND ",
+            'caching_job':          None,
+            'caching_job_progress': {},
+        }
+        return results
+
+    if retry_failed:
+        failed_count = WeVoteImageCachingJobItem.objects.filter(
+            caching_job_id=caching_job.id, date_completed__isnull=False, succeeded=False) \
+            .update(date_completed=None, status=None)
+        WeVoteImageCachingJob.objects.filter(id=caching_job.id).update(
+            item_failed_count=F('item_failed_count') - failed_count, date_completed=None)
+        caching_job.refresh_from_db()
+        status += "RETRYING_FAILED_ITEMS: " + str(failed_count) + " "
+    if positive_value_exists(worker_count):
+        caching_job.worker_count = max(convert_to_int(worker_count), 1)
+    if positive_value_exists(download_limit):
+        caching_job.download_limit = max(convert_to_int(download_limit), 1)
+    if caching_job.date_started is None:
+        caching_job.date_started = now()
+    caching_job.save()
+
+    item_list = list(WeVoteImageCachingJobItem.objects.filter(
+        caching_job_id=caching_job.id, date_completed__isnull=True).order_by('id').values_list('id', 'we_vote_id'))
+    stop_event = stop_event or threading.Event()
+    previous_download_limit = image_download_limiter.statistics()['download_limit']
+    image_download_limiter.set_download_limit(caching_job.download_limit)
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=caching_job.worker_count,
+                                thread_name_prefix='image_caching_job_' + str(caching_job.id)) as executor:
+            future_list = [
+                executor.submit(cache_images_for_job_item, caching_job, caching_job_item_id, we_vote_id, stop_event)
+                for caching_job_item_id, we_vote_id in item_list]
+            try:
+                for future in as_completed(future_list):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # The item stays not done, so the next run tries it again
+                        logger.error("IMAGE_CACHING_JOB_ITEM_NOT_MARKED: " + str(e))
+                    if progress_function is not None:
+                        progress_function(retrieve_image_caching_job_progress(caching_job))
+            except KeyboardInterrupt:
+                # The items already started finish and are marked, the rest wait for the next run
+                stop_event.set()
+                status += "IMAGE_CACHING_JOB_INTERRUPTED "
+    finally:
+        image_download_limiter.set_download_limit(previous_download_limit)
+
+    caching_job_progress = retrieve_image_caching_job_progress(caching_job)
+    summary = "{cached} cached, {failed} failed, {left} left, with {workers} workers in {seconds:.0f} " \
+              "sec".format(cached=caching_job_progress['item_cached_count'],
+                           failed=caching_job_progress['item_failed_count'],
+                           left=caching_job_progress['item_left_count'], workers=caching_job.worker_count,
+                           seconds=time.time() - start_time)
+    if caching_job_progress['item_left_count'] == 0:
+        WeVoteImageCachingJob.objects.filter(id=caching_job.id).update(
+            date_completed=now(), completion_summary=summary)
+        status += "IMAGE_CACHING_JOB_COMPLETED "
+    else:
+        WeVoteImageCachingJob.objects.filter(id=caching_job.id).update(completion_summary=summary)
+        status += "IMAGE_CACHING_JOB_STOPPED "
+    caching_job.refresh_from_db()
+
+    results = {
+        'success':              True,
+        'status':               status,
+        'caching_job':          caching_job,
+        'caching_job_progress': retrieve_image_caching_job_progress(caching_job),
+    }
+    return results
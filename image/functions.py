@@ -2,37 +2,110 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
+from config.base import get_environment_variable_default
 from exception.models import handle_exception
 from io import BytesIO
 from PIL import Image
 from urllib.request import Request, urlopen
-import urllib
-import requests
+import threading
 import wevote_functions.admin
+from wevote_functions.functions import convert_to_int
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# How many image downloads one process runs at the same time, so the bulk image caching jobs don't flood the sites
+# we download from (or get rate limited by them)
+IMAGE_DOWNLOAD_LIMIT = convert_to_int(get_environment_variable_default('IMAGE_DOWNLOAD_LIMIT', 8))
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = convert_to_int(get_environment_variable_default('IMAGE_DOWNLOAD_TIMEOUT_SECONDS', 30))
+# Some sites only send images to browsers
+REMOTE_IMAGE_REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/36.0.1941.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
+    'Accept-Encoding': 'none',
+    'Accept-Language': 'en-US,en;q=0.8',
+    'Connection': 'keep-alive',
+}
+
+
+class ImageDownloadLimiter(object):
+    """
+    Lets at most download_limit threads download an image at a time. The limit can be changed while downloads are
+    running, for example by a bulk image caching job.
+    """
+
+    def __init__(self, download_limit=IMAGE_DOWNLOAD_LIMIT):
+        self.condition = threading.Condition()
+        self.download_limit = max(download_limit, 1)
+        self.active_count = 0
+        self.largest_active_count = 0
+
+    def set_download_limit(self, download_limit):
+        with self.condition:
+            self.download_limit = max(download_limit, 1)
+            self.condition.notify_all()
+
+    def __enter__(self):
+        with self.condition:
+            while self.active_count >= self.download_limit:
+                self.condition.wait()
+            self.active_count += 1
+            if self.active_count > self.largest_active_count:
+                self.largest_active_count = self.active_count
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.condition:
+            self.active_count -= 1
+            self.condition.notify()
+        return False
+
+    def statistics(self):
+        with self.condition:
+            return {
+                'download_limit':           self.download_limit,
+                'active_count':             self.active_count,
+                'largest_active_count':     self.largest_active_count,
+            }
+
+    def clear(self):
+        with self.condition:
+            self.largest_active_count = self.active_count
+
+
+# One per process
+image_download_limiter = ImageDownloadLimiter()
+
+
+def download_image_bytes(image_url_https, headers=None):
+    """
+    Download the image into memory, waiting for a free download slot first. Raises like urlopen does.
+    :param image_url_https:
+    :param headers:
+    :return:
+    """
+    remote_url_req = Request(image_url_https, headers=headers or {})
+    with image_download_limiter:
+        with urlopen(remote_url_req, timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS) as remote_url:
+            return remote_url.read()
+
 
 def analyze_remote_url(image_url_https):
     """
-    Validate url and get image properties
+    Validate url and get image properties. We download the image once, and return its bytes as image_bytes so the
+    caller can store it without downloading it again.
     :param image_url_https:
     :return:
     """
+    image_bytes = None
     image_format = None
     image_height = None
     image_width = None
     image_url_valid = False
     try:
         if image_url_https is not None:
-            # urlopen(Request(image_url_https))
-            remote_url_req = urllib.request.Request(image_url_https,headers={'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/36.0.1941.0 Safari/537.36',
-                                                                             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                                                                             'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.3',
-                                                                             'Accept-Encoding': 'none',
-                                                                             'Accept-Language': 'en-US,en;q=0.8',
-                                                                             'Connection': 'keep-alive'})
-            remote_url = urlopen(remote_url_req)
+            image_bytes = download_image_bytes(image_url_https, headers=REMOTE_IMAGE_REQUEST_HEADERS)
             image_url_valid = True
     except Exception as e:
         image_url_valid = False
@@ -42,18 +115,19 @@ def analyze_remote_url(image_url_https):
 
     if image_url_valid:
         try:
-            response = requests.get(image_url_https)
-            image = Image.open(BytesIO(response.content))
+            image = Image.open(BytesIO(image_bytes))
             image_width, image_height = image.size
             image_format = image.format
         except Exception as e:
             image_url_valid = False
+            image_bytes = None
 
     results = {
         'image_url_valid':              image_url_valid,
         'image_width':                  image_width,
         'image_height':                 image_height,
-        'image_format':                 image_format.lower() if image_format is not None else image_format
+        'image_format':                 image_format.lower() if image_format is not None else image_format,
+        'image_bytes':                  image_bytes,
     }
     return results
 
@@ -0,0 +1,146 @@
+# image/image_storage.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Where WeVoteImageManager keeps our cached image files.
+#   - S3ImageStorage writes to AWS_STORAGE_BUCKET_NAME with one boto3 client per process. Creating a client loads
+#     the service description and opens a new connection pool, which used to happen for every image we uploaded.
+#   - LocalImageStorage keeps the same keys as files under IMAGE_STORAGE_LOCAL_DIRECTORY. It stands in for S3 when
+#     developing or benchmarking offline (see the benchmark_image_pipeline management command).
+# IMAGE_STORAGE_LOCAL_DIRECTORY is empty in production, so we use S3.
+
+import boto3
+from botocore.config import Config
+from config.base import get_environment_variable, get_environment_variable_default
+import os
+import shutil
+import threading
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+AWS_ACCESS_KEY_ID = get_environment_variable("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = get_environment_variable("AWS_SECRET_ACCESS_KEY")
+AWS_REGION_NAME = get_environment_variable("AWS_REGION_NAME")
+AWS_STORAGE_BUCKET_NAME = get_environment_variable("AWS_STORAGE_BUCKET_NAME")
+AWS_STORAGE_SERVICE = "s3"
+# One connection per thread that uploads at the same time, in the bulk image caching jobs
+IMAGE_STORAGE_MAX_POOL_CONNECTIONS = \
+    convert_to_int(get_environment_variable_default('IMAGE_STORAGE_MAX_POOL_CONNECTIONS', 20))
+IMAGE_STORAGE_LOCAL_DIRECTORY = get_environment_variable_default('IMAGE_STORAGE_LOCAL_DIRECTORY', '')
+
+
+class S3ImageStorage(object):
+    """
+    Our S3 bucket, through a client shared by all the threads in this process
+    """
+
+    def __init__(self, bucket_name=AWS_STORAGE_BUCKET_NAME):
+        self.bucket_name = bucket_name
+        self.lock = threading.Lock()
+        self.client = None
+        self.client_process_id = None
+
+    def get_client(self):
+        # boto3 clients are thread safe, but a worker forked from a process with a client must not share its sockets
+        process_id = os.getpid()
+        if self.client is not None and self.client_process_id == process_id:
+            return self.client
+        with self.lock:
+            if self.client is None or self.client_process_id != process_id:
+                self.client = boto3.session.Session().client(
+                    AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
+                    aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    config=Config(max_pool_connections=IMAGE_STORAGE_MAX_POOL_CONNECTIONS))
+                self.client_process_id = process_id
+        return self.client
+
+    def put_image(self, we_vote_image_file_location, image_file, content_type=None):
+        """
+        :param we_vote_image_file_location:
+        :param image_file: bytes, or a file-like object
+        :param content_type:
+        """
+        extra_arguments = {'ContentType': content_type} if content_type else {}
+        self.get_client().put_object(
+            Bucket=self.bucket_name, Key=we_vote_image_file_location, Body=image_file, **extra_arguments)
+
+    def upload_image_file(self, local_path, we_vote_image_file_location, content_type=None):
+        extra_arguments = {'ContentType': content_type} if content_type else None
+        self.get_client().upload_file(
+            local_path, self.bucket_name, we_vote_image_file_location, ExtraArgs=extra_arguments)
+
+    def download_image_file(self, we_vote_image_file_location, local_path):
+        self.get_client().download_file(self.bucket_name, we_vote_image_file_location, local_path)
+
+    def delete_image(self, we_vote_image_file_location):
+        self.get_client().delete_object(Bucket=self.bucket_name, Key=we_vote_image_file_location)
+
+    def image_url(self, we_vote_image_file_location):
+        return "https://{bucket_name}.s3.amazonaws.com/{we_vote_image_file_location}" \
+               "".format(bucket_name=self.bucket_name, we_vote_image_file_location=we_vote_image_file_location)
+
+
+class LocalImageStorage(object):
+    """
+    A directory laid out like our S3 bucket
+    """
+
+    def __init__(self, directory=IMAGE_STORAGE_LOCAL_DIRECTORY):
+        self.directory = os.path.abspath(directory)
+
+    def local_path(self, we_vote_image_file_location):
+        local_path = os.path.abspath(os.path.join(self.directory, we_vote_image_file_location))
+        if not local_path.startswith(self.directory + os.sep):
+            raise ValueError("Image location outside of image storage: " + str(we_vote_image_file_location))
+        return local_path
+
+    def put_image(self, we_vote_image_file_location, image_file, content_type=None):
+        local_path = self.local_path(we_vote_image_file_location)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, 'wb') as local_file:
+            if isinstance(image_file, (bytes, bytearray)):
+                local_file.write(image_file)
+            else:
+                shutil.copyfileobj(image_file, local_file)
+
+    def upload_image_file(self, local_path, we_vote_image_file_location, content_type=None):
+        with open(local_path, 'rb') as image_file:
+            self.put_image(we_vote_image_file_location, image_file, content_type)
+
+    def download_image_file(self, we_vote_image_file_location, local_path):
+        shutil.copyfile(self.local_path(we_vote_image_file_location), local_path)
+
+    def delete_image(self, we_vote_image_file_location):
+        # Like S3, deleting an image that isn't there is not an error
+        try:
+            os.remove(self.local_path(we_vote_image_file_location))
+        except FileNotFoundError:
+            pass
+
+    def image_url(self, we_vote_image_file_location):
+        return "file://" + self.local_path(we_vote_image_file_location)
+
+
+def create_image_storage():
+    if positive_value_exists(IMAGE_STORAGE_LOCAL_DIRECTORY):
+        return LocalImageStorage(IMAGE_STORAGE_LOCAL_DIRECTORY)
+    return S3ImageStorage()
+
+
+# One per process
+image_storage = create_image_storage()
+
+
+def get_image_storage():
+    return image_storage
+
+
+def set_image_storage(new_image_storage):
+    """
+    Switch this process to another storage, like a LocalImageStorage for a benchmark or test
+    :param new_image_storage:
+    :return: the storage we were using, so the caller can switch back
+    """
+    global image_storage
+    previous_image_storage = image_storage
+    image_storage = new_image_storage
+    return previous_image_storage
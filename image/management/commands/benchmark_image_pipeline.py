@@ -0,0 +1,107 @@
+# image/management/commands/benchmark_image_pipeline.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.core.management.base import BaseCommand
+from image.controllers import PROFILE_IMAGE_LARGE_HEIGHT, PROFILE_IMAGE_LARGE_WIDTH, PROFILE_IMAGE_MEDIUM_HEIGHT, \
+    PROFILE_IMAGE_MEDIUM_WIDTH, PROFILE_IMAGE_TINY_HEIGHT, PROFILE_IMAGE_TINY_WIDTH
+from image.image_storage import AWS_STORAGE_SERVICE, LocalImageStorage, set_image_storage
+from image.models import TWITTER_PROFILE_IMAGE_NAME, WeVoteImageManager
+from image.test_helpers import create_sample_image_bytes
+from io import BytesIO
+from PIL import Image
+import boto3
+import os
+import shutil
+import tempfile
+import time
+
+RESIZED_IMAGE_SIZE_LIST = [
+    ('large', PROFILE_IMAGE_LARGE_WIDTH, PROFILE_IMAGE_LARGE_HEIGHT),
+    ('medium', PROFILE_IMAGE_MEDIUM_WIDTH, PROFILE_IMAGE_MEDIUM_HEIGHT),
+    ('tiny', PROFILE_IMAGE_TINY_WIDTH, PROFILE_IMAGE_TINY_HEIGHT),
+]
+
+
+def cache_resized_images_through_tmp(we_vote_image_manager, image_storage, image_bytes, image_format, number):
+    """
+    What cache_resized_image_locally used to do for each resized version: save the downloaded image in /tmp, resize
+    it there, then upload the file with a new boto3 client
+    """
+    for size_name, image_width, image_height in RESIZED_IMAGE_SIZE_LIST:
+        we_vote_image_file_name = "benchmark_image_pipeline_{number}_{size_name}.{image_format}".format(
+            number=number, size_name=size_name, image_format=image_format)
+        with open("/tmp/" + we_vote_image_file_name, 'wb') as image_file:
+            image_file.write(image_bytes)
+        we_vote_image_manager.resize_we_vote_master_image(
+            we_vote_image_file_name, image_width, image_height, TWITTER_PROFILE_IMAGE_NAME, 0, 0)
+        boto3.client(AWS_STORAGE_SERVICE, region_name='us-east-1',
+                     aws_access_key_id='benchmark', aws_secret_access_key='benchmark')
+        image_storage.upload_image_file("/tmp/" + we_vote_image_file_name,
+                                        "tmp/{number}/{name}".format(number=number, name=we_vote_image_file_name),
+                                        content_type="image/" + image_format)
+        os.remove("/tmp/" + we_vote_image_file_name)
+
+
+def cache_resized_images_in_memory(we_vote_image_manager, image_bytes, image_format, number):
+    """
+    What cache_resized_image_locally does now: decode once, then resize, encode and upload each version from memory
+    """
+    source_python_image = Image.open(BytesIO(image_bytes))
+    source_python_image.load()
+    for size_name, image_width, image_height in RESIZED_IMAGE_SIZE_LIST:
+        resized_image_bytes = we_vote_image_manager.resize_we_vote_image_in_memory(
+            source_python_image, image_width, image_height, TWITTER_PROFILE_IMAGE_NAME, 0, 0, image_format)
+        we_vote_image_manager.store_image_bytes_to_aws(
+            resized_image_bytes, "memory/{number}/{size_name}.{image_format}".format(
+                number=number, size_name=size_name, image_format=image_format), image_format)
+
+
+class Command(BaseCommand):
+    help = 'Times making the large, medium and tiny versions of synthetic images, through /tmp files with a new ' \
+           'boto3 client per upload (the old way) and in memory with one client per process, and reports images per ' \
+           'minute. Uploads go to a LocalImageStorage in a temporary directory, so this runs offline and the ' \
+           'difference is the work on our side of the network.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--image_count', type=int, default=100)
+        parser.add_argument('--source_width', type=int, default=800)
+        parser.add_argument('--source_height', type=int, default=800)
+        parser.add_argument('--image_format', type=str, default='jpeg')
+
+    def handle(self, *args, **options):
+        image_count = max(options['image_count'], 1)
+        image_format = options['image_format'].lower()
+        source_image_list = [
+            create_sample_image_bytes(options['source_width'], options['source_height'], image_format,
+                                      noise_sigma=32 + number % 32)
+            for number in range(min(image_count, 10))]
+        we_vote_image_manager = WeVoteImageManager()
+        storage_directory = tempfile.mkdtemp(prefix='benchmark_image_pipeline_')
+        local_image_storage = LocalImageStorage(storage_directory)
+        previous_image_storage = set_image_storage(local_image_storage)
+        try:
+            start_time = time.time()
+            for number in range(image_count):
+                cache_resized_images_through_tmp(
+                    we_vote_image_manager, local_image_storage, source_image_list[number % len(source_image_list)],
+                    image_format, number)
+            tmp_seconds = time.time() - start_time
+
+            start_time = time.time()
+            for number in range(image_count):
+                cache_resized_images_in_memory(
+                    we_vote_image_manager, source_image_list[number % len(source_image_list)], image_format, number)
+            memory_seconds = time.time() - start_time
+        finally:
+            set_image_storage(previous_image_storage)
+            shutil.rmtree(storage_directory, ignore_errors=True)
+
+        report_format = '{label}: {image_count} images ({source_width}x{source_height} {image_format}, 3 versions ' \
+                        'each) in {seconds:.2f} sec, {images_per_minute:.0f} images/min'
+        for label, seconds in [('/tmp files, client per upload', tmp_seconds),
+                               ('in memory, one client', memory_seconds)]:
+            self.stdout.write(report_format.format(
+                label=label, image_count=image_count, source_width=options['source_width'],
+                source_height=options['source_height'], image_format=image_format, seconds=seconds,
+                images_per_minute=image_count * 60 / max(seconds, 0.001)))
@@ -0,0 +1,70 @@
+# image/management/commands/cache_images_in_parallel.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.core.management.base import BaseCommand, CommandError
+from image.controllers_caching_job import run_image_caching_job, start_image_caching_job
+from image.models import CACHE_IMAGES_FOR_CANDIDATES, CACHE_IMAGES_FOR_ORGANIZATIONS, CACHE_IMAGES_FOR_VOTERS
+import time
+
+KIND_OF_JOB_BY_NAME = {
+    'candidates':       CACHE_IMAGES_FOR_CANDIDATES,
+    'organizations':    CACHE_IMAGES_FOR_ORGANIZATIONS,
+    'voters':           CACHE_IMAGES_FOR_VOTERS,
+}
+
+
+class Command(BaseCommand):
+    help = 'Caches the master and resized images for all candidates, organizations or voters (optionally for one ' \
+           'election), several at a time. Ctrl-C stops after the ones already started; run again with --resume ' \
+           'to cache the rest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', type=str, choices=sorted(KIND_OF_JOB_BY_NAME.keys()))
+        parser.add_argument('--google_civic_election_id', type=int, default=0)
+        parser.add_argument('--resume', type=int, default=0, help='The id of an image caching job to finish')
+        parser.add_argument('--retry_failed', action='store_true')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Defaults to IMAGE_CACHING_WORKER_COUNT for a new job, and to the saved value for '
+                                 'a resumed one')
+        parser.add_argument('--download_limit', type=int, default=None,
+                            help='How many images we download at the same time. Defaults to IMAGE_DOWNLOAD_LIMIT '
+                                 'for a new job, and to the saved value for a resumed one')
+        parser.add_argument('--progress_seconds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Only pass along the settings that were given, so a resumed job keeps the ones saved with it
+        job_settings = {}
+        if options['workers'] is not None:
+            job_settings['worker_count'] = options['workers']
+        if options['download_limit'] is not None:
+            job_settings['download_limit'] = options['download_limit']
+
+        if options['resume']:
+            caching_job_id = options['resume']
+        elif options['kind']:
+            results = start_image_caching_job(
+                KIND_OF_JOB_BY_NAME[options['kind']], options['google_civic_election_id'], **job_settings)
+            if not results['success']:
+                raise CommandError(results['status'])
+            caching_job_id = results['caching_job'].id
+            self.stdout.write('Started image caching job {caching_job_id} with {item_count} {kind}'.format(
+                caching_job_id=caching_job_id, item_count=results['caching_job'].item_count, kind=options['kind']))
+        else:
+            raise CommandError('Either --kind or --resume is required')
+
+        last_report = {'time': time.time()}
+        progress_format = 'Job {caching_job_id}: {percent_done}% ({item_cached_count} cached, {item_failed_count} ' \
+                          'failed, {item_left_count} left), {items_per_minute}/min, {seconds_left} sec left'
+
+        def report_progress(caching_job_progress):
+            if time.time() - last_report['time'] >= options['progress_seconds']:
+                last_report['time'] = time.time()
+                self.stdout.write(progress_format.format(**caching_job_progress))
+
+        results = run_image_caching_job(
+            caching_job_id, retry_failed=options['retry_failed'], progress_function=report_progress, **job_settings)
+        if not results['success']:
+            raise CommandError(results['status'])
+        self.stdout.write(progress_format.format(**results['caching_job_progress']))
+        self.stdout.write(results['status'] + results['caching_job'].completion_summary)
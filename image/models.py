@@ -2,18 +2,17 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from config.base import get_environment_variable
 from datetime import date
 from django.db import models
 from exception.models import handle_record_found_more_than_one_exception, handle_exception, \
     handle_record_not_saved_exception, handle_record_not_deleted_exception
 from PIL import Image, ImageOps
-from urllib.request import urlretrieve
+from io import BytesIO
 from urllib.error import HTTPError
 from wevote_functions.functions import convert_to_int, positive_value_exists
-import boto3
 import wevote_functions.admin
-from .functions import analyze_remote_url
+from .functions import analyze_remote_url, download_image_bytes
+from .image_storage import get_image_storage
 
 # naming convention stored at aws
 CHOSEN_FAVICON_NAME = "favicon_image"
@@ -34,11 +33,15 @@ MASTER_IMAGE = "master"
 # This constant is stored in WeVoteImage, field is other_source
 ORGANIZATION_ENDORSEMENTS_IMAGE_NAME = "organization_endorsements_image"
 
-AWS_ACCESS_KEY_ID = get_environment_variable("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = get_environment_variable("AWS_SECRET_ACCESS_KEY")
-AWS_REGION_NAME = get_environment_variable("AWS_REGION_NAME")
-AWS_STORAGE_BUCKET_NAME = get_environment_variable("AWS_STORAGE_BUCKET_NAME")
-AWS_STORAGE_SERVICE = "s3"
+# Kinds of WeVoteImageCachingJob
+CACHE_IMAGES_FOR_CANDIDATES = "CACHE_IMAGES_FOR_CANDIDATES"
+CACHE_IMAGES_FOR_ORGANIZATIONS = "CACHE_IMAGES_FOR_ORGANIZATIONS"
+CACHE_IMAGES_FOR_VOTERS = "CACHE_IMAGES_FOR_VOTERS"
+KIND_OF_IMAGE_CACHING_JOB_CHOICES = (
+    (CACHE_IMAGES_FOR_CANDIDATES,       'Cache images for candidates'),
+    (CACHE_IMAGES_FOR_ORGANIZATIONS,    'Cache images for organizations'),
+    (CACHE_IMAGES_FOR_VOTERS,           'Cache images for voters'),
+)
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -281,10 +284,7 @@ class WeVoteImageManager(models.Model):
         """
         try:
 
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
-            client.delete_object(Bucket=AWS_STORAGE_BUCKET_NAME, Key=we_vote_image_file_location)
+            get_image_storage().delete_image(we_vote_image_file_location)
             image_deleted_from_aws = True
         except Exception as e:
             image_deleted_from_aws = False
@@ -1435,16 +1435,8 @@ class WeVoteImageManager(models.Model):
         """
         try:
             image_local_path = "/tmp/" + image_local_path
-            image = Image.open(image_local_path)
-            if image_type == TWITTER_BACKGROUND_IMAGE_NAME or image_type == TWITTER_BANNER_IMAGE_NAME:
-                image = image.resize((image_width, image_height), Image.ANTIALIAS)
-            elif image_type == FACEBOOK_BACKGROUND_IMAGE_NAME:
-                centering_x = 0.5
-                centering_y = ((image.height - image_offset_y) * 0.5) / image.height
-                image = ImageOps.fit(image, (image_width, image_height), Image.ANTIALIAS,
-                                     centering=(centering_x, centering_y))
-            else:
-                image = ImageOps.fit(image, (image_width, image_height), Image.ANTIALIAS, centering=(0.5, 0.5))
+            image = self.resize_python_image(
+                Image.open(image_local_path), image_width, image_height, image_type, image_offset_x, image_offset_y)
             image.save(image_local_path)
             resized_image_created = True
         except Exception as e:
@@ -1454,6 +1446,80 @@ class WeVoteImageManager(models.Model):
 
         return resized_image_created
 
+    def resize_python_image(self, python_image_library_image, image_width, image_height, image_type,
+                            image_offset_x, image_offset_y):
+        """
+        Return a resized copy of the image, leaving the image as it was, so we can make every resized version from
+        one decoded image. Raises like PIL does.
+        :param python_image_library_image:
+        :param image_width:
+        :param image_height:
+        :param image_type:
+        :param image_offset_x:
+        :param image_offset_y:
+        :return:
+        """
+        image = python_image_library_image
+        if image_type == TWITTER_BACKGROUND_IMAGE_NAME or image_type == TWITTER_BANNER_IMAGE_NAME:
+            return image.resize((image_width, image_height), Image.ANTIALIAS)
+        elif image_type == FACEBOOK_BACKGROUND_IMAGE_NAME:
+            centering_x = 0.5
+            centering_y = ((image.height - image_offset_y) * 0.5) / image.height
+            return ImageOps.fit(image, (image_width, image_height), Image.ANTIALIAS,
+                                centering=(centering_x, centering_y))
+        else:
+            return ImageOps.fit(image, (image_width, image_height), Image.ANTIALIAS, centering=(0.5, 0.5))
+
+    def resize_we_vote_image_in_memory(self, python_image_library_image, image_width, image_height, image_type,
+                                       image_offset_x, image_offset_y, image_format):
+        """
+        Resize the decoded image and encode the resized version, without going through /tmp
+        :param python_image_library_image:
+        :param image_width:
+        :param image_height:
+        :param image_type:
+        :param image_offset_x:
+        :param image_offset_y:
+        :param image_format:
+        :return: the encoded image bytes, or None if we couldn't resize it
+        """
+        try:
+            image = self.resize_python_image(
+                python_image_library_image, image_width, image_height, image_type, image_offset_x, image_offset_y)
+            return self.encode_python_image(image, image_format)
+        except Exception as e:
+            exception_message = "resize_we_vote_image_in_memory failed"
+            handle_exception(e, logger=logger, exception_message=exception_message)
+            return None
+
+    def encode_python_image(self, python_image_library_image, image_format):
+        """
+        Encode the image the way saving it to a file named *.{image_format} would
+        :param python_image_library_image:
+        :param image_format:
+        :return:
+        """
+        pil_format = Image.registered_extensions().get("." + str(image_format).lower(), str(image_format).upper())
+        image_buffer = BytesIO()
+        python_image_library_image.save(image_buffer, format=pil_format)
+        return image_buffer.getvalue()
+
+    def retrieve_image_bytes_from_url(self, image_url_https):
+        """
+        Download the image into memory
+        :param image_url_https:
+        :return: the image bytes, or None if we couldn't download it
+        """
+        try:
+            return download_image_bytes(image_url_https)
+        except HTTPError as error:  # something wrong with url
+            exception_message = "retrieve_image_bytes_from_url failed because of http error"
+            handle_exception(error, logger=logger, exception_message=exception_message)
+        except Exception as e:
+            exception_message = "retrieve_image_bytes_from_url failed"
+            handle_exception(e, logger=logger, exception_message=exception_message)
+        return None
+
     def store_image_locally(self, image_url_https, image_local_path):
         """
         Save image locally at /tmp/ folder
@@ -1463,7 +1529,11 @@ class WeVoteImageManager(models.Model):
         """
         try:
             image_local_path = "/tmp/" + image_local_path
-            urlretrieve(image_url_https, image_local_path)
+            image_bytes = self.retrieve_image_bytes_from_url(image_url_https)
+            if image_bytes is None:
+                return False
+            with open(image_local_path, 'wb') as image_file:
+                image_file.write(image_bytes)
             image_stored = True
         except HTTPError as error:  # something wrong with url
             image_stored = False
@@ -1507,13 +1577,10 @@ class WeVoteImageManager(models.Model):
         :return:
         """
         try:
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
             upload_image_from_location = "/tmp/" + we_vote_image_file_name
             content_type = "image/{image_format}".format(image_format=image_format)
-            client.upload_file(upload_image_from_location, AWS_STORAGE_BUCKET_NAME, we_vote_image_file_location,
-                               ExtraArgs={'ContentType': content_type})
+            get_image_storage().upload_image_file(upload_image_from_location, we_vote_image_file_location,
+                                                  content_type=content_type)
             image_stored_to_aws = True
         except Exception as e:
             image_stored_to_aws = False
@@ -1522,6 +1589,28 @@ class WeVoteImageManager(models.Model):
 
         return image_stored_to_aws
 
+    def store_image_bytes_to_aws(self, image_bytes, we_vote_image_file_location, image_format):
+        """
+        Upload image bytes we have in memory to aws
+        :param image_bytes:
+        :param we_vote_image_file_location:
+        :param image_format:
+        :return:
+        """
+        try:
+            content_type = "image/{image_format}".format(image_format=image_format)
+            get_image_storage().put_image(we_vote_image_file_location, image_bytes, content_type=content_type)
+            image_stored_to_aws = True
+        except Exception as e:
+            image_stored_to_aws = False
+            exception_message = "store_image_bytes_to_aws failed: " + str(e) + " "
+            handle_exception(e, logger=logger, exception_message=exception_message)
+
+        return image_stored_to_aws
+
+    def we_vote_image_url_from_location(self, we_vote_image_file_location):
+        return get_image_storage().image_url(we_vote_image_file_location)
+
     def store_image_file_to_aws(self, image_file, we_vote_image_file_location):
         """
         Upload image_file(inMemoryUploadedFile) directly to AWS
@@ -1530,12 +1619,7 @@ class WeVoteImageManager(models.Model):
         :return:
         """
         try:
-            session = boto3.session.Session(region_name=AWS_REGION_NAME,
-                                            aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                            aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
-            s3 = session.resource(AWS_STORAGE_SERVICE)
-            s3.Bucket(AWS_STORAGE_BUCKET_NAME).put_object(Key=we_vote_image_file_location,
-                                                          Body=image_file)
+            get_image_storage().put_image(we_vote_image_file_location, image_file)
             image_stored_to_aws = True
         except Exception as e:
             image_stored_to_aws = False
@@ -1551,11 +1635,8 @@ class WeVoteImageManager(models.Model):
         :return:
         """
         try:
-            client = boto3.client(AWS_STORAGE_SERVICE, region_name=AWS_REGION_NAME,
-                                  aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
             download_image_at_location = "/tmp/" + we_vote_image_file_location
-            client.download_file(AWS_STORAGE_BUCKET_NAME, we_vote_image_file_location, download_image_at_location)
+            get_image_storage().download_image_file(we_vote_image_file_location, download_image_at_location)
             image_retrieved_from_aws = True
         except Exception as e:
             image_retrieved_from_aws = False
@@ -1563,3 +1644,46 @@ class WeVoteImageManager(models.Model):
             handle_exception(e, logger=logger, exception_message=exception_message)
 
         return image_retrieved_from_aws
+
+
+class WeVoteImageCachingJob(models.Model):
+    """
+    One run of a bulk job that caches the master and resized images for every candidate, organization or voter in
+    its list (see image/controllers_caching_job.py). The list is saved as WeVoteImageCachingJobItem entries when the
+    job starts, so an interrupted job can be resumed where it stopped.
+    """
+    kind_of_job = models.CharField(max_length=50, choices=KIND_OF_IMAGE_CACHING_JOB_CHOICES)
+    # 0 for all candidates, organizations or voters
+    google_civic_election_id = models.PositiveIntegerField(default=0, null=False, db_index=True)
+    worker_count = models.PositiveIntegerField(default=1)
+    download_limit = models.PositiveIntegerField(default=1)
+    item_count = models.PositiveIntegerField(default=0)
+    item_cached_count = models.PositiveIntegerField(default=0)
+    item_failed_count = models.PositiveIntegerField(default=0)
+    date_started = models.DateTimeField(null=True)
+    date_last_progress = models.DateTimeField(null=True)
+    date_completed = models.DateTimeField(null=True)
+    completion_summary = models.TextField(null=True, blank=True)
+
+    def item_done_count(self):
+        return self.item_cached_count + self.item_failed_count
+
+    def percent_done(self):
+        if not positive_value_exists(self.item_count):
+            return 100
+        return int(100 * self.item_done_count() / self.item_count)
+
+
+class WeVoteImageCachingJobItem(models.Model):
+    """
+    One candidate, organization or voter whose images a WeVoteImageCachingJob caches
+    """
+    caching_job_id = models.PositiveIntegerField(default=0, null=False, db_index=True)
+    # candidate_we_vote_id, organization_we_vote_id or voter_we_vote_id
+    we_vote_id = models.CharField(max_length=255, null=False)
+    date_completed = models.DateTimeField(null=True)
+    succeeded = models.BooleanField(default=False)
+    status = models.TextField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('caching_job_id', 'we_vote_id')
@@ -0,0 +1,25 @@
+# image/test_helpers.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from io import BytesIO
+from PIL import Image
+
+
+def create_sample_image_bytes(image_width, image_height, image_format, noise_sigma=40):
+    """
+    A noisy photo-like image, so encoding it costs about what a real profile photo costs. For tests and benchmarks.
+    :param image_width:
+    :param image_height:
+    :param image_format: like 'png' or 'jpeg'
+    :param noise_sigma: vary this to get images that don't compress the same way
+    :return: the encoded image
+    """
+    image = Image.merge('RGB', [
+        Image.effect_noise((image_width, image_height), noise_sigma),
+        Image.linear_gradient('L').resize((image_width, image_height)),
+        Image.radial_gradient('L').resize((image_width, image_height)),
+    ])
+    image_buffer = BytesIO()
+    image.save(image_buffer, format=image_format.upper())
+    return image_buffer.getvalue()
@@ -0,0 +1,219 @@
+# image/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import SimpleTestCase, TransactionTestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from image.controllers_caching_job import cache_images_for_job_item, run_image_caching_job, \
+    start_image_caching_job
+from image.functions import image_download_limiter
+from image.image_storage import LocalImageStorage, set_image_storage
+from image.models import CACHE_IMAGES_FOR_CANDIDATES, FACEBOOK_BACKGROUND_IMAGE_NAME, TWITTER_PROFILE_IMAGE_NAME, \
+    WeVoteImage, WeVoteImageCachingJobItem, WeVoteImageManager
+from image.test_helpers import create_sample_image_bytes
+from io import BytesIO
+from PIL import Image
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+class WeVoteImageTestsInMemoryPipeline(SimpleTestCase):
+
+    def setUp(self):
+        self.storage_directory = tempfile.mkdtemp(prefix='image_tests_')
+        self.previous_image_storage = set_image_storage(LocalImageStorage(self.storage_directory))
+        self.we_vote_image_manager = WeVoteImageManager()
+
+    def tearDown(self):
+        set_image_storage(self.previous_image_storage)
+        shutil.rmtree(self.storage_directory, ignore_errors=True)
+
+    def test_resize_in_memory_matches_resize_through_tmp(self):
+        image_bytes = create_sample_image_bytes(400, 300, 'png')
+        source_python_image = Image.open(BytesIO(image_bytes))
+        source_python_image.load()
+        for image_type, image_width, image_height, image_offset_y in [
+                (TWITTER_PROFILE_IMAGE_NAME, 200, 200, 0), (TWITTER_PROFILE_IMAGE_NAME, 48, 48, 0),
+                (FACEBOOK_BACKGROUND_IMAGE_NAME, 320, 120, 60)]:
+            we_vote_image_file_name = 'image_tests_{width}x{height}.png'.format(width=image_width, height=image_height)
+            with open('/tmp/' + we_vote_image_file_name, 'wb') as image_file:
+                image_file.write(image_bytes)
+            self.assertTrue(self.we_vote_image_manager.resize_we_vote_master_image(
+                we_vote_image_file_name, image_width, image_height, image_type, 0, image_offset_y))
+            with open('/tmp/' + we_vote_image_file_name, 'rb') as image_file:
+                resized_through_tmp = Image.open(BytesIO(image_file.read()))
+            os.remove('/tmp/' + we_vote_image_file_name)
+
+            resized_image_bytes = self.we_vote_image_manager.resize_we_vote_image_in_memory(
+                source_python_image, image_width, image_height, image_type, 0, image_offset_y, 'png')
+            resized_in_memory = Image.open(BytesIO(resized_image_bytes))
+            self.assertEqual(resized_in_memory.format, 'PNG')
+            self.assertEqual(resized_in_memory.size, (image_width, image_height))
+            self.assertEqual(resized_in_memory.tobytes(), resized_through_tmp.tobytes())
+        # Every version came from the same decoded image, which we left as it was
+        self.assertEqual(source_python_image.size, (400, 300))
+
+    def test_store_and_delete_with_local_image_storage(self):
+        image_bytes = create_sample_image_bytes(60, 40, 'jpeg')
+        we_vote_image_file_location = 'wv01voter1/twitter_profile_image-20201018_1_60x40.jpeg'
+        self.assertTrue(self.we_vote_image_manager.store_image_bytes_to_aws(
+            image_bytes, we_vote_image_file_location, 'jpeg'))
+        local_path = os.path.join(self.storage_directory, we_vote_image_file_location)
+        with open(local_path, 'rb') as image_file:
+            self.assertEqual(image_file.read(), image_bytes)
+        self.assertEqual(self.we_vote_image_manager.we_vote_image_url_from_location(we_vote_image_file_location),
+                         'file://' + os.path.abspath(local_path))
+
+        self.assertTrue(self.we_vote_image_manager.delete_image_from_aws(we_vote_image_file_location))
+        self.assertFalse(os.path.exists(local_path))
+        # Keys can't reach outside of the storage directory
+        self.assertFalse(self.we_vote_image_manager.store_image_bytes_to_aws(image_bytes, '../outside.jpeg', 'jpeg'))
+
+
+class ImageFixtureServer(object):
+    """
+    Serves test images over HTTP on localhost, counting the requests for each path and how many run at the same time
+    """
+
+    def __init__(self, image_bytes_by_path, seconds_per_request=0.05):
+        self.image_bytes_by_path = image_bytes_by_path
+        self.request_count_by_path = {}
+        self.active_count = 0
+        self.largest_active_count = 0
+        self.lock = threading.Lock()
+        fixture_server = self
+
+        class ImageRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture_server.lock:
+                    fixture_server.request_count_by_path[self.path] = \
+                        fixture_server.request_count_by_path.get(self.path, 0) + 1
+                    fixture_server.active_count += 1
+                    fixture_server.largest_active_count = \
+                        max(fixture_server.largest_active_count, fixture_server.active_count)
+                try:
+                    time.sleep(seconds_per_request)
+                    image_bytes = fixture_server.image_bytes_by_path.get(self.path)
+                    if image_bytes is None:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/png')
+                    self.send_header('Content-Length', str(len(image_bytes)))
+                    self.end_headers()
+                    self.wfile.write(image_bytes)
+                finally:
+                    with fixture_server.lock:
+                        fixture_server.active_count -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer(('127.0.0.1', 0), ImageRequestHandler)
+        self.server_thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return 'http://127.0.0.1:{port}{path}'.format(port=self.http_server.server_address[1], path=path)
+
+    def __enter__(self):
+        self.server_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        return False
+
+
+class WeVoteImageTestsCachingJob(TransactionTestCase):
+    # The worker threads use their own database connections, so they have to see committed rows
+
+    def setUp(self):
+        self.storage_directory = tempfile.mkdtemp(prefix='image_tests_')
+        self.previous_image_storage = set_image_storage(LocalImageStorage(self.storage_directory))
+        image_download_limiter.clear()
+        self.candidate_we_vote_id_list = ['wv01cand{number}'.format(number=number) for number in range(6)]
+
+    def tearDown(self):
+        set_image_storage(self.previous_image_storage)
+        shutil.rmtree(self.storage_directory, ignore_errors=True)
+
+    def create_master_images(self, fixture_server):
+        for candidate_we_vote_id in self.candidate_we_vote_id_list:
+            WeVoteImage.objects.create(
+                candidate_we_vote_id=candidate_we_vote_id, kind_of_image_other_source=True,
+                kind_of_image_original=True, other_source='test_image_source',
+                other_source_image_url=fixture_server.url('/' + candidate_we_vote_id + '.png'),
+                we_vote_image_url='https://example.com/' + candidate_we_vote_id + '/master.png',
+                we_vote_image_file_location=candidate_we_vote_id + '/master.png')
+
+    def test_job_caches_in_parallel_and_resumes(self):
+        image_bytes_by_path = {'/' + candidate_we_vote_id + '.png': create_sample_image_bytes(300, 240, 'png')
+                               for candidate_we_vote_id in self.candidate_we_vote_id_list}
+        with ImageFixtureServer(image_bytes_by_path) as fixture_server:
+            self.create_master_images(fixture_server)
+            results = start_image_caching_job(CACHE_IMAGES_FOR_CANDIDATES, worker_count=4, download_limit=2)
+            self.assertTrue(results['success'])
+            caching_job = results['caching_job']
+            self.assertEqual(caching_job.item_count, 6)
+
+            # The first item was cached before the job was interrupted
+            first_item = WeVoteImageCachingJobItem.objects.filter(caching_job_id=caching_job.id).order_by('id')[0]
+            self.assertTrue(cache_images_for_job_item(
+                caching_job, first_item.id, first_item.we_vote_id, threading.Event()))
+
+            results = run_image_caching_job(caching_job.id)
+            self.assertIn('IMAGE_CACHING_JOB_COMPLETED', results['status'])
+            caching_job_progress = results['caching_job_progress']
+            self.assertEqual(caching_job_progress['item_cached_count'], 6)
+            self.assertEqual(caching_job_progress['item_failed_count'], 0)
+            self.assertEqual(caching_job_progress['percent_done'], 100)
+
+            # Each candidate's image was downloaded once, for all three resized versions, and never more than
+            # download_limit at a time
+            self.assertEqual(fixture_server.request_count_by_path, {path: 1 for path in image_bytes_by_path})
+            self.assertLessEqual(fixture_server.largest_active_count, 2)
+            self.assertLessEqual(image_download_limiter.statistics()['largest_active_count'], 2)
+
+        for candidate_we_vote_id in self.candidate_we_vote_id_list:
+            resized_image_list = WeVoteImage.objects.filter(
+                candidate_we_vote_id=candidate_we_vote_id, kind_of_image_original=False)
+            self.assertEqual(len(resized_image_list), 3)
+            for we_vote_image in resized_image_list:
+                self.assertTrue(os.path.exists(
+                    os.path.join(self.storage_directory, we_vote_image.we_vote_image_file_location)))
+
+        # Running the finished job again has nothing left to do
+        results = run_image_caching_job(caching_job.id)
+        self.assertEqual(results['caching_job_progress']['item_cached_count'], 6)
+
+    def test_item_whose_image_is_missing_fails_and_is_retried(self):
+        missing_we_vote_id = self.candidate_we_vote_id_list[0]
+        image_bytes_by_path = {'/' + candidate_we_vote_id + '.png': create_sample_image_bytes(300, 240, 'png')
+                               for candidate_we_vote_id in self.candidate_we_vote_id_list[1:]}
+        with ImageFixtureServer(image_bytes_by_path) as fixture_server:
+            self.create_master_images(fixture_server)
+            results = start_image_caching_job(CACHE_IMAGES_FOR_CANDIDATES, worker_count=4, download_limit=2)
+            caching_job = results['caching_job']
+
+            # The fixture server answers 404 for the first candidate's image
+            results = run_image_caching_job(caching_job.id)
+            caching_job_progress = results['caching_job_progress']
+            self.assertEqual(caching_job_progress['item_cached_count'], 5)
+            self.assertEqual(caching_job_progress['item_failed_count'], 1)
+            failed_item = WeVoteImageCachingJobItem.objects.get(caching_job_id=caching_job.id, succeeded=False)
+            self.assertEqual(failed_item.we_vote_id, missing_we_vote_id)
+            self.assertIn('cached_large_image', failed_item.status)
+
+            # Once the image is there, retrying the failed item caches it
+            fixture_server.image_bytes_by_path['/' + missing_we_vote_id + '.png'] = \
+                create_sample_image_bytes(300, 240, 'png')
+            results = run_image_caching_job(caching_job.id, retry_failed=True)
+            caching_job_progress = results['caching_job_progress']
+            self.assertEqual(caching_job_progress['item_cached_count'], 6)
+            self.assertEqual(caching_job_progress['item_failed_count'], 0)
+        self.assertEqual(WeVoteImage.objects.filter(
+            candidate_we_vote_id=missing_we_vote_id, kind_of_image_original=False).count(), 3)
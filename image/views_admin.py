@@ -7,6 +7,8 @@ from .controllers import cache_all_kind_of_images_locally_for_all_organizations,
     cache_and_create_resized_images_for_organization, create_resized_images_for_all_organizations, \
     cache_and_create_resized_images_for_voter, create_resized_images_for_all_voters, \
     retrieve_all_images_for_one_candidate, retrieve_all_images_for_one_organization, retrieve_all_images_for_one_voter
+from .controllers_caching_job import retrieve_image_caching_job_progress
+from .models import WeVoteImageCachingJob
 from admin_tools.views import redirect_to_sign_in_page
 from candidate.models import CandidateCampaignManager
 from django.contrib.auth.decorators import login_required
@@ -19,6 +21,8 @@ from wevote_functions.functions import convert_to_int, get_voter_api_device_id,
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+IMAGE_CACHING_JOBS_SHOWN = 50
+
 
 @login_required
 def cache_images_locally_for_all_organizations_view(request):
@@ -190,3 +194,25 @@ def images_for_one_organization_view(request, organization_we_vote_id):
         'organization':                 organization
     }
     return render(request, 'image/images_for_one_organization.html', template_values)
+
+
+@login_required
+def image_caching_job_list_view(request):
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    messages_on_stage = get_messages(request)
+    caching_job_list = list(WeVoteImageCachingJob.objects.order_by('-id')[:IMAGE_CACHING_JOBS_SHOWN])
+    caching_job_progress_list = []
+    for caching_job in caching_job_list:
+        caching_job_progress = retrieve_image_caching_job_progress(caching_job, refresh=False)
+        caching_job_progress['caching_job'] = caching_job
+        caching_job_progress_list.append(caching_job_progress)
+
+    template_values = {
+        'messages_on_stage':            messages_on_stage,
+        'caching_job_progress_list':    caching_job_progress_list,
+    }
+    return render(request, 'image/image_caching_job_list.html', template_values)
@@ -857,7 +857,12 @@ def retrieve_ballot_items_from_polling_location_api_v4(
         existing_measure_objects_dict={},
         new_office_we_vote_ids_list=[],
         new_candidate_we_vote_ids_list=[],
-        new_measure_we_vote_ids_list=[]):
+        new_measure_we_vote_ids_list=[],
+        prefetched_json=None):
+    """
+    :param prefetched_json: The responses from fetch_ballot_items_json_for_polling_location_api_v4, if they were
+        already retrieved (see retrieve_ballot_items_from_polling_location_list_api_v4). If None, we call Ballotpedia.
+    """
     success = True
     status = ""
     polling_location_found = False
@@ -928,15 +933,18 @@ def retrieve_ballot_items_from_polling_location_api_v4(
                 state_code = "na"
 
         try:
-            # Get the electoral_districts at this lat/long
-            response = requests.get(
-                BALLOTPEDIA_API_SAMPLE_BALLOT_ELECTIONS_URL,
-                headers=MAIL_HEADERS,
-                params={
-                    "lat": polling_location.latitude,
-                    "long": polling_location.longitude,
-                })
-            structured_json = json.loads(response.text)
+            if prefetched_json is None:
+                # Get the electoral_districts at this lat/long
+                response = requests.get(
+                    BALLOTPEDIA_API_SAMPLE_BALLOT_ELECTIONS_URL,
+                    headers=MAIL_HEADERS,
+                    params={
+                        "lat": polling_location.latitude,
+                        "long": polling_location.longitude,
+                    })
+                structured_json = json.loads(response.text)
+            else:
+                structured_json = prefetched_json['sample_ballot_elections_json']
 
             # Use Ballotpedia API call counter to track the number of queries we are doing each day
             ballotpedia_api_counter_manager = BallotpediaApiCounterManager()
@@ -962,31 +970,17 @@ def retrieve_ballot_items_from_polling_location_api_v4(
                 }
                 return results
 
-            office_district_string = ""
-            office_district_count = 0
-            ballotpedia_district_id_not_used_list = []
-            for one_district in ballotpedia_district_id_list:
-                # The url we send to Ballotpedia can only be so long. If too long, we stop adding districts to the
-                #  office_district_string, but capture the districts not used
-                # 3796 = 4096 - 300 (300 gives us room for all of the other url variables we need)
-                if len(office_district_string) < 3796:
-                    office_district_string += str(one_district) + ","
-                    office_district_count += 1
-                else:
-                    # In the future we might want to set up a second query to get the races for these districts
-                    ballotpedia_district_id_not_used_list.append(one_district)
+            if prefetched_json is None:
+                office_district_string = generate_office_district_string_api_v4(ballotpedia_district_id_list)
 
-            # Remove last comma
-            if office_district_count > 1:
-                office_district_string = office_district_string[:-1]
-            # chunks_of_district_strings.append(office_district_string)
-
-            # Get the electoral_districts at this lat/long
-            response = requests.get(BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL, headers=MAIL_HEADERS, params={
-                "districts": office_district_string,
-                "election_date": election_day_text,
-            })
-            structured_json = json.loads(response.text)
+                # Get the electoral_districts at this lat/long
+                response = requests.get(BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL, headers=MAIL_HEADERS, params={
+                    "districts": office_district_string,
+                    "election_date": election_day_text,
+                })
+                structured_json = json.loads(response.text)
+            else:
+                structured_json = prefetched_json['sample_ballot_results_json']
 
             # Use Ballotpedia API call counter to track the number of queries we are doing each day
             ballotpedia_api_counter_manager = BallotpediaApiCounterManager()
@@ -1074,6 +1068,28 @@ def retrieve_ballot_items_from_polling_location_api_v4(
     return results
 
 
+def generate_office_district_string_api_v4(ballotpedia_district_id_list):
+    office_district_string = ""
+    office_district_count = 0
+    ballotpedia_district_id_not_used_list = []
+    for one_district in ballotpedia_district_id_list:
+        # The url we send to Ballotpedia can only be so long. If too long, we stop adding districts to the
+        #  office_district_string, but capture the districts not used
+        # 3796 = 4096 - 300 (300 gives us room for all of the other url variables we need)
+        if len(office_district_string) < 3796:
+            office_district_string += str(one_district) + ","
+            office_district_count += 1
+        else:
+            # In the future we might want to set up a second query to get the races for these districts
+            ballotpedia_district_id_not_used_list.append(one_district)
+
+    # Remove last comma
+    if office_district_count > 1:
+        office_district_string = office_district_string[:-1]
+    # chunks_of_district_strings.append(office_district_string)
+    return office_district_string
+
+
 def retrieve_ballot_items_for_one_voter_api_v4(
         google_civic_election_id,
         election_day_text="",
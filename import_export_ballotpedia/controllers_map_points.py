@@ -0,0 +1,296 @@
+# import_export_ballotpedia/controllers_map_points.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Retrieve Ballotpedia ballots for many map points (polling locations) at once. Worker threads only talk to
+# Ballotpedia, and never touch the database. The thread that called retrieve_ballot_items_from_polling_location_list_api_v4
+# stores each response as it arrives, so the existing_*_objects_dict caches are only ever changed by one thread.
+
+from .controllers import BALLOTPEDIA_API_SAMPLE_BALLOT_ELECTIONS_URL, BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL, \
+    generate_office_district_string_api_v4, groom_and_store_sample_ballot_elections_api_v4, MAIL_HEADERS, \
+    retrieve_ballot_items_from_polling_location_api_v4
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import json
+import requests
+import threading
+import time
+import wevote_functions.admin
+from wevote_functions.functions import positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+# Number of map points we wait on Ballotpedia for at the same time
+BALLOTPEDIA_MAP_POINT_FETCH_WORKERS = 4
+# Across all of those workers
+BALLOTPEDIA_REQUESTS_PER_SECOND = 5
+BALLOTPEDIA_REQUEST_TIMEOUT_SECONDS = 30
+# Connection errors, timeouts, 429 and 5xx responses are retried, waiting 2, 4, 8... seconds (or Retry-After)
+BALLOTPEDIA_REQUEST_RETRIES = 3
+BALLOTPEDIA_RETRY_BACKOFF_SECONDS = 2
+
+
+class TokenBucket(object):
+    """
+    Allows rate_per_second calls to acquire() on average, with bursts of up to capacity. Thread safe.
+    """
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate_per_second = float(rate_per_second)
+        self.capacity = float(capacity if capacity else max(1, rate_per_second))
+        self.tokens = self.capacity
+        self.last_refill_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available
+        :return: seconds spent waiting
+        """
+        seconds_waited = 0
+        while True:
+            with self.lock:
+                now_time = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now_time - self.last_refill_time) * self.rate_per_second)
+                self.last_refill_time = now_time
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return seconds_waited
+                seconds_to_wait = (1 - self.tokens) / self.rate_per_second
+            time.sleep(seconds_to_wait)
+            seconds_waited += seconds_to_wait
+
+
+def fetch_ballotpedia_json_with_retries(url, params, token_bucket=None, retries=BALLOTPEDIA_REQUEST_RETRIES,
+                                        backoff_seconds=BALLOTPEDIA_RETRY_BACKOFF_SECONDS):
+    status = ""
+    success = False
+    structured_json = {}
+    request_count = 0
+
+    for attempt_number in range(retries + 1):
+        if attempt_number > 0:
+            status += "RETRY_" + str(attempt_number) + " "
+        if token_bucket is not None:
+            token_bucket.acquire()
+        request_count += 1
+        retry_after_seconds = backoff_seconds * (2 ** attempt_number)
+        try:
+            response = requests.get(url, headers=MAIL_HEADERS, params=params,
+                                    timeout=BALLOTPEDIA_REQUEST_TIMEOUT_SECONDS)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            status += "BALLOTPEDIA_REQUEST_FAILED: " + str(e) + " "
+            time.sleep(retry_after_seconds)
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            status += "BALLOTPEDIA_STATUS_CODE_" + str(response.status_code) + " "
+            retry_after_header = response.headers.get('Retry-After', '')
+            if retry_after_header.isdigit():
+                retry_after_seconds = int(retry_after_header)
+            time.sleep(retry_after_seconds)
+            continue
+
+        try:
+            structured_json = json.loads(response.text)
+            success = True
+        except ValueError as e:
+            status += "BALLOTPEDIA_RESPONSE_NOT_JSON: " + str(e) + " "
+        break
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'structured_json':  structured_json,
+        'request_count':    request_count,
+    }
+    return results
+
+
+def fetch_ballot_items_json_for_polling_location_api_v4(
+        polling_location,
+        election_day_text="",
+        token_bucket=None,
+        sample_ballot_elections_url=BALLOTPEDIA_API_SAMPLE_BALLOT_ELECTIONS_URL,
+        sample_ballot_results_url=BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL):
+    """
+    The two Ballotpedia requests retrieve_ballot_items_from_polling_location_api_v4 makes for one map point.
+    Safe to call from a worker thread: there is no database access here.
+    :return: results, with the prefetched_json to pass to retrieve_ballot_items_from_polling_location_api_v4
+    """
+    status = ""
+    prefetched_json = {
+        'sample_ballot_elections_json': {},
+        'sample_ballot_results_json':   {},
+    }
+
+    if not polling_location.latitude or not polling_location.longitude:
+        # retrieve_ballot_items_from_polling_location_api_v4 reports this
+        results = {
+            'success':          True,
+            'status':           "FETCH-MISSING_LATITUDE_LONGITUDE ",
+            'prefetched_json':  prefetched_json,
+            'request_count':    0,
+        }
+        return results
+
+    fetch_results = fetch_ballotpedia_json_with_retries(
+        sample_ballot_elections_url,
+        params={
+            "lat": polling_location.latitude,
+            "long": polling_location.longitude,
+        },
+        token_bucket=token_bucket)
+    status += fetch_results['status']
+    request_count = fetch_results['request_count']
+    success = fetch_results['success']
+    prefetched_json['sample_ballot_elections_json'] = fetch_results['structured_json']
+
+    if success:
+        groom_results = groom_and_store_sample_ballot_elections_api_v4(fetch_results['structured_json'], 0)
+        ballotpedia_district_id_list = groom_results['ballotpedia_district_id_list']
+        if ballotpedia_district_id_list:
+            fetch_results = fetch_ballotpedia_json_with_retries(
+                sample_ballot_results_url,
+                params={
+                    "districts": generate_office_district_string_api_v4(ballotpedia_district_id_list),
+                    "election_date": election_day_text,
+                },
+                token_bucket=token_bucket)
+            status += fetch_results['status']
+            request_count += fetch_results['request_count']
+            success = fetch_results['success']
+            prefetched_json['sample_ballot_results_json'] = fetch_results['structured_json']
+
+    results = {
+        'success':          success,
+        'status':           status,
+        'prefetched_json':  prefetched_json,
+        'request_count':    request_count,
+    }
+    return results
+
+
+def retrieve_ballot_items_from_polling_location_list_api_v4(
+        google_civic_election_id,
+        election_day_text="",
+        polling_location_list=[],
+        state_code="",
+        batch_set_id=0,
+        existing_offices_by_election_dict={},
+        existing_office_objects_dict={},
+        existing_candidate_objects_dict={},
+        existing_measure_objects_dict={},
+        new_office_we_vote_ids_list=[],
+        new_candidate_we_vote_ids_list=[],
+        new_measure_we_vote_ids_list=[],
+        max_workers=BALLOTPEDIA_MAP_POINT_FETCH_WORKERS,
+        requests_per_second=BALLOTPEDIA_REQUESTS_PER_SECOND,
+        sample_ballot_elections_url=BALLOTPEDIA_API_SAMPLE_BALLOT_ELECTIONS_URL,
+        sample_ballot_results_url=BALLOTPEDIA_API_SAMPLE_BALLOT_RESULTS_URL):
+    """
+    Same as calling retrieve_ballot_items_from_polling_location_api_v4 for each polling location in turn, but with up
+    to max_workers Ballotpedia requests in flight at once, limited to requests_per_second.
+    """
+    status = ""
+    success = False
+    ballots_retrieved = 0
+    ballots_not_retrieved = 0
+    ballotpedia_request_count = 0
+    token_bucket = TokenBucket(requests_per_second)
+    polling_location_iterator = iter(polling_location_list)
+    polling_location_by_future = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        def submit_next_polling_location():
+            polling_location = next(polling_location_iterator, None)
+            if polling_location is not None:
+                future = executor.submit(
+                    fetch_ballot_items_json_for_polling_location_api_v4,
+                    polling_location,
+                    election_day_text=election_day_text,
+                    token_bucket=token_bucket,
+                    sample_ballot_elections_url=sample_ballot_elections_url,
+                    sample_ballot_results_url=sample_ballot_results_url)
+                polling_location_by_future[future] = polling_location
+
+        # Only a few responses waiting to be stored are held in memory at once
+        for _ in range(max(1, max_workers) * 2):
+            submit_next_polling_location()
+
+        while polling_location_by_future:
+            done_future_set, not_done_future_set = wait(list(polling_location_by_future.keys()),
+                                                        return_when=FIRST_COMPLETED)
+            for future in done_future_set:
+                polling_location = polling_location_by_future.pop(future)
+                submit_next_polling_location()
+                try:
+                    fetch_results = future.result()
+                except Exception as e:
+                    fetch_results = {
+                        'success':          False,
+                        'status':           "FETCH_EXCEPTION: " + str(e) + " ",
+                        'prefetched_json':  None,
+                        'request_count':    0,
+                    }
+                ballotpedia_request_count += fetch_results['request_count']
+                if not fetch_results['success']:
+                    ballots_not_retrieved += 1
+                    if ballots_not_retrieved < 5:
+                        status += "BALLOTPEDIA_FETCH_FAILED (" + str(polling_location.we_vote_id) + "): [[[" + \
+                            fetch_results['status'] + "]]] "
+                    continue
+
+                # The store stage: only this thread changes the existing_*_objects_dict caches
+                one_ballot_results = retrieve_ballot_items_from_polling_location_api_v4(
+                    google_civic_election_id,
+                    election_day_text=election_day_text,
+                    polling_location_we_vote_id=polling_location.we_vote_id,
+                    polling_location=polling_location,
+                    state_code=state_code,
+                    batch_set_id=batch_set_id,
+                    existing_offices_by_election_dict=existing_offices_by_election_dict,
+                    existing_office_objects_dict=existing_office_objects_dict,
+                    existing_candidate_objects_dict=existing_candidate_objects_dict,
+                    existing_measure_objects_dict=existing_measure_objects_dict,
+                    new_office_we_vote_ids_list=new_office_we_vote_ids_list,
+                    new_candidate_we_vote_ids_list=new_candidate_we_vote_ids_list,
+                    new_measure_we_vote_ids_list=new_measure_we_vote_ids_list,
+                    prefetched_json=fetch_results['prefetched_json'],
+                )
+                if one_ballot_results['success']:
+                    success = True
+
+                existing_offices_by_election_dict = one_ballot_results['existing_offices_by_election_dict']
+                existing_office_objects_dict = one_ballot_results['existing_office_objects_dict']
+                existing_candidate_objects_dict = one_ballot_results['existing_candidate_objects_dict']
+                existing_measure_objects_dict = one_ballot_results['existing_measure_objects_dict']
+                new_office_we_vote_ids_list = one_ballot_results['new_office_we_vote_ids_list']
+                new_candidate_we_vote_ids_list = one_ballot_results['new_candidate_we_vote_ids_list']
+                new_measure_we_vote_ids_list = one_ballot_results['new_measure_we_vote_ids_list']
+
+                if positive_value_exists(one_ballot_results['batch_header_id']):
+                    ballots_retrieved += 1
+                    if ballots_retrieved < 5:
+                        status += "BALLOT_ITEMS_RETRIEVED: [[[" + one_ballot_results['status'] + "]]] "
+                else:
+                    ballots_not_retrieved += 1
+                    if ballots_not_retrieved < 5:
+                        status += "BALLOT_ITEMS_NOT_RETRIEVED: [[[" + one_ballot_results['status'] + "]]] "
+
+    status += "BALLOTPEDIA_REQUESTS: " + str(ballotpedia_request_count) + " "
+    results = {
+        'success':                              success,
+        'status':                               status,
+        'ballots_retrieved':                    ballots_retrieved,
+        'ballots_not_retrieved':                ballots_not_retrieved,
+        'ballotpedia_request_count':            ballotpedia_request_count,
+        'existing_offices_by_election_dict':    existing_offices_by_election_dict,
+        'existing_office_objects_dict':         existing_office_objects_dict,
+        'existing_candidate_objects_dict':      existing_candidate_objects_dict,
+        'existing_measure_objects_dict':        existing_measure_objects_dict,
+        'new_office_we_vote_ids_list':          new_office_we_vote_ids_list,
+        'new_candidate_we_vote_ids_list':       new_candidate_we_vote_ids_list,
+        'new_measure_we_vote_ids_list':         new_measure_we_vote_ids_list,
+    }
+    return results
@@ -0,0 +1,172 @@
+# import_export_ballotpedia/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from candidate.models import CandidateCampaign
+from django.test import SimpleTestCase, TestCase
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from import_export_ballotpedia.controllers_map_points import fetch_ballot_items_json_for_polling_location_api_v4, \
+    retrieve_ballot_items_from_polling_location_list_api_v4, TokenBucket
+from import_export_batches.models import BATCH_HEADER_MAP_BALLOT_ITEMS_TO_BALLOTPEDIA_BALLOT_ITEMS, BatchRow
+import json
+from office.models import ContestOffice
+from polling_location.models import PollingLocation
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+
+class StubBallotpediaRequestHandler(BaseHTTPRequestHandler):
+    # The first sample_ballot_results request gets a 503, to check that we retry
+    request_path_list = []
+
+    def do_GET(self):
+        parsed_url = urlparse(self.path)
+        self.request_path_list.append(parsed_url.path)
+        if parsed_url.path == '/sample_ballot_elections':
+            response_json = {'data': {'districts': [{'id': 101}, {'id': 202}]}}
+        elif self.request_path_list.count('/sample_ballot_results') == 1:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        else:
+            response_json = {'data': {'districts': parse_qs(parsed_url.query)['districts']}}
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response_json).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BallotpediaMapPointFetchTestCase(SimpleTestCase):
+
+    def setUp(self):
+        StubBallotpediaRequestHandler.request_path_list = []
+        self.server = HTTPServer(('127.0.0.1', 0), StubBallotpediaRequestHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = 'http://127.0.0.1:{port}'.format(port=self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetch_retries_after_server_error(self):
+        polling_location = SimpleNamespace(we_vote_id='wvt3ploc1', latitude=37.8, longitude=-122.3)
+        results = fetch_ballot_items_json_for_polling_location_api_v4(
+            polling_location, election_day_text='2020-11-03', token_bucket=TokenBucket(100),
+            sample_ballot_elections_url=self.base_url + '/sample_ballot_elections',
+            sample_ballot_results_url=self.base_url + '/sample_ballot_results')
+        self.assertTrue(results['success'], results['status'])
+        self.assertEqual(results['request_count'], 3)
+        self.assertEqual(results['prefetched_json']['sample_ballot_results_json'],
+                         {'data': {'districts': ['101,202']}})
+
+    def test_missing_latitude_makes_no_requests(self):
+        polling_location = SimpleNamespace(we_vote_id='wvt3ploc2', latitude=None, longitude=None)
+        results = fetch_ballot_items_json_for_polling_location_api_v4(
+            polling_location, sample_ballot_elections_url=self.base_url + '/sample_ballot_elections')
+        self.assertEqual(results['request_count'], 0)
+        self.assertEqual(StubBallotpediaRequestHandler.request_path_list, [])
+
+
+class StubBallotpediaSameBallotRequestHandler(BaseHTTPRequestHandler):
+    # Every map point is in the same district, with the same race and candidates
+    def do_GET(self):
+        parsed_url = urlparse(self.path)
+        if parsed_url.path == '/sample_ballot_elections':
+            response_json = {'data': {'districts': [{'id': 101}]}}
+        else:
+            response_json = {'data': {'districts': [{
+                'name': 'Oakland',
+                'races': [{
+                    'id': 5001,
+                    'office': {'id': 801, 'name': 'Mayor of Oakland', 'level': 'Local'},
+                    'candidates': [
+                        {'id': 7001, 'race': 5001, 'person': {'id': 9001, 'name': 'Jane Smith'}},
+                        {'id': 7002, 'race': 5001, 'person': {'id': 9002, 'name': 'John Doe'}},
+                    ],
+                }],
+            }]}}
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response_json).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BallotpediaMapPointStoreTestCase(TestCase):
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubBallotpediaSameBallotRequestHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = 'http://127.0.0.1:{port}'.format(port=self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_map_points_sharing_offices_and_candidates_are_stored_once(self):
+        polling_location_list = [
+            PollingLocation(we_vote_id='wvt3ploc{number}'.format(number=number), city='Oakland', state='CA',
+                            zip_long='94612', latitude=37.8 + number / 1000, longitude=-122.27)
+            for number in range(8)]
+        results = retrieve_ballot_items_from_polling_location_list_api_v4(
+            4184,
+            election_day_text='2020-11-03',
+            polling_location_list=polling_location_list,
+            state_code='CA',
+            existing_offices_by_election_dict={},
+            existing_office_objects_dict={},
+            existing_candidate_objects_dict={},
+            existing_measure_objects_dict={},
+            new_office_we_vote_ids_list=[],
+            new_candidate_we_vote_ids_list=[],
+            new_measure_we_vote_ids_list=[],
+            max_workers=4,
+            requests_per_second=1000,
+            sample_ballot_elections_url=self.base_url + '/sample_ballot_elections',
+            sample_ballot_results_url=self.base_url + '/sample_ballot_results')
+        self.assertTrue(results['success'], results['status'])
+        self.assertEqual(results['ballots_retrieved'], 8)
+
+        # One office and two candidates, no matter how many map points they came back for
+        self.assertEqual(ContestOffice.objects.filter(ballotpedia_race_id=5001).count(), 1)
+        self.assertEqual(CandidateCampaign.objects.filter(ballotpedia_candidate_id__in=[7001, 7002]).count(), 2)
+        contest_office = ContestOffice.objects.get(ballotpedia_race_id=5001)
+        self.assertEqual(list(results['existing_offices_by_election_dict'][4184].keys()), [5001])
+        self.assertEqual(sorted(results['existing_candidate_objects_dict'].keys()), [7001, 7002])
+        self.assertEqual(results['new_office_we_vote_ids_list'], [contest_office.we_vote_id])
+        self.assertEqual(len(results['new_candidate_we_vote_ids_list']), 2)
+        self.assertEqual(len(set(results['new_candidate_we_vote_ids_list'])), 2)
+
+        # Exactly one ballot item batch row for the office at each map point
+        remote_source_keys = list(BATCH_HEADER_MAP_BALLOT_ITEMS_TO_BALLOTPEDIA_BALLOT_ITEMS.values())
+        office_column_name = 'batch_row_{index:03d}'.format(
+            index=remote_source_keys.index('contest_office_we_vote_id'))
+        polling_location_column_name = 'batch_row_{index:03d}'.format(
+            index=remote_source_keys.index('polling_location_we_vote_id'))
+        batch_row_list = list(BatchRow.objects.all())
+        self.assertEqual(len(batch_row_list), 8)
+        self.assertEqual(len(set(batch_row.batch_header_id for batch_row in batch_row_list)), 8)
+        self.assertEqual(set(getattr(batch_row, office_column_name) for batch_row in batch_row_list),
+                         {contest_office.we_vote_id})
+        self.assertEqual(set(getattr(batch_row, polling_location_column_name) for batch_row in batch_row_list),
+                         set(polling_location.we_vote_id for polling_location in polling_location_list))
+
+
+class TokenBucketTestCase(SimpleTestCase):
+
+    def test_rate_is_limited_after_burst(self):
+        token_bucket = TokenBucket(20, capacity=5)
+        start_time = time.monotonic()
+        for _ in range(15):
+            token_bucket.acquire()
+        # 5 right away, then 10 more at 20 per second
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.45)
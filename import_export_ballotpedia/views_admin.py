@@ -7,6 +7,7 @@ from .controllers import attach_ballotpedia_election_by_district_from_api, \
     retrieve_ballot_items_from_polling_location, retrieve_ballot_items_from_polling_location_api_v4, \
     retrieve_ballotpedia_candidates_by_district_from_api, retrieve_ballotpedia_measures_by_district_from_api, \
     retrieve_ballotpedia_district_id_list_for_polling_location, retrieve_ballotpedia_offices_by_district_from_api
+from .controllers_map_points import retrieve_ballot_items_from_polling_location_list_api_v4
 from admin_tools.views import redirect_to_sign_in_page
 from ballot.models import BallotReturnedListManager, BallotReturnedManager
 from config.base import get_environment_variable
@@ -908,41 +909,31 @@ def retrieve_ballotpedia_ballots_for_polling_locations_api_v4_internal_view(
                 handle_exception(e, logger=logger, exception_message=status)
 
     if success:
-        for polling_location in polling_location_list:
-            one_ballot_results = retrieve_ballot_items_from_polling_location_api_v4(
-                google_civic_election_id,
-                election_day_text=election_day_text,
-                polling_location_we_vote_id=polling_location.we_vote_id,
-                polling_location=polling_location,
-                state_code=state_code,
-                batch_set_id=batch_set_id,
-                existing_offices_by_election_dict=existing_offices_by_election_dict,
-                existing_office_objects_dict=existing_office_objects_dict,
-                existing_candidate_objects_dict=existing_candidate_objects_dict,
-                existing_measure_objects_dict=existing_measure_objects_dict,
-                new_office_we_vote_ids_list=new_office_we_vote_ids_list,
-                new_candidate_we_vote_ids_list=new_candidate_we_vote_ids_list,
-                new_measure_we_vote_ids_list=new_measure_we_vote_ids_list
-            )
-            if one_ballot_results['success']:
-                success = True
-
-            existing_offices_by_election_dict = one_ballot_results['existing_offices_by_election_dict']
-            existing_office_objects_dict = one_ballot_results['existing_office_objects_dict']
-            existing_candidate_objects_dict = one_ballot_results['existing_candidate_objects_dict']
-            existing_measure_objects_dict = one_ballot_results['existing_measure_objects_dict']
-            new_office_we_vote_ids_list = one_ballot_results['new_office_we_vote_ids_list']
-            new_candidate_we_vote_ids_list = one_ballot_results['new_candidate_we_vote_ids_list']
-            new_measure_we_vote_ids_list = one_ballot_results['new_measure_we_vote_ids_list']
-
-            if one_ballot_results['batch_header_id']:
-                ballots_retrieved += 1
-                if ballots_retrieved < 5:
-                    status += "BALLOT_ITEMS_RETRIEVED: [[[" + one_ballot_results['status'] + "]]] "
-            else:
-                ballots_not_retrieved += 1
-                if ballots_not_retrieved < 5:
-                    status += "BALLOT_ITEMS_NOT_RETRIEVED: [[[" + one_ballot_results['status'] + "]]] "
+        # Several map points are fetched from Ballotpedia at once; each is stored as it arrives
+        list_results = retrieve_ballot_items_from_polling_location_list_api_v4(
+            google_civic_election_id,
+            election_day_text=election_day_text,
+            polling_location_list=polling_location_list,
+            state_code=state_code,
+            batch_set_id=batch_set_id,
+            existing_offices_by_election_dict=existing_offices_by_election_dict,
+            existing_office_objects_dict=existing_office_objects_dict,
+            existing_candidate_objects_dict=existing_candidate_objects_dict,
+            existing_measure_objects_dict=existing_measure_objects_dict,
+            new_office_we_vote_ids_list=new_office_we_vote_ids_list,
+            new_candidate_we_vote_ids_list=new_candidate_we_vote_ids_list,
+            new_measure_we_vote_ids_list=new_measure_we_vote_ids_list,
+        )
+        status += list_results['status']
+        ballots_retrieved += list_results['ballots_retrieved']
+        ballots_not_retrieved += list_results['ballots_not_retrieved']
+        existing_offices_by_election_dict = list_results['existing_offices_by_election_dict']
+        existing_office_objects_dict = list_results['existing_office_objects_dict']
+        existing_candidate_objects_dict = list_results['existing_candidate_objects_dict']
+        existing_measure_objects_dict = list_results['existing_measure_objects_dict']
+        new_office_we_vote_ids_list = list_results['new_office_we_vote_ids_list']
+        new_candidate_we_vote_ids_list = list_results['new_candidate_we_vote_ids_list']
+        new_measure_we_vote_ids_list = list_results['new_measure_we_vote_ids_list']
     else:
         status += "CANNOT_CALL_RETRIEVE_BECAUSE_OF_ERRORS [retrieve_ballot_items_from_polling_location_api_v4] "
     retrieve_row_count = ballots_retrieved
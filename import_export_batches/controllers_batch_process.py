@@ -13,24 +13,29 @@ from .models import ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, \
     CALCULATE_SITEWIDE_VOTER_METRICS, \
     IMPORT_CREATE, IMPORT_DELETE, \
     RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, \
-    REFRESH_BALLOT_ITEMS_FROM_VOTERS, SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE
+    REFRESH_BALLOT_ITEMS_FROM_VOTERS, REFRESH_ELECTION_STATISTICS, REFRESH_POSITION_CACHED_INFO, \
+    SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE
 from activity.controllers import process_activity_notice_seeds_triggered_by_batch_process
 from analytics.controllers import calculate_sitewide_daily_metrics, \
     process_one_analytics_batch_process_augment_with_election_id, \
     process_one_analytics_batch_process_augment_with_first_visit, process_sitewide_voter_metrics, \
     retrieve_analytics_processing_next_step
 from analytics.models import AnalyticsManager
+from api_internal_cache.controllers import generate_json_data_for_api_internal_cache
 from api_internal_cache.models import ApiInternalCacheManager
+from ballot.ballot_item_list_cache import ballot_item_list_cache
 from ballot.models import BallotReturnedListManager
 from datetime import timedelta
 from django.utils.timezone import now
+from election.controllers_statistics import election_statistics_refresh_is_due, refresh_election_statistics, \
+    retrieve_election_id_list_for_statistics_refresh
 from election.models import ElectionManager
 from exception.models import handle_exception
 from import_export_twitter.controllers import fetch_number_of_candidates_needing_twitter_search, \
     retrieve_possible_twitter_handles_in_bulk
 from issue.controllers import update_issue_statistics
 import json
-from voter_guide.controllers import voter_guides_upcoming_retrieve_for_api
+from position.models import PositionRefreshRequestManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
 from wevote_settings.models import fetch_batch_process_system_on
@@ -254,6 +259,46 @@ def batch_process_next_steps():
                 status=status,
             )
 
+    # ##################################
+    # Copy changes to organizations, voters, candidates, offices and measures into the positions that cache them
+    refresh_position_process_is_currently_running = \
+        batch_process_manager.is_refresh_position_cached_info_process_currently_running()
+    if not refresh_position_process_is_currently_running:
+        results = batch_process_manager.create_batch_process(kind_of_process=REFRESH_POSITION_CACHED_INFO)
+        status += results['status']
+        success = results['success']
+        if results['batch_process_saved']:
+            batch_process = results['batch_process']
+            batch_process_list.append(batch_process)
+            status += "SCHEDULED_REFRESH_POSITION_CACHED_INFO "
+        else:
+            status += "FAILED_TO_SCHEDULE-" + str(REFRESH_POSITION_CACHED_INFO) + " "
+            batch_process_manager.create_batch_process_log_entry(
+                batch_process_id=0,
+                kind_of_process=REFRESH_POSITION_CACHED_INFO,
+                status=status,
+            )
+
+    # ##################################
+    # Recalculate the counts shown on the election admin pages
+    refresh_election_statistics_process_is_currently_running = \
+        batch_process_manager.is_refresh_election_statistics_process_currently_running()
+    if not refresh_election_statistics_process_is_currently_running and election_statistics_refresh_is_due():
+        results = batch_process_manager.create_batch_process(kind_of_process=REFRESH_ELECTION_STATISTICS)
+        status += results['status']
+        success = results['success']
+        if results['batch_process_saved']:
+            batch_process = results['batch_process']
+            batch_process_list.append(batch_process)
+            status += "SCHEDULED_REFRESH_ELECTION_STATISTICS "
+        else:
+            status += "FAILED_TO_SCHEDULE-" + str(REFRESH_ELECTION_STATISTICS) + " "
+            batch_process_manager.create_batch_process_log_entry(
+                batch_process_id=0,
+                kind_of_process=REFRESH_ELECTION_STATISTICS,
+                status=status,
+            )
+
     # ############################
     # Processing Ballot Items
     # If less than NUMBER_OF_SIMULTANEOUS_BATCH_PROCESSES total active processes,
@@ -333,6 +378,12 @@ def batch_process_next_steps():
         elif batch_process.kind_of_process in [API_REFRESH_REQUEST]:
             results = process_one_api_refresh_request_batch_process(batch_process)
             status += results['status']
+        elif batch_process.kind_of_process in [REFRESH_POSITION_CACHED_INFO]:
+            results = process_refresh_position_cached_info_batch_process(batch_process)
+            status += results['status']
+        elif batch_process.kind_of_process in [REFRESH_ELECTION_STATISTICS]:
+            results = process_refresh_election_statistics_batch_process(batch_process)
+            status += results['status']
         elif batch_process.kind_of_process in [
                 AUGMENT_ANALYTICS_ACTION_WITH_ELECTION_ID, AUGMENT_ANALYTICS_ACTION_WITH_FIRST_VISIT,
                 CALCULATE_SITEWIDE_VOTER_METRICS,
@@ -602,30 +653,27 @@ def process_one_api_refresh_request_batch_process(batch_process):
     api_internal_cache_id = 0
     api_internal_cache_saved = False
     api_results_retrieved = False
-    if batch_process.api_name == 'voterGuidesUpcoming':
-        status += "STARTING_PROCESS_ONE_API_REFRESH_REQUESTED-voterGuidesUpcoming-" \
-                  "(" + str(batch_process.election_id_list_serialized) + ") "
-        google_civic_election_id_list = json.loads(batch_process.election_id_list_serialized)
-        results = voter_guides_upcoming_retrieve_for_api(google_civic_election_id_list=google_civic_election_id_list)
+    # Any api registered in API_INTERNAL_CACHE_REGISTRY can be refreshed here
+    results = generate_json_data_for_api_internal_cache(
+        api_name=batch_process.api_name,
+        election_id_list_serialized=batch_process.election_id_list_serialized)
+    status += results['status']
+    api_results_retrieved = results['success']
+    json_data = results['json_data']
+    if api_results_retrieved:
+        # Save the json in the cache
+        status += "NEW_API_RESULTS_RETRIEVED-CREATING_API_INTERNAL_CACHE "
+        cached_api_response_serialized = json.dumps(json_data)
+        results = api_internal_cache_manager.create_api_internal_cache(
+            api_name=batch_process.api_name,
+            cached_api_response_serialized=cached_api_response_serialized,
+            election_id_list_serialized=batch_process.election_id_list_serialized,
+        )
         status += results['status']
-        api_results_retrieved = results['success']
-        json_data = results['json_data']
-        if json_data['success'] and api_results_retrieved:
-            # Save the json in the cache
-            status += "NEW_API_RESULTS_RETRIEVED-CREATING_API_INTERNAL_CACHE "
-            cached_api_response_serialized = json.dumps(json_data)
-            results = api_internal_cache_manager.create_api_internal_cache(
-                api_name=batch_process.api_name,
-                cached_api_response_serialized=cached_api_response_serialized,
-                election_id_list_serialized=batch_process.election_id_list_serialized,
-            )
-            status += results['status']
-            api_internal_cache_saved = results['success']
-            api_internal_cache_id = results['api_internal_cache_id']
-        else:
-            status += "NEW_API_RESULTS_RETRIEVE_FAILED "
+        api_internal_cache_saved = results['success']
+        api_internal_cache_id = results['api_internal_cache_id']
     else:
-        status += "API_NAME_NOT_RECOGNIZED: " + str(batch_process.api_name) + " "
+        status += "NEW_API_RESULTS_RETRIEVE_FAILED "
 
     if api_results_retrieved and api_internal_cache_saved:
         try:
@@ -1650,6 +1698,179 @@ def process_activity_notice_batch_process(batch_process):
     return results
 
 
+def process_refresh_position_cached_info_batch_process(batch_process):
+    status = ""
+    success = True
+    batch_process_manager = BatchProcessManager()
+
+    kind_of_process = batch_process.kind_of_process
+    process_now = False
+    # We adjust timeout for REFRESH_POSITION_CACHED_INFO in retrieve_batch_process_list
+    refresh_position_processing_time_out_duration = 270  # 4.5 minutes * 60 seconds
+
+    if batch_process.date_started is None:
+        # When a batch_process is running, we mark it "taken off the shelf" to be worked on ("date_checked_out").
+        #  When the process is complete, we should reset this to "NULL"
+        process_now = True
+        try:
+            batch_process.date_started = now()
+            batch_process.date_checked_out = now()
+            batch_process.save()
+        except Exception as e:
+            status += "REFRESH_POSITION_CACHED_INFO-CHECKED_OUT_TIME_NOT_SAVED " + str(e) + " "
+            handle_exception(e, logger=logger, exception_message=status)
+            success = False
+            batch_process_manager.create_batch_process_log_entry(
+                batch_process_id=batch_process.id,
+                kind_of_process=kind_of_process,
+                status=status,
+            )
+            results = {
+                'success': success,
+                'status': status,
+            }
+            return results
+    elif batch_process.date_completed is None:
+        # Check to see if process has timed out
+        date_when_timed_out = \
+            batch_process.date_started + timedelta(seconds=refresh_position_processing_time_out_duration)
+        if now() > date_when_timed_out:
+            # Update batch_process.date_completed to now
+            status += "REFRESH_POSITION_CACHED_INFO-TIMED_OUT "
+            results = mark_batch_process_as_complete(
+                batch_process,
+                kind_of_process=kind_of_process,
+                status=status)
+            status += results['status']
+
+    if process_now:
+        refresh_results = PositionRefreshRequestManager().process_position_refresh_requests()
+        status += refresh_results['status']
+
+        if refresh_results['success']:
+            try:
+                batch_process.completion_summary = \
+                    "REFRESH_POSITION_CACHED_INFO_RESULTS, " \
+                    "requests_processed: {requests_processed} " \
+                    "positions_refreshed: {positions_refreshed} " \
+                    "sweep_position_count: {sweep_position_count} " \
+                    "positions_per_second: {positions_per_second:.1f}" \
+                    "".format(requests_processed=refresh_results['requests_processed'],
+                              positions_refreshed=refresh_results['positions_refreshed'],
+                              sweep_position_count=refresh_results['sweep_position_count'],
+                              positions_per_second=refresh_results['positions_per_second'])
+                batch_process.date_checked_out = None
+                batch_process.date_completed = now()
+                batch_process.save()
+
+                if positive_value_exists(refresh_results['positions_refreshed']):
+                    batch_process_manager.create_batch_process_log_entry(
+                        batch_process_id=batch_process.id,
+                        kind_of_process=kind_of_process,
+                        status=status,
+                    )
+            except Exception as e:
+                status += "REFRESH_POSITION_CACHED_INFO-DATE_COMPLETED_TIME_NOT_SAVED " + str(e) + " "
+                handle_exception(e, logger=logger, exception_message=status)
+                batch_process_manager.create_batch_process_log_entry(
+                    batch_process_id=batch_process.id,
+                    kind_of_process=kind_of_process,
+                    status=status,
+                )
+                results = {
+                    'success': success,
+                    'status': status,
+                }
+                return results
+        else:
+            status += "REFRESH_POSITION_CACHED_INFO_FAILED "
+            success = False
+            batch_process_manager.create_batch_process_log_entry(
+                batch_process_id=batch_process.id,
+                kind_of_process=kind_of_process,
+                status=status,
+            )
+
+    results = {
+        'success':              success,
+        'status':               status,
+    }
+    return results
+
+
+def process_refresh_election_statistics_batch_process(batch_process):
+    status = ""
+    success = True
+    batch_process_manager = BatchProcessManager()
+    kind_of_process = batch_process.kind_of_process
+
+    if batch_process.date_started is not None:
+        # Only one worker runs this, and it finishes in one go. If it was started before, that run died, so we close
+        # it out and let batch_process_next_steps schedule a new one.
+        status += "REFRESH_ELECTION_STATISTICS-ALREADY_STARTED "
+        results = mark_batch_process_as_complete(batch_process, kind_of_process=kind_of_process, status=status)
+        status += results['status']
+        results = {
+            'success': success,
+            'status': status,
+        }
+        return results
+
+    try:
+        batch_process.date_started = now()
+        batch_process.date_checked_out = now()
+        batch_process.save()
+    except Exception as e:
+        status += "REFRESH_ELECTION_STATISTICS-CHECKED_OUT_TIME_NOT_SAVED " + str(e) + " "
+        handle_exception(e, logger=logger, exception_message=status)
+        batch_process_manager.create_batch_process_log_entry(
+            batch_process_id=batch_process.id,
+            kind_of_process=kind_of_process,
+            status=status,
+        )
+        results = {
+            'success': False,
+            'status': status,
+        }
+        return results
+
+    google_civic_election_id_list = retrieve_election_id_list_for_statistics_refresh()
+    refresh_results = refresh_election_statistics(google_civic_election_id_list)
+    status += refresh_results['status']
+    if not refresh_results['success']:
+        success = False
+        batch_process_manager.create_batch_process_log_entry(
+            batch_process_id=batch_process.id,
+            critical_failure=True,
+            kind_of_process=kind_of_process,
+            status=status,
+        )
+    try:
+        batch_process.completion_summary = \
+            "REFRESH_ELECTION_STATISTICS_RESULTS, " \
+            "elections_refreshed: {elections_refreshed} " \
+            "not_processed: {not_processed}" \
+            "".format(elections_refreshed=refresh_results['elections_refreshed'],
+                      not_processed=refresh_results['not_processed'])
+        batch_process.date_checked_out = None
+        batch_process.date_completed = now()
+        batch_process.save()
+    except Exception as e:
+        status += "REFRESH_ELECTION_STATISTICS-DATE_COMPLETED_TIME_NOT_SAVED " + str(e) + " "
+        handle_exception(e, logger=logger, exception_message=status)
+        batch_process_manager.create_batch_process_log_entry(
+            batch_process_id=batch_process.id,
+            kind_of_process=kind_of_process,
+            status=status,
+        )
+
+    results = {
+        'success':              success,
+        'status':               status,
+    }
+    return results
+
+
 def process_one_search_twitter_batch_process(batch_process):
     status = ""
     success = True
@@ -2005,6 +2226,11 @@ def mark_batch_process_as_complete(batch_process=None,
                 status=status,
             )
 
+    if kind_of_process in [RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS,
+                           REFRESH_BALLOT_ITEMS_FROM_VOTERS] and positive_value_exists(google_civic_election_id):
+        # Ballot items in this election may have been deleted or updated in bulk
+        ballot_item_list_cache.invalidate(google_civic_election_id=google_civic_election_id)
+
     if batch_process_ballot_item_chunk_updated or batch_process_ballot_item_chunk_updated:
         batch_process_manager.create_batch_process_log_entry(
             batch_process_id=batch_process_id,
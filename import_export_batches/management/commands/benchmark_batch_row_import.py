@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from import_export_batches.models import BatchDescription, BatchHeader, BatchHeaderMap, BatchManager, BatchRow, \
+    get_batch_row_values_from_list, IMPORT_POLLING_LOCATION
+import time
+
+
+def generate_polling_location_csv_lines(row_count):
+    yield ['we_vote_id', 'location_name', 'line1', 'city', 'state', 'zip_long', 'latitude', 'longitude']
+    for row_number in range(row_count):
+        yield ['wvbenchploc{row_number}'.format(row_number=row_number),
+               'Benchmark Location {row_number}'.format(row_number=row_number),
+               '{row_number} Main St'.format(row_number=row_number), 'Oakland', 'CA', '94612',
+               '37.8', '-122.27']
+
+
+class Command(BaseCommand):
+    help = 'Compares rows/sec for saving BatchRow entries one at a time (the old create_batch_from_csv_data) ' \
+           'against the bulk_create path, on a synthetic polling location file. Everything it creates is deleted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--row_count', type=int, default=20000)
+        parser.add_argument('--batch_row_bulk_create_size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        row_count = options['row_count']
+        batch_manager = BatchManager()
+
+        # The one-INSERT-per-row path, without the header (it is the same in both paths)
+        csv_lines = generate_polling_location_csv_lines(row_count)
+        next(csv_lines)
+        batch_row_id_list = []
+        start_time = time.time()
+        for line in csv_lines:
+            batch_row = BatchRow.objects.create(batch_header_id=0, **get_batch_row_values_from_list(line))
+            batch_row_id_list.append(batch_row.id)
+        one_at_a_time_seconds = time.time() - start_time
+        BatchRow.objects.filter(id__in=batch_row_id_list).delete()
+
+        start_time = time.time()
+        results = batch_manager.create_batch_from_csv_data(
+            'Benchmark', generate_polling_location_csv_lines(row_count), IMPORT_POLLING_LOCATION,
+            batch_row_bulk_create_size=options['batch_row_bulk_create_size'])
+        bulk_seconds = time.time() - start_time
+        batch_header_id = results['batch_header_id']
+        BatchRow.objects.filter(batch_header_id=batch_header_id).delete()
+        BatchDescription.objects.filter(batch_header_id=batch_header_id).delete()
+        BatchHeaderMap.objects.filter(batch_header_id=batch_header_id).delete()
+        BatchHeader.objects.filter(id=batch_header_id).delete()
+
+        self.stdout.write('rows: {row_count}, saved by bulk path: {number_of_batch_rows}'.format(
+            row_count=row_count, number_of_batch_rows=results['number_of_batch_rows']))
+        self.stdout.write('one at a time rows/sec: {one_at_a_time:.0f}, bulk_create rows/sec: {bulk:.0f}'.format(
+            one_at_a_time=row_count / one_at_a_time_seconds if one_at_a_time_seconds else 0,
+            bulk=row_count / bulk_seconds if bulk_seconds else 0))
@@ -5,7 +5,7 @@
 import codecs
 import csv
 from datetime import date, timedelta
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.utils.http import urlquote
 from django.utils.timezone import localtime, now
@@ -13,6 +13,7 @@ from election.models import ElectionManager
 from electoral_district.controllers import electoral_district_import_from_xml_data
 from exception.models import handle_exception
 from import_export_ctcl.controllers import create_candidate_selection_rows, retrieve_candidate_from_candidate_selection
+import itertools
 import json
 import magic
 from organization.models import ORGANIZATION_TYPE_CHOICES, UNKNOWN, alphanumeric
@@ -84,6 +85,11 @@ KIND_OF_ACTION_CHOICES = (
     (IMPORT_ADD_TO_EXISTING,   'Add to Existing'),
 )
 
+# BatchRow has batch_row_000 through batch_row_050
+BATCH_ROW_COLUMN_COUNT = 51
+# How many BatchRow entries we hold in memory and save with one INSERT
+BATCH_ROW_BULK_CREATE_SIZE = 1000
+
 BATCH_SET_SOURCE_CTCL = 'CTCL'
 BATCH_SET_SOURCE_IMPORT_EXPORT_ENDORSEMENTS = 'IMPORT_EXPORT_ENDORSEMENTS'
 BATCH_SET_SOURCE_IMPORT_BALLOTPEDIA_BALLOT_ITEMS = 'IMPORT_BALLOTPEDIA_BALLOT_ITEMS'
@@ -440,6 +446,8 @@ CALCULATE_SITEWIDE_VOTER_METRICS = "CALCULATE_SITEWIDE_VOTER_METRICS"
 RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS = "RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS"
 REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS = "REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS"
 REFRESH_BALLOT_ITEMS_FROM_VOTERS = "REFRESH_BALLOT_ITEMS_FROM_VOTERS"
+REFRESH_ELECTION_STATISTICS = "REFRESH_ELECTION_STATISTICS"
+REFRESH_POSITION_CACHED_INFO = "REFRESH_POSITION_CACHED_INFO"
 SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE = "SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE"
 
 KIND_OF_PROCESS_CHOICES = (
@@ -448,6 +456,8 @@ KIND_OF_PROCESS_CHOICES = (
     (RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS,  'Retrieve Ballot Items from Map Points'),
     (REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS, 'Refresh Ballot Items from BallotReturned Map Points'),
     (REFRESH_BALLOT_ITEMS_FROM_VOTERS, 'Refresh Ballot Items from Voter Custom Addresses'),
+    (REFRESH_ELECTION_STATISTICS, 'Recalculate the counts shown on the election admin pages'),
+    (REFRESH_POSITION_CACHED_INFO, 'Refresh data cached in positions from organizations, candidates, etc.'),
     (SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE, 'Search for Candidate Twitter Handles'),
 )
 
@@ -455,6 +465,16 @@ KIND_OF_PROCESS_CHOICES = (
 logger = wevote_functions.admin.get_logger(__name__)
 
 
+def get_batch_row_values_from_list(incoming_list):
+    return {'batch_row_{index:03d}'.format(index=index): get_value_if_index_in_list(incoming_list, index)
+            for index in range(BATCH_ROW_COLUMN_COUNT)}
+
+
+def get_batch_row_values_from_dict(structured_json, remote_source_key_list):
+    return {'batch_row_{index:03d}'.format(index=index): get_value_from_dict(structured_json, remote_source_key)
+            for index, remote_source_key in enumerate(remote_source_key_list)}
+
+
 def get_value_if_index_in_list(incoming_list, index):
     try:
         return incoming_list[index]
@@ -654,7 +674,12 @@ class BatchManager(models.Model):
         return results
 
     def create_batch_from_csv_data(self, file_name, csv_data, kind_of_batch, google_civic_election_id=0,
-                                   organization_we_vote_id="", polling_location_we_vote_id=""):
+                                   organization_we_vote_id="", polling_location_we_vote_id="",
+                                   batch_row_bulk_create_size=BATCH_ROW_BULK_CREATE_SIZE, progress_callback=None):
+        """
+        The first line of csv_data is the header. csv_data can be any iterable, like a csv.reader, and is only read
+        once, so large files don't need to fit in memory.
+        """
         first_line = True
         success = False
         status = ""
@@ -671,6 +696,8 @@ class BatchManager(models.Model):
 
         batch_header_id = 0
         batch_header_map_id = 0
+        # The header comes from the first line, and BatchRow entries from the rest of this same iterator
+        csv_data = iter(csv_data)
         for line in csv_data:
             if first_line:
                 first_line = False
@@ -817,72 +844,21 @@ class BatchManager(models.Model):
                     status += "EXCEPTION_BATCH_HEADER " + str(e) + " "
                     handle_exception(e, logger=logger, exception_message=status)
                     break
-            else:
-                # if number_of_batch_rows >= limit_for_testing:
-                #     break
-                if positive_value_exists(batch_header_id):
-                    try:
-                        batch_row = BatchRow.objects.create(
-                            batch_header_id=batch_header_id,
-                            batch_row_000=get_value_if_index_in_list(line, 0),
-                            batch_row_001=get_value_if_index_in_list(line, 1),
-                            batch_row_002=get_value_if_index_in_list(line, 2),
-                            batch_row_003=get_value_if_index_in_list(line, 3),
-                            batch_row_004=get_value_if_index_in_list(line, 4),
-                            batch_row_005=get_value_if_index_in_list(line, 5),
-                            batch_row_006=get_value_if_index_in_list(line, 6),
-                            batch_row_007=get_value_if_index_in_list(line, 7),
-                            batch_row_008=get_value_if_index_in_list(line, 8),
-                            batch_row_009=get_value_if_index_in_list(line, 9),
-                            batch_row_010=get_value_if_index_in_list(line, 10),
-                            batch_row_011=get_value_if_index_in_list(line, 11),
-                            batch_row_012=get_value_if_index_in_list(line, 12),
-                            batch_row_013=get_value_if_index_in_list(line, 13),
-                            batch_row_014=get_value_if_index_in_list(line, 14),
-                            batch_row_015=get_value_if_index_in_list(line, 15),
-                            batch_row_016=get_value_if_index_in_list(line, 16),
-                            batch_row_017=get_value_if_index_in_list(line, 17),
-                            batch_row_018=get_value_if_index_in_list(line, 18),
-                            batch_row_019=get_value_if_index_in_list(line, 19),
-                            batch_row_020=get_value_if_index_in_list(line, 20),
-                            batch_row_021=get_value_if_index_in_list(line, 21),
-                            batch_row_022=get_value_if_index_in_list(line, 22),
-                            batch_row_023=get_value_if_index_in_list(line, 23),
-                            batch_row_024=get_value_if_index_in_list(line, 24),
-                            batch_row_025=get_value_if_index_in_list(line, 25),
-                            batch_row_026=get_value_if_index_in_list(line, 26),
-                            batch_row_027=get_value_if_index_in_list(line, 27),
-                            batch_row_028=get_value_if_index_in_list(line, 28),
-                            batch_row_029=get_value_if_index_in_list(line, 29),
-                            batch_row_030=get_value_if_index_in_list(line, 30),
-                            batch_row_031=get_value_if_index_in_list(line, 31),
-                            batch_row_032=get_value_if_index_in_list(line, 32),
-                            batch_row_033=get_value_if_index_in_list(line, 33),
-                            batch_row_034=get_value_if_index_in_list(line, 34),
-                            batch_row_035=get_value_if_index_in_list(line, 35),
-                            batch_row_036=get_value_if_index_in_list(line, 36),
-                            batch_row_037=get_value_if_index_in_list(line, 37),
-                            batch_row_038=get_value_if_index_in_list(line, 38),
-                            batch_row_039=get_value_if_index_in_list(line, 39),
-                            batch_row_040=get_value_if_index_in_list(line, 40),
-                            batch_row_041=get_value_if_index_in_list(line, 41),
-                            batch_row_042=get_value_if_index_in_list(line, 42),
-                            batch_row_043=get_value_if_index_in_list(line, 43),
-                            batch_row_044=get_value_if_index_in_list(line, 44),
-                            batch_row_045=get_value_if_index_in_list(line, 45),
-                            batch_row_046=get_value_if_index_in_list(line, 46),
-                            batch_row_047=get_value_if_index_in_list(line, 47),
-                            batch_row_048=get_value_if_index_in_list(line, 48),
-                            batch_row_049=get_value_if_index_in_list(line, 49),
-                            batch_row_050=get_value_if_index_in_list(line, 50),
-                            google_civic_election_id=google_civic_election_id,
-                            polling_location_we_vote_id=polling_location_we_vote_id,
-                        )
-                        number_of_batch_rows += 1
-                    except Exception as e:
-                        # Stop trying to save rows -- break out of the for loop
-                        status += "EXCEPTION_BATCH_ROW " + str(e) + " "
-                        break
+            break
+
+        if positive_value_exists(batch_header_id):
+            batch_row_generator = (BatchRow(
+                batch_header_id=batch_header_id,
+                google_civic_election_id=google_civic_election_id,
+                polling_location_we_vote_id=polling_location_we_vote_id,
+                **get_batch_row_values_from_list(line)) for line in csv_data)
+            results = self.create_batch_rows_in_bulk(
+                batch_row_generator,
+                batch_row_bulk_create_size=batch_row_bulk_create_size,
+                progress_callback=progress_callback)
+            number_of_batch_rows = results['number_of_batch_rows']
+            if not results['success']:
+                status += "EXCEPTION_BATCH_ROW " + results['status']
 
         results = {
             'success':              success,
@@ -895,7 +871,11 @@ class BatchManager(models.Model):
 
     def create_batch_from_json(self, file_name, structured_json_list, mapping_dict, kind_of_batch,
                                google_civic_election_id=0, organization_we_vote_id="", polling_location_we_vote_id="",
-                               batch_set_id=0, state_code=""):
+                               batch_set_id=0, state_code="",
+                               batch_row_bulk_create_size=BATCH_ROW_BULK_CREATE_SIZE, progress_callback=None):
+        """
+        structured_json_list can be a list, or a generator so the whole import doesn't need to be in memory at once
+        """
         success = False
         status = ""
         number_of_batch_rows = 0
@@ -905,7 +885,9 @@ class BatchManager(models.Model):
         batch_header_map_id = 0
         batch_name = ""
 
-        if not len(structured_json_list):
+        structured_json_list = iter(structured_json_list)
+        first_dict = next(structured_json_list, None)
+        if first_dict is None:
             # If there aren't any values, don't create a batch
             results = {
                 'success': success,
@@ -1065,81 +1047,37 @@ class BatchManager(models.Model):
             handle_exception(e, logger=logger, exception_message=status)
 
         if positive_value_exists(batch_header_id):
-            for one_dict in structured_json_list:
-                # if number_of_batch_rows >= limit_for_testing:
-                #     break
-                local_google_civic_election_id = google_civic_election_id  # Use it if it came in to this function
-                if not positive_value_exists(google_civic_election_id):
-                    local_google_civic_election_id = get_value_from_dict(one_dict, 'google_civic_election_id')
-                local_polling_location_we_vote_id = polling_location_we_vote_id  # Use it if it came in to this function
-                if not positive_value_exists(polling_location_we_vote_id):
-                    local_polling_location_we_vote_id = get_value_from_dict(one_dict, 'polling_location_we_vote_id')
-                local_state_code = state_code  # Use it if it came in to this function
-                if not positive_value_exists(state_code):
-                    local_state_code = get_value_from_dict(one_dict, 'state_code')
-                try:
-                    batch_row = BatchRow.objects.create(
+            remote_source_key_list = [get_value_if_index_in_list(remote_source_keys, index)
+                                      for index in range(BATCH_ROW_COLUMN_COUNT)]
+
+            def generate_batch_rows():
+                for one_dict in itertools.chain([first_dict], structured_json_list):
+                    # if number_of_batch_rows >= limit_for_testing:
+                    #     break
+                    local_google_civic_election_id = google_civic_election_id  # Use it if it came in to this function
+                    if not positive_value_exists(google_civic_election_id):
+                        local_google_civic_election_id = get_value_from_dict(one_dict, 'google_civic_election_id')
+                    # Use it if it came in to this function
+                    local_polling_location_we_vote_id = polling_location_we_vote_id
+                    if not positive_value_exists(polling_location_we_vote_id):
+                        local_polling_location_we_vote_id = get_value_from_dict(one_dict, 'polling_location_we_vote_id')
+                    local_state_code = state_code  # Use it if it came in to this function
+                    if not positive_value_exists(state_code):
+                        local_state_code = get_value_from_dict(one_dict, 'state_code')
+                    yield BatchRow(
                         batch_header_id=batch_header_id,
-                        batch_row_000=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 0)),
-                        batch_row_001=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 1)),
-                        batch_row_002=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 2)),
-                        batch_row_003=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 3)),
-                        batch_row_004=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 4)),
-                        batch_row_005=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 5)),
-                        batch_row_006=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 6)),
-                        batch_row_007=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 7)),
-                        batch_row_008=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 8)),
-                        batch_row_009=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 9)),
-                        batch_row_010=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 10)),
-                        batch_row_011=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 11)),
-                        batch_row_012=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 12)),
-                        batch_row_013=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 13)),
-                        batch_row_014=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 14)),
-                        batch_row_015=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 15)),
-                        batch_row_016=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 16)),
-                        batch_row_017=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 17)),
-                        batch_row_018=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 18)),
-                        batch_row_019=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 19)),
-                        batch_row_020=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 20)),
-                        batch_row_021=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 21)),
-                        batch_row_022=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 22)),
-                        batch_row_023=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 23)),
-                        batch_row_024=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 24)),
-                        batch_row_025=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 25)),
-                        batch_row_026=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 26)),
-                        batch_row_027=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 27)),
-                        batch_row_028=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 28)),
-                        batch_row_029=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 29)),
-                        batch_row_030=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 30)),
-                        batch_row_031=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 31)),
-                        batch_row_032=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 32)),
-                        batch_row_033=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 33)),
-                        batch_row_034=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 34)),
-                        batch_row_035=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 35)),
-                        batch_row_036=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 36)),
-                        batch_row_037=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 37)),
-                        batch_row_038=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 38)),
-                        batch_row_039=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 39)),
-                        batch_row_040=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 40)),
-                        batch_row_041=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 41)),
-                        batch_row_042=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 42)),
-                        batch_row_043=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 43)),
-                        batch_row_044=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 44)),
-                        batch_row_045=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 45)),
-                        batch_row_046=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 46)),
-                        batch_row_047=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 47)),
-                        batch_row_048=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 48)),
-                        batch_row_049=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 49)),
-                        batch_row_050=get_value_from_dict(one_dict, get_value_if_index_in_list(remote_source_keys, 50)),
                         google_civic_election_id=local_google_civic_election_id,
                         polling_location_we_vote_id=local_polling_location_we_vote_id,
                         state_code=local_state_code,
-                    )
-                    number_of_batch_rows += 1
-                except Exception as e:
-                    # Stop trying to save rows -- break out of the for loop
-                    status += "EXCEPTION_BATCH_ROW_FOR_JSON " + str(e) + " "
-                    break
+                        **get_batch_row_values_from_dict(one_dict, remote_source_key_list))
+
+            results = self.create_batch_rows_in_bulk(
+                generate_batch_rows(),
+                batch_row_bulk_create_size=batch_row_bulk_create_size,
+                progress_callback=progress_callback)
+            number_of_batch_rows = results['number_of_batch_rows']
+            if not results['success']:
+                status += "EXCEPTION_BATCH_ROW_FOR_JSON " + results['status']
         else:
             status += "NO_BATCH_HEADER_ID "
 
@@ -1152,6 +1090,57 @@ class BatchManager(models.Model):
         }
         return results
 
+    def create_batch_rows_in_bulk(self, batch_row_iterator, batch_row_bulk_create_size=BATCH_ROW_BULK_CREATE_SIZE,
+                                  progress_callback=None):
+        """
+        Save unsaved BatchRow objects batch_row_bulk_create_size at a time, all in one transaction. If any of them
+        can't be saved, none of them are.
+        :param batch_row_iterator: BatchRow objects, usually from a generator, so only one block is in memory
+        :param batch_row_bulk_create_size:
+        :param progress_callback: Called with the number of rows saved so far, after each block
+        :return:
+        """
+        status = ""
+        success = True
+        number_of_batch_rows = 0
+        number_of_bulk_creates = 0
+        batch_row_bulk_create_size = max(1, convert_to_int(batch_row_bulk_create_size))
+
+        try:
+            with transaction.atomic():
+                batch_row_list = []
+                for batch_row in batch_row_iterator:
+                    batch_row_list.append(batch_row)
+                    if len(batch_row_list) < batch_row_bulk_create_size:
+                        continue
+                    BatchRow.objects.bulk_create(batch_row_list)
+                    number_of_batch_rows += len(batch_row_list)
+                    number_of_bulk_creates += 1
+                    batch_row_list = []
+                    if progress_callback is not None:
+                        progress_callback(number_of_batch_rows)
+                if len(batch_row_list):
+                    BatchRow.objects.bulk_create(batch_row_list)
+                    number_of_batch_rows += len(batch_row_list)
+                    number_of_bulk_creates += 1
+                    if progress_callback is not None:
+                        progress_callback(number_of_batch_rows)
+            status += "BATCH_ROWS_BULK_CREATED "
+        except Exception as e:
+            success = False
+            # The transaction was rolled back
+            number_of_batch_rows = 0
+            status += "BATCH_ROWS_BULK_CREATE_FAILED " + str(e) + " "
+            handle_exception(e, logger=logger, exception_message=status)
+
+        results = {
+            'success':                  success,
+            'status':                   status,
+            'number_of_batch_rows':     number_of_batch_rows,
+            'number_of_bulk_creates':   number_of_bulk_creates,
+        }
+        return results
+
     # I don't believe this is currently in use. There is also a function of this same name in controllers.py
     def create_batch_header_translation_suggestion(
             self, kind_of_batch, header_value_recognized_by_we_vote, incoming_alternate_header_value):
@@ -4734,6 +4723,8 @@ class BatchProcessManager(models.Model):
                     CALCULATE_ORGANIZATION_ELECTION_METRICS,
                     REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS,
                     REFRESH_BALLOT_ITEMS_FROM_VOTERS,
+                    REFRESH_ELECTION_STATISTICS,
+                    REFRESH_POSITION_CACHED_INFO,
                     RETRIEVE_BALLOT_ITEMS_FROM_POLLING_LOCATIONS,
                     SEARCH_TWITTER_FOR_CANDIDATE_TWITTER_HANDLE
                 ]:
@@ -4929,23 +4920,31 @@ class BatchProcessManager(models.Model):
             return True
 
     def is_activity_notice_process_currently_running(self):
+        return self.is_single_kind_of_process_currently_running(ACTIVITY_NOTICE_PROCESS)
+
+    def is_refresh_election_statistics_process_currently_running(self):
+        return self.is_single_kind_of_process_currently_running(REFRESH_ELECTION_STATISTICS)
+
+    def is_refresh_position_cached_info_process_currently_running(self):
+        return self.is_single_kind_of_process_currently_running(REFRESH_POSITION_CACHED_INFO)
+
+    def is_single_kind_of_process_currently_running(self, kind_of_process):
         status = ""
-        analytics_kind_of_process_list = [ACTIVITY_NOTICE_PROCESS]
         try:
             batch_process_queryset = BatchProcess.objects.all()
             batch_process_queryset = batch_process_queryset.filter(date_started__isnull=False)
             batch_process_queryset = batch_process_queryset.filter(date_completed__isnull=True)
             batch_process_queryset = batch_process_queryset.filter(date_checked_out__isnull=False)
-            batch_process_queryset = batch_process_queryset.filter(
-                kind_of_process__in=analytics_kind_of_process_list)
+            batch_process_queryset = batch_process_queryset.filter(kind_of_process=kind_of_process)
             # Don't consider paused back_processes to be currently running
-            # Note: Paused processes might still be running, but for ACTIVITY_NOTICE_PROCESS, we will allow this
+            # Note: Paused processes might still be running, but for ACTIVITY_NOTICE_PROCESS,
+            #  REFRESH_ELECTION_STATISTICS and REFRESH_POSITION_CACHED_INFO, we will allow this
             batch_process_queryset = batch_process_queryset.exclude(batch_process_paused=True)
 
             batch_process_count = batch_process_queryset.count()
             return positive_value_exists(batch_process_count)
         except Exception as e:
-            status += 'FAILED_COUNT_CHECKED_OUT_BATCH_PROCESSES-ACTIVITY_NOTICE ' + str(e) + ' '
+            status += 'FAILED_COUNT_CHECKED_OUT_BATCH_PROCESSES-' + str(kind_of_process) + ' ' + str(e) + ' '
             return True
 
     def is_analytics_process_currently_running(self):
@@ -5014,7 +5013,8 @@ class BatchProcessManager(models.Model):
                 if batch_process.date_checked_out is None:
                     filtered_batch_process_list.append(batch_process)
                 else:
-                    if batch_process.kind_of_process == ACTIVITY_NOTICE_PROCESS:
+                    if batch_process.kind_of_process in \
+                            [ACTIVITY_NOTICE_PROCESS, REFRESH_ELECTION_STATISTICS, REFRESH_POSITION_CACHED_INFO]:
                         # See also longest_activity_notice_processing_run_time_allowed
                         checked_out_expiration_time = 270  # 4.5 minutes * 60 seconds
                     else:
@@ -0,0 +1,43 @@
+# import_export_batches/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+from import_export_batches.models import BatchManager, BatchRow, BATCH_HEADER_MAP_FOR_POSITIONS, \
+    IMPORT_POLLING_LOCATION, POSITION
+
+
+class BatchRowBulkCreateTestCase(TestCase):
+
+    def test_create_batch_from_csv_data_saves_every_row(self):
+        csv_lines = [['we_vote_id', 'location_name', 'state']] + \
+            [['wvt3ploc{number}'.format(number=number), 'Location {number}'.format(number=number), 'CA']
+             for number in range(25)]
+        progress_list = []
+        results = BatchManager().create_batch_from_csv_data(
+            'test.csv', iter(csv_lines), IMPORT_POLLING_LOCATION, google_civic_election_id=4184,
+            batch_row_bulk_create_size=10, progress_callback=progress_list.append)
+        self.assertTrue(results['batch_saved'], results['status'])
+        self.assertEqual(results['number_of_batch_rows'], 25)
+        self.assertEqual(progress_list, [10, 20, 25])
+
+        batch_row_list = list(BatchRow.objects.filter(batch_header_id=results['batch_header_id']).order_by('id'))
+        self.assertEqual(len(batch_row_list), 25)
+        self.assertEqual(batch_row_list[0].batch_row_000, 'wvt3ploc0')
+        self.assertEqual(batch_row_list[24].batch_row_001, 'Location 24')
+        self.assertEqual(batch_row_list[24].batch_row_003, '')
+        self.assertEqual(batch_row_list[24].google_civic_election_id, 4184)
+
+    def test_create_batch_from_json_accepts_a_generator(self):
+        position_generator = ({'position_we_vote_id': 'wvt3pos{number}'.format(number=number),
+                               'google_civic_election_id': 4184,
+                               'state_code': 'ca'} for number in range(7))
+        results = BatchManager().create_batch_from_json(
+            'test', position_generator, BATCH_HEADER_MAP_FOR_POSITIONS, POSITION, batch_row_bulk_create_size=3)
+        self.assertTrue(results['batch_saved'], results['status'])
+        self.assertEqual(results['number_of_batch_rows'], 7)
+        self.assertEqual(BatchRow.objects.filter(
+            batch_header_id=results['batch_header_id'], state_code='ca').count(), 7)
+
+        results = BatchManager().create_batch_from_json('test', iter([]), BATCH_HEADER_MAP_FOR_POSITIONS, POSITION)
+        self.assertFalse(results['batch_saved'])
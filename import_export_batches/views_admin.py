@@ -2,7 +2,8 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from .models import ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, \
+from .models import ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, REFRESH_ELECTION_STATISTICS, \
+    REFRESH_POSITION_CACHED_INFO, \
     BatchDescription, BatchHeader, BatchHeaderMap, BatchManager, \
     BatchProcess, BatchProcessAnalyticsChunk, BatchProcessBallotItemChunk, BatchProcessLogEntry, BatchProcessManager, \
     BatchRow, BatchRowActionBallotItem, BatchRowActionPollingLocation, \
@@ -1617,6 +1618,13 @@ def batch_process_list_view(request):
             elif kind_of_processes_to_show == "API_REFRESH_REQUEST":
                 api_refresh_processes = ['API_REFRESH_REQUEST']
                 batch_process_queryset = batch_process_queryset.filter(kind_of_process__in=api_refresh_processes)
+            elif kind_of_processes_to_show == "REFRESH_POSITION_CACHED_INFO":
+                position_refresh_processes = ['REFRESH_POSITION_CACHED_INFO']
+                batch_process_queryset = batch_process_queryset.filter(kind_of_process__in=position_refresh_processes)
+            elif kind_of_processes_to_show == "REFRESH_ELECTION_STATISTICS":
+                election_statistics_processes = ['REFRESH_ELECTION_STATISTICS']
+                batch_process_queryset = batch_process_queryset.filter(
+                    kind_of_process__in=election_statistics_processes)
             elif kind_of_processes_to_show == "BALLOT_ITEMS":
                 ballot_item_processes = [
                     'REFRESH_BALLOT_ITEMS_FROM_POLLING_LOCATIONS',
@@ -1630,7 +1638,8 @@ def batch_process_list_view(request):
             # Don't modify the query
             pass
         else:
-            exclude_list = [ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST]
+            exclude_list = [
+                ACTIVITY_NOTICE_PROCESS, API_REFRESH_REQUEST, REFRESH_ELECTION_STATISTICS, REFRESH_POSITION_CACHED_INFO]
             batch_process_queryset = batch_process_queryset.exclude(kind_of_process__in=exclude_list)
         batch_process_queryset = batch_process_queryset.order_by("-id")
 
@@ -245,6 +245,15 @@ def issue_retrieve_for_api(issue_id, issue_we_vote_id):  # issueRetrieve
 
 
 def issue_descriptions_retrieve_for_api():  # issuesDescriptionsRetrieve
+    json_data = issue_descriptions_retrieve_json_data_for_api()
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
+
+
+def issue_descriptions_retrieve_json_data_for_api():
+    """
+    The json_data behind issueDescriptionsRetrieve, without the HttpResponse, so it can be stored in ApiInternalCache
+    :return:
+    """
     issue_list = []
     issues_to_display = []
 
@@ -266,8 +275,7 @@ def issue_descriptions_retrieve_for_api():  # issuesDescriptionsRetrieve
             'success': False,
             'issue_list': [],
         }
-
-        return HttpResponse(json.dumps(json_data), content_type='application/json')
+        return json_data
 
     for issue in issue_list:
         one_issue = {
@@ -293,7 +301,7 @@ def issue_descriptions_retrieve_for_api():  # issuesDescriptionsRetrieve
         'success':                      True,
         'issue_list':                   issues_to_display,
     }
-    return HttpResponse(json.dumps(json_data), content_type='application/json')
+    return json_data
 
 
 def issues_retrieve_for_api(  # issuesRetrieve
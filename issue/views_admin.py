@@ -5,6 +5,7 @@
 from .controllers import *
 from .models import ALPHABETICAL_ASCENDING, Issue, OrganizationLinkToIssue
 from admin_tools.views import redirect_to_sign_in_page
+from api_internal_cache.controllers import retrieve_api_internal_cache_http_response
 from config.base import get_environment_variable
 from django.db.models import Q
 from django.http import HttpResponseRedirect
@@ -80,6 +81,10 @@ def issues_sync_out_view(request):  # issuesSyncOut
 
 
 def issue_descriptions_retrieve_view(request):  # issueDescriptionsRetrieve
+    http_response = retrieve_api_internal_cache_http_response(request, 'issueDescriptionsRetrieve', {})
+    if http_response is not None:
+        return http_response
+
     http_response = issue_descriptions_retrieve_for_api()
     return http_response
 
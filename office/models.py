@@ -207,9 +207,9 @@ class ContestOfficeManager(models.Model):
     def __unicode__(self):
         return "ContestOfficeManager"
 
-    def retrieve_contest_office_from_id(self, contest_office_id):
+    def retrieve_contest_office_from_id(self, contest_office_id, read_only=False):
         contest_office_manager = ContestOfficeManager()
-        return contest_office_manager.retrieve_contest_office(contest_office_id)
+        return contest_office_manager.retrieve_contest_office(contest_office_id, read_only=read_only)
 
     def retrieve_contest_office_from_we_vote_id(self, contest_office_we_vote_id, read_only=False):
         contest_office_id = 0
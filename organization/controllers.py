@@ -12,6 +12,8 @@ from analytics.models import ACTION_BALLOT_VISIT, ACTION_ORGANIZATION_FOLLOW, AC
     ACTION_ORGANIZATION_STOP_FOLLOWING, ACTION_ORGANIZATION_STOP_IGNORING, AnalyticsManager
 import base64
 from config.base import get_environment_variable
+from django.db.models import Count, Q
+from django.db.models.functions import Upper
 from django.http import HttpResponse
 from donate.controllers import move_donation_info_to_another_organization
 from election.models import ElectionManager
@@ -37,6 +39,8 @@ import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, \
     extract_twitter_handle_from_text_string, positive_value_exists, \
     process_request_from_master
+from wevote_functions.duplicate_index import generate_lookup_chunk_list, generate_upper_value_list, \
+    normalize_for_iexact
 import tweepy
 import re
 
@@ -1513,16 +1517,91 @@ def organizations_import_from_master_server(request, state_code=''):
     return import_results
 
 
+def convert_organization_vote_smart_id(vote_smart_id):
+    """
+    Organization.vote_smart_id is an integer field, and retrieve_possible_duplicate_organizations doesn't find
+    anything for a vote_smart_id Django can't convert to an integer
+    :return: integer, or None
+    """
+    try:
+        return int(vote_smart_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def retrieve_possible_duplicate_organizations_for_list(structured_json):
+    """
+    Look up the local organizations that retrieve_possible_duplicate_organizations could find for any of these
+    organizations, with a few queries for the whole list
+    :param structured_json:
+    :return: organization_count, we_vote_id_count_dict (organizations for each incoming we_vote_id),
+      organization_we_vote_id_by_id, and organization_ids_by_name, organization_ids_by_twitter_handle and
+      organization_ids_by_vote_smart_id, which map a normalized value to the ids of the organizations that have it
+    """
+    organization_we_vote_id_by_id = {}
+    organization_ids_by_name = {}
+    organization_ids_by_twitter_handle = {}
+    organization_ids_by_vote_smart_id = {}
+
+    # Organizations without a name, twitter handle or vote_smart_id are compared with every organization
+    organization_count = Organization.objects.count()
+    we_vote_id_count_dict = {}
+    we_vote_id_list = generate_upper_value_list(one_organization.get('we_vote_id')
+                                                for one_organization in structured_json)
+    for we_vote_id_chunk in generate_lookup_chunk_list(we_vote_id_list):
+        query = Organization.objects.order_by().annotate(we_vote_id_upper=Upper('we_vote_id')) \
+            .filter(we_vote_id_upper__in=we_vote_id_chunk)
+        for row in query.values('we_vote_id_upper').annotate(organization_count=Count('id')):
+            we_vote_id_count_dict[row['we_vote_id_upper']] = row['organization_count']
+
+    filter_list = []
+    for organization_name_chunk in generate_lookup_chunk_list(generate_upper_value_list(
+            one_organization.get('organization_name') for one_organization in structured_json)):
+        filter_list.append(Q(organization_name_upper__in=organization_name_chunk))
+    for twitter_handle_chunk in generate_lookup_chunk_list(generate_upper_value_list(
+            one_organization.get('organization_twitter_handle') for one_organization in structured_json)):
+        filter_list.append(Q(organization_twitter_handle_upper__in=twitter_handle_chunk))
+    vote_smart_id_set = {convert_organization_vote_smart_id(one_organization.get('vote_smart_id'))
+                         for one_organization in structured_json
+                         if positive_value_exists(one_organization.get('vote_smart_id'))}
+    vote_smart_id_set.discard(None)
+    for vote_smart_id_chunk in generate_lookup_chunk_list(vote_smart_id_set):
+        filter_list.append(Q(vote_smart_id__in=vote_smart_id_chunk))
+
+    organization_queryset = Organization.objects.annotate(
+        organization_name_upper=Upper('organization_name'),
+        organization_twitter_handle_upper=Upper('organization_twitter_handle'))
+    for one_filter in filter_list:
+        for row in organization_queryset.filter(one_filter).values(
+                'id', 'we_vote_id', 'organization_name_upper', 'organization_twitter_handle_upper', 'vote_smart_id'):
+            organization_we_vote_id_by_id[row['id']] = normalize_for_iexact(row['we_vote_id'])
+            organization_ids_by_name.setdefault(row['organization_name_upper'], set()).add(row['id'])
+            organization_ids_by_twitter_handle.setdefault(
+                row['organization_twitter_handle_upper'], set()).add(row['id'])
+            organization_ids_by_vote_smart_id.setdefault(row['vote_smart_id'], set()).add(row['id'])
+
+    return {
+        'organization_count':                   organization_count,
+        'we_vote_id_count_dict':                we_vote_id_count_dict,
+        'organization_we_vote_id_by_id':        organization_we_vote_id_by_id,
+        'organization_ids_by_name':             organization_ids_by_name,
+        'organization_ids_by_twitter_handle':   organization_ids_by_twitter_handle,
+        'organization_ids_by_vote_smart_id':    organization_ids_by_vote_smart_id,
+    }
+
+
 def filter_organizations_structured_json_for_local_duplicates(structured_json):
     """
     With this function, we remove organizations that seem to be duplicates, but have different we_vote_id's.
     We do not check to see if we have a matching office this routine -- that is done elsewhere.
+    We find the same duplicates retrieve_possible_duplicate_organizations would, with a few queries for the whole list.
     :param structured_json:
     :return:
     """
     duplicates_removed = 0
     filtered_structured_json = []
-    organization_list_manager = OrganizationListManager()
+    possible_duplicates = retrieve_possible_duplicate_organizations_for_list(structured_json)
+    organization_we_vote_id_by_id = possible_duplicates['organization_we_vote_id_by_id']
     for one_organization in structured_json:
         organization_name = one_organization['organization_name'] if 'organization_name' in one_organization else ''
         we_vote_id = one_organization['we_vote_id'] if 'we_vote_id' in one_organization else ''
@@ -1531,12 +1610,38 @@ def filter_organizations_structured_json_for_local_duplicates(structured_json):
         vote_smart_id = one_organization['vote_smart_id'] if 'vote_smart_id' in one_organization else ''
 
         # Check to see if there is an entry that matches in all critical ways, minus the we_vote_id
-        we_vote_id_from_master = we_vote_id
-
-        results = organization_list_manager.retrieve_possible_duplicate_organizations(
-            organization_name, organization_twitter_handle, vote_smart_id, we_vote_id_from_master)
+        we_vote_id_from_master_upper = normalize_for_iexact(we_vote_id) if positive_value_exists(we_vote_id) else None
+        if positive_value_exists(vote_smart_id) and convert_organization_vote_smart_id(vote_smart_id) is None:
+            # retrieve_possible_duplicate_organizations fails, and we keep the organization
+            duplicate_found = False
+        elif not positive_value_exists(organization_name) and not positive_value_exists(organization_twitter_handle) \
+                and not positive_value_exists(vote_smart_id):
+            # We want to find organizations with *any* of these values, and we have none of them
+            other_organization_count = possible_duplicates['organization_count']
+            if we_vote_id_from_master_upper is not None:
+                other_organization_count -= \
+                    possible_duplicates['we_vote_id_count_dict'].get(we_vote_id_from_master_upper, 0)
+            duplicate_found = other_organization_count > 0
+        else:
+            # We want to find organizations with *any* of these values
+            organization_id_set = set()
+            if positive_value_exists(organization_name):
+                organization_id_set |= possible_duplicates['organization_ids_by_name'].get(
+                    normalize_for_iexact(organization_name), set())
+            if positive_value_exists(organization_twitter_handle):
+                organization_id_set |= possible_duplicates['organization_ids_by_twitter_handle'].get(
+                    normalize_for_iexact(organization_twitter_handle), set())
+            if positive_value_exists(vote_smart_id):
+                organization_id_set |= possible_duplicates['organization_ids_by_vote_smart_id'].get(
+                    convert_organization_vote_smart_id(vote_smart_id), set())
+            if we_vote_id_from_master_upper is None:
+                duplicate_found = len(organization_id_set) > 0
+            else:
+                # Ignore entries with we_vote_id coming in from master server
+                duplicate_found = any(organization_we_vote_id_by_id[organization_id] != we_vote_id_from_master_upper
+                                      for organization_id in organization_id_set)
 
-        if results['organization_list_found']:
+        if duplicate_found:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
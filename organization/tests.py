@@ -0,0 +1,43 @@
+# organization/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.test import TestCase
+from organization.controllers import filter_organizations_structured_json_for_local_duplicates
+from organization.models import Organization, OrganizationListManager
+
+
+class FilterOrganizationDuplicatesTestCase(TestCase):
+    """
+    The filter must find the same duplicates as asking retrieve_possible_duplicate_organizations about one
+    organization at a time
+    """
+
+    def test_organizations_match_one_at_a_time(self):
+        for we_vote_id, organization_name, organization_twitter_handle, vote_smart_id in [
+                ("wv01org1", "League of Voters", "leagueofvoters", 101), ("wv01org2", "Parks Alliance", "", None),
+                ("wv01org3", "Taxpayers Group", "TaxGroup", 303)]:
+            Organization.objects.create(
+                we_vote_id=we_vote_id, organization_name=organization_name,
+                organization_twitter_handle=organization_twitter_handle, vote_smart_id=vote_smart_id)
+        structured_json = []
+        for we_vote_id in ["wv01org1", "WV01ORG3", "wv02org1", ""]:
+            for organization_name in ["LEAGUE OF VOTERS", "parks alliance", "New Group", ""]:
+                for organization_twitter_handle in ["taxgroup", "newgroup", ""]:
+                    for vote_smart_id in [101, "303", "not a number", ""]:
+                        structured_json.append({
+                            'we_vote_id': we_vote_id,
+                            'organization_name': organization_name,
+                            'organization_twitter_handle': organization_twitter_handle,
+                            'vote_smart_id': vote_smart_id,
+                        })
+
+        organization_list_manager = OrganizationListManager()
+        expected_structured_json = [
+            one_organization for one_organization in structured_json
+            if not organization_list_manager.retrieve_possible_duplicate_organizations(
+                one_organization['organization_name'], one_organization['organization_twitter_handle'],
+                one_organization['vote_smart_id'], one_organization['we_vote_id'])['organization_list_found']]
+        results = filter_organizations_structured_json_for_local_duplicates(structured_json)
+        self.assertEqual(results['structured_json'], expected_structured_json)
+        self.assertGreater(results['duplicates_removed'], 0)
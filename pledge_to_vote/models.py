@@ -199,6 +199,27 @@ class PledgeToVoteManager(models.Model):
         }
         return results
 
+    def retrieve_voter_guide_we_vote_id_list_pledged_by_voter(self, voter_we_vote_id, read_only=True):
+        """
+        All of the voter guides this voter has pledged to, in one query
+        :param voter_we_vote_id:
+        :param read_only:
+        :return:
+        """
+        voter_guide_we_vote_id_list = []
+        if not positive_value_exists(voter_we_vote_id):
+            return voter_guide_we_vote_id_list
+        try:
+            if positive_value_exists(read_only):
+                pledge_queryset = PledgeToVote.objects.using('readonly').all()
+            else:
+                pledge_queryset = PledgeToVote.objects.all()
+            pledge_queryset = pledge_queryset.filter(voter_we_vote_id__iexact=voter_we_vote_id)
+            voter_guide_we_vote_id_list = list(pledge_queryset.values_list('voter_guide_we_vote_id', flat=True))
+        except Exception as e:
+            pass
+        return voter_guide_we_vote_id_list
+
     # def retrieve_voter_pledges_list(self, voter_we_vote_id):  # TODO Implement this
     #     """
     #
@@ -6,6 +6,7 @@ from config.base import get_environment_variable
 from django.db import models
 from django.db.models import Q
 from exception.models import handle_record_found_more_than_one_exception
+from geoip.models import GeocodeCacheManager
 from geopy.geocoders import get_geocoder_for_service
 from geopy.exc import GeocoderQuotaExceeded
 import wevote_functions.admin
@@ -395,7 +396,9 @@ class PollingLocationManager(models.Model):
             polling_location.state,
             polling_location.zip_long)
         try:
-            location = self.google_client.geocode(full_ballot_address, sensor=False, timeout=GEOCODE_TIMEOUT)
+            geocode_cache_manager = GeocodeCacheManager()
+            location = geocode_cache_manager.geocode(
+                self.google_client, full_ballot_address, sensor=False, timeout=GEOCODE_TIMEOUT)
         except GeocoderQuotaExceeded:
             status += "GeocoderQuotaExceeded "
             results = {
@@ -4,14 +4,15 @@
 
 from .models import PositionEntered, PositionForFriends, PositionManager, PositionListManager, ANY_STANCE, \
     FRIENDS_AND_PUBLIC, FRIENDS_ONLY, PUBLIC_ONLY, SHOW_PUBLIC, THIS_ELECTION_ONLY, ALL_OTHER_ELECTIONS, \
-    ALL_ELECTIONS, SUPPORT, OPPOSE, INFORMATION_ONLY, NO_STANCE
+    ALL_ELECTIONS, SUPPORT, OPPOSE, INFORMATION_ONLY, NO_STANCE, PERCENT_RATING
 from ballot.controllers import figure_out_google_civic_election_id_voter_is_watching, \
     figure_out_google_civic_election_id_voter_is_watching_by_voter_id
 from ballot.models import BallotItemListManager, OFFICE, CANDIDATE, MEASURE
 from candidate.models import CandidateCampaign, CandidateCampaignManager, CandidateCampaignListManager, \
     CandidateToOfficeLink
 from config.base import get_environment_variable
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.db.models.functions import Upper
 from django.http import HttpResponse
 from election.models import ElectionManager, fetch_election_state
 from exception.models import handle_record_not_saved_exception
@@ -26,8 +27,12 @@ import json
 from voter.models import fetch_voter_id_from_voter_device_link, VoterManager
 from voter_guide.models import ORGANIZATION, VOTER, VoterGuideManager
 import wevote_functions.admin
-from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists, process_request_from_master, \
+from wevote_functions.functions import is_voter_device_id_valid, positive_value_exists, \
     convert_to_int, is_link_to_video, is_speaker_type_organization, is_speaker_type_public_figure
+from wevote_functions.bulk_upsert import BulkUpsert, fetch_id_by_we_vote_id, fetch_values_by_we_vote_id
+from wevote_functions.duplicate_index import DuplicateIndex, generate_lookup_chunk_list, generate_upper_value_list, \
+    normalize_for_iexact
+from wevote_functions.sync_stream import import_from_master_server_in_chunks
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -535,21 +540,10 @@ def count_for_all_ballot_items_from_position_network_score_for_api(  # positions
     # The list where we capture results
     position_counts_list_results = []
 
-    # Get all of the individual scores for this entire election
-    position_network_score_list = position_list_manager.fetch_position_network_score_list(
+    # Get the support/oppose tallies for every ballot item in this entire election, in one query
+    tallies_by_ballot_item_we_vote_id = position_list_manager.fetch_position_network_score_tallies(
         voter_id, google_civic_election_id)
 
-    # Now organize the scores by ballot item
-    raw_entries_by_ballot_item = {}
-    for position_network_score in position_network_score_list:
-        ballot_item_we_vote_id = position_network_score.get_ballot_item_we_vote_id()
-        if ballot_item_we_vote_id not in raw_entries_by_ballot_item:
-            temp_list = []
-        else:
-            temp_list = raw_entries_by_ballot_item[ballot_item_we_vote_id]
-        temp_list.append(position_network_score)
-        raw_entries_by_ballot_item[ballot_item_we_vote_id] = temp_list
-
     # Get a list of all candidates and measures from this election (in the active election)
     ballot_item_list_manager = BallotItemListManager()
     candidate_list_manager = CandidateCampaignListManager()
@@ -560,83 +554,56 @@ def count_for_all_ballot_items_from_position_network_score_for_api(  # positions
         status += results['status']
         ballot_item_list = results['ballot_item_list']
 
+    # Retrieve the candidates for all offices on this ballot at once, instead of once per office
+    office_we_vote_id_list = []
+    for one_ballot_item in ballot_item_list:
+        if one_ballot_item.is_contest_office() and \
+                one_ballot_item.contest_office_we_vote_id not in office_we_vote_id_list:
+            office_we_vote_id_list.append(one_ballot_item.contest_office_we_vote_id)
+    candidate_list_by_office_we_vote_id = {}
+    if positive_value_exists(len(office_we_vote_id_list)):
+        results = candidate_list_manager.retrieve_all_candidates_for_office_list(
+            office_we_vote_id_list=office_we_vote_id_list, read_only=True)
+        if results['success']:
+            candidate_list_by_office_we_vote_id = results['candidate_list_by_office_we_vote_id']
+        else:
+            status += results['status']
+
     # ballot_item_list is populated with contest_office and contest_measure entries
-    support_or_oppose_exists = False
+    ballot_item_we_vote_id_list = []
     for one_ballot_item in ballot_item_list:
-        # Retrieve all positions for each ballot item
         if one_ballot_item.is_contest_office():
-            results = candidate_list_manager.retrieve_all_candidates_for_office(
-                office_we_vote_id=one_ballot_item.contest_office_we_vote_id, read_only=True)
-            success = results['success']
-            candidate_list = results['candidate_list']
-
-            if success:
-                # Loop through all candidates under this office
-                for candidate in candidate_list:
-                    support_count_for_one_ballot_item = 0
-                    oppose_count_for_one_ballot_item = 0
-                    support_we_vote_id_list = []
-                    oppose_we_vote_id_list = []
-                    support_name_list = []
-                    oppose_name_list = []
-
-                    if candidate.we_vote_id in raw_entries_by_ballot_item:
-                        for position_network_score in raw_entries_by_ballot_item[candidate.we_vote_id]:
-                            if position_network_score.is_support:
-                                support_or_oppose_exists = True
-                                support_count_for_one_ballot_item += 1
-                                support_we_vote_id_list.append(position_network_score.get_speaker_we_vote_id())
-                                support_name_list.append(position_network_score.speaker_display_name)
-                            elif position_network_score.is_oppose:
-                                support_or_oppose_exists = True
-                                oppose_count_for_one_ballot_item += 1
-                                oppose_we_vote_id_list.append(position_network_score.get_speaker_we_vote_id())
-                                oppose_name_list.append(position_network_score.speaker_display_name)
-
-                    one_ballot_item_results = {
-                        'ballot_item_we_vote_id':   candidate.we_vote_id,
-                        'support_count':            support_count_for_one_ballot_item,
-                        'oppose_count':             oppose_count_for_one_ballot_item,
-                        'support_we_vote_id_list':  support_we_vote_id_list,
-                        'support_name_list':        support_name_list,
-                        'oppose_we_vote_id_list':   oppose_we_vote_id_list,
-                        'oppose_name_list':         oppose_name_list,
-                    }
-                    position_counts_list_results.append(one_ballot_item_results)
+            # Loop through all candidates under this office
+            for candidate in candidate_list_by_office_we_vote_id.get(one_ballot_item.contest_office_we_vote_id, []):
+                ballot_item_we_vote_id_list.append(candidate.we_vote_id)
         elif one_ballot_item.is_contest_measure():
-            support_count_for_one_ballot_item = 0
-            oppose_count_for_one_ballot_item = 0
-            support_we_vote_id_list = []
-            oppose_we_vote_id_list = []
-            support_name_list = []
-            oppose_name_list = []
-
-            if one_ballot_item.contest_measure_we_vote_id in raw_entries_by_ballot_item:
-                for position_network_score in raw_entries_by_ballot_item[one_ballot_item.contest_measure_we_vote_id]:
-                    if position_network_score.is_support:
-                        support_or_oppose_exists = True
-                        support_count_for_one_ballot_item += 1
-                        support_we_vote_id_list.append(position_network_score.get_speaker_we_vote_id())
-                        support_name_list.append(position_network_score.speaker_display_name)
-                    elif position_network_score.is_oppose:
-                        support_or_oppose_exists = True
-                        oppose_count_for_one_ballot_item += 1
-                        oppose_we_vote_id_list.append(position_network_score.get_speaker_we_vote_id())
-                        oppose_name_list.append(position_network_score.speaker_display_name)
+            ballot_item_we_vote_id_list.append(one_ballot_item.contest_measure_we_vote_id)
 
+    support_or_oppose_exists = False
+    for ballot_item_we_vote_id in ballot_item_we_vote_id_list:
+        if ballot_item_we_vote_id in tallies_by_ballot_item_we_vote_id:
+            one_tally = tallies_by_ballot_item_we_vote_id[ballot_item_we_vote_id]
+            support_or_oppose_exists = True
             one_ballot_item_results = {
-                'ballot_item_we_vote_id':   one_ballot_item.contest_measure_we_vote_id,
-                'support_count':            support_count_for_one_ballot_item,
-                'oppose_count':             oppose_count_for_one_ballot_item,
-                'support_we_vote_id_list':  support_we_vote_id_list,
-                'support_name_list':        support_name_list,
-                'oppose_we_vote_id_list':   oppose_we_vote_id_list,
-                'oppose_name_list':         oppose_name_list,
+                'ballot_item_we_vote_id':   ballot_item_we_vote_id,
+                'support_count':            one_tally['support_count'],
+                'oppose_count':             one_tally['oppose_count'],
+                'support_we_vote_id_list':  list(one_tally['support_we_vote_id_list']),
+                'support_name_list':        list(one_tally['support_name_list']),
+                'oppose_we_vote_id_list':   list(one_tally['oppose_we_vote_id_list']),
+                'oppose_name_list':         list(one_tally['oppose_name_list']),
             }
-            position_counts_list_results.append(one_ballot_item_results)
         else:
-            # Skip the rest of this loop
-            continue
+            one_ballot_item_results = {
+                'ballot_item_we_vote_id':   ballot_item_we_vote_id,
+                'support_count':            0,
+                'oppose_count':             0,
+                'support_we_vote_id_list':  [],
+                'support_name_list':        [],
+                'oppose_we_vote_id_list':   [],
+                'oppose_name_list':         [],
+            }
+        position_counts_list_results.append(one_ballot_item_results)
 
     json_data = {
         'success':                  True,
@@ -2582,7 +2549,6 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
     status = "POSITION_LIST_FOR_BALLOT_ITEM "
     success = True
 
-    position_manager = PositionManager()
     position_list_manager = PositionListManager()
     ballot_item_found = False
     if positive_value_exists(candidate_id) or positive_value_exists(candidate_we_vote_id):
@@ -2595,7 +2561,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         return_only_latest_position_per_speaker = True
         position_objects = position_list_manager.retrieve_all_positions_for_candidate_campaign(
             retrieve_public_positions_now, candidate_id, candidate_we_vote_id, stance_we_are_looking_for,
-            return_only_latest_position_per_speaker, read_only=False)
+            return_only_latest_position_per_speaker, read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2606,9 +2572,10 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # the WebApp team)
         candidate_campaign_manager = CandidateCampaignManager()
         if positive_value_exists(candidate_id):
-            results = candidate_campaign_manager.retrieve_candidate_campaign_from_id(candidate_id)
+            results = candidate_campaign_manager.retrieve_candidate_campaign_from_id(candidate_id, read_only=True)
         else:
-            results = candidate_campaign_manager.retrieve_candidate_campaign_from_we_vote_id(candidate_we_vote_id)
+            results = candidate_campaign_manager.retrieve_candidate_campaign_from_we_vote_id(
+                candidate_we_vote_id, read_only=True)
 
         if results['candidate_campaign_found']:
             candidate_campaign = results['candidate_campaign']
@@ -2629,7 +2596,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         position_objects = position_list_manager.retrieve_all_positions_for_contest_measure(
             retrieve_public_positions_now,
             measure_id, measure_we_vote_id, stance_we_are_looking_for,
-            return_only_latest_position_per_speaker, read_only=False)
+            return_only_latest_position_per_speaker, read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2639,9 +2606,9 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # the WebApp team)
         contest_measure_manager = ContestMeasureManager()
         if positive_value_exists(measure_id):
-            results = contest_measure_manager.retrieve_contest_measure_from_id(measure_id)
+            results = contest_measure_manager.retrieve_contest_measure_from_id(measure_id, read_only=True)
         else:
-            results = contest_measure_manager.retrieve_contest_measure_from_we_vote_id(measure_we_vote_id)
+            results = contest_measure_manager.retrieve_contest_measure_from_we_vote_id(measure_we_vote_id, read_only=True)
 
         if results['contest_measure_found']:
             contest_measure = results['contest_measure']
@@ -2664,7 +2631,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             contest_office_we_vote_id=office_we_vote_id,
             stance_we_are_looking_for=stance_we_are_looking_for,
             most_recent_only=return_only_latest_position_per_speaker,
-            read_only=False)
+            read_only=True)
         # is_public_position_setting = True
         # public_positions_list = position_list_manager.add_is_public_position(public_positions_list,
         #                                                                      is_public_position_setting)
@@ -2675,9 +2642,9 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         # the WebApp team)
         contest_office_manager = ContestOfficeManager()
         if positive_value_exists(office_id):
-            results = contest_office_manager.retrieve_contest_office_from_id(office_id)
+            results = contest_office_manager.retrieve_contest_office_from_id(office_id, read_only=True)
         else:
-            results = contest_office_manager.retrieve_contest_office_from_we_vote_id(office_we_vote_id)
+            results = contest_office_manager.retrieve_contest_office_from_we_vote_id(office_we_vote_id, read_only=True)
 
         if results['contest_office_found']:
             contest_office = results['contest_office']
@@ -2714,12 +2681,6 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
         return HttpResponse(json.dumps(json_data), content_type='application/json')
 
     position_list = []
-    offices_dict = {}
-    candidates_dict = {}
-    measures_dict = {}
-    organizations_dict = {}
-    voters_by_linked_org_dict = {}
-    voters_dict = {}
     for one_position in position_objects:
         # Is there sufficient information in the position to display it?
         some_data_exists = True if one_position.is_support_or_positive_rating() \
@@ -2737,28 +2698,7 @@ def position_list_for_ballot_item_for_api(office_id, office_we_vote_id,  # posit
             speaker_id = one_position.organization_id
             speaker_we_vote_id = one_position.organization_we_vote_id
             one_position_success = True
-            # Make sure we have this data to display
-            if not positive_value_exists(one_position.speaker_display_name) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_large) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_medium) \
-                    or not positive_value_exists(one_position.speaker_image_url_https_tiny) \
-                    or not positive_value_exists(one_position.speaker_twitter_handle) \
-                    or one_position.speaker_type == UNKNOWN:
-                results = position_manager.refresh_cached_position_info(
-                    one_position,
-                    offices_dict=offices_dict,
-                    candidates_dict=candidates_dict,
-                    measures_dict=measures_dict,
-                    organizations_dict=organizations_dict,
-                    voters_by_linked_org_dict=voters_by_linked_org_dict,
-                    voters_dict=voters_dict)
-                one_position = results['position']
-                offices_dict = results['offices_dict']
-                candidates_dict = results['candidates_dict']
-                measures_dict = results['measures_dict']
-                organizations_dict = results['organizations_dict']
-                voters_by_linked_org_dict = results['voters_by_linked_org_dict']
-                voters_dict = results['voters_dict']
+            # Missing speaker data is filled in by the REFRESH_POSITION_CACHED_INFO batch process, not here
             speaker_display_name = one_position.speaker_display_name
         else:
             speaker_display_name = "Unknown"
@@ -3564,7 +3504,6 @@ def position_list_for_opinion_maker_for_api(voter_device_id,  # positionListForO
         opinion_maker_id = 0
         opinion_maker_we_vote_id = ''
 
-    position_manager = PositionManager()
     # Get voter_id from the voter_device_id so we can know who is supporting/opposing
     results = is_voter_device_id_valid(voter_device_id)
     if not results['success']:
@@ -3658,7 +3597,8 @@ def position_list_for_opinion_maker_for_api(voter_device_id,  # positionListForO
                 show_positions_current_voter_election=filter_for_voter,
                 exclude_positions_current_voter_election=filter_out_voter,
                 voter_device_id=voter_device_id,
-                google_civic_election_id=google_civic_election_id)
+                google_civic_election_id=google_civic_election_id,
+                read_only=True)
         else:
             opinion_maker_id = organization_id
             opinion_maker_we_vote_id = organization_we_vote_id
@@ -3714,26 +3654,13 @@ def position_list_for_opinion_maker_for_api(voter_device_id,  # positionListForO
 
     position_list = []
     all_elections_that_have_positions = []
-    offices_dict = {}
-    candidates_dict = {}
-    measures_dict = {}
-    organizations_dict = {}
-    voters_by_linked_org_dict = {}
-    voters_dict = {}
     status += "POSITION_LIST_RAW_COUNT: " + str(len(position_list_raw)) + " "
     for one_position in position_list_raw:
         # Whose position is it?
-        missing_ballot_item_image = False
-        missing_office_information = False
         if positive_value_exists(one_position.candidate_campaign_we_vote_id):
             kind_of_ballot_item = CANDIDATE
             ballot_item_id = one_position.candidate_campaign_id
             ballot_item_we_vote_id = one_position.candidate_campaign_we_vote_id
-            if not positive_value_exists(one_position.contest_office_we_vote_id) \
-                    or not positive_value_exists(one_position.contest_office_name):
-                missing_office_information = True
-            if not positive_value_exists(one_position.ballot_item_image_url_https):
-                missing_ballot_item_image = True
             one_position_success = True
         elif positive_value_exists(one_position.contest_measure_we_vote_id):
             kind_of_ballot_item = MEASURE
@@ -3753,37 +3680,7 @@ def position_list_for_opinion_maker_for_api(voter_device_id,  # positionListForO
             one_position_success = False
 
         if one_position_success:
-            # Make sure we have this data to display. If we don't, refresh PositionEntered table from other tables.
-            if position_manager.position_speaker_name_needs_repair(one_position, opinion_maker_display_name):
-                force_update = True
-            else:
-                force_update = False
-            race_office_level_missing = not positive_value_exists(one_position.race_office_level) \
-                and positive_value_exists(one_position.candidate_campaign_we_vote_id)
-            # REMOVED: or not positive_value_exists(one_position.state_code) \
-            if force_update or not positive_value_exists(one_position.ballot_item_display_name) \
-                    or not positive_value_exists(one_position.position_ultimate_election_date) \
-                    or not positive_value_exists(one_position.position_year) \
-                    or not positive_value_exists(one_position.speaker_image_url_https) \
-                    or one_position.speaker_type == UNKNOWN \
-                    or missing_ballot_item_image \
-                    or missing_office_information \
-                    or race_office_level_missing:
-                results = position_manager.refresh_cached_position_info(
-                    one_position, force_update,
-                    offices_dict=offices_dict,
-                    candidates_dict=candidates_dict,
-                    measures_dict=measures_dict,
-                    organizations_dict=organizations_dict,
-                    voters_by_linked_org_dict=voters_by_linked_org_dict,
-                    voters_dict=voters_dict)
-                one_position = results['position']
-                offices_dict = results['offices_dict']
-                candidates_dict = results['candidates_dict']
-                measures_dict = results['measures_dict']
-                organizations_dict = results['organizations_dict']
-                voters_by_linked_org_dict = results['voters_by_linked_org_dict']
-                voters_dict = results['voters_dict']
+            # Missing cached data is filled in by the REFRESH_POSITION_CACHED_INFO batch process, not here
             one_position_dict_for_api = {
                 'ballot_item_display_name':
                     one_position.ballot_item_display_name
@@ -3898,7 +3795,6 @@ def position_list_for_voter_for_api(voter_device_id,
     status = ''
     position_list_raw = []
 
-    position_manager = PositionManager()
     # Get voter_id from the voter_device_id so we can know who is supporting/opposing
     results = is_voter_device_id_valid(voter_device_id)
     if not results['success']:
@@ -3961,32 +3857,19 @@ def position_list_for_voter_for_api(voter_device_id,
 
     position_list_results = position_list_manager.retrieve_all_positions_for_voter(
         voter.id, voter.we_vote_id, stance_we_are_looking_for, friends_vs_public, google_civic_election_id,
-        this_election_vs_others)
+        this_election_vs_others, read_only=True)
     if position_list_results['position_list_found']:
         position_list_retrieved = position_list_results['position_list']
     else:
         position_list_retrieved = []
 
     position_list = []
-    offices_dict = {}
-    candidates_dict = {}
-    measures_dict = {}
-    organizations_dict = {}
-    voters_by_linked_org_dict = {}
-    voters_dict = {}
     for one_position in position_list_retrieved:
         # Whose position is it?
-        missing_ballot_item_image = False
-        missing_office_information = False
         if positive_value_exists(one_position.candidate_campaign_we_vote_id):
             kind_of_ballot_item = CANDIDATE
             ballot_item_id = one_position.candidate_campaign_id
             ballot_item_we_vote_id = one_position.candidate_campaign_we_vote_id
-            if not positive_value_exists(one_position.contest_office_we_vote_id) \
-                    or not positive_value_exists(one_position.contest_office_name):
-                missing_office_information = True
-            if not positive_value_exists(one_position.ballot_item_image_url_https):
-                missing_ballot_item_image = True
             one_position_success = True
         elif positive_value_exists(one_position.contest_measure_we_vote_id):
             kind_of_ballot_item = MEASURE
@@ -4005,30 +3888,7 @@ def position_list_for_voter_for_api(voter_device_id,
             one_position_success = False
 
         if one_position_success:
-            # Make sure we have this data to display. If we don't, refresh PositionEntered table from other tables.
-            race_office_level_missing = not positive_value_exists(one_position.race_office_level) \
-                and positive_value_exists(one_position.candidate_campaign_we_vote_id)
-            if not positive_value_exists(one_position.ballot_item_display_name) \
-                    or not positive_value_exists(one_position.state_code) \
-                    or not positive_value_exists(one_position.speaker_image_url_https) \
-                    or missing_ballot_item_image \
-                    or missing_office_information \
-                    or race_office_level_missing:
-                results = position_manager.refresh_cached_position_info(
-                    one_position,
-                    offices_dict=offices_dict,
-                    candidates_dict=candidates_dict,
-                    measures_dict=measures_dict,
-                    organizations_dict=organizations_dict,
-                    voters_by_linked_org_dict=voters_by_linked_org_dict,
-                    voters_dict=voters_dict)
-                one_position = results['position']
-                offices_dict = results['offices_dict']
-                candidates_dict = results['candidates_dict']
-                measures_dict = results['measures_dict']
-                organizations_dict = results['organizations_dict']
-                voters_by_linked_org_dict = results['voters_by_linked_org_dict']
-                voters_dict = results['voters_dict']
+            # Missing cached data is filled in by the REFRESH_POSITION_CACHED_INFO batch process, not here
             one_position_dict_for_api = {
                 'position_we_vote_id':                  one_position.we_vote_id,
                 'position_ultimate_election_date':      one_position.position_ultimate_election_date,
@@ -4104,42 +3964,85 @@ def positions_import_from_sample_file(request=None):  # , load_from_uri=False
     return positions_import_from_structured_json(request, structured_json)
 
 
-def positions_import_from_master_server(request, google_civic_election_id=''):
+def positions_import_from_master_server(request, google_civic_election_id='', full_sync=False):
     """
-    Get the json data, and either create new entries or update existing
+    Get the json data, and either create new entries or update existing. Only positions that changed since our last
+    sync of this election are requested, unless full_sync is True.
     :return:
     """
-
-    import_results, structured_json = process_request_from_master(
-        request, "Loading Positions from We Vote Master servers",
+    return import_from_master_server_in_chunks(
+        'positions',
         POSITIONS_SYNC_URL, {
             "key":                      WE_VOTE_API_KEY,  # This comes from an environment variable
-            "format":                   'json',
             "google_civic_election_id": str(google_civic_election_id),
-        }
-    )
+        },
+        import_function=positions_import_from_structured_json,
+        filter_function=filter_positions_structured_json_for_local_duplicates,
+        full_sync=full_sync)
 
-    if import_results['success']:
-        results = filter_positions_structured_json_for_local_duplicates(structured_json)
-        filtered_structured_json = results['structured_json']
-        duplicates_removed = results['duplicates_removed']
 
-        import_results = positions_import_from_structured_json(filtered_structured_json)
-        import_results['duplicates_removed'] = duplicates_removed
+def generate_position_election_key(google_civic_election_id):
+    # PositionEntered.google_civic_election_id is a CharField, so Django compares it as a string
+    return None if google_civic_election_id is None else str(google_civic_election_id)
 
-    return import_results
+
+def generate_position_duplicate_index(structured_json):
+    """
+    Count the local positions that retrieve_possible_duplicate_positions could find for any of these positions
+    :param structured_json:
+    :return: DuplicateIndex
+    """
+    duplicate_index = DuplicateIndex()
+    election_key_set = {generate_position_election_key(one_position.get('google_civic_election_id', ''))
+                        for one_position in structured_json}
+    election_filter = Q(google_civic_election_id__in=[election_key for election_key in election_key_set
+                                                      if election_key is not None])
+    if None in election_key_set:
+        election_filter |= Q(google_civic_election_id__isnull=True)
+    # As of Aug 2018 we are no longer using PERCENT_RATING
+    position_queryset = PositionEntered.objects.filter(election_filter).exclude(stance__iexact=PERCENT_RATING)
+
+    # Positions without an organization and a candidate or measure are compared with every position in the election
+    # order_by() keeps the default ordering out of the GROUP BY
+    for row in position_queryset.order_by().values('google_civic_election_id') \
+            .annotate(position_count=Count('id')):
+        duplicate_index.add_key_count(('election', row['google_civic_election_id']), row['position_count'])
+    we_vote_id_list = generate_upper_value_list(one_position.get('we_vote_id') for one_position in structured_json)
+    for we_vote_id_chunk in generate_lookup_chunk_list(we_vote_id_list):
+        query = position_queryset.order_by().annotate(we_vote_id_upper=Upper('we_vote_id')) \
+            .filter(we_vote_id_upper__in=we_vote_id_chunk)
+        for row in query.values('google_civic_election_id', 'we_vote_id_upper').annotate(position_count=Count('id')):
+            duplicate_index.add_value_count(
+                ('election', row['google_civic_election_id']), row['we_vote_id_upper'], row['position_count'])
+
+    organization_we_vote_id_list = generate_upper_value_list(
+        one_position.get('organization_we_vote_id') for one_position in structured_json)
+    for organization_we_vote_id_chunk in generate_lookup_chunk_list(organization_we_vote_id_list):
+        query = position_queryset.annotate(organization_we_vote_id_upper=Upper('organization_we_vote_id')) \
+            .filter(organization_we_vote_id_upper__in=organization_we_vote_id_chunk)
+        for row in query.values('google_civic_election_id', 'we_vote_id', 'organization_we_vote_id',
+                                'contest_measure_we_vote_id'):
+            we_vote_id_upper = normalize_for_iexact(row['we_vote_id'])
+            organization_we_vote_id_upper = normalize_for_iexact(row['organization_we_vote_id'])
+            duplicate_index.add(
+                ('organization', row['google_civic_election_id'], organization_we_vote_id_upper), we_vote_id_upper)
+            duplicate_index.add(
+                ('organization_measure', row['google_civic_election_id'], organization_we_vote_id_upper,
+                 normalize_for_iexact(row['contest_measure_we_vote_id'])), we_vote_id_upper)
+    return duplicate_index
 
 
 def filter_positions_structured_json_for_local_duplicates(structured_json):
     """
     With this function, we remove positions that seem to be duplicates, but have different we_vote_id's.
     We do not check to see if we have a matching office this routine -- that is done elsewhere.
+    We find the same duplicates retrieve_possible_duplicate_positions would, with a few queries for the whole list.
     :param structured_json:
     :return:
     """
     duplicates_removed = 0
     filtered_structured_json = []
-    position_list_manager = PositionListManager()
+    duplicate_index = generate_position_duplicate_index(structured_json)
     for one_position in structured_json:
         we_vote_id = one_position['we_vote_id'] if 'we_vote_id' in one_position else ''
         google_civic_election_id = \
@@ -4150,16 +4053,36 @@ def filter_positions_structured_json_for_local_duplicates(structured_json):
             if 'candidate_campaign_we_vote_id' in one_position else ''
         contest_measure_we_vote_id = one_position['contest_measure_we_vote_id'] \
             if 'contest_measure_we_vote_id' in one_position else ''
+        election_key = generate_position_election_key(google_civic_election_id)
+        organization_we_vote_id_upper = normalize_for_iexact(organization_we_vote_id)
 
         # Check to see if there is an entry that matches in all critical ways, minus the we_vote_id
-        we_vote_id_from_master = we_vote_id
+        organization_and_candidate = positive_value_exists(organization_we_vote_id) and \
+            positive_value_exists(candidate_campaign_we_vote_id)
+        organization_and_measure = positive_value_exists(organization_we_vote_id) and \
+            positive_value_exists(contest_measure_we_vote_id)
+        if not organization_and_candidate and not organization_and_measure:
+            key = ('election', election_key)
+        elif organization_and_candidate and \
+                normalize_for_iexact(candidate_campaign_we_vote_id) == organization_we_vote_id_upper:
+            # retrieve_possible_duplicate_positions compares candidate_we_vote_id with organization_we_vote_id, so
+            #  the candidate only narrows the search when the two are the same
+            key = ('organization', election_key, organization_we_vote_id_upper)
+        elif organization_and_measure:
+            key = ('organization_measure', election_key, organization_we_vote_id_upper,
+                   normalize_for_iexact(contest_measure_we_vote_id))
+        else:
+            key = None
 
-        results = position_list_manager.retrieve_possible_duplicate_positions(
-            google_civic_election_id, organization_we_vote_id,
-            candidate_campaign_we_vote_id, contest_measure_we_vote_id,
-            we_vote_id_from_master)
+        if key is None:
+            duplicate_found = False
+        elif positive_value_exists(we_vote_id):
+            # Ignore entries with we_vote_id coming in from master server
+            duplicate_found = duplicate_index.key_exists_for_other_value(key, normalize_for_iexact(we_vote_id))
+        else:
+            duplicate_found = duplicate_index.key_exists(key)
 
-        if results['position_list_found']:
+        if duplicate_found:
             # There seems to be a duplicate already in this database using a different we_vote_id
             duplicates_removed += 1
         else:
@@ -4174,48 +4097,71 @@ def filter_positions_structured_json_for_local_duplicates(structured_json):
     return positions_results
 
 
+# The position fields we copy straight from the Master server
+POSITION_IMPORT_FIELD_LIST = (
+    'ballot_item_display_name', 'ballot_item_image_url_https', 'ballot_item_twitter_handle',
+    'candidate_campaign_we_vote_id', 'contest_measure_we_vote_id', 'contest_office_we_vote_id', 'date_entered',
+    'from_scraper', 'google_civic_election_id', 'is_private_citizen', 'more_info_url', 'organization_certified',
+    'organization_we_vote_id', 'politician_we_vote_id', 'position_ultimate_election_date', 'position_year',
+    'public_figure_we_vote_id', 'race_office_level', 'speaker_display_name', 'speaker_image_url_https',
+    'speaker_twitter_handle', 'speaker_type', 'stance', 'state_code', 'statement_html', 'statement_text',
+    'tweet_source_id', 'twitter_followers_count', 'twitter_user_entered_position', 'volunteer_certified',
+    'vote_smart_rating', 'vote_smart_rating_id', 'vote_smart_rating_name', 'vote_smart_time_span',
+    'voter_entering_position', 'voter_we_vote_id',
+)
+# ...and the fields we fill in locally
+POSITION_IMPORT_LOCAL_FIELD_LIST = (
+    'we_vote_id', 'candidate_campaign_id', 'contest_measure_id', 'contest_office_id', 'google_civic_candidate_name',
+    'organization_id', 'politician_id', 'voter_id',
+)
+
+
 def positions_import_from_structured_json(structured_json):
-    positions_saved = 0
-    positions_updated = 0
+    """
+    Create or update the positions in structured_json. The local ids we need are looked up for the whole list at
+    once, and the positions are written with bulk_create and bulk_update.
+    :param structured_json:
+    :return:
+    """
     positions_not_processed = 0
+    position_list = []
     for one_position in structured_json:
         # Make sure we have the minimum required variables
-        if positive_value_exists(one_position["we_vote_id"]) \
-                and (positive_value_exists(one_position["organization_we_vote_id"]) or positive_value_exists(
-                        one_position["public_figure_we_vote_id"])) \
-                and positive_value_exists(one_position["candidate_campaign_we_vote_id"]):
+        if positive_value_exists(one_position.get("we_vote_id")) \
+                and (positive_value_exists(one_position.get("organization_we_vote_id")) or positive_value_exists(
+                        one_position.get("public_figure_we_vote_id"))) \
+                and positive_value_exists(one_position.get("candidate_campaign_we_vote_id")):
             # organization position on candidate
             pass
-        elif positive_value_exists(one_position["we_vote_id"]) \
-                and (positive_value_exists(one_position["organization_we_vote_id"]) or positive_value_exists(
-                    one_position["public_figure_we_vote_id"])) \
-                and positive_value_exists(one_position["contest_measure_we_vote_id"]):
+        elif positive_value_exists(one_position.get("we_vote_id")) \
+                and (positive_value_exists(one_position.get("organization_we_vote_id")) or positive_value_exists(
+                    one_position.get("public_figure_we_vote_id"))) \
+                and positive_value_exists(one_position.get("contest_measure_we_vote_id")):
             # organization position on measure
             pass
         else:
             # Note that we do not import voter_we_vote_id positions at this point because they are considered private
             positions_not_processed += 1
             continue
-
-        # Check to see if this position had been imported previously
-        position_on_stage_found = False
-        try:
-            if len(one_position["we_vote_id"]) > 0:
-                position_query = PositionEntered.objects.filter(we_vote_id=one_position["we_vote_id"])
-                if len(position_query):
-                    position_on_stage = position_query[0]
-                    position_on_stage_found = True
-        except PositionEntered.DoesNotExist as e:
-            pass
-        except Exception as e:
-            print("exception thrown in positions_import_from_structured_json" + e)
-            pass
-
+        position_list.append(one_position)
+
+    # Look up everything we need to know locally with a few queries for the whole list
+    position_id_by_we_vote_id = fetch_id_by_we_vote_id(
+        PositionEntered, [one_position["we_vote_id"] for one_position in position_list])
+    organization_id_by_we_vote_id = fetch_id_by_we_vote_id(
+        Organization, [one_position["organization_we_vote_id"] for one_position in position_list])
+    candidate_values_by_we_vote_id = fetch_values_by_we_vote_id(
+        CandidateCampaign, [one_position["candidate_campaign_we_vote_id"] for one_position in position_list],
+        field_list=('id', 'google_civic_candidate_name'))
+    contest_measure_id_by_we_vote_id = fetch_id_by_we_vote_id(
+        ContestMeasure, [one_position["contest_measure_we_vote_id"] for one_position in position_list])
+
+    bulk_upsert = BulkUpsert(PositionEntered, POSITION_IMPORT_FIELD_LIST + POSITION_IMPORT_LOCAL_FIELD_LIST)
+    for one_position in position_list:
         # We need to look up the local organization_id and store for internal use
         organization_id = 0
         if positive_value_exists(one_position["organization_we_vote_id"]):
-            organization_manager = OrganizationManager()
-            organization_id = organization_manager.fetch_organization_id(one_position["organization_we_vote_id"])
+            organization_id = organization_id_by_we_vote_id.get(one_position["organization_we_vote_id"].lower(), 0)
             if not positive_value_exists(organization_id):
                 # If an id does not exist, then we don't have this organization locally
                 positions_not_processed += 1
@@ -4224,143 +4170,58 @@ def positions_import_from_structured_json(structured_json):
             # TODO Build this for public_figure - skip for now
             continue
 
-        candidate_campaign_manager = CandidateCampaignManager()
         candidate_campaign_id = 0
         contest_measure_id = 0
+        google_civic_candidate_name = one_position.get("google_civic_candidate_name", '')
         if positive_value_exists(one_position["candidate_campaign_we_vote_id"]):
             # We need to look up the local candidate_campaign_id and store for internal use
-            candidate_campaign_id = candidate_campaign_manager.fetch_candidate_campaign_id_from_we_vote_id(
-                one_position["candidate_campaign_we_vote_id"])
+            candidate_values = \
+                candidate_values_by_we_vote_id.get(one_position["candidate_campaign_we_vote_id"].lower(), {})
+            candidate_campaign_id = candidate_values.get('id', 0)
             if not positive_value_exists(candidate_campaign_id):
                 # If an id does not exist, then we don't have this candidate locally
-                # print("positions_import did not find a candidate_campaign_id for candidate_campaign_we_vote_id: " +
-                #       one_position["candidate_campaign_we_vote_id"])
                 positions_not_processed += 1
                 continue
+            # Keep the google_civic_candidate_name so we have a backup way to link position if the we_vote_id is lost
+            if not positive_value_exists(google_civic_candidate_name):
+                google_civic_candidate_name = candidate_values['google_civic_candidate_name'] or ''
         elif positive_value_exists(one_position["contest_measure_we_vote_id"]):
-            contest_measure_manager = ContestMeasureManager()
-            contest_measure_id = contest_measure_manager.fetch_contest_measure_id_from_we_vote_id(
-                one_position["contest_measure_we_vote_id"])
+            contest_measure_id = contest_measure_id_by_we_vote_id.get(
+                one_position["contest_measure_we_vote_id"].lower(), 0)
             if not positive_value_exists(contest_measure_id):
                 # If an id does not exist, then we don't have this measure locally
-                # print("positions_import did not find a contest_measure_id for contest_measure_we_vote_id: " +
-                #       one_position["contest_measure_we_vote_id"])
                 positions_not_processed += 1
                 continue
 
-        contest_office_id = 0
-        if positive_value_exists(one_position['contest_office_we_vote_id']):
-            # TODO
-            pass
-
-        politician_id = 0
-        if positive_value_exists(one_position['politician_we_vote_id']):
-            # TODO
-            pass
-
-        voter_id = 0
-        if positive_value_exists(one_position['voter_we_vote_id']):
-            # TODO
-            pass
-
-        # Find the google_civic_candidate_name so we have a backup way to link position if the we_vote_id is lost
-        google_civic_candidate_name = one_position["google_civic_candidate_name"] if \
-            "google_civic_candidate_name" in one_position else ''
-        if not positive_value_exists(google_civic_candidate_name):
-            google_civic_candidate_name = candidate_campaign_manager.fetch_google_civic_candidate_name_from_we_vote_id(
-                one_position["candidate_campaign_we_vote_id"])
-
         try:
-            if position_on_stage_found:
-                # Update
-                position_on_stage.we_vote_id = one_position["we_vote_id"]
-                position_on_stage.candidate_campaign_id = candidate_campaign_id
-                position_on_stage.candidate_campaign_we_vote_id = one_position["candidate_campaign_we_vote_id"]
-                position_on_stage.contest_measure_id = contest_measure_id
-                position_on_stage.contest_measure_we_vote_id = one_position["contest_measure_we_vote_id"]
-                position_on_stage.contest_office_id = contest_office_id
-                position_on_stage.contest_office_we_vote_id = one_position["contest_office_we_vote_id"]
-                position_on_stage.race_office_level = one_position["race_office_level"]
-                position_on_stage.date_entered = one_position["date_entered"]
-                position_on_stage.google_civic_candidate_name = google_civic_candidate_name
-                position_on_stage.google_civic_election_id = one_position["google_civic_election_id"]
-                position_on_stage.state_code = one_position["state_code"]
-                position_on_stage.more_info_url = one_position["more_info_url"]
-                position_on_stage.organization_id = organization_id
-                position_on_stage.organization_we_vote_id = one_position["organization_we_vote_id"]
-                position_on_stage.position_ultimate_election_date = one_position["position_ultimate_election_date"]
-                position_on_stage.position_year = one_position["position_year"]
-                position_on_stage.stance = one_position["stance"]
-                position_on_stage.statement_text = one_position["statement_text"]
-                position_on_stage.statement_html = one_position["statement_html"]
-                position_on_stage.is_private_citizen = one_position["is_private_citizen"]
-            else:
-                # Create new
-                position_on_stage = PositionEntered(
-                    we_vote_id=one_position["we_vote_id"],
-                    date_entered=one_position["date_entered"],
-                    candidate_campaign_id=candidate_campaign_id,
-                    candidate_campaign_we_vote_id=one_position["candidate_campaign_we_vote_id"],
-                    contest_measure_id=contest_measure_id,
-                    contest_measure_we_vote_id=one_position["contest_measure_we_vote_id"],
-                    contest_office_id=contest_office_id,
-                    contest_office_we_vote_id=one_position["contest_office_we_vote_id"],
-                    google_civic_candidate_name=google_civic_candidate_name,
-                    google_civic_election_id=one_position["google_civic_election_id"],
-                    state_code=one_position["state_code"],
-                    more_info_url=one_position["more_info_url"],
-                    organization_id=organization_id,
-                    organization_we_vote_id=one_position["organization_we_vote_id"],
-                    position_ultimate_election_date=one_position["position_ultimate_election_date"],
-                    position_year=one_position["position_year"],
-                    stance=one_position["stance"],
-                    statement_html=one_position["statement_html"],
-                    statement_text=one_position["statement_text"],
-                    is_private_citizen=one_position["is_private_citizen"],
-                )
-
-            position_on_stage.ballot_item_display_name = one_position["ballot_item_display_name"]
-            position_on_stage.ballot_item_image_url_https = one_position["ballot_item_image_url_https"]
-            position_on_stage.ballot_item_twitter_handle = one_position["ballot_item_twitter_handle"]
-            position_on_stage.from_scraper = one_position["from_scraper"]
-            position_on_stage.date_last_changed = one_position["date_last_changed"]
-            position_on_stage.organization_certified = one_position["organization_certified"]
-            position_on_stage.politician_id = politician_id
-            position_on_stage.politician_we_vote_id = one_position["politician_we_vote_id"]
-            position_on_stage.public_figure_we_vote_id = one_position["public_figure_we_vote_id"]
-            position_on_stage.speaker_display_name = one_position["speaker_display_name"]
-            position_on_stage.speaker_image_url_https = one_position["speaker_image_url_https"]
-            position_on_stage.speaker_twitter_handle = one_position["speaker_twitter_handle"]
-            position_on_stage.twitter_followers_count = one_position["twitter_followers_count"]
-            position_on_stage.speaker_type = one_position["speaker_type"]
-            position_on_stage.tweet_source_id = one_position["tweet_source_id"]
-            position_on_stage.twitter_user_entered_position = one_position["twitter_user_entered_position"]
-            position_on_stage.volunteer_certified = one_position["volunteer_certified"]
-            position_on_stage.vote_smart_rating = one_position["vote_smart_rating"]
-            position_on_stage.vote_smart_rating_id = one_position["vote_smart_rating_id"]
-            position_on_stage.vote_smart_rating_name = one_position["vote_smart_rating_name"]
-            position_on_stage.vote_smart_time_span = one_position["vote_smart_time_span"]
-            position_on_stage.voter_entering_position = one_position["voter_entering_position"]
-            position_on_stage.voter_id = voter_id
-            position_on_stage.voter_we_vote_id = one_position["voter_we_vote_id"]
-
-            position_on_stage.save()
-            if position_on_stage_found:
-                # Update
-                positions_updated += 1
-            else:
-                # New
-                positions_saved += 1
-        except Exception as e:
-            handle_record_not_saved_exception(e, logger=logger)
+            field_values = {field: one_position[field] for field in POSITION_IMPORT_FIELD_LIST}
+        except KeyError as e:
+            handle_record_not_saved_exception(e, logger=logger, exception_message_optional="POSITION_FIELD_MISSING ")
             positions_not_processed += 1
+            continue
+        # PositionEntered.save would lower case the we_vote_id, but bulk_create doesn't call save
+        position_we_vote_id = one_position["we_vote_id"].strip().lower()
+        position_on_stage = PositionEntered(
+            we_vote_id=position_we_vote_id,
+            candidate_campaign_id=candidate_campaign_id,
+            contest_measure_id=contest_measure_id,
+            contest_office_id=0,
+            google_civic_candidate_name=google_civic_candidate_name,
+            organization_id=organization_id,
+            politician_id=0,
+            voter_id=0,
+            **field_values)
+        bulk_upsert.add(position_we_vote_id, position_on_stage,
+                        existing_id=position_id_by_we_vote_id.get(position_we_vote_id, 0))
+
+    write_results = bulk_upsert.write()
 
     positions_results = {
         'success': True,
         'status': "POSITIONS_IMPORT_PROCESS_COMPLETE",
-        'saved': positions_saved,
-        'updated': positions_updated,
-        'not_processed': positions_not_processed,
+        'saved': write_results['saved'],
+        'updated': write_results['updated'],
+        'not_processed': positions_not_processed + write_results['not_processed'],
     }
     return positions_results
 
@@ -5095,20 +4956,6 @@ def retrieve_ballot_item_we_vote_ids_for_organizations_to_follow(voter_id,
     status = ''
     position_list_raw = []
 
-    if not positive_value_exists(voter_id):
-        ballot_item_we_vote_ids_list = []
-        results = {
-            'status':                       "VALID_VOTER_ID_MISSING ",
-            'success':                      False,
-            'count':                        0,
-            'organization_id':              organization_id,
-            'organization_we_vote_id':      organization_we_vote_id,
-            'google_civic_election_id':     google_civic_election_id,
-            'state_code':                   state_code,
-            'ballot_item_we_vote_ids_list': ballot_item_we_vote_ids_list,
-        }
-        return results
-
     position_list_manager = PositionListManager()
     # Since we want to return the id and we_vote_id, and we don't know for sure that there are any positions
     # for this opinion_maker, we retrieve the following so we can get the id and we_vote_id (per the request of
@@ -5126,14 +4973,17 @@ def retrieve_ballot_item_we_vote_ids_for_organizations_to_follow(voter_id,
         opinion_maker_we_vote_id = organization.we_vote_id
         opinion_maker_found = True
 
-        follow_organization_manager = FollowOrganizationManager()
-        voter_we_vote_id = ''
-        following_results = follow_organization_manager.retrieve_voter_following_org_status(
-            voter_id, voter_we_vote_id, opinion_maker_id, opinion_maker_we_vote_id, read_only=True)
-        if following_results['is_following']:
-            is_following = True
-        elif following_results['is_ignoring']:
-            is_ignoring = True
+        # Without a voter_id (the generic_for_all_voters list we pre-generate for ApiInternalCache), there is no one
+        #  who could be following or ignoring this organization
+        if positive_value_exists(voter_id):
+            follow_organization_manager = FollowOrganizationManager()
+            voter_we_vote_id = ''
+            following_results = follow_organization_manager.retrieve_voter_following_org_status(
+                voter_id, voter_we_vote_id, opinion_maker_id, opinion_maker_we_vote_id, read_only=True)
+            if following_results['is_following']:
+                is_following = True
+            elif following_results['is_ignoring']:
+                is_ignoring = True
 
         if is_following or is_ignoring:
             ballot_item_we_vote_ids_list = []
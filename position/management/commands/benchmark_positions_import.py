@@ -0,0 +1,129 @@
+from candidate.models import CandidateCampaign
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from organization.models import Organization
+import json
+from position.controllers import positions_import_from_structured_json
+import random
+import time
+from wevote_functions.sync_stream import SYNC_IMPORT_CHUNK_SIZE
+
+BENCHMARK_GOOGLE_CIVIC_ELECTION_ID = 999999
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.query_count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.query_count += 1
+        return execute(sql, params, many, context)
+
+
+def load_position_dump(dump_file):
+    # positionsSyncOut returns a json list, or one position per line with format=ndjson
+    with open(dump_file) as file:
+        text = file.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    position_list = []
+    for line in text.splitlines():
+        if line.strip():
+            one_position = json.loads(line)
+            if '_sync' not in one_position:
+                position_list.append(one_position)
+    return position_list
+
+
+def generate_synthetic_positions(position_count, organization_count, candidate_count, seed):
+    organization_we_vote_id_list = ['wvbenchorg{number}'.format(number=number) for number in range(organization_count)]
+    Organization.objects.bulk_create([
+        Organization(we_vote_id=we_vote_id, organization_name='Benchmark Organization ' + we_vote_id)
+        for we_vote_id in organization_we_vote_id_list])
+    candidate_we_vote_id_list = ['wvbenchcand{number}'.format(number=number) for number in range(candidate_count)]
+    CandidateCampaign.objects.bulk_create([
+        CandidateCampaign(we_vote_id=we_vote_id, candidate_name='Benchmark Candidate ' + we_vote_id,
+                          google_civic_election_id=BENCHMARK_GOOGLE_CIVIC_ELECTION_ID)
+        for we_vote_id in candidate_we_vote_id_list])
+
+    random_generator = random.Random(seed)
+    position_list = []
+    for number in range(position_count):
+        position_list.append({
+            'we_vote_id': 'wvbenchpos{number}'.format(number=number),
+            'ballot_item_display_name': 'Benchmark Candidate', 'ballot_item_image_url_https': '',
+            'ballot_item_twitter_handle': '',
+            'candidate_campaign_we_vote_id': random_generator.choice(candidate_we_vote_id_list),
+            'contest_measure_we_vote_id': '', 'contest_office_we_vote_id': '',
+            'date_entered': '2020-10-18T12:00:00+00:00', 'date_last_changed': '2020-10-18T12:00:00+00:00',
+            'from_scraper': False, 'google_civic_candidate_name': '',
+            'google_civic_election_id': str(BENCHMARK_GOOGLE_CIVIC_ELECTION_ID), 'is_private_citizen': False,
+            'more_info_url': '', 'organization_certified': False,
+            'organization_we_vote_id': random_generator.choice(organization_we_vote_id_list),
+            'politician_we_vote_id': '', 'position_ultimate_election_date': 20201103, 'position_year': 2020,
+            'public_figure_we_vote_id': '', 'race_office_level': '', 'speaker_display_name': 'Benchmark Organization',
+            'speaker_image_url_https': '', 'speaker_twitter_handle': '', 'speaker_type': 'U',
+            'stance': random_generator.choice(['SUPPORT', 'OPPOSE', 'INFO_ONLY']), 'state_code': 'ca',
+            'statement_html': '', 'statement_text': 'Benchmark statement {number}'.format(number=number),
+            'tweet_source_id': None, 'twitter_followers_count': 0, 'twitter_user_entered_position': None,
+            'volunteer_certified': False, 'vote_smart_rating': None, 'vote_smart_rating_id': None,
+            'vote_smart_rating_name': None, 'vote_smart_time_span': None, 'voter_entering_position': None,
+            'voter_we_vote_id': None,
+        })
+    return position_list
+
+
+def time_import(position_list, chunk_size):
+    query_counter = QueryCounter()
+    totals = {'saved': 0, 'updated': 0, 'not_processed': 0}
+    start_time = time.time()
+    with connection.execute_wrapper(query_counter):
+        for start in range(0, len(position_list), chunk_size):
+            results = positions_import_from_structured_json(position_list[start:start + chunk_size])
+            for key in totals:
+                totals[key] += results[key]
+    seconds_elapsed = time.time() - start_time
+    totals['positions_per_second'] = len(position_list) / seconds_elapsed if seconds_elapsed else 0
+    totals['queries_per_thousand'] = query_counter.query_count * 1000 / len(position_list) if position_list else 0
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Times positions_import_from_structured_json on an election dump from positionsSyncOut (or 100,000 ' \
+           'synthetic positions) in sync-sized chunks, twice, so the second pass updates what the first one saved. ' \
+           'It times the importer in this checkout. For the one-position-at-a-time baseline, check out the commit ' \
+           'before wevote_functions/bulk_upsert.py was added, copy position/management into it and run this ' \
+           'command there with the same options and --label baseline. The organizations and candidates a dump ' \
+           'refers to need to be here already. Everything it writes is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dump_file', type=str, default='')
+        parser.add_argument('--position_count', type=int, default=100000)
+        parser.add_argument('--organization_count', type=int, default=2000)
+        parser.add_argument('--candidate_count', type=int, default=1000)
+        parser.add_argument('--chunk_size', type=int, default=SYNC_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--seed', type=int, default=2020)
+        parser.add_argument('--label', type=str, default='',
+                            help='Which checkout these numbers are for, like baseline or bulk')
+
+    def handle(self, *args, **options):
+        report_format = '{label}: {positions_per_second:.0f} positions/sec, {queries_per_thousand:.0f} queries ' \
+                        'per 1000 positions (saved {saved}, updated {updated}, not processed {not_processed})'
+        with transaction.atomic():
+            if options['dump_file']:
+                position_list = load_position_dump(options['dump_file'])
+            else:
+                position_list = generate_synthetic_positions(
+                    options['position_count'], options['organization_count'], options['candidate_count'],
+                    options['seed'])
+            self.stdout.write('positions: {count}'.format(count=len(position_list)))
+
+            label = 'chunks of {chunk_size}'.format(chunk_size=options['chunk_size'])
+            if options['label']:
+                label = options['label'] + ', ' + label
+            results = time_import(position_list, options['chunk_size'])
+            self.stdout.write(report_format.format(label=label + ', first pass', **results))
+            results = time_import(position_list, options['chunk_size'])
+            self.stdout.write(report_format.format(label=label + ', second pass', **results))
+
+            transaction.set_rollback(True)
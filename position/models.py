@@ -8,9 +8,12 @@ from analytics.models import ACTION_POSITION_TAKEN, AnalyticsManager
 from candidate.models import CandidateCampaign, CandidateCampaignListManager, CandidateCampaignManager
 from ballot.controllers import figure_out_google_civic_election_id_voter_is_watching, \
     figure_out_google_civic_election_id_voter_is_watching_by_voter_we_vote_id
+from datetime import timedelta
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils.timezone import now
 from election.models import Election
 from exception.models import handle_exception, handle_record_found_more_than_one_exception,\
@@ -24,12 +27,15 @@ from organization.models import Organization, OrganizationManager, \
     ORGANIZATION, POLITICAL_ACTION_COMMITTEE, PUBLIC_FIGURE, UNKNOWN, VOTER, ORGANIZATION_TYPE_CHOICES
 import robot_detection
 from share.models import ShareManager
+import threading
+import time
 from twitter.models import TwitterUser
 from voter.models import fetch_voter_id_from_voter_we_vote_id, fetch_voter_we_vote_id_from_voter_id, Voter, VoterManager
 from voter_guide.models import VoterGuideManager
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists
-from wevote_settings.models import fetch_next_we_vote_id_position_integer, fetch_site_unique_id_prefix
+from wevote_settings.models import fetch_next_we_vote_id_position_integer, fetch_site_unique_id_prefix, \
+    WeVoteSetting, WeVoteSettingsManager
 
 
 ANY_STANCE = 'ANY_STANCE'  # This is a way to indicate when we want to return any stance (support, oppose, no_stance)
@@ -3142,7 +3148,7 @@ class PositionListManager(models.Model):
     def retrieve_all_positions_for_voter(self, voter_id=0, voter_we_vote_id='',
                                          stance_we_are_looking_for=ANY_STANCE, friends_vs_public=FRIENDS_AND_PUBLIC,
                                          google_civic_election_id=0, this_election_vs_others='', state_code='',
-                                         since_date=None):
+                                         since_date=None, read_only=False):
         """
         We want the voter's position information for display prior to sign in
         :param voter_id:
@@ -3154,6 +3160,7 @@ class PositionListManager(models.Model):
         :param this_election_vs_others:
         :param state_code:
         :param since_date:
+        :param read_only:
         :return:
         """
         status = ''
@@ -3207,7 +3214,10 @@ class PositionListManager(models.Model):
             ############################
             # Retrieve public positions
             try:
-                public_positions_list_query = PositionEntered.objects.all()
+                if read_only:
+                    public_positions_list_query = PositionEntered.objects.using('readonly').all()
+                else:
+                    public_positions_list_query = PositionEntered.objects.all()
 
                 # As of Aug 2018 we are no longer using PERCENT_RATING
                 public_positions_list_query = public_positions_list_query.exclude(stance__iexact=PERCENT_RATING)
@@ -3264,7 +3274,10 @@ class PositionListManager(models.Model):
             ############################
             # Retrieve positions meant for friends only
             try:
-                friends_positions_list_query = PositionForFriends.objects.all()
+                if read_only:
+                    friends_positions_list_query = PositionForFriends.objects.using('readonly').all()
+                else:
+                    friends_positions_list_query = PositionForFriends.objects.all()
 
                 # As of Aug 2018 we are no longer using PERCENT_RATING
                 friends_positions_list_query = friends_positions_list_query.exclude(stance__iexact=PERCENT_RATING)
@@ -4188,6 +4201,65 @@ class PositionListManager(models.Model):
             position_network_score_list = {}
             return position_network_score_list
 
+    def fetch_position_network_score_tallies(self, viewing_voter_id, google_civic_election_id):
+        """
+        Build the support/oppose counts and speaker lists for every ballot item in one query. Only the columns
+        we need are retrieved, and rows without a support or oppose stance are filtered out in the database.
+        :param viewing_voter_id:
+        :param google_civic_election_id:
+        :return: dict with ballot_item_we_vote_id as key
+        """
+        tallies_by_ballot_item_we_vote_id = {}
+        try:
+            position_network_score_query = PositionNetworkScore.objects.using('readonly').all()
+            position_network_score_query = position_network_score_query.filter(viewing_voter_id=viewing_voter_id)
+            position_network_score_query = position_network_score_query.filter(
+                google_civic_election_id=google_civic_election_id)
+            position_network_score_query = position_network_score_query.filter(
+                Q(is_support=True) | Q(is_oppose=True))
+            position_network_score_query = position_network_score_query.order_by('id')
+            position_network_score_query = position_network_score_query.values_list(
+                'candidate_we_vote_id', 'measure_we_vote_id', 'organization_we_vote_id', 'friend_voter_we_vote_id',
+                'speaker_display_name', 'is_support')
+            for candidate_we_vote_id, measure_we_vote_id, organization_we_vote_id, friend_voter_we_vote_id, \
+                    speaker_display_name, is_support in position_network_score_query:
+                # Mirror PositionNetworkScore.get_ballot_item_we_vote_id and get_speaker_we_vote_id
+                if positive_value_exists(candidate_we_vote_id):
+                    ballot_item_we_vote_id = candidate_we_vote_id
+                elif positive_value_exists(measure_we_vote_id):
+                    ballot_item_we_vote_id = measure_we_vote_id
+                else:
+                    ballot_item_we_vote_id = ""
+                if positive_value_exists(organization_we_vote_id):
+                    speaker_we_vote_id = organization_we_vote_id
+                elif positive_value_exists(friend_voter_we_vote_id):
+                    speaker_we_vote_id = friend_voter_we_vote_id
+                else:
+                    speaker_we_vote_id = ""
+
+                if ballot_item_we_vote_id not in tallies_by_ballot_item_we_vote_id:
+                    tallies_by_ballot_item_we_vote_id[ballot_item_we_vote_id] = {
+                        'support_count':            0,
+                        'oppose_count':             0,
+                        'support_we_vote_id_list':  [],
+                        'support_name_list':        [],
+                        'oppose_we_vote_id_list':   [],
+                        'oppose_name_list':         [],
+                    }
+                one_tally = tallies_by_ballot_item_we_vote_id[ballot_item_we_vote_id]
+                if is_support:
+                    one_tally['support_count'] += 1
+                    one_tally['support_we_vote_id_list'].append(speaker_we_vote_id)
+                    one_tally['support_name_list'].append(speaker_display_name)
+                else:
+                    one_tally['oppose_count'] += 1
+                    one_tally['oppose_we_vote_id_list'].append(speaker_we_vote_id)
+                    one_tally['oppose_name_list'].append(speaker_display_name)
+        except Exception as e:
+            pass
+
+        return tallies_by_ballot_item_we_vote_id
+
     def remove_position_network_scores_when_voter_stops_following(
             self, viewing_voter_id, organization_we_vote_id):
         success = True
@@ -9011,3 +9083,388 @@ class PositionMetricsManager(models.Model):
         total_positions_count = position_entered_count + position_for_friends_count
 
         return total_positions_count
+
+
+# PositionRefreshRequest kind_of_source
+REFRESH_SOURCE_ORGANIZATION = 'ORGANIZATION'
+REFRESH_SOURCE_VOTER = 'VOTER'
+REFRESH_SOURCE_CANDIDATE = 'CANDIDATE'
+REFRESH_SOURCE_OFFICE = 'OFFICE'
+REFRESH_SOURCE_MEASURE = 'MEASURE'
+REFRESH_SOURCE_SWEEP = 'SWEEP'
+REFRESH_SOURCE_CHOICES = (
+    (REFRESH_SOURCE_ORGANIZATION,   'Organization'),
+    (REFRESH_SOURCE_VOTER,          'Voter'),
+    (REFRESH_SOURCE_CANDIDATE,      'Candidate'),
+    (REFRESH_SOURCE_OFFICE,         'Office'),
+    (REFRESH_SOURCE_MEASURE,        'Measure'),
+    (REFRESH_SOURCE_SWEEP,          'Sweep for positions with missing cached data'),
+)
+POSITION_REFRESH_REQUESTS_PER_RUN = 200
+POSITION_REFRESH_SWEEP_POSITIONS_PER_RUN = 1000
+# The fields of each source that refresh_cached_position_info copies into positions (directly, or through methods like
+# organization_photo_url). A save(update_fields=...) that doesn't touch any of them can't make a position out of date.
+POSITION_CACHED_FIELDS_BY_SOURCE = {
+    REFRESH_SOURCE_ORGANIZATION: frozenset([
+        'we_vote_id', 'organization_name', 'organization_type', 'organization_twitter_handle',
+        'twitter_followers_count', 'organization_image', 'twitter_profile_image_url_https',
+        'facebook_profile_image_url_https', 'wikipedia_photo_url',
+        'we_vote_hosted_profile_image_url_large', 'we_vote_hosted_profile_image_url_medium',
+        'we_vote_hosted_profile_image_url_tiny']),
+    REFRESH_SOURCE_VOTER: frozenset([
+        'we_vote_id', 'linked_organization_we_vote_id', 'first_name', 'last_name', 'email', 'twitter_name',
+        'twitter_screen_name', 'facebook_profile_image_url_https', 'twitter_profile_image_url_https',
+        'we_vote_hosted_profile_image_url_large', 'we_vote_hosted_profile_image_url_medium',
+        'we_vote_hosted_profile_image_url_tiny']),
+    REFRESH_SOURCE_CANDIDATE: frozenset([
+        'we_vote_id', 'candidate_name', 'google_civic_candidate_name', 'ballotpedia_candidate_name',
+        'contest_office_id', 'contest_office_we_vote_id', 'candidate_twitter_handle', 'state_code',
+        'ocd_division_id', 'party', 'politician_id', 'politician_we_vote_id', 'candidate_year',
+        'candidate_ultimate_election_date', 'photo_url', 'photo_url_from_maplight', 'photo_url_from_vote_smart',
+        'twitter_profile_image_url_https', 'facebook_profile_image_url_https',
+        'we_vote_hosted_profile_image_url_large', 'we_vote_hosted_profile_image_url_medium',
+        'we_vote_hosted_profile_image_url_tiny']),
+    REFRESH_SOURCE_OFFICE: frozenset([
+        'we_vote_id', 'office_name', 'google_civic_election_id', 'state_code']),
+    REFRESH_SOURCE_MEASURE: frozenset([
+        'we_vote_id', 'measure_title', 'google_civic_election_id', 'state_code', 'measure_year',
+        'measure_ultimate_election_date']),
+}
+
+# Saves made while the refresh worker is running don't queue more refreshes
+position_refresh_thread_state = threading.local()
+
+
+def position_cached_info_is_incomplete(position):
+    """
+    Used by the sweep to find positions that no source change will ever repair. Missing images and twitter handles
+    are left to the source-change requests, since so many speakers and candidates legitimately don't have them.
+    """
+    if not positive_value_exists(position.speaker_display_name) or position.speaker_type == UNKNOWN:
+        return True
+    if positive_value_exists(position.candidate_campaign_we_vote_id):
+        return not positive_value_exists(position.ballot_item_display_name) \
+            or not positive_value_exists(position.contest_office_we_vote_id) \
+            or not positive_value_exists(position.contest_office_name) \
+            or not positive_value_exists(position.position_ultimate_election_date) \
+            or not positive_value_exists(position.position_year)
+    if positive_value_exists(position.contest_measure_we_vote_id):
+        return not positive_value_exists(position.ballot_item_display_name) \
+            or not positive_value_exists(position.position_ultimate_election_date) \
+            or not positive_value_exists(position.position_year)
+    return False
+
+
+class PositionRefreshRequest(models.Model):
+    """
+    An organization, voter, candidate, office or measure changed, so the copies of its data cached in PositionEntered
+    and PositionForFriends need to be refreshed. Worked through by the REFRESH_POSITION_CACHED_INFO batch process,
+    so the position list APIs never have to repair positions while a voter waits.
+    """
+    kind_of_source = models.CharField(max_length=20, choices=REFRESH_SOURCE_CHOICES, null=False)
+    source_we_vote_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    date_requested = models.DateTimeField(null=False, auto_now_add=True)
+    date_completed = models.DateTimeField(null=True, blank=True, db_index=True)
+    positions_refreshed = models.PositiveIntegerField(default=0)
+    # Positions that raised an error while being refreshed. The sweep picks them up again if they still miss data.
+    positions_failed = models.PositiveIntegerField(default=0)
+    status = models.TextField(null=True, blank=True)
+
+
+class PositionRefreshRequestManager(models.Manager):
+
+    def __unicode__(self):
+        return "PositionRefreshRequestManager"
+
+    def create_position_refresh_request(self, kind_of_source, source_we_vote_id):
+        status = ""
+        success = True
+        position_refresh_request_created = False
+        if getattr(position_refresh_thread_state, 'refresh_running', False):
+            status += "POSITION_REFRESH_REQUEST_SKIPPED-REFRESH_RUNNING "
+        elif not positive_value_exists(source_we_vote_id):
+            status += "POSITION_REFRESH_REQUEST_MISSING_SOURCE_WE_VOTE_ID "
+            success = False
+        else:
+            try:
+                # One pending request per source is enough
+                pending_query = PositionRefreshRequest.objects.filter(
+                    kind_of_source=kind_of_source,
+                    source_we_vote_id=source_we_vote_id,
+                    date_completed__isnull=True)
+                if not pending_query.exists():
+                    PositionRefreshRequest.objects.create(
+                        kind_of_source=kind_of_source,
+                        source_we_vote_id=source_we_vote_id)
+                    position_refresh_request_created = True
+                    status += "POSITION_REFRESH_REQUEST_CREATED "
+                else:
+                    status += "POSITION_REFRESH_REQUEST_ALREADY_PENDING "
+            except Exception as e:
+                status += "POSITION_REFRESH_REQUEST_NOT_CREATED " + str(e) + " "
+                success = False
+        results = {
+            'success':                          success,
+            'status':                           status,
+            'position_refresh_request_created': position_refresh_request_created,
+        }
+        return results
+
+    def retrieve_positions_to_sweep(self, position_model, setting_name, sweep_size):
+        """
+        Walk the position table in id order, a slice per run, and return the positions in this slice that are
+        missing cached data. The last id looked at is kept in a WeVoteSetting so the next run picks up from there.
+        """
+        we_vote_settings_manager = WeVoteSettingsManager()
+        results = we_vote_settings_manager.fetch_setting_results(setting_name, read_only=False)
+        last_position_id = convert_to_int(results['setting_value']) if results['we_vote_setting_found'] else 0
+        position_list = list(position_model.objects.filter(id__gt=last_position_id).order_by('id')[:sweep_size])
+        if len(position_list) < sweep_size:
+            # Start over at the beginning of the table next time
+            next_last_position_id = 0
+        else:
+            next_last_position_id = position_list[-1].id
+        we_vote_settings_manager.save_setting(setting_name, next_last_position_id, value_type=WeVoteSetting.INTEGER)
+        return [position for position in position_list if position_cached_info_is_incomplete(position)]
+
+    def process_position_refresh_requests(
+            self,
+            requests_per_run=POSITION_REFRESH_REQUESTS_PER_RUN,
+            sweep_positions_per_run=POSITION_REFRESH_SWEEP_POSITIONS_PER_RUN):
+        """
+        Refresh every position that caches data from the sources in the oldest pending requests, plus the positions
+        with missing data found by this run's slice of the sweep. The organizations, voters, candidates, offices and
+        measures these positions need are retrieved in one query per table up front.
+        """
+        status = ""
+        success = True
+        position_manager = PositionManager()
+        start_time = time.time()
+
+        position_refresh_request_list = list(
+            PositionRefreshRequest.objects.filter(date_completed__isnull=True).order_by('id')[:requests_per_run])
+        we_vote_id_list_by_kind = {
+            REFRESH_SOURCE_ORGANIZATION:    set(),
+            REFRESH_SOURCE_VOTER:           set(),
+            REFRESH_SOURCE_CANDIDATE:       set(),
+            REFRESH_SOURCE_OFFICE:          set(),
+            REFRESH_SOURCE_MEASURE:         set(),
+        }
+        for position_refresh_request in position_refresh_request_list:
+            we_vote_id_list_by_kind[position_refresh_request.kind_of_source].add(
+                position_refresh_request.source_we_vote_id)
+
+        # Positions to force_update, keyed so a position in both the requests and the sweep is refreshed once
+        position_dict = {}
+        if position_refresh_request_list:
+            position_filter = \
+                Q(organization_we_vote_id__in=we_vote_id_list_by_kind[REFRESH_SOURCE_ORGANIZATION]) | \
+                Q(voter_we_vote_id__in=we_vote_id_list_by_kind[REFRESH_SOURCE_VOTER]) | \
+                Q(candidate_campaign_we_vote_id__in=we_vote_id_list_by_kind[REFRESH_SOURCE_CANDIDATE]) | \
+                Q(contest_office_we_vote_id__in=we_vote_id_list_by_kind[REFRESH_SOURCE_OFFICE]) | \
+                Q(contest_measure_we_vote_id__in=we_vote_id_list_by_kind[REFRESH_SOURCE_MEASURE])
+            for position_model in [PositionEntered, PositionForFriends]:
+                for position in position_model.objects.filter(position_filter):
+                    position_dict[(position_model.__name__, position.id)] = (position, True)
+
+        # The sweep repairs positions that were incomplete before anything changed
+        sweep_position_count = 0
+        if positive_value_exists(sweep_positions_per_run):
+            for position_model, setting_name in [
+                    (PositionEntered, 'position_refresh_sweep_last_position_entered_id'),
+                    (PositionForFriends, 'position_refresh_sweep_last_position_for_friends_id')]:
+                for position in self.retrieve_positions_to_sweep(position_model, setting_name,
+                                                                 sweep_positions_per_run):
+                    if (position_model.__name__, position.id) not in position_dict:
+                        position_dict[(position_model.__name__, position.id)] = (position, False)
+                        sweep_position_count += 1
+
+        # Retrieve the source objects for all of these positions at once
+        organization_we_vote_id_list = set()
+        voter_we_vote_id_list = set()
+        candidate_we_vote_id_list = set()
+        office_we_vote_id_list = set()
+        measure_we_vote_id_list = set()
+        for position, force_update in position_dict.values():
+            if positive_value_exists(position.organization_we_vote_id):
+                organization_we_vote_id_list.add(position.organization_we_vote_id)
+            if positive_value_exists(position.voter_we_vote_id):
+                voter_we_vote_id_list.add(position.voter_we_vote_id)
+            if positive_value_exists(position.candidate_campaign_we_vote_id):
+                candidate_we_vote_id_list.add(position.candidate_campaign_we_vote_id)
+            if positive_value_exists(position.contest_office_we_vote_id):
+                office_we_vote_id_list.add(position.contest_office_we_vote_id)
+            if positive_value_exists(position.contest_measure_we_vote_id):
+                measure_we_vote_id_list.add(position.contest_measure_we_vote_id)
+        organizations_dict = {organization.we_vote_id: organization for organization in
+                              Organization.objects.filter(we_vote_id__in=organization_we_vote_id_list)}
+        voters_dict = {voter.we_vote_id: voter for voter in
+                       Voter.objects.filter(we_vote_id__in=voter_we_vote_id_list)}
+        voters_by_linked_org_dict = {voter.linked_organization_we_vote_id: voter for voter in
+                                     Voter.objects.filter(linked_organization_we_vote_id__in=organizations_dict.keys())}
+        candidates_dict = {candidate.we_vote_id: candidate for candidate in
+                           CandidateCampaign.objects.filter(we_vote_id__in=candidate_we_vote_id_list)}
+        for candidate in candidates_dict.values():
+            if positive_value_exists(candidate.contest_office_we_vote_id):
+                office_we_vote_id_list.add(candidate.contest_office_we_vote_id)
+        offices_dict = {office.we_vote_id: office for office in
+                        ContestOffice.objects.filter(we_vote_id__in=office_we_vote_id_list)}
+        measures_dict = {measure.we_vote_id: measure for measure in
+                         ContestMeasure.objects.filter(we_vote_id__in=measure_we_vote_id_list)}
+
+        positions_refreshed_by_source = {}
+        positions_failed_by_source = {}
+        status_by_source = {}
+        positions_refreshed = 0
+        positions_failed = 0
+        position_refresh_thread_state.refresh_running = True
+        try:
+            for position, force_update in position_dict.values():
+                source_key_list = [
+                    (REFRESH_SOURCE_ORGANIZATION, position.organization_we_vote_id),
+                    (REFRESH_SOURCE_VOTER, position.voter_we_vote_id),
+                    (REFRESH_SOURCE_CANDIDATE, position.candidate_campaign_we_vote_id),
+                    (REFRESH_SOURCE_OFFICE, position.contest_office_we_vote_id),
+                    (REFRESH_SOURCE_MEASURE, position.contest_measure_we_vote_id)]
+                # One position that can't be refreshed must not stop the others, or keep the requests for it pending
+                try:
+                    results = position_manager.refresh_cached_position_info(
+                        position,
+                        force_update=force_update,
+                        offices_dict=offices_dict,
+                        candidates_dict=candidates_dict,
+                        measures_dict=measures_dict,
+                        organizations_dict=organizations_dict,
+                        voters_by_linked_org_dict=voters_by_linked_org_dict,
+                        voters_dict=voters_dict)
+                except Exception as e:
+                    handle_exception(e, logger=logger, exception_message="POSITION_REFRESH_FAILED ")
+                    results = {
+                        'success':  False,
+                        'status':   "POSITION_REFRESH_FAILED " + str(position.we_vote_id) + ": " + str(e) + " ",
+                    }
+                if not results['success']:
+                    status += results['status']
+                    positions_failed += 1
+                    for source_key in source_key_list:
+                        positions_failed_by_source[source_key] = positions_failed_by_source.get(source_key, 0) + 1
+                        status_by_source[source_key] = status_by_source.get(source_key, "") + results['status']
+                    continue
+                positions_refreshed += 1
+                for source_key in source_key_list:
+                    positions_refreshed_by_source[source_key] = positions_refreshed_by_source.get(source_key, 0) + 1
+        finally:
+            position_refresh_thread_state.refresh_running = False
+
+        # Every request we picked up is done, even when some of its positions failed. Otherwise the same oldest
+        # requests would be picked up by every run, and nothing behind them would ever be refreshed.
+        date_completed = now()
+        for position_refresh_request in position_refresh_request_list:
+            source_key = (position_refresh_request.kind_of_source, position_refresh_request.source_we_vote_id)
+            position_refresh_request.date_completed = date_completed
+            position_refresh_request.positions_refreshed = positions_refreshed_by_source.get(source_key, 0)
+            position_refresh_request.positions_failed = positions_failed_by_source.get(source_key, 0)
+            position_refresh_request.status = status_by_source.get(source_key, "POSITION_REFRESH_REQUEST_COMPLETED ")
+        try:
+            PositionRefreshRequest.objects.bulk_update(
+                position_refresh_request_list, ['date_completed', 'positions_refreshed', 'positions_failed', 'status'])
+            if sweep_position_count:
+                PositionRefreshRequest.objects.create(
+                    kind_of_source=REFRESH_SOURCE_SWEEP,
+                    date_completed=date_completed,
+                    positions_refreshed=sweep_position_count)
+        except Exception as e:
+            status += "POSITION_REFRESH_REQUESTS_NOT_MARKED_COMPLETE " + str(e) + " "
+            handle_exception(e, logger=logger, exception_message=status)
+            success = False
+
+        seconds_elapsed = time.time() - start_time
+        results = {
+            'success':                  success,
+            'status':                   status,
+            'requests_processed':       len(position_refresh_request_list) if success else 0,
+            'positions_refreshed':      positions_refreshed,
+            'positions_failed':         positions_failed,
+            'sweep_position_count':     sweep_position_count,
+            'seconds_elapsed':          seconds_elapsed,
+            'positions_per_second':     positions_refreshed / seconds_elapsed if seconds_elapsed else 0,
+        }
+        return results
+
+    def retrieve_position_refresh_statistics(self, hours=1):
+        """
+        Backlog depth and the recent refresh rate, for the admin statistics page
+        """
+        backlog_query = PositionRefreshRequest.objects.using('readonly').filter(date_completed__isnull=True)
+        backlog_count = backlog_query.count()
+        oldest_pending = backlog_query.order_by('id').values_list('date_requested', flat=True).first()
+        oldest_pending_seconds = (now() - oldest_pending).total_seconds() if oldest_pending else 0
+
+        since_date = now() - timedelta(hours=hours)
+        completed_list = list(PositionRefreshRequest.objects.using('readonly')
+                              .filter(date_completed__gte=since_date)
+                              .values_list('kind_of_source', 'date_requested', 'date_completed',
+                                           'positions_refreshed'))
+        requests_completed = 0
+        positions_refreshed = 0
+        total_seconds_waiting = 0
+        for kind_of_source, date_requested, date_completed, request_positions_refreshed in completed_list:
+            positions_refreshed += request_positions_refreshed
+            if kind_of_source != REFRESH_SOURCE_SWEEP:
+                requests_completed += 1
+                total_seconds_waiting += (date_completed - date_requested).total_seconds()
+        return {
+            'backlog_count':                            backlog_count,
+            'oldest_pending_seconds':                   oldest_pending_seconds,
+            'hours':                                    hours,
+            'requests_completed':                       requests_completed,
+            'average_seconds_from_request_to_refresh':
+                total_seconds_waiting / requests_completed if requests_completed else 0,
+            'positions_refreshed':                      positions_refreshed,
+            'positions_refreshed_per_second':           positions_refreshed / (hours * 3600),
+        }
+
+
+def position_cached_fields_saved(kind_of_source, raw, update_fields):
+    """
+    Whether a post_save of this kind of source might have changed data that positions keep a copy of. Fixture loading
+    (raw) and saves that list their update_fields without any of those fields don't.
+    """
+    if raw:
+        return False
+    if update_fields is None:
+        return True
+    return not POSITION_CACHED_FIELDS_BY_SOURCE[kind_of_source].isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Organization)
+def save_organization_position_refresh_signal(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not created and position_cached_fields_saved(REFRESH_SOURCE_ORGANIZATION, raw, update_fields):
+        PositionRefreshRequestManager().create_position_refresh_request(
+            REFRESH_SOURCE_ORGANIZATION, instance.we_vote_id)
+
+
+@receiver(post_save, sender=Voter)
+def save_voter_position_refresh_signal(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Voters without a linked organization have not taken any positions
+    if not created and positive_value_exists(instance.linked_organization_we_vote_id) and \
+            position_cached_fields_saved(REFRESH_SOURCE_VOTER, raw, update_fields):
+        PositionRefreshRequestManager().create_position_refresh_request(REFRESH_SOURCE_VOTER, instance.we_vote_id)
+
+
+@receiver(post_save, sender=CandidateCampaign)
+def save_candidate_position_refresh_signal(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not created and position_cached_fields_saved(REFRESH_SOURCE_CANDIDATE, raw, update_fields):
+        PositionRefreshRequestManager().create_position_refresh_request(REFRESH_SOURCE_CANDIDATE, instance.we_vote_id)
+
+
+@receiver(post_save, sender=ContestOffice)
+def save_office_position_refresh_signal(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not created and position_cached_fields_saved(REFRESH_SOURCE_OFFICE, raw, update_fields):
+        PositionRefreshRequestManager().create_position_refresh_request(REFRESH_SOURCE_OFFICE, instance.we_vote_id)
+
+
+@receiver(post_save, sender=ContestMeasure)
+def save_measure_position_refresh_signal(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not created and position_cached_fields_saved(REFRESH_SOURCE_MEASURE, raw, update_fields):
+        PositionRefreshRequestManager().create_position_refresh_request(REFRESH_SOURCE_MEASURE, instance.we_vote_id)
@@ -0,0 +1,266 @@
+# position/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from ballot.models import BallotItem
+from candidate.models import CandidateCampaign, CandidateToOfficeLink
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from organization.models import Organization
+from position.controllers import count_for_all_ballot_items_from_position_network_score_for_api, \
+    filter_positions_structured_json_for_local_duplicates, POSITION_IMPORT_FIELD_LIST, \
+    positions_import_from_structured_json
+from position.models import PositionEntered, PositionListManager, PositionManager, PositionNetworkScore, \
+    PositionRefreshRequest, PositionRefreshRequestManager, REFRESH_SOURCE_ORGANIZATION
+import time
+from unittest import mock
+from voter.models import Voter, VoterDeviceLink
+from wevote_functions.functions import generate_voter_device_id
+
+GOOGLE_CIVIC_ELECTION_ID = 4184
+
+
+class WeVotePositionTestsCountForAllBallotItems(TransactionTestCase):
+    # The queries we are counting run against the readonly database, so the test data needs to be committed
+    databases = ["default", "readonly"]
+
+    def setUp(self):
+        voter = Voter.objects.create(we_vote_id="wv01voter1")
+        self.voter_id = voter.id
+        self.voter_device_id = generate_voter_device_id()
+        VoterDeviceLink.objects.create(voter_device_id=self.voter_device_id, voter_id=self.voter_id)
+
+    def create_ballot(self, office_count, candidates_per_office=3):
+        for office_number in range(office_count):
+            office_we_vote_id = "wv01off{office_number}".format(office_number=office_number)
+            BallotItem.objects.create(
+                voter_id=self.voter_id,
+                google_civic_election_id=GOOGLE_CIVIC_ELECTION_ID,
+                contest_office_we_vote_id=office_we_vote_id,
+                ballot_item_display_name="Office {office_number}".format(office_number=office_number))
+            for candidate_number in range(candidates_per_office):
+                candidate_we_vote_id = "wv01cand{office_number}x{candidate_number}".format(
+                    office_number=office_number, candidate_number=candidate_number)
+                CandidateCampaign.objects.create(
+                    we_vote_id=candidate_we_vote_id,
+                    candidate_name="Candidate {candidate_we_vote_id}".format(candidate_we_vote_id=candidate_we_vote_id),
+                    google_civic_election_id=GOOGLE_CIVIC_ELECTION_ID,
+                    twitter_followers_count=candidate_number)
+                CandidateToOfficeLink.objects.create(
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    contest_office_we_vote_id=office_we_vote_id,
+                    google_civic_election_id=GOOGLE_CIVIC_ELECTION_ID)
+                PositionNetworkScore.objects.create(
+                    viewing_voter_id=self.voter_id,
+                    viewing_voter_we_vote_id="wv01voter1",
+                    google_civic_election_id=GOOGLE_CIVIC_ELECTION_ID,
+                    organization_we_vote_id="wv01org{candidate_number}".format(candidate_number=candidate_number),
+                    candidate_we_vote_id=candidate_we_vote_id,
+                    speaker_display_name="Org {candidate_number}".format(candidate_number=candidate_number),
+                    is_support=candidate_number % 2 == 0,
+                    is_oppose=candidate_number % 2 == 1)
+
+    def count_position_counts_queries(self):
+        """
+        Call positionsCountForAllBallotItems' controller
+        :return: (number of queries across all databases, seconds elapsed, json_data)
+        """
+        context_list = [CaptureQueriesContext(connections[alias]) for alias in self.databases]
+        for context in context_list:
+            context.__enter__()
+        start_time = time.time()
+        json_data = count_for_all_ballot_items_from_position_network_score_for_api(
+            self.voter_device_id, GOOGLE_CIVIC_ELECTION_ID)
+        elapsed_seconds = time.time() - start_time
+        for context in context_list:
+            context.__exit__(None, None, None)
+        query_count = sum(len(context.captured_queries) for context in context_list)
+        return query_count, elapsed_seconds, json_data
+
+    def test_query_count_does_not_grow_with_ballot_size(self):
+        self.create_ballot(office_count=2)
+        small_query_count, small_seconds, json_data = self.count_position_counts_queries()
+        self.assertTrue(json_data['success'], json_data['status'])
+        self.assertTrue(json_data['support_or_oppose_exists'])
+        position_counts_list = json_data['position_counts_list']
+        self.assertEqual(len(position_counts_list), 6)
+        # Candidates under one office keep the twitter_followers_count order
+        self.assertEqual([position_counts['ballot_item_we_vote_id'] for position_counts in position_counts_list[:3]],
+                         ["wv01cand0x2", "wv01cand0x1", "wv01cand0x0"])
+        position_counts_by_we_vote_id = {position_counts['ballot_item_we_vote_id']: position_counts
+                                         for position_counts in position_counts_list}
+        self.assertEqual(position_counts_by_we_vote_id['wv01cand0x0']['support_count'], 1)
+        self.assertEqual(position_counts_by_we_vote_id['wv01cand0x0']['oppose_count'], 0)
+        self.assertEqual(position_counts_by_we_vote_id['wv01cand0x0']['support_name_list'], ["Org 0"])
+        self.assertEqual(position_counts_by_we_vote_id['wv01cand0x1']['oppose_we_vote_id_list'], ["wv01org1"])
+
+        BallotItem.objects.all().delete()
+        CandidateCampaign.objects.all().delete()
+        CandidateToOfficeLink.objects.all().delete()
+        PositionNetworkScore.objects.all().delete()
+
+        self.create_ballot(office_count=40)
+        large_query_count, large_seconds, json_data = self.count_position_counts_queries()
+        self.assertTrue(json_data['success'], json_data['status'])
+        self.assertEqual(len(json_data['position_counts_list']), 120)
+        self.assertEqual(small_query_count, large_query_count,
+                         "Query count grew from {small} to {large} as the ballot grew from 2 to 40 offices "
+                         "({small_seconds:.4f}s vs {large_seconds:.4f}s)".format(
+                             small=small_query_count, large=large_query_count,
+                             small_seconds=small_seconds, large_seconds=large_seconds))
+
+
+class PositionRefreshRequestTestCase(TestCase):
+
+    def test_organization_change_reaches_positions_through_the_queue(self):
+        organization = Organization.objects.create(we_vote_id="wv01org900", organization_name="Old Name")
+        position = PositionEntered.objects.create(
+            we_vote_id="wv01pos900",
+            organization_we_vote_id=organization.we_vote_id,
+            speaker_display_name="Old Name",
+            stance="SUPPORT")
+        self.assertEqual(PositionRefreshRequest.objects.count(), 0)
+
+        organization.organization_name = "New Name"
+        organization.save()
+        organization.save()
+        pending_query = PositionRefreshRequest.objects.filter(date_completed__isnull=True)
+        self.assertEqual(list(pending_query.values_list('kind_of_source', 'source_we_vote_id')),
+                         [(REFRESH_SOURCE_ORGANIZATION, organization.we_vote_id)])
+
+        results = PositionRefreshRequestManager().process_position_refresh_requests(sweep_positions_per_run=0)
+        self.assertTrue(results['success'], results['status'])
+        self.assertEqual(results['requests_processed'], 1)
+        self.assertEqual(PositionEntered.objects.get(id=position.id).speaker_display_name, "New Name")
+        # The refresh saves the position, but doesn't queue another request
+        self.assertEqual(pending_query.count(), 0)
+        self.assertEqual(PositionRefreshRequest.objects.get().positions_refreshed, 1)
+
+    def test_saves_that_dont_touch_cached_fields_are_not_queued(self):
+        organization = Organization.objects.create(we_vote_id="wv01org901", organization_name="Old Name")
+        organization.organization_website = "https://example.com"
+        organization.save(update_fields=['organization_website'])
+        self.assertEqual(PositionRefreshRequest.objects.count(), 0)
+
+        organization.organization_name = "New Name"
+        organization.save(update_fields=['organization_name', 'organization_website'])
+        self.assertEqual(PositionRefreshRequest.objects.count(), 1)
+
+    def test_position_that_fails_does_not_keep_requests_pending(self):
+        organization_list = [
+            Organization.objects.create(we_vote_id="wv01org90" + str(number), organization_name="Old Name")
+            for number in range(2, 4)]
+        for organization in organization_list:
+            PositionEntered.objects.create(
+                we_vote_id=organization.we_vote_id.replace("org", "pos"),
+                organization_we_vote_id=organization.we_vote_id,
+                speaker_display_name="Old Name",
+                stance="SUPPORT")
+            organization.organization_name = "New Name"
+            organization.save()
+
+        refresh_cached_position_info = PositionManager.refresh_cached_position_info
+
+        def refresh_or_fail(position_manager, position, **kwargs):
+            if position.we_vote_id == "wv01pos902":
+                raise ValueError("Broken position")
+            return refresh_cached_position_info(position_manager, position, **kwargs)
+
+        with mock.patch.object(PositionManager, 'refresh_cached_position_info', refresh_or_fail):
+            results = PositionRefreshRequestManager().process_position_refresh_requests(sweep_positions_per_run=0)
+        self.assertEqual(results['requests_processed'], 2)
+        self.assertEqual(results['positions_refreshed'], 1)
+        self.assertEqual(results['positions_failed'], 1)
+        self.assertEqual(PositionEntered.objects.get(we_vote_id="wv01pos903").speaker_display_name, "New Name")
+
+        self.assertEqual(PositionRefreshRequest.objects.filter(date_completed__isnull=True).count(), 0)
+        failed_request = PositionRefreshRequest.objects.get(source_we_vote_id="wv01org902")
+        self.assertEqual(failed_request.positions_failed, 1)
+        self.assertIn("Broken position", failed_request.status)
+        refreshed_request = PositionRefreshRequest.objects.get(source_we_vote_id="wv01org903")
+        self.assertEqual((refreshed_request.positions_refreshed, refreshed_request.positions_failed), (1, 0))
+
+
+class PositionImportTestCase(TestCase):
+
+    def generate_position_json(self, position_number, stance="SUPPORT", candidate_we_vote_id="wv01cand910"):
+        one_position = {field: PositionEntered._meta.get_field(field).get_default()
+                        for field in POSITION_IMPORT_FIELD_LIST}
+        one_position.update({
+            'we_vote_id': "wv02pos{position_number}".format(position_number=position_number),
+            'candidate_campaign_we_vote_id': candidate_we_vote_id,
+            'contest_measure_we_vote_id': '',
+            'google_civic_election_id': str(GOOGLE_CIVIC_ELECTION_ID),
+            'organization_we_vote_id': "wv01org910",
+            'public_figure_we_vote_id': '',
+            'stance': stance,
+            'state_code': 'ca',
+        })
+        return one_position
+
+    def test_import_creates_then_updates_in_bulk(self):
+        Organization.objects.create(we_vote_id="wv01org910", organization_name="Importing Organization")
+        CandidateCampaign.objects.create(
+            we_vote_id="wv01cand910", candidate_name="Imported Candidate",
+            google_civic_candidate_name="IMPORTED CANDIDATE", google_civic_election_id=GOOGLE_CIVIC_ELECTION_ID)
+
+        structured_json = [self.generate_position_json(position_number) for position_number in range(3)]
+        # We don't have this candidate locally
+        structured_json.append(self.generate_position_json(99, candidate_we_vote_id="wv01cand999"))
+        results = positions_import_from_structured_json(structured_json)
+        self.assertEqual((results['saved'], results['updated'], results['not_processed']), (3, 0, 1))
+        position = PositionEntered.objects.get(we_vote_id="wv02pos0")
+        self.assertEqual(position.organization_id, Organization.objects.get(we_vote_id="wv01org910").id)
+        self.assertEqual(position.google_civic_candidate_name, "IMPORTED CANDIDATE")
+
+        structured_json = [self.generate_position_json(position_number, stance="OPPOSE")
+                           for position_number in range(30)]
+        with CaptureQueriesContext(connections['default']) as context:
+            results = positions_import_from_structured_json(structured_json)
+        self.assertEqual((results['saved'], results['updated'], results['not_processed']), (27, 3, 0))
+        self.assertEqual(PositionEntered.objects.get(we_vote_id="wv02pos0").stance, "OPPOSE")
+        self.assertEqual(PositionEntered.objects.filter(we_vote_id__startswith="wv02pos").count(), 30)
+        # A few lookups, then a bulk_create and a bulk_update, instead of several queries for each position
+        self.assertLess(len(context.captured_queries), len(structured_json))
+
+
+class FilterPositionDuplicatesTestCase(TestCase):
+    """
+    The filter must find the same duplicates as asking retrieve_possible_duplicate_positions about one position
+    at a time
+    """
+
+    def test_positions_match_one_at_a_time(self):
+        for we_vote_id, organization_we_vote_id, contest_measure_we_vote_id, stance in [
+                ("wv01pos1", "wv01org1", "wv01meas1", "SUPPORT"), ("wv01pos2", "WV01ORG1", None, "OPPOSE"),
+                ("wv01pos3", "wv01org2", "wv01meas1", "PERCENT_RATING"),
+                ("wv01pos4", "wv01org3", "wv01meas2", "INFO_ONLY")]:
+            PositionEntered.objects.create(
+                we_vote_id=we_vote_id, google_civic_election_id=str(GOOGLE_CIVIC_ELECTION_ID),
+                organization_we_vote_id=organization_we_vote_id,
+                contest_measure_we_vote_id=contest_measure_we_vote_id, stance=stance)
+        structured_json = []
+        for we_vote_id in ["wv01pos1", "WV01POS2", "wv02pos1", ""]:
+            for google_civic_election_id in [str(GOOGLE_CIVIC_ELECTION_ID), GOOGLE_CIVIC_ELECTION_ID, "1"]:
+                for organization_we_vote_id in ["wv01org1", "wv01org2", "wv01org3", ""]:
+                    for candidate_we_vote_id, contest_measure_we_vote_id in [
+                            ("wv01cand1", ""), ("", "WV01MEAS1"), ("", "wv01meas2"), ("wv01org1", ""), ("", "")]:
+                        structured_json.append({
+                            'we_vote_id': we_vote_id,
+                            'google_civic_election_id': google_civic_election_id,
+                            'organization_we_vote_id': organization_we_vote_id,
+                            'candidate_campaign_we_vote_id': candidate_we_vote_id,
+                            'contest_measure_we_vote_id': contest_measure_we_vote_id,
+                        })
+
+        position_list_manager = PositionListManager()
+        expected_structured_json = [
+            one_position for one_position in structured_json
+            if not position_list_manager.retrieve_possible_duplicate_positions(
+                one_position['google_civic_election_id'], one_position['organization_we_vote_id'],
+                one_position['candidate_campaign_we_vote_id'], one_position['contest_measure_we_vote_id'],
+                one_position['we_vote_id'])['position_list_found']]
+        results = filter_positions_structured_json_for_local_duplicates(structured_json)
+        self.assertEqual(results['structured_json'], expected_structured_json)
+        self.assertGreater(results['duplicates_removed'], 0)
@@ -19,6 +19,8 @@ urlpatterns = [
     url(r'^(?P<position_we_vote_id>wv[\w]{2}pos[\w]+)/edit/$', views_admin.position_edit_view, name='position_edit'),
     url(r'^(?P<position_we_vote_id>wv[\w]{2}pos[\w]+)/summary/$',
         views_admin.position_summary_view, name='position_summary'),
+    url(r'^position_refresh_statistics/$',
+        views_admin.position_refresh_statistics_view, name='position_refresh_statistics'),
     url(r'^refresh_cached_position_info_for_election/',
         views_admin.refresh_cached_position_info_for_election_view,
         name='refresh_cached_position_info_for_election'),
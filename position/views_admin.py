@@ -7,7 +7,8 @@ from .controllers import generate_position_sorting_dates_for_election, positions
     refresh_positions_with_candidate_details_for_election, \
     refresh_positions_with_contest_office_details_for_election, \
     refresh_positions_with_contest_measure_details_for_election
-from .models import ANY_STANCE, PositionEntered, PositionForFriends, PositionListManager, PERCENT_RATING
+from .models import ANY_STANCE, PositionEntered, PositionForFriends, PositionListManager, \
+    PositionRefreshRequestManager, PERCENT_RATING
 from admin_tools.views import redirect_to_sign_in_page
 from candidate.models import CandidateCampaign, CandidateCampaignListManager, CandidateCampaignManager
 from config.base import get_environment_variable
@@ -29,6 +30,7 @@ from politician.models import PoliticianManager
 from voter.models import voter_has_authority
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, positive_value_exists, STATE_CODE_MAP
+from wevote_functions.sync_stream import is_sync_out_ndjson_request, sync_out_ndjson_response
 from django.http import HttpResponse
 import json
 
@@ -70,7 +72,7 @@ def positions_sync_out_view(request):  # positionsSyncOut
         position_list_query = position_list_query.extra(
             select={'date_last_changed': "to_char(date_last_changed, 'YYYY-MM-DD HH24:MI:SS')"})
 
-        position_list_dict = position_list_query.values(
+        position_field_list = (
             'we_vote_id', 'ballot_item_display_name', 'ballot_item_image_url_https',
             'ballot_item_twitter_handle', 'speaker_display_name',
             'speaker_image_url_https', 'speaker_twitter_handle', 'date_entered',
@@ -84,7 +86,10 @@ def positions_sync_out_view(request):  # positionsSyncOut
             'statement_text', 'statement_html', 'twitter_followers_count', 'more_info_url', 'from_scraper',
             'organization_certified', 'volunteer_certified', 'voter_entering_position',
             'tweet_source_id', 'twitter_user_entered_position', 'is_private_citizen')
+        if is_sync_out_ndjson_request(request):
+            return sync_out_ndjson_response(request, position_list_query, position_field_list)
 
+        position_list_dict = position_list_query.values(*position_field_list)
         if position_list_dict:
             position_list_json = list(position_list_dict)
             return HttpResponse(json.dumps(position_list_json), content_type='application/json')
@@ -118,7 +123,8 @@ def positions_import_from_master_server_view(request):
         return HttpResponseRedirect(reverse('admin_tools:sync_dashboard', args=()) + "?google_civic_election_id=" +
                                     str(google_civic_election_id) + "&state_code=" + str(state_code))
 
-    results = positions_import_from_master_server(request, google_civic_election_id)
+    full_sync = positive_value_exists(request.GET.get('full_sync', False))
+    results = positions_import_from_master_server(request, google_civic_election_id, full_sync=full_sync)
 
     if not results['success']:
         messages.add_message(request, messages.ERROR, results['status'])
@@ -911,3 +917,21 @@ def position_delete_process_view(request):
 
     return HttpResponseRedirect(reverse('position:position_list', args=()) +
                                 "?google_civic_election_id=" + str(google_civic_election_id))
+
+
+@login_required
+def position_refresh_statistics_view(request):
+    """
+    How many position refresh requests are waiting, and how quickly the REFRESH_POSITION_CACHED_INFO batch process
+    has been refreshing positions over the last hour
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    hours = convert_to_int(request.GET.get('hours', 1)) or 1
+    json_data = PositionRefreshRequestManager().retrieve_position_refresh_statistics(hours=hours)
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
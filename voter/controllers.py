@@ -1,6 +1,7 @@
 # voter/controllers.py
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
+from .identity_cache import voter_identity_cache
 from .models import BALLOT_ADDRESS, fetch_voter_id_from_voter_device_link, \
     MAINTENANCE_STATUS_FLAGS_TASK_ONE, MAINTENANCE_STATUS_FLAGS_TASK_TWO, MAINTENANCE_STATUS_FLAGS_COMPLETED, \
     NOTIFICATION_VOTER_DAILY_SUMMARY_EMAIL, \
@@ -2394,6 +2395,9 @@ def voter_merge_two_accounts_action(  # voterMergeTwoAccounts, part 2
     else:
         status += update_link_results['status']
         status += "VOTER_DEVICE_LINK_NOT_UPDATED "
+    # Both voters were changed above, some of them with queryset updates that don't go through save()
+    voter_identity_cache.invalidate(voter_device_id=voter_device_id, voter_id=from_voter_id)
+    voter_identity_cache.invalidate(voter_id=new_owner_voter.id)
 
     # Data healing scripts
     repair_results = position_list_manager.repair_all_positions_for_voter(new_owner_voter.id)
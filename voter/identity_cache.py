@@ -0,0 +1,171 @@
+# voter/identity_cache.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Most API calls turn the voter_device_id into a VoterDeviceLink and then a Voter several times over, from different
+# controllers. VoterIdentityCache remembers those lookups for the life of one request (see VoterIdentityCacheMiddleware)
+# and, if VOTER_IDENTITY_CACHE_SECONDS is set, shares replica lookups across requests in the same process for a few
+# seconds. Saving or deleting a VoterDeviceLink or Voter clears its entries in this process; other processes rely on
+# the short expiry. The statistics are kept for each view, like the database routing statistics.
+
+from config.base import get_environment_variable_default
+from config.database_router import request_endpoint, UNRESOLVED_ENDPOINT
+import copy
+import threading
+import time
+from wevote_functions.functions import convert_to_int, positive_value_exists
+
+# 0 turns off the cross-request tier, so only duplicate lookups within one request are removed
+VOTER_IDENTITY_CACHE_SECONDS = convert_to_int(get_environment_variable_default('VOTER_IDENTITY_CACHE_SECONDS', 0))
+VOTER_IDENTITY_CACHE_MAX_ENTRIES = 20000
+VOTER_IDENTITY_CACHE_COUNTER_NAMES = ('lookups', 'duplicate_lookups_removed', 'shared_cache_hits', 'misses')
+OUTSIDE_REQUEST_ENDPOINT = 'outside_request'
+
+
+class VoterIdentityCache(object):
+    """
+    Keys are ('voter_device_link', voter_device_id, database) and ('voter', voter_id, database), where database is
+    'readonly' or 'default'. Objects read from the primary database are only remembered within a request, since the
+    caller may be about to update them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_scope = threading.local()
+        self.shared_entry_dict = {}
+        self.statistics_by_endpoint = {}
+
+    def start_request(self):
+        self.request_scope.entry_dict = {}
+        self.request_scope.count_by_counter_name = {}
+
+    def end_request(self, endpoint=UNRESOLVED_ENDPOINT):
+        """
+        :param endpoint: the name of the view that answered the request, which we only know once it has been resolved
+        :return:
+        """
+        count_by_counter_name = getattr(self.request_scope, 'count_by_counter_name', None)
+        self.request_scope.entry_dict = None
+        self.request_scope.count_by_counter_name = None
+        if count_by_counter_name:
+            self._add_counts(endpoint, count_by_counter_name)
+
+    def _add_counts(self, endpoint, count_by_counter_name):
+        with self.lock:
+            endpoint_statistics = self.statistics_by_endpoint.get(endpoint)
+            if endpoint_statistics is None:
+                endpoint_statistics = {counter_name: 0 for counter_name in VOTER_IDENTITY_CACHE_COUNTER_NAMES}
+                self.statistics_by_endpoint[endpoint] = endpoint_statistics
+            for counter_name, count in count_by_counter_name.items():
+                endpoint_statistics[counter_name] += count
+
+    def _count(self, counter_name):
+        count_by_counter_name = getattr(self.request_scope, 'count_by_counter_name', None)
+        if count_by_counter_name is None:
+            self._add_counts(OUTSIDE_REQUEST_ENDPOINT, {counter_name: 1})
+        else:
+            count_by_counter_name[counter_name] = count_by_counter_name.get(counter_name, 0) + 1
+
+    def retrieve(self, entry_type, entry_id, read_only=True):
+        """
+        :return: the cached VoterDeviceLink or Voter, or None
+        """
+        if not positive_value_exists(entry_id):
+            return None
+        request_entry_dict = getattr(self.request_scope, 'entry_dict', None)
+        shared_tier_on = positive_value_exists(read_only) and VOTER_IDENTITY_CACHE_SECONDS > 0
+        if request_entry_dict is None and not shared_tier_on:
+            return None
+        entry_key = (entry_type, entry_id, 'readonly' if read_only else 'default')
+        self._count('lookups')
+
+        if request_entry_dict is not None and entry_key in request_entry_dict:
+            self._count('duplicate_lookups_removed')
+            return request_entry_dict[entry_key]
+
+        if shared_tier_on:
+            shared_entry = self.shared_entry_dict.get(entry_key)
+            if shared_entry is not None and time.time() - shared_entry[1] < VOTER_IDENTITY_CACHE_SECONDS:
+                # Each request gets its own copy, so one request can't change another request's objects
+                cached_object = copy.deepcopy(shared_entry[0])
+                if request_entry_dict is not None:
+                    request_entry_dict[entry_key] = cached_object
+                self._count('shared_cache_hits')
+                return cached_object
+
+        self._count('misses')
+        return None
+
+    def store(self, entry_type, entry_id, cached_object, read_only=True):
+        if not positive_value_exists(entry_id) or cached_object is None:
+            return
+        entry_key = (entry_type, entry_id, 'readonly' if read_only else 'default')
+        request_entry_dict = getattr(self.request_scope, 'entry_dict', None)
+        if request_entry_dict is not None:
+            request_entry_dict[entry_key] = cached_object
+        if positive_value_exists(read_only) and VOTER_IDENTITY_CACHE_SECONDS > 0:
+            with self.lock:
+                if len(self.shared_entry_dict) >= VOTER_IDENTITY_CACHE_MAX_ENTRIES:
+                    self.shared_entry_dict = {}
+                self.shared_entry_dict[entry_key] = (copy.deepcopy(cached_object), time.time())
+
+    def invalidate(self, voter_device_id='', voter_id=0):
+        """
+        Forget a voter_device_id, or a voter_id along with every voter_device_id that points to it
+        """
+        voter_id = convert_to_int(voter_id)
+        request_entry_dict = getattr(self.request_scope, 'entry_dict', None)
+        entry_dict_list = [self.shared_entry_dict]
+        if request_entry_dict is not None:
+            entry_dict_list.append(request_entry_dict)
+        with self.lock:
+            for entry_dict in entry_dict_list:
+                for entry_key in list(entry_dict.keys()):
+                    entry_type, entry_id, database = entry_key
+                    cached_object = entry_dict[entry_key]
+                    if isinstance(cached_object, tuple):
+                        cached_object = cached_object[0]
+                    if entry_type == 'voter_device_link':
+                        if (positive_value_exists(voter_device_id) and entry_id == voter_device_id) or \
+                                (positive_value_exists(voter_id) and cached_object.voter_id == voter_id):
+                            del entry_dict[entry_key]
+                    elif entry_type == 'voter':
+                        if positive_value_exists(voter_id) and entry_id == voter_id:
+                            del entry_dict[entry_key]
+
+    def clear(self):
+        with self.lock:
+            self.shared_entry_dict = {}
+            self.statistics_by_endpoint = {}
+        self.request_scope.entry_dict = None
+        self.request_scope.count_by_counter_name = None
+
+    def statistics(self):
+        with self.lock:
+            statistics_by_endpoint = {endpoint: dict(endpoint_statistics)
+                                      for endpoint, endpoint_statistics in self.statistics_by_endpoint.items()}
+        return {
+            'shared_cache_seconds':     VOTER_IDENTITY_CACHE_SECONDS,
+            'shared_entries_cached':    len(self.shared_entry_dict),
+            'statistics_by_endpoint':   statistics_by_endpoint,
+        }
+
+
+# One per process
+voter_identity_cache = VoterIdentityCache()
+
+
+class VoterIdentityCacheMiddleware(object):
+    """
+    Gives each request its own VoterIdentityCache scope
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        voter_identity_cache.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            voter_identity_cache.end_request(request_endpoint(request))
+        return response
@@ -11,6 +11,7 @@ from apple.models import AppleUser
 from exception.models import handle_exception, handle_record_found_more_than_one_exception,\
     handle_record_not_saved_exception
 from import_export_facebook.models import FacebookManager
+from .identity_cache import voter_identity_cache
 import pytz
 from sms.models import SMSManager
 import string
@@ -772,8 +773,25 @@ class VoterManager(BaseUserManager):
         return results
 
     def retrieve_voter_by_id(self, voter_id, read_only=False):
+        voter_id = convert_to_int(voter_id)
+        voter = voter_identity_cache.retrieve('voter', voter_id, read_only=read_only)
+        if voter is not None:
+            results = {
+                'success':                  True,
+                'status':                   "VOTER_RETRIEVED_FROM_IDENTITY_CACHE ",
+                'error_result':             False,
+                'DoesNotExist':             False,
+                'MultipleObjectsReturned':  False,
+                'voter_found':              True,
+                'voter_id':                 voter.id,
+                'voter':                    voter,
+            }
+            return results
         voter_manager = VoterManager()
-        return voter_manager.retrieve_voter(voter_id, read_only=read_only)
+        results = voter_manager.retrieve_voter(voter_id, read_only=read_only)
+        if results['voter_found']:
+            voter_identity_cache.store('voter', voter_id, results['voter'], read_only=read_only)
+        return results
 
     def retrieve_voter_by_email(self, email, read_only=False):
         voter_id = ''
@@ -2182,6 +2200,11 @@ class Voter(AbstractBaseUser):
         if self.we_vote_id == "" or self.we_vote_id is None:  # If there isn't a value...
             self.generate_new_we_vote_id()
         super(Voter, self).save(*args, **kwargs)
+        voter_identity_cache.invalidate(voter_id=self.id)
+
+    def delete(self, *args, **kwargs):
+        voter_identity_cache.invalidate(voter_id=self.id)
+        return super(Voter, self).delete(*args, **kwargs)
 
     def generate_new_we_vote_id(self):
         # ...generate a new id
@@ -2482,6 +2505,10 @@ class VoterDeviceLink(models.Model):
         verbose_name="the Firebase Cloud Messaging (FCW) token for this device", max_length=255, null=True,
         blank=True, unique=True)
 
+    def save(self, *args, **kwargs):
+        super(VoterDeviceLink, self).save(*args, **kwargs)
+        voter_identity_cache.invalidate(voter_device_id=self.voter_device_id)
+
     def generate_voter_device_id(self):
         # A simple mapping to this function
         return generate_voter_device_id()
@@ -2564,6 +2591,7 @@ class VoterDeviceLinkManager(models.Model):
         try:
             if positive_value_exists(voter_id):
                 VoterDeviceLink.objects.filter(voter_id=voter_id).delete()
+                voter_identity_cache.invalidate(voter_id=voter_id)
                 status = "DELETE_ALL_VOTER_DEVICE_LINKS_SUCCESSFUL "
                 success = True
             else:
@@ -2584,6 +2612,7 @@ class VoterDeviceLinkManager(models.Model):
         try:
             if positive_value_exists(voter_id):
                 VoterDeviceLink.objects.filter(voter_id=voter_id).delete()
+                voter_identity_cache.invalidate(voter_id=voter_id)
                 status += "DELETE_ALL_VOTER_DEVICE_LINKS_SUCCESSFUL "
                 success = True
             else:
@@ -2603,6 +2632,7 @@ class VoterDeviceLinkManager(models.Model):
         try:
             if positive_value_exists(voter_device_id):
                 VoterDeviceLink.objects.filter(voter_device_id=voter_device_id).delete()
+                voter_identity_cache.invalidate(voter_device_id=voter_device_id)
                 status = "DELETE_VOTER_DEVICE_LINK_SUCCESSFUL "
                 success = True
             else:
@@ -2633,6 +2663,22 @@ class VoterDeviceLinkManager(models.Model):
         status = ""
         voter_device_link_on_stage = VoterDeviceLink()
 
+        if positive_value_exists(voter_device_id):
+            voter_device_link = voter_identity_cache.retrieve(
+                'voter_device_link', voter_device_id, read_only=positive_value_exists(read_only))
+            if voter_device_link is not None:
+                status += " RETRIEVE_VOTER_DEVICE_LINK-FROM_IDENTITY_CACHE "
+                results = {
+                    'success':                      True,
+                    'status':                       status,
+                    'error_result':                 False,
+                    'DoesNotExist':                 False,
+                    'MultipleObjectsReturned':      False,
+                    'voter_device_link_found':      True,
+                    'voter_device_link':            voter_device_link,
+                }
+                return results
+
         try:
             if positive_value_exists(voter_device_id):
                 status += " RETRIEVE_VOTER_DEVICE_LINK-GET_BY_VOTER_DEVICE_ID "
@@ -2642,6 +2688,8 @@ class VoterDeviceLinkManager(models.Model):
                 else:
                     voter_device_link_on_stage = VoterDeviceLink.objects.get(voter_device_id=voter_device_id)
                 voter_device_link_id = voter_device_link_on_stage.id
+                voter_identity_cache.store('voter_device_link', voter_device_id, voter_device_link_on_stage,
+                                           read_only=positive_value_exists(read_only))
             elif positive_value_exists(voter_id):
                 status += " RETRIEVE_VOTER_DEVICE_LINK-GET_BY_VOTER_ID "
                 if read_only:
@@ -0,0 +1,71 @@
+# voter/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from types import SimpleNamespace
+from voter.identity_cache import voter_identity_cache, VoterIdentityCacheMiddleware
+from voter.models import fetch_voter_id_from_voter_device_link, fetch_voter_we_vote_id_from_voter_device_link, \
+    Voter, VoterDeviceLink, VoterDeviceLinkManager, VoterManager
+
+VOTER_DEVICE_ID = "voteridentitycachetestdevice"
+
+
+class VoterIdentityCacheTestCase(TestCase):
+
+    def setUp(self):
+        voter_identity_cache.clear()
+        self.voter = Voter.objects.create(we_vote_id='wvt3voter1', first_name='First')
+        self.other_voter = Voter.objects.create(we_vote_id='wvt3voter2', first_name='Second')
+        VoterDeviceLink.objects.create(voter_device_id=VOTER_DEVICE_ID, voter_id=self.voter.id)
+
+    def tearDown(self):
+        voter_identity_cache.clear()
+
+    def test_repeat_lookups_within_one_request_are_not_sent_to_database(self):
+        voter_identity_cache.start_request()
+        self.assertEqual(fetch_voter_we_vote_id_from_voter_device_link(VOTER_DEVICE_ID), 'wvt3voter1')
+        with self.assertNumQueries(0):
+            self.assertEqual(fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID), self.voter.id)
+            results = VoterManager().retrieve_voter_from_voter_device_id(VOTER_DEVICE_ID, read_only=True)
+            self.assertEqual(results['voter'].first_name, 'First')
+        voter_identity_cache.end_request('apis_v1:voterRetrieveView')
+
+        endpoint_statistics = voter_identity_cache.statistics()['statistics_by_endpoint']['apis_v1:voterRetrieveView']
+        self.assertEqual(endpoint_statistics['duplicate_lookups_removed'], 3)
+
+        # Outside of a request, nothing is remembered
+        with self.assertNumQueries(1):
+            fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID)
+
+    def test_update_voter_device_link_clears_cached_link(self):
+        voter_identity_cache.start_request()
+        self.assertEqual(fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID), self.voter.id)
+        voter_device_link_manager = VoterDeviceLinkManager()
+        results = voter_device_link_manager.retrieve_voter_device_link(VOTER_DEVICE_ID)
+        voter_device_link_manager.update_voter_device_link(results['voter_device_link'], self.other_voter)
+        self.assertEqual(fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID), self.other_voter.id)
+
+        self.voter.first_name = 'Changed'
+        self.voter.save()
+        results = VoterManager().retrieve_voter_by_id(self.voter.id, read_only=True)
+        self.assertEqual(results['voter'].first_name, 'Changed')
+        voter_identity_cache.end_request()
+
+    def test_statistics_are_kept_by_view_name(self):
+        def voter_retrieve_view(request):
+            request.resolver_match = SimpleNamespace(view_name='apis_v1:voterRetrieveView')
+            fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID)
+            fetch_voter_id_from_voter_device_link(VOTER_DEVICE_ID)
+            return HttpResponse()
+
+        middleware = VoterIdentityCacheMiddleware(voter_retrieve_view)
+        request_factory = RequestFactory()
+        for path in ['/apis/v1/voterRetrieve/', '/apis/v1/voterRetrieve']:
+            middleware(request_factory.get(path, {'voter_device_id': VOTER_DEVICE_ID}))
+
+        statistics_by_endpoint = voter_identity_cache.statistics()['statistics_by_endpoint']
+        self.assertEqual(list(statistics_by_endpoint.keys()), ['apis_v1:voterRetrieveView'])
+        self.assertEqual(statistics_by_endpoint['apis_v1:voterRetrieveView']['lookups'], 4)
+        self.assertEqual(statistics_by_endpoint['apis_v1:voterRetrieveView']['duplicate_lookups_removed'], 2)
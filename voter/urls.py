@@ -19,6 +19,8 @@ urlpatterns = [
     url(r'^voter_remove_facebook_auth_process/$',
         views_admin.voter_remove_facebook_auth_process_view, name='voter_remove_facebook_auth_process'),
     url(r'^edit_process/$', views_admin.voter_edit_process_view, name='voter_edit_process'),
+    url(r'^identity_cache_statistics/$',
+        views_admin.voter_identity_cache_statistics_view, name='voter_identity_cache_statistics'),
     url(r'^login_complete/$', views_admin.login_complete_view, name='login_complete_view'),
     url(r'^(?P<voter_id>[0-9]+)/edit/$', views_admin.voter_edit_view, name='voter_edit'),
     url(r'^edit/(?P<voter_we_vote_id>wv[\w]{2}voter[\w]+)$', views_admin.voter_edit_view, name='voter_edit_we_vote_id'),
@@ -3,6 +3,7 @@
 # -*- coding: UTF-8 -*-
 
 from .controllers import delete_all_voter_information_permanently, process_maintenance_status_flags
+from .identity_cache import voter_identity_cache
 from .models import fetch_voter_id_from_voter_device_link, Voter, VoterAddressManager, VoterDeviceLinkManager, \
     voter_has_authority, VoterManager, voter_setup
 from admin_tools.views import redirect_to_sign_in_page
@@ -24,6 +25,7 @@ from twitter.models import TwitterLinkToOrganization, TwitterLinkToVoter, Twitte
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, get_voter_api_device_id, set_voter_api_device_id, \
     positive_value_exists
+from wevote_functions.process_statistics import process_statistics_json_response
 
 logger = wevote_functions.admin.get_logger(__name__)
 
@@ -84,6 +86,22 @@ def process_maintenance_status_flags_view(request):
     return HttpResponseRedirect(reverse('voter:voter_list', args=()))
 
 
+@login_required
+def voter_identity_cache_statistics_view(request):
+    """
+    Per endpoint, how many voter_device_id and voter lookups the worker process answering this request served
+    from the voter identity cache
+    :param request:
+    :return:
+    """
+    # admin, analytics_admin, partner_organization, political_data_manager, political_data_viewer, verified_volunteer
+    authority_required = {'admin'}
+    if not voter_has_authority(request, authority_required):
+        return redirect_to_sign_in_page(request, authority_required)
+
+    return process_statistics_json_response(request, voter_identity_cache.statistics)
+
+
 # This is open to anyone, and provides psql to update the database directly
 def voter_authenticate_manually_view(request):
     messages_on_stage = get_messages(request)
@@ -2716,15 +2716,34 @@ def voter_guides_to_follow_retrieve_for_api(voter_device_id,  # voterGuidesToFol
                                             start_retrieve_at_this_number=0,
                                             maximum_number_to_retrieve=0,
                                             filter_voter_guides_by_issue=False,
-                                            add_voter_guides_not_from_election=False):
+                                            add_voter_guides_not_from_election=False,
+                                            generic_for_all_voters=False):
+    """
+    :param voter_device_id:
+    :param kind_of_ballot_item:
+    :param ballot_item_we_vote_id:
+    :param google_civic_election_id:
+    :param search_string:
+    :param start_retrieve_at_this_number:
+    :param maximum_number_to_retrieve:
+    :param filter_voter_guides_by_issue:
+    :param add_voter_guides_not_from_election:
+    :param generic_for_all_voters: Skip the voter lookup and return the list as a voter who doesn't follow anyone
+        would see it. This is the version we pre-generate for ApiInternalCache.
+    :return:
+    """
     voter_we_vote_id = ""
     start_retrieve_at_this_number = convert_to_int(start_retrieve_at_this_number)
     number_retrieved = 0
     filter_voter_guides_by_issue = positive_value_exists(filter_voter_guides_by_issue)
     add_voter_guides_not_from_election = positive_value_exists(add_voter_guides_not_from_election)
+    generic_for_all_voters = positive_value_exists(generic_for_all_voters)
     status = ""
     # Get voter_id from the voter_device_id so we can figure out which voter_guides to offer
-    results = is_voter_device_id_valid(voter_device_id)
+    if generic_for_all_voters:
+        results = {'success': True}
+    else:
+        results = is_voter_device_id_valid(voter_device_id)
     if not results['success']:
         json_data = {
             'status': 'ERROR_GUIDES_TO_FOLLOW_NO_VOTER_DEVICE_ID ',
@@ -2746,8 +2765,13 @@ def voter_guides_to_follow_retrieve_for_api(voter_device_id,  # voterGuidesToFol
         }
         return results
 
-    voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
-    if not positive_value_exists(voter_id):
+    if generic_for_all_voters:
+        voter_id = 0
+        filter_voter_guides_by_issue = False
+        status += "VOTER_GUIDES_TO_FOLLOW_GENERIC_FOR_ALL_VOTERS "
+    else:
+        voter_id = fetch_voter_id_from_voter_device_link(voter_device_id)
+    if not positive_value_exists(voter_id) and not generic_for_all_voters:
         json_data = {
             'status': "ERROR_GUIDES_TO_FOLLOW_VOTER_NOT_FOUND_FROM_VOTER_DEVICE_ID ",
             'success': False,
@@ -3050,6 +3074,66 @@ def voter_guides_to_follow_retrieve_for_api(voter_device_id,  # voterGuidesToFol
         return results
 
 
+def voter_guides_to_follow_personalize_generic_json_data(voter_device_id, generic_json_data):
+    """
+    voterGuidesToFollowRetrieve: Turn the generic_for_all_voters json_data we pre-generate for ApiInternalCache into
+    the response this voter would get from voter_guides_to_follow_retrieve_for_api, by removing the voter guides the
+    voter follows, ignores or owns, and marking the ones the voter has pledged to. This takes the same few queries
+    no matter how many voter guides are in the list.
+    :param voter_device_id:
+    :param generic_json_data:
+    :return:
+    """
+    status = ""
+    voter_manager = VoterManager()
+    voter_results = voter_manager.retrieve_voter_from_voter_device_id(voter_device_id, read_only=True)
+    if not voter_results['voter_found']:
+        status += "PERSONALIZE_VOTER_GUIDES_TO_FOLLOW-VOTER_NOT_FOUND "
+        results = {
+            'success':      False,
+            'status':       status,
+            'json_data':    {},
+        }
+        return results
+    voter = voter_results['voter']
+
+    follow_organization_list_manager = FollowOrganizationList()
+    return_we_vote_id = True
+    organization_we_vote_ids_to_remove = set(
+        follow_organization_list_manager.retrieve_follow_organization_by_voter_id_simple_id_array(
+            voter.id, return_we_vote_id, read_only=True))
+    organization_we_vote_ids_to_remove.update(
+        follow_organization_list_manager.retrieve_ignore_organization_by_voter_id_simple_id_array(
+            voter.id, return_we_vote_id, read_only=True))
+    if positive_value_exists(voter.linked_organization_we_vote_id):
+        # Do not return your own voter guide to follow
+        organization_we_vote_ids_to_remove.add(voter.linked_organization_we_vote_id)
+
+    pledge_to_vote_manager = PledgeToVoteManager()
+    voter_guide_we_vote_ids_pledged = set(
+        pledge_to_vote_manager.retrieve_voter_guide_we_vote_id_list_pledged_by_voter(voter.we_vote_id))
+
+    voter_guides = []
+    for one_voter_guide in generic_json_data.get('voter_guides', []):
+        if one_voter_guide['organization_we_vote_id'] in organization_we_vote_ids_to_remove:
+            continue
+        one_voter_guide['voter_has_pledged'] = one_voter_guide['we_vote_id'] in voter_guide_we_vote_ids_pledged
+        voter_guides.append(one_voter_guide)
+
+    status += "VOTER_GUIDES_TO_FOLLOW_PERSONALIZED_FROM_GENERIC "
+    json_data = generic_json_data.copy()
+    json_data['status'] = status + generic_json_data.get('status', '')
+    json_data['voter_device_id'] = voter_device_id
+    json_data['voter_guides'] = voter_guides
+    json_data['number_retrieved'] = len(voter_guides)
+    results = {
+        'success':      True,
+        'status':       status,
+        'json_data':    json_data,
+    }
+    return results
+
+
 def retrieve_voter_guides_to_follow_by_ballot_item(voter_id, kind_of_ballot_item, ballot_item_we_vote_id,
                                                    search_string, filter_voter_guides_by_issue=None,
                                                    organization_we_vote_id_list_for_voter_issues=None):
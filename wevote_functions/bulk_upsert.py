@@ -0,0 +1,151 @@
+# wevote_functions/bulk_upsert.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# The *_import_from_structured_json functions used to handle one record at a time: a query to see if the record
+# already existed, a query for every we_vote_id that had to be translated into a local id, and a save. Now they look
+# up everything a chunk of records needs with a few "__in" queries (fetch_values_by_we_vote_id), and hand the new and
+# changed objects to BulkUpsert, which writes them with bulk_create and bulk_update.
+
+from django.db import transaction
+from exception.models import handle_record_not_saved_exception
+import wevote_functions.admin
+from wevote_functions.functions import IN_LIST_CHUNK_SIZE, positive_value_exists
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+BULK_UPSERT_BATCH_SIZE = 500
+
+
+def fetch_values_by_we_vote_id(model, we_vote_id_list, field_list=('id',), we_vote_id_field='we_vote_id'):
+    """
+    Look up many we_vote_ids at once
+    :param model: like Organization
+    :param we_vote_id_list:
+    :param field_list: the values we want for each we_vote_id
+    :param we_vote_id_field:
+    :return: dict of lower case we_vote_id -> dict of field_list values, for the we_vote_ids we have locally. If
+      more than one row has the same we_vote_id, we return the values from the one with the lowest id.
+    """
+    # Stored we_vote_ids are lower case, but we don't want to miss a row that was saved before that was enforced
+    we_vote_id_set = set()
+    for we_vote_id in we_vote_id_list:
+        if positive_value_exists(we_vote_id):
+            we_vote_id_set.add(we_vote_id)
+            we_vote_id_set.add(we_vote_id.lower())
+    we_vote_id_list = list(we_vote_id_set)
+
+    values_by_we_vote_id = {}
+    for start in range(0, len(we_vote_id_list), IN_LIST_CHUNK_SIZE):
+        query = model.objects.filter(
+            **{we_vote_id_field + '__in': we_vote_id_list[start:start + IN_LIST_CHUNK_SIZE]})
+        for row in query.order_by('id').values(we_vote_id_field, *field_list):
+            we_vote_id_lower = row[we_vote_id_field].lower()
+            if we_vote_id_lower not in values_by_we_vote_id:
+                values_by_we_vote_id[we_vote_id_lower] = row
+    return values_by_we_vote_id
+
+
+def fetch_id_by_we_vote_id(model, we_vote_id_list, we_vote_id_field='we_vote_id'):
+    """
+    :return: dict of lower case we_vote_id -> local id
+    """
+    values_by_we_vote_id = fetch_values_by_we_vote_id(
+        model, we_vote_id_list, field_list=('id',), we_vote_id_field=we_vote_id_field)
+    return {we_vote_id: values['id'] for we_vote_id, values in values_by_we_vote_id.items()}
+
+
+class BulkUpsert(object):
+    """
+    Collect the objects an import creates or changes, then write them with write(). New objects are written with
+    bulk_create. Changed objects must have their pk set, and only the fields in update_field_list (plus any auto_now
+    fields) are written with bulk_update, so an object built from the incoming record doesn't need the fields it
+    doesn't change.
+
+    The model's save() and the post_save signals are not called, so callers do what those would have done (like
+    lower casing the we_vote_id, or clearing a cache). If a batch fails, we save the objects in it one at a time, so
+    one bad record doesn't cost us the rest, and count the ones that fail as not_processed.
+    """
+
+    def __init__(self, model, update_field_list, batch_size=BULK_UPSERT_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.auto_now_field_list = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        self.update_field_list = list(update_field_list)
+        for field in self.auto_now_field_list:
+            if field.name not in self.update_field_list:
+                self.update_field_list.append(field.name)
+        self.new_object_by_key = {}
+        self.changed_object_by_key = {}
+        self.saved = 0
+        self.updated = 0
+        self.not_processed = 0
+
+    def add(self, key, one_object, existing_id=0):
+        """
+        :param key: identifies the record, like its we_vote_id. If the same key is added twice, the last one wins.
+        :param one_object: an unsaved model instance
+        :param existing_id: the id of the row this object replaces, or 0 for a new row
+        :return:
+        """
+        if key in self.new_object_by_key or key in self.changed_object_by_key:
+            # Saving one at a time, the second copy of a record updated the first
+            self.updated += 1
+        if positive_value_exists(existing_id):
+            one_object.pk = existing_id
+            self.changed_object_by_key[key] = one_object
+        elif key in self.changed_object_by_key:
+            one_object.pk = self.changed_object_by_key[key].pk
+            self.changed_object_by_key[key] = one_object
+        else:
+            self.new_object_by_key[key] = one_object
+
+    def write(self):
+        new_object_list = list(self.new_object_by_key.values())
+        for start in range(0, len(new_object_list), self.batch_size):
+            object_list = new_object_list[start:start + self.batch_size]
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(object_list)
+                self.saved += len(object_list)
+            except Exception as e:
+                logger.error("BULK_CREATE_FAILED-SAVING_ONE_AT_A_TIME " + str(e))
+                self.save_one_at_a_time(object_list, update_fields=None)
+
+        changed_object_list = list(self.changed_object_by_key.values())
+        for one_object in changed_object_list:
+            for field in self.auto_now_field_list:
+                field.pre_save(one_object, False)
+        for start in range(0, len(changed_object_list), self.batch_size):
+            object_list = changed_object_list[start:start + self.batch_size]
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_update(object_list, self.update_field_list)
+                self.updated += len(object_list)
+            except Exception as e:
+                logger.error("BULK_UPDATE_FAILED-SAVING_ONE_AT_A_TIME " + str(e))
+                self.save_one_at_a_time(object_list, update_fields=self.update_field_list)
+
+        self.new_object_by_key = {}
+        self.changed_object_by_key = {}
+        return self.results()
+
+    def save_one_at_a_time(self, object_list, update_fields):
+        for one_object in object_list:
+            try:
+                with transaction.atomic():
+                    one_object.save(update_fields=update_fields)
+                if update_fields is None:
+                    self.saved += 1
+                else:
+                    self.updated += 1
+            except Exception as e:
+                handle_record_not_saved_exception(e, logger=logger)
+                self.not_processed += 1
+
+    def results(self):
+        return {
+            'saved':            self.saved,
+            'updated':          self.updated,
+            'not_processed':    self.not_processed,
+        }
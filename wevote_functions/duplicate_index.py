@@ -0,0 +1,65 @@
+# wevote_functions/duplicate_index.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# The filter_*_structured_json_for_local_duplicates functions used to ask the database about every incoming record
+# (retrieve_possible_duplicate_*). Now they load the local rows that could match a whole chunk of records with a few
+# queries, count them in a DuplicateIndex, and answer the same question for each record from memory.
+
+from wevote_functions.functions import IN_LIST_CHUNK_SIZE, positive_value_exists
+
+
+def normalize_for_iexact(value):
+    """
+    The value iexact compares, so two values match with iexact when their normalized values are equal. Django turns
+    iexact=None into IS NULL, so None only matches None.
+    """
+    if value is None:
+        return None
+    return str(value).upper()
+
+
+def generate_lookup_chunk_list(value_list):
+    value_list = list(value_list)
+    return [value_list[start:start + IN_LIST_CHUNK_SIZE] for start in range(0, len(value_list), IN_LIST_CHUNK_SIZE)]
+
+
+def generate_upper_value_list(value_list):
+    """
+    The positive values in value_list, normalized for matching against Upper(field)
+    """
+    return list({normalize_for_iexact(value) for value in value_list if positive_value_exists(value)})
+
+
+class DuplicateIndex(object):
+    """
+    How many local rows have each key, and how many of those have each value of the one field we ignore when looking
+    for a duplicate (like the we_vote_id coming in from the Master server). That tells us whether there is a row with
+    this key other than the record we are importing.
+    """
+
+    def __init__(self):
+        self.count_by_key = {}
+        self.count_by_key_and_value = {}
+
+    def add(self, key, value=None, count=1):
+        self.count_by_key[key] = self.count_by_key.get(key, 0) + count
+        self.add_value_count(key, value, count)
+
+    def add_key_count(self, key, count):
+        """
+        For rows we count with an aggregate, without knowing their values. Use add_value_count for the values we need.
+        """
+        self.count_by_key[key] = self.count_by_key.get(key, 0) + count
+
+    def add_value_count(self, key, value, count=1):
+        self.count_by_key_and_value[(key, value)] = self.count_by_key_and_value.get((key, value), 0) + count
+
+    def key_exists(self, key):
+        return self.count_by_key.get(key, 0) > 0
+
+    def key_exists_for_other_value(self, key, value):
+        return self.count_by_key.get(key, 0) - self.count_by_key_and_value.get((key, value), 0) > 0
+
+    def value_exists(self, key, value):
+        return self.count_by_key_and_value.get((key, value), 0) > 0
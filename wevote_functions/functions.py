@@ -34,6 +34,10 @@ PUBLIC_FIGURE = 'PF'
 UNKNOWN = 'U'
 VOTER = 'V'
 
+# The most values we put in one "__in" filter. Postgres is happy with long IN lists, but we keep each query a
+# reasonable size.
+IN_LIST_CHUNK_SIZE = 5000
+
 logger = wevote_functions.admin.get_logger(__name__)
 
 
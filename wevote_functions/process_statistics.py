@@ -0,0 +1,26 @@
+# wevote_functions/process_statistics.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Our caches, the API profiler and the database router each keep their counters in one object per worker process.
+# Their admin pages all answer the same way: the counters of the worker process that happened to get the request,
+# tagged with its process id so several calls can be told apart, and clear=1 to start counting over.
+
+from django.http import HttpResponse
+import json
+import os
+from wevote_functions.functions import positive_value_exists
+
+
+def process_statistics_json_response(request, retrieve_statistics, clear_statistics=None):
+    """
+    :param request:
+    :param retrieve_statistics: returns a dict of this process's counters, like voter_identity_cache.statistics
+    :param clear_statistics: if passed, called first when the request has clear=1
+    :return:
+    """
+    if clear_statistics is not None and positive_value_exists(request.GET.get('clear', False)):
+        clear_statistics()
+    json_data = retrieve_statistics()
+    json_data['process_id'] = os.getpid()
+    return HttpResponse(json.dumps(json_data), content_type='application/json')
@@ -0,0 +1,254 @@
+# wevote_functions/sync_stream.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+# Incremental sync between the Master We Vote server and developer/staging servers.
+#
+# When a *SyncOut endpoint is called with format=ndjson it streams one JSON object per line instead of building the
+# whole list in memory. Rows come out in id order, a page at a time (keyset pagination, no OFFSET). Two optional
+# parameters narrow the response:
+#   changed_since   only rows whose date_last_changed (or date_last_updated) is at or after this ISO 8601 time
+#   cursor          continue a sync that stopped after "limit" rows
+# The last line is always {"_sync": {...}} with success, status, count, has_more, cursor and next_changed_since.
+# The importing server keeps next_changed_since in a WeVoteSetting, so the next sync only asks for the rows that
+# changed. If any row wasn't imported, we keep the old watermark so the next sync asks for it again. Rows deleted on the
+# Master server are not reported. Run a full sync to pick up deletions.
+# So far ballotItemsSyncOut, candidatesSyncOut and positionsSyncOut stream, and the imports of ballot items, candidates
+# and positions use import_from_master_server_in_chunks. The other *SyncOut endpoints still return one json list.
+
+from datetime import timedelta
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+import json
+import requests
+import wevote_functions.admin
+from wevote_functions.functions import convert_to_int, positive_value_exists
+from wevote_settings.models import WeVoteSetting, WeVoteSettingsManager
+
+logger = wevote_functions.admin.get_logger(__name__)
+
+SYNC_NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+SYNC_PAGE_SIZE = 1000
+SYNC_MAX_ROWS_PER_RESPONSE = 50000
+SYNC_IMPORT_CHUNK_SIZE = 500
+# A row saved just before a sync starts might not be committed until just after. Asking for a few minutes of
+# overlap next time means we don't miss it. Importing the same row twice is harmless.
+SYNC_WATERMARK_OVERLAP_SECONDS = 300
+
+
+def encode_sync_cursor(sync_started_at, last_id):
+    return '{sync_started_at}|{last_id}'.format(sync_started_at=sync_started_at.isoformat(), last_id=last_id)
+
+
+def decode_sync_cursor(cursor):
+    """
+    :return: (sync_started_at, last_id). Raises ValueError if the cursor wasn't made by encode_sync_cursor.
+    """
+    sync_started_at_text, last_id_text = cursor.split('|')
+    sync_started_at = parse_datetime(sync_started_at_text)
+    if sync_started_at is None:
+        raise ValueError('cursor date not recognized')
+    return sync_started_at, int(last_id_text)
+
+
+def generate_sync_ndjson_lines(query, field_list, changed_since_field, changed_since, cursor, limit):
+    status = ""
+    count = 0
+    has_more = False
+    try:
+        if positive_value_exists(cursor):
+            sync_started_at, last_id = decode_sync_cursor(cursor)
+        else:
+            sync_started_at, last_id = now(), 0
+        if positive_value_exists(changed_since):
+            changed_since_date = parse_datetime(changed_since)
+            if changed_since_date is None:
+                raise ValueError('changed_since not recognized: ' + str(changed_since))
+            query = query.filter(**{changed_since_field + '__gte': changed_since_date})
+        # Rows saved after the sync started are left for the next sync, so paging through can't skip or repeat them
+        query = query.exclude(**{changed_since_field + '__gt': sync_started_at})
+
+        while True:
+            page_size = min(SYNC_PAGE_SIZE, limit - count)
+            if page_size <= 0:
+                has_more = True
+                break
+            row_list = list(query.filter(id__gt=last_id).order_by('id').values('id', *field_list)[:page_size])
+            for row in row_list:
+                last_id = row.pop('id')
+                yield json.dumps(row, default=str) + '\n'
+            count += len(row_list)
+            if len(row_list) < page_size:
+                break
+        success = True
+        status += "SYNC_OUT_COMPLETE "
+    except Exception as e:
+        success = False
+        status += "SYNC_OUT_FAILED " + str(e) + " "
+        logger.error(status)
+        sync_started_at = None
+
+    sync_json = {
+        'success':  success,
+        'status':   status,
+        'count':    count,
+        'has_more': has_more,
+    }
+    if success:
+        sync_json['cursor'] = encode_sync_cursor(sync_started_at, last_id) if has_more else ''
+        sync_json['next_changed_since'] = \
+            (sync_started_at - timedelta(seconds=SYNC_WATERMARK_OVERLAP_SECONDS)).isoformat()
+    yield json.dumps({'_sync': sync_json}) + '\n'
+
+
+def sync_out_ndjson_response(request, query, field_list, changed_since_field='date_last_changed'):
+    """
+    Stream query as NDJSON, reading changed_since, cursor and limit from the request
+    """
+    changed_since = request.GET.get('changed_since', '')
+    cursor = request.GET.get('cursor', '')
+    limit = convert_to_int(request.GET.get('limit', SYNC_MAX_ROWS_PER_RESPONSE)) or SYNC_MAX_ROWS_PER_RESPONSE
+    limit = min(limit, SYNC_MAX_ROWS_PER_RESPONSE)
+    # The rows are read after the view returns, outside of the request, so pick the database the router would use now
+    query = query.using(query.db)
+    return StreamingHttpResponse(
+        generate_sync_ndjson_lines(query, field_list, changed_since_field, changed_since, cursor, limit),
+        content_type=SYNC_NDJSON_CONTENT_TYPE)
+
+
+def is_sync_out_ndjson_request(request):
+    return request.GET.get('format', '') == 'ndjson'
+
+
+class MasterServerSyncStream(object):
+    """
+    Iterate over the rows a *SyncOut endpoint on the Master server returns, following cursors until there are no
+    more. Only one page of rows is held in memory at a time. If the Master server doesn't know about format=ndjson
+    yet, we fall back to the json list it does return, and next_changed_since stays empty.
+    """
+
+    def __init__(self, get_url, get_params, changed_since=''):
+        self.get_url = get_url
+        self.get_params = dict(get_params)
+        self.get_params['format'] = 'ndjson'
+        if positive_value_exists(changed_since):
+            self.get_params['changed_since'] = changed_since
+        self.success = False
+        self.status = ""
+        self.record_count = 0
+        self.next_changed_since = ''
+
+    def __iter__(self):
+        cursor = ''
+        while True:
+            get_params = dict(self.get_params)
+            if positive_value_exists(cursor):
+                get_params['cursor'] = cursor
+            sync_json = None
+            with requests.get(self.get_url, params=get_params, stream=True) as response:
+                if SYNC_NDJSON_CONTENT_TYPE not in response.headers.get('Content-Type', ''):
+                    yield from self.records_from_json_list(response.text)
+                    return
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    one_record = json.loads(line)
+                    if '_sync' in one_record:
+                        sync_json = one_record['_sync']
+                        break
+                    self.record_count += 1
+                    yield one_record
+            if sync_json is None:
+                self.status += "SYNC_STREAM_ENDED_WITHOUT_SUMMARY "
+                return
+            self.status += sync_json['status']
+            if not sync_json['success']:
+                return
+            if not sync_json['has_more']:
+                self.success = True
+                self.next_changed_since = sync_json['next_changed_since']
+                return
+            cursor = sync_json['cursor']
+
+    def records_from_json_list(self, response_text):
+        structured_json = json.loads(response_text)
+        if 'success' in structured_json and not structured_json['success']:
+            self.status += "Error: " + structured_json['status']
+            return
+        self.success = True
+        for one_record in structured_json:
+            self.record_count += 1
+            yield one_record
+
+
+def fetch_sync_watermark_setting_name(sync_name, google_civic_election_id='', state_code=''):
+    return 'master_sync_changed_since_{sync_name}_{google_civic_election_id}_{state_code}'.format(
+        sync_name=sync_name, google_civic_election_id=google_civic_election_id, state_code=state_code.lower())
+
+
+def import_from_master_server_in_chunks(
+        sync_name, get_url, get_params, import_function, filter_function=None, full_sync=False,
+        save_watermark_when_not_processed=False):
+    """
+    Import the rows changed on the Master server since our last sync of sync_name (for the election and state in
+    get_params), SYNC_IMPORT_CHUNK_SIZE rows at a time
+    :param sync_name: positions, candidates, ballot_items, ...
+    :param get_url:
+    :param get_params:
+    :param import_function: like positions_import_from_structured_json. Returns saved, updated and not_processed
+    :param filter_function: like filter_positions_structured_json_for_local_duplicates
+    :param full_sync: ignore the saved watermark and ask for every row
+    :param save_watermark_when_not_processed: move the watermark forward even if some rows weren't imported, so the
+      next sync doesn't ask for them again
+    :return:
+    """
+    we_vote_settings_manager = WeVoteSettingsManager()
+    setting_name = fetch_sync_watermark_setting_name(
+        sync_name, get_params.get('google_civic_election_id', ''), get_params.get('state_code', ''))
+    changed_since = ''
+    if not positive_value_exists(full_sync):
+        changed_since = we_vote_settings_manager.fetch_setting(setting_name)
+
+    import_results = {
+        'success':              True,
+        'status':               "",
+        'saved':                0,
+        'updated':              0,
+        'not_processed':        0,
+        'duplicates_removed':   0,
+        'changed_since':        changed_since,
+    }
+
+    def import_one_chunk(structured_json):
+        if filter_function is not None:
+            filter_results = filter_function(structured_json)
+            structured_json = filter_results['structured_json']
+            import_results['duplicates_removed'] += filter_results['duplicates_removed']
+        chunk_results = import_function(structured_json)
+        for key in ['saved', 'updated', 'not_processed']:
+            import_results[key] += chunk_results.get(key, 0)
+
+    sync_stream = MasterServerSyncStream(get_url, get_params, changed_since=changed_since)
+    structured_json = []
+    for one_record in sync_stream:
+        structured_json.append(one_record)
+        if len(structured_json) >= SYNC_IMPORT_CHUNK_SIZE:
+            import_one_chunk(structured_json)
+            structured_json = []
+    if structured_json:
+        import_one_chunk(structured_json)
+
+    import_results['success'] = sync_stream.success
+    import_results['status'] += sync_stream.status
+    import_results['record_count'] = sync_stream.record_count
+    if sync_stream.success and positive_value_exists(sync_stream.next_changed_since):
+        if import_results['not_processed'] == 0 or positive_value_exists(save_watermark_when_not_processed):
+            we_vote_settings_manager.save_setting(
+                setting_name, sync_stream.next_changed_since, value_type=WeVoteSetting.STRING)
+        else:
+            # Ask for the rows that weren't imported again next time
+            import_results['status'] += "SYNC_WATERMARK_NOT_SAVED-ROWS_NOT_PROCESSED "
+    print("... the master server returned " + str(sync_stream.record_count) + " " + sync_name +
+          (" changed since " + changed_since if changed_since else ""))
+    return import_results
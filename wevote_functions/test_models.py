@@ -2,8 +2,18 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from django.test import TestCase
-from .functions import positive_value_exists
+from candidate.models import CandidateCampaign
+from datetime import datetime, timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase
+import json
+import os
+from unittest import mock
+from wevote_settings.models import WeVoteSettingsManager
+from .functions import convert_to_int, positive_value_exists
+from .process_statistics import process_statistics_json_response
+from .sync_stream import decode_sync_cursor, encode_sync_cursor, fetch_sync_watermark_setting_name, \
+    generate_sync_ndjson_lines, import_from_master_server_in_chunks, MasterServerSyncStream, \
+    SYNC_NDJSON_CONTENT_TYPE
 
 
 class WeVoteFunctionsTestsModels(TestCase):
@@ -74,3 +84,151 @@ class WeVoteFunctionsTestsModels(TestCase):
         value_to_test = []
         self.assertEqual(positive_value_exists(value_to_test), False,
                          "Testing value: {value_to_test}, False expected".format(value_to_test=value_to_test))
+
+    def test_sync_cursor_round_trip(self):
+        sync_started_at = datetime(2020, 10, 18, 12, 30, 15, tzinfo=timezone.utc)
+        cursor = encode_sync_cursor(sync_started_at, 4567)
+        self.assertEqual(decode_sync_cursor(cursor), (sync_started_at, 4567))
+        with self.assertRaises(ValueError):
+            decode_sync_cursor('not-a-cursor')
+
+
+class FakeSyncOutResponse(object):
+    """
+    Stands in for the requests.get response from a *SyncOut endpoint on the Master server
+    """
+
+    def __init__(self, content_type, line_list=None, text=''):
+        self.headers = {'Content-Type': content_type}
+        self.line_list = line_list or []
+        self.text = text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.line_list:
+            yield line.rstrip('\n')
+
+
+class WeVoteFunctionsTestsSyncStream(TestCase):
+
+    def setUp(self):
+        self.candidate_we_vote_id_list = ['wv01cand{number}'.format(number=number) for number in range(5)]
+        CandidateCampaign.objects.bulk_create(
+            [CandidateCampaign(we_vote_id=candidate_we_vote_id, candidate_name='Candidate ' + candidate_we_vote_id)
+             for candidate_we_vote_id in self.candidate_we_vote_id_list])
+        # The first two candidates haven't changed since January, the rest changed in June
+        CandidateCampaign.objects.filter(we_vote_id__in=self.candidate_we_vote_id_list[:2]).update(
+            date_last_updated=datetime(2020, 1, 15, tzinfo=timezone.utc))
+        CandidateCampaign.objects.filter(we_vote_id__in=self.candidate_we_vote_id_list[2:]).update(
+            date_last_updated=datetime(2020, 6, 15, tzinfo=timezone.utc))
+        self.get_url_list = []
+
+    def generate_candidate_lines(self, changed_since='', cursor='', limit=50000):
+        return list(generate_sync_ndjson_lines(
+            CandidateCampaign.objects.all(), ['we_vote_id'], 'date_last_updated', changed_since, cursor, limit))
+
+    def fake_candidates_sync_out(self, get_url, params=None, stream=False):
+        self.get_url_list.append(get_url)
+        params = params or {}
+        line_list = self.generate_candidate_lines(
+            params.get('changed_since', ''), params.get('cursor', ''), convert_to_int(params.get('limit', 50000)))
+        return FakeSyncOutResponse(SYNC_NDJSON_CONTENT_TYPE, line_list=line_list)
+
+    def test_sync_out_pages_across_limit_with_cursor(self):
+        we_vote_id_list = []
+        cursor = ''
+        response_count = 0
+        # Pages of 2 inside each response of 3 rows, so the rows cross both boundaries
+        with mock.patch('wevote_functions.sync_stream.SYNC_PAGE_SIZE', 2):
+            while True:
+                line_list = self.generate_candidate_lines(cursor=cursor, limit=3)
+                response_count += 1
+                sync_json = json.loads(line_list[-1])['_sync']
+                self.assertTrue(sync_json['success'])
+                self.assertEqual(sync_json['count'], len(line_list) - 1)
+                we_vote_id_list += [json.loads(line)['we_vote_id'] for line in line_list[:-1]]
+                if not sync_json['has_more']:
+                    self.assertEqual(sync_json['cursor'], '')
+                    break
+                cursor = sync_json['cursor']
+        self.assertEqual(response_count, 2)
+        # Every row once, in id order
+        self.assertEqual(we_vote_id_list, self.candidate_we_vote_id_list)
+
+    def test_sync_out_changed_since(self):
+        line_list = self.generate_candidate_lines(changed_since='2020-03-01T00:00:00+00:00')
+        self.assertEqual([json.loads(line)['we_vote_id'] for line in line_list[:-1]],
+                         self.candidate_we_vote_id_list[2:])
+        self.assertTrue(json.loads(line_list[-1])['_sync']['success'])
+
+        line_list = self.generate_candidate_lines(changed_since='not-a-date')
+        self.assertEqual(len(line_list), 1)
+        self.assertFalse(json.loads(line_list[-1])['_sync']['success'])
+
+    def test_master_server_sync_stream_follows_cursors(self):
+        with mock.patch('wevote_functions.sync_stream.requests.get', side_effect=self.fake_candidates_sync_out):
+            sync_stream = MasterServerSyncStream('https://master.example.com/candidatesSyncOut/', {'limit': 2})
+            we_vote_id_list = [one_record['we_vote_id'] for one_record in sync_stream]
+        self.assertEqual(we_vote_id_list, self.candidate_we_vote_id_list)
+        self.assertEqual(len(self.get_url_list), 3)
+        self.assertTrue(sync_stream.success)
+        self.assertEqual(sync_stream.record_count, 5)
+        self.assertTrue(positive_value_exists(sync_stream.next_changed_since))
+
+    def test_master_server_sync_stream_falls_back_to_json_list(self):
+        json_list = [{'we_vote_id': 'wv01cand0'}, {'we_vote_id': 'wv01cand1'}]
+        with mock.patch('wevote_functions.sync_stream.requests.get',
+                        return_value=FakeSyncOutResponse('application/json', text=json.dumps(json_list))):
+            sync_stream = MasterServerSyncStream('https://master.example.com/candidatesSyncOut/', {})
+            self.assertEqual(list(sync_stream), json_list)
+        self.assertTrue(sync_stream.success)
+        self.assertEqual(sync_stream.next_changed_since, '')
+
+    def import_candidates(self, sync_name, not_processed_per_chunk, **import_arguments):
+        def import_function(structured_json):
+            return {'saved': len(structured_json), 'updated': 0, 'not_processed': not_processed_per_chunk}
+
+        with mock.patch('wevote_functions.sync_stream.requests.get', side_effect=self.fake_candidates_sync_out):
+            return import_from_master_server_in_chunks(
+                sync_name, 'https://master.example.com/candidatesSyncOut/', {'google_civic_election_id': 4000},
+                import_function=import_function, **import_arguments)
+
+    def test_watermark_saved_only_when_every_row_imported(self):
+        we_vote_settings_manager = WeVoteSettingsManager()
+
+        import_results = self.import_candidates('candidates_all_imported', 0)
+        self.assertTrue(import_results['success'])
+        self.assertEqual(import_results['saved'], 5)
+        setting_name = fetch_sync_watermark_setting_name('candidates_all_imported', 4000)
+        self.assertTrue(positive_value_exists(we_vote_settings_manager.fetch_setting(setting_name)))
+
+        import_results = self.import_candidates('candidates_some_not_imported', 1)
+        self.assertEqual(import_results['not_processed'], 1)
+        self.assertIn('SYNC_WATERMARK_NOT_SAVED', import_results['status'])
+        setting_name = fetch_sync_watermark_setting_name('candidates_some_not_imported', 4000)
+        self.assertEqual(we_vote_settings_manager.fetch_setting(setting_name), '')
+
+        # Unless the caller asks for it
+        self.import_candidates('candidates_some_not_imported', 1, save_watermark_when_not_processed=True)
+        self.assertTrue(positive_value_exists(we_vote_settings_manager.fetch_setting(setting_name)))
+
+
+class WeVoteFunctionsTestsProcessStatistics(SimpleTestCase):
+
+    def test_statistics_are_tagged_with_process_id_and_cleared_on_request(self):
+        counters = {'hits': 3}
+        request_factory = RequestFactory()
+
+        response = process_statistics_json_response(
+            request_factory.get('/admin/statistics_json/'), lambda: dict(counters), counters.clear)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'hits': 3, 'process_id': os.getpid()})
+
+        response = process_statistics_json_response(
+            request_factory.get('/admin/statistics_json/', {'clear': 1}), lambda: dict(counters), counters.clear)
+        self.assertEqual(json.loads(response.content), {'process_id': os.getpid()})
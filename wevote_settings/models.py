@@ -2,10 +2,12 @@
 # Brought to you by We Vote. Be good.
 # -*- coding: UTF-8 -*-
 
-from django.db import models
+from django.db import connection, models, transaction
 from exception.models import handle_record_found_more_than_one_exception,\
     handle_record_not_saved_exception
+import os
 import string
+import threading
 import wevote_functions.admin
 from wevote_functions.functions import convert_to_int, generate_random_string, positive_value_exists
 
@@ -25,6 +27,10 @@ KIND_OF_ACTION_CHOICES = (
 
 logger = wevote_functions.admin.get_logger(__name__)
 
+# Each process reserves this many integers at a time from each we_vote_id counter. Integers left in the pool when
+#  a process exits are never used, so we_vote_ids have gaps, and are not in creation order across processes.
+WE_VOTE_ID_INTEGER_BLOCK_SIZE = 100
+
 
 class WeVoteSetting(models.Model):
     """
@@ -260,13 +266,112 @@ def fetch_site_unique_id_prefix():
     return site_unique_id_prefix
 
 
+class WeVoteIdIntegerAllocator(object):
+    """
+    Hands out the integers used in we_vote_ids. Each counter is a WeVoteSetting on the primary database, which we
+    move forward by a whole block in one atomic UPDATE, and then hand out the block from memory.
+    """
+
+    def __init__(self, block_size=WE_VOTE_ID_INTEGER_BLOCK_SIZE):
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        # Keyed by setting name, the [next_integer, last_integer] this process has reserved but not handed out yet
+        self.pool_by_setting_name = {}
+        self.process_id = os.getpid()
+        self.blocks_reserved = 0
+        self.integers_allocated = 0
+
+    def reserve_block(self, we_vote_id_last_setting_name, block_size):
+        """
+        Move the counter forward by block_size on the primary database
+        :return: the last integer in the block we reserved. The block is (last - block_size + 1) through last.
+        """
+        while True:
+            with transaction.atomic():
+                # Lock every row with this name (in id order, so two processes can't deadlock), so no other process
+                #  can reserve an overlapping block until we commit, and we don't depend on the readonly replica being
+                #  up-to-date. setting.name isn't unique, so processes that found the counter missing at the same
+                #  time may each have created a row. We continue from the highest of them, and keep only the first.
+                we_vote_setting_list = list(WeVoteSetting.objects.select_for_update()
+                                            .filter(name=we_vote_id_last_setting_name).order_by('id'))
+                if we_vote_setting_list:
+                    last_integer = max(convert_to_int(we_vote_setting.integer_value)
+                                       for we_vote_setting in we_vote_setting_list) + block_size
+                    WeVoteSetting.objects.filter(id=we_vote_setting_list[0].id).update(
+                        integer_value=last_integer,
+                        value_type=WeVoteSetting.INTEGER)
+                    if len(we_vote_setting_list) > 1:
+                        WeVoteSetting.objects.filter(
+                            id__in=[we_vote_setting.id for we_vote_setting in we_vote_setting_list[1:]]).delete()
+                    return last_integer
+            # Create the counter at zero, where other processes can see and lock it, then reserve from it
+            WeVoteSetting.objects.create(
+                name=we_vote_id_last_setting_name,
+                value_type=WeVoteSetting.INTEGER,
+                integer_value=0)
+
+    def fetch_integer_list(self, we_vote_id_last_setting_name, number_needed=1):
+        """
+        For bulk creates, ask for all of the integers at once
+        :param we_vote_id_last_setting_name:
+        :param number_needed:
+        :return: list of unused integers, in increasing order
+        """
+        if number_needed < 1:
+            return []
+        if connection.in_atomic_block:
+            # If the surrounding transaction is rolled back, our reservation is rolled back with it, so we can't
+            #  keep any integers in the pool for later. Reserve exactly what is needed.
+            last_integer = self.reserve_block(we_vote_id_last_setting_name, number_needed)
+            self.integers_allocated += number_needed
+            return list(range(last_integer - number_needed + 1, last_integer + 1))
+
+        integer_list = []
+        with self.lock:
+            if self.process_id != os.getpid():
+                # This process was forked from the one that filled the pool, which may still be handing them out
+                self.pool_by_setting_name = {}
+                self.process_id = os.getpid()
+            while len(integer_list) < number_needed:
+                pool = self.pool_by_setting_name.get(we_vote_id_last_setting_name)
+                if pool is None or pool[0] > pool[1]:
+                    block_size = max(self.block_size, number_needed - len(integer_list))
+                    last_integer = self.reserve_block(we_vote_id_last_setting_name, block_size)
+                    pool = [last_integer - block_size + 1, last_integer]
+                    self.pool_by_setting_name[we_vote_id_last_setting_name] = pool
+                    self.blocks_reserved += 1
+                number_to_take = min(number_needed - len(integer_list), pool[1] - pool[0] + 1)
+                integer_list.extend(range(pool[0], pool[0] + number_to_take))
+                pool[0] += number_to_take
+            self.integers_allocated += number_needed
+        return integer_list
+
+    def fetch_next_integer(self, we_vote_id_last_setting_name):
+        return self.fetch_integer_list(we_vote_id_last_setting_name, 1)[0]
+
+    def clear_pool(self):
+        with self.lock:
+            self.pool_by_setting_name = {}
+
+    def statistics(self):
+        return {
+            'block_size':           self.block_size,
+            'blocks_reserved':      self.blocks_reserved,
+            'integers_allocated':   self.integers_allocated,
+            'integers_in_pool':     sum(pool[1] - pool[0] + 1 for pool in self.pool_by_setting_name.values()),
+        }
+
+
+# One per process
+we_vote_id_integer_allocator = WeVoteIdIntegerAllocator()
+
+
 def fetch_next_we_vote_id_integer(we_vote_id_last_setting_name):
-    we_vote_settings_manager = WeVoteSettingsManager()
-    we_vote_id_last_integer = we_vote_settings_manager.fetch_setting(we_vote_id_last_setting_name)
-    we_vote_id_next_integer = convert_to_int(we_vote_id_last_integer)
-    we_vote_id_next_integer += 1
-    we_vote_settings_manager.save_setting(we_vote_id_last_setting_name, we_vote_id_next_integer)
-    return we_vote_id_next_integer
+    return we_vote_id_integer_allocator.fetch_next_integer(we_vote_id_last_setting_name)
+
+
+def fetch_next_we_vote_id_integer_list(we_vote_id_last_setting_name, number_needed):
+    return we_vote_id_integer_allocator.fetch_integer_list(we_vote_id_last_setting_name, number_needed)
 
 
 def fetch_next_we_vote_id_activity_comment_integer():
@@ -0,0 +1,102 @@
+# wevote_settings/tests.py
+# Brought to you by We Vote. Be good.
+# -*- coding: UTF-8 -*-
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+import multiprocessing
+import unittest
+from wevote_settings.models import fetch_next_we_vote_id_integer, fetch_next_we_vote_id_integer_list, \
+    WeVoteIdIntegerAllocator, we_vote_id_integer_allocator, WeVoteSetting, WeVoteSettingsManager
+
+SETTING_NAME = 'we_vote_id_last_stress_test_integer'
+PROCESS_COUNT = 8
+INTEGERS_PER_PROCESS = 500
+
+
+def allocate_integers_in_child_process(result_queue, block_size):
+    # Each process needs its own database connection
+    connections.close_all()
+    allocator = WeVoteIdIntegerAllocator(block_size=block_size)
+    integer_list = []
+    for number in range(INTEGERS_PER_PROCESS):
+        if number % 50 == 0:
+            integer_list.extend(allocator.fetch_integer_list(SETTING_NAME, 7))
+        else:
+            integer_list.append(allocator.fetch_next_integer(SETTING_NAME))
+    connections.close_all()
+    result_queue.put(integer_list)
+
+
+def reserve_missing_counter_in_child_process(result_queue, start_barrier, setting_name):
+    connections.close_all()
+    allocator = WeVoteIdIntegerAllocator(block_size=10)
+    # Every process finds the counter missing at the same moment
+    start_barrier.wait()
+    last_integer = allocator.reserve_block(setting_name, 10)
+    connections.close_all()
+    result_queue.put(last_integer)
+
+
+class WeVoteIdIntegerAllocatorTestCase(TransactionTestCase):
+    # TransactionTestCase, so the allocator is not inside an atomic block, and uses its in-process pool
+
+    def setUp(self):
+        we_vote_id_integer_allocator.clear_pool()
+
+    def test_continues_from_existing_counter(self):
+        WeVoteSettingsManager().save_setting(SETTING_NAME, 41)
+        self.assertEqual(fetch_next_we_vote_id_integer(SETTING_NAME), 42)
+        self.assertEqual(fetch_next_we_vote_id_integer(SETTING_NAME), 43)
+        self.assertEqual(fetch_next_we_vote_id_integer_list(SETTING_NAME, 3), [44, 45, 46])
+        # The counter is moved forward one block at a time
+        we_vote_setting = WeVoteSetting.objects.get(name=SETTING_NAME)
+        self.assertEqual(we_vote_setting.integer_value, 41 + we_vote_id_integer_allocator.block_size)
+
+    def test_creates_missing_counter(self):
+        allocator = WeVoteIdIntegerAllocator(block_size=10)
+        self.assertEqual(allocator.fetch_integer_list(SETTING_NAME, 25), list(range(1, 26)))
+        self.assertEqual(allocator.fetch_next_integer(SETTING_NAME), 26)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "Needs a database that allows concurrent connections")
+    def test_no_duplicates_across_processes(self):
+        connections.close_all()
+        multiprocessing_context = multiprocessing.get_context('fork')
+        result_queue = multiprocessing_context.Queue()
+        process_list = [multiprocessing_context.Process(
+            target=allocate_integers_in_child_process, args=(result_queue, block_size))
+            for block_size in [1, 10, 100, 13, 1, 10, 100, 13][:PROCESS_COUNT]]
+        for process in process_list:
+            process.start()
+        integer_list = []
+        for _ in process_list:
+            integer_list.extend(result_queue.get(timeout=120))
+        for process in process_list:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        expected_count = PROCESS_COUNT * (INTEGERS_PER_PROCESS + 6 * (INTEGERS_PER_PROCESS // 50))
+        self.assertEqual(len(integer_list), expected_count)
+        self.assertEqual(len(set(integer_list)), expected_count, "The same integer was handed out twice")
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "Needs a database that allows concurrent connections")
+    def test_no_duplicates_when_counter_is_missing(self):
+        setting_name = 'we_vote_id_last_missing_counter_test_integer'
+        connections.close_all()
+        multiprocessing_context = multiprocessing.get_context('fork')
+        result_queue = multiprocessing_context.Queue()
+        start_barrier = multiprocessing_context.Barrier(PROCESS_COUNT)
+        process_list = [multiprocessing_context.Process(
+            target=reserve_missing_counter_in_child_process, args=(result_queue, start_barrier, setting_name))
+            for _ in range(PROCESS_COUNT)]
+        for process in process_list:
+            process.start()
+        last_integer_list = [result_queue.get(timeout=120) for _ in process_list]
+        for process in process_list:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        # Each process got its own block of 10, and the counter ends at the last of them, in one row
+        self.assertEqual(sorted(last_integer_list), list(range(10, 10 * PROCESS_COUNT + 1, 10)))
+        self.assertEqual(list(WeVoteSetting.objects.filter(name=setting_name).values_list('integer_value', flat=True)),
+                         [10 * PROCESS_COUNT])